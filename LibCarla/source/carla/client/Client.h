@@ -42,6 +42,29 @@ namespace client {
       return _simulator->GetNetworkingTimeout();
     }
 
+    // 开关客户端分析器，关闭时只保留已有的统计数据。
+    void SetProfilerEnabled(bool enabled) {
+      _simulator->SetProfilerEnabled(enabled);
+    }
+
+    bool IsProfilerEnabled() const {
+      return _simulator->IsProfilerEnabled();
+    }
+
+    void ResetProfiler() {
+      _simulator->ResetProfiler();
+    }
+
+    // 每个 RPC 方法与数据流的统计数据。
+    detail::ClientProfiler::Snapshot GetProfilerSnapshot() const {
+      return _simulator->GetProfilerSnapshot();
+    }
+
+    // Prometheus 文本格式的统计数据。
+    std::string GetProfilerPrometheusText() const {
+      return _simulator->GetProfilerPrometheusText();
+    }
+
     /// 返回此客户端 API 版本的字符串。
     std::string GetClientVersion() const {
       return _simulator->GetClientVersion();
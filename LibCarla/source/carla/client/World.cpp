@@ -45,6 +45,22 @@ namespace client {
     return _episode.Lock()->GetRandomLocationFromNavigation();  // 返回随机导航位置
   }
 
+  std::vector<geom::Location> World::GetRandomLocationsFromNavigation(size_t count) const {  // 一次获取多个随机导航位置
+    return _episode.Lock()->GetRandomLocationsFromNavigation(count);
+  }
+
+  std::vector<ActorId> World::SetWalkersTargets(  // 批量设置行人的导航目标
+      const std::vector<ActorId> &walkers,
+      const std::vector<geom::Location> &targets) {
+    return _episode.Lock()->SetWalkersTargets(walkers, targets);
+  }
+
+  std::vector<ActorId> World::SetWalkersMaxSpeeds(  // 批量设置行人的最大速度
+      const std::vector<ActorId> &walkers,
+      const std::vector<float> &speeds) {
+    return _episode.Lock()->SetWalkersMaxSpeeds(walkers, speeds);
+  }
+
   SharedPtr<Actor> World::GetSpectator() const {  // 获取观众的方法
     return _episode.Lock()->GetSpectator();  // 返回当前观众
   }
@@ -83,6 +83,19 @@ namespace client {
     /// 从行人导航网格获得一个随机位置
     boost::optional<geom::Location> GetRandomLocationFromNavigation() const;
 
+    /// 从行人导航网格一次获得多个随机位置, 失败的不计入
+    std::vector<geom::Location> GetRandomLocationsFromNavigation(size_t count) const;
+
+    /// 为多个由AI控制器驱动的行人设置导航目标, 返回设置失败的行人id
+    std::vector<ActorId> SetWalkersTargets(
+        const std::vector<ActorId> &walkers,
+        const std::vector<geom::Location> &targets);
+
+    /// 为多个由AI控制器驱动的行人设置最大速度, 返回设置失败的行人id
+    std::vector<ActorId> SetWalkersMaxSpeeds(
+        const std::vector<ActorId> &walkers,
+        const std::vector<float> &speeds);
+
     /// 返回为旁观者的参与者.
     /// 旁观者控制模拟器窗口中的视图.
     SharedPtr<Actor> GetSpectator() const;
@@ -41,6 +41,17 @@ namespace detail {
     return true;
   }
 
+  /// 在流回调前记录消息大小与到达时间，关闭分析器时只多一次原子读取。
+  static std::function<void(Buffer)> ProfiledCallback(
+      ClientProfiler &profiler,
+      uint32_t stream_id,
+      std::function<void(Buffer)> callback) {
+    return [&profiler, stream_id, callback=std::move(callback)](Buffer buffer) {
+      profiler.RecordMessage(stream_id, buffer.size());
+      callback(std::move(buffer));
+    };
+  }
+
   // ===========================================================================
   // -- Client::Pimpl ----------------------------------------------------------
   // ===========================================================================
@@ -59,10 +70,17 @@ namespace detail {
 
     template <typename ... Args>
     auto RawCall(const std::string &function, Args && ... args) {
+      const auto start = ClientProfiler::clock::now();
       try {
-        return rpc_client.call(function, std::forward<Args>(args) ...);
+        auto object = rpc_client.call(function, std::forward<Args>(args) ...);
+        profiler.RecordCall(function, start, true);
+        return object;
       } catch (const ::rpc::timeout &) {
+        profiler.RecordCall(function, start, false);
         throw_exception(TimeoutException(endpoint, GetTimeout()));
+      } catch (...) {
+        profiler.RecordCall(function, start, false);
+        throw;
       }
     }
 
@@ -80,6 +98,7 @@ namespace detail {
     template <typename ... Args>
     void AsyncCall(const std::string &function, Args && ... args) {
       // Discard returned future.
+      profiler.RecordAsyncCall(function);
       rpc_client.async_call(function, std::forward<Args>(args) ...);
     }
 
@@ -91,6 +110,9 @@ namespace detail {
 
     const std::string endpoint;
 
+    // 声明在两个客户端之前，保证流回调线程结束后才析构
+    ClientProfiler profiler;
+
     rpc::Client rpc_client;
 
     streaming::Client streaming_client;
@@ -132,6 +154,26 @@ namespace detail {
     return _pimpl->GetTimeout();
   }
 
+  void Client::SetProfilerEnabled(bool enabled) {
+    _pimpl->profiler.SetEnabled(enabled);
+  }
+
+  bool Client::IsProfilerEnabled() const {
+    return _pimpl->profiler.IsEnabled();
+  }
+
+  void Client::ResetProfiler() {
+    _pimpl->profiler.Reset();
+  }
+
+  ClientProfiler::Snapshot Client::GetProfilerSnapshot() const {
+    return _pimpl->profiler.GetSnapshot();
+  }
+
+  std::string Client::GetProfilerPrometheusText() const {
+    return _pimpl->profiler.GetPrometheusText();
+  }
+
   const std::string Client::GetEndpoint() const {
     return _pimpl->endpoint;
   }
@@ -653,7 +695,9 @@ namespace detail {
       std::function<void(Buffer)> callback) {
     carla::streaming::detail::token_type thisToken(token);
     streaming::Token receivedToken = _pimpl->CallAndWait<streaming::Token>("get_sensor_token", thisToken.get_stream_id());
-    _pimpl->streaming_client.Subscribe(receivedToken, std::move(callback));
+    _pimpl->streaming_client.Subscribe(
+        receivedToken,
+        ProfiledCallback(_pimpl->profiler, thisToken.get_stream_id(), std::move(callback)));
   }
 
   void Client::UnSubscribeFromStream(const streaming::Token &token) {
@@ -687,7 +731,10 @@ namespace detail {
     std::vector<unsigned char> token_data = _pimpl->CallAndWait<std::vector<unsigned char>>("get_gbuffer_token", ActorId, GBufferId);
     streaming::Token token;
     std::memcpy(&token.data[0u], token_data.data(), token_data.size());
-    _pimpl->streaming_client.Subscribe(token, std::move(callback));
+    const auto stream_id = carla::streaming::detail::token_type(token).get_stream_id();
+    _pimpl->streaming_client.Subscribe(
+        token,
+        ProfiledCallback(_pimpl->profiler, stream_id, std::move(callback)));
   }
 
   void Client::UnSubscribeFromGBuffer(
@@ -9,6 +9,7 @@
 #include "carla/Memory.h"
 #include "carla/NonCopyable.h"
 #include "carla/Time.h"
+#include "carla/client/detail/ClientProfiler.h"
 #include "carla/geom/Transform.h"
 #include "carla/geom/Location.h"
 #include "carla/rpc/Actor.h"
@@ -96,6 +97,17 @@ namespace detail {
 
     const std::string GetEndpoint() const;
 
+    /// 开关客户端分析器，统计 RPC 调用与数据流消息。
+    void SetProfilerEnabled(bool enabled);
+
+    bool IsProfilerEnabled() const;
+
+    void ResetProfiler();
+
+    ClientProfiler::Snapshot GetProfilerSnapshot() const;
+
+    std::string GetProfilerPrometheusText() const;
+
     std::string GetClientVersion();
 
     std::string GetServerVersion();
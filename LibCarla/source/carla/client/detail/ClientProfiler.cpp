@@ -0,0 +1,155 @@
+// Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma
+// de Barcelona (UAB).
+//
+// This work is licensed under the terms of the MIT license.
+// For a copy, see <https://opensource.org/licenses/MIT>.
+
+#include "carla/client/detail/ClientProfiler.h"
+
+#include <algorithm>
+#include <sstream>
+
+namespace carla {
+namespace client {
+namespace detail {
+
+  static double ToSeconds(ClientProfiler::clock::duration duration) {
+    return std::chrono::duration_cast<std::chrono::duration<double>>(duration).count();
+  }
+
+  void ClientProfiler::RecordCall(
+      const std::string &function,
+      clock::time_point start,
+      bool succeeded) {
+    if (!IsEnabled()) {
+      return;
+    }
+    const double seconds = ToSeconds(clock::now() - start);
+    const auto buckets = Buckets();
+    const auto bucket = static_cast<size_t>(
+        std::lower_bound(buckets.begin(), buckets.end(), seconds) - buckets.begin());
+    std::lock_guard<std::mutex> lock(_mutex);
+    auto &stats = _rpc[function];
+    stats.min_seconds = stats.calls == 0u ? seconds : std::min(stats.min_seconds, seconds);
+    stats.max_seconds = std::max(stats.max_seconds, seconds);
+    ++stats.calls;
+    if (!succeeded) {
+      ++stats.errors;
+    }
+    stats.total_seconds += seconds;
+    ++stats.buckets[bucket];
+  }
+
+  void ClientProfiler::RecordAsyncCall(const std::string &function) {
+    if (!IsEnabled()) {
+      return;
+    }
+    std::lock_guard<std::mutex> lock(_mutex);
+    ++_rpc[function].async_calls;
+  }
+
+  void ClientProfiler::RecordMessage(uint32_t stream_id, size_t size) {
+    if (!IsEnabled()) {
+      return;
+    }
+    const auto now = clock::now();
+    std::lock_guard<std::mutex> lock(_mutex);
+    auto &stats = _streams[stream_id];
+    if (stats.messages > 0u) {
+      const double interval = ToSeconds(now - stats.last_arrival);
+      stats.min_interval_seconds = stats.intervals == 0u ? interval : std::min(stats.min_interval_seconds, interval);
+      stats.max_interval_seconds = std::max(stats.max_interval_seconds, interval);
+      stats.total_interval_seconds += interval;
+      ++stats.intervals;
+    }
+    stats.last_arrival = now;
+    ++stats.messages;
+    stats.bytes += size;
+    stats.max_bytes = std::max<uint64_t>(stats.max_bytes, size);
+  }
+
+  void ClientProfiler::Reset() {
+    std::lock_guard<std::mutex> lock(_mutex);
+    _rpc.clear();
+    _streams.clear();
+  }
+
+  ClientProfiler::Snapshot ClientProfiler::GetSnapshot() const {
+    Snapshot snapshot;
+    snapshot.enabled = IsEnabled();
+    std::lock_guard<std::mutex> lock(_mutex);
+    snapshot.rpc = _rpc;
+    snapshot.streams = _streams;
+    return snapshot;
+  }
+
+  std::string ClientProfiler::GetPrometheusText() const {
+    const auto snapshot = GetSnapshot();
+    const auto buckets = Buckets();
+    std::ostringstream out;
+
+    out << "# HELP carla_client_profiler_enabled Whether the client profiler is recording.\n"
+        << "# TYPE carla_client_profiler_enabled gauge\n"
+        << "carla_client_profiler_enabled " << (snapshot.enabled ? 1 : 0) << '\n';
+
+    out << "# HELP carla_client_rpc_calls_total Synchronous RPC calls by method.\n"
+        << "# TYPE carla_client_rpc_calls_total counter\n";
+    for (const auto &item : snapshot.rpc) {
+      out << "carla_client_rpc_calls_total{method=\"" << item.first << "\"} " << item.second.calls << '\n';
+    }
+    out << "# HELP carla_client_rpc_errors_total Synchronous RPC calls that failed or timed out.\n"
+        << "# TYPE carla_client_rpc_errors_total counter\n";
+    for (const auto &item : snapshot.rpc) {
+      out << "carla_client_rpc_errors_total{method=\"" << item.first << "\"} " << item.second.errors << '\n';
+    }
+    out << "# HELP carla_client_rpc_async_calls_total Asynchronous RPC calls by method.\n"
+        << "# TYPE carla_client_rpc_async_calls_total counter\n";
+    for (const auto &item : snapshot.rpc) {
+      out << "carla_client_rpc_async_calls_total{method=\"" << item.first << "\"} " << item.second.async_calls << '\n';
+    }
+    out << "# HELP carla_client_rpc_latency_seconds Latency of synchronous RPC calls.\n"
+        << "# TYPE carla_client_rpc_latency_seconds histogram\n";
+    for (const auto &item : snapshot.rpc) {
+      const auto &stats = item.second;
+      uint64_t cumulative = 0u;
+      for (size_t i = 0u; i < buckets.size(); ++i) {
+        cumulative += stats.buckets[i];
+        out << "carla_client_rpc_latency_seconds_bucket{method=\"" << item.first
+            << "\",le=\"" << buckets[i] << "\"} " << cumulative << '\n';
+      }
+      out << "carla_client_rpc_latency_seconds_bucket{method=\"" << item.first
+          << "\",le=\"+Inf\"} " << stats.calls << '\n'
+          << "carla_client_rpc_latency_seconds_sum{method=\"" << item.first << "\"} " << stats.total_seconds << '\n'
+          << "carla_client_rpc_latency_seconds_count{method=\"" << item.first << "\"} " << stats.calls << '\n';
+    }
+
+    out << "# HELP carla_client_stream_messages_total Messages received by stream.\n"
+        << "# TYPE carla_client_stream_messages_total counter\n";
+    for (const auto &item : snapshot.streams) {
+      out << "carla_client_stream_messages_total{stream=\"" << item.first << "\"} " << item.second.messages << '\n';
+    }
+    out << "# HELP carla_client_stream_bytes_total Bytes received by stream.\n"
+        << "# TYPE carla_client_stream_bytes_total counter\n";
+    for (const auto &item : snapshot.streams) {
+      out << "carla_client_stream_bytes_total{stream=\"" << item.first << "\"} " << item.second.bytes << '\n';
+    }
+    out << "# HELP carla_client_stream_interval_seconds Time between consecutive messages of a stream.\n"
+        << "# TYPE carla_client_stream_interval_seconds summary\n";
+    for (const auto &item : snapshot.streams) {
+      out << "carla_client_stream_interval_seconds_sum{stream=\"" << item.first << "\"} "
+          << item.second.total_interval_seconds << '\n'
+          << "carla_client_stream_interval_seconds_count{stream=\"" << item.first << "\"} "
+          << item.second.intervals << '\n';
+    }
+    out << "# HELP carla_client_stream_interval_max_seconds Longest time between consecutive messages of a stream.\n"
+        << "# TYPE carla_client_stream_interval_max_seconds gauge\n";
+    for (const auto &item : snapshot.streams) {
+      out << "carla_client_stream_interval_max_seconds{stream=\"" << item.first << "\"} "
+          << item.second.max_interval_seconds << '\n';
+    }
+    return out.str();
+  }
+
+} // namespace detail
+} // namespace client
+} // namespace carla
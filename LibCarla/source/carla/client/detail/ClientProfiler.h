@@ -0,0 +1,103 @@
+// Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma
+// de Barcelona (UAB).
+//
+// This work is licensed under the terms of the MIT license.
+// For a copy, see <https://opensource.org/licenses/MIT>.
+
+#pragma once
+
+#include "carla/NonCopyable.h"
+
+#include <array>
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <map>
+#include <mutex>
+#include <string>
+
+namespace carla {
+namespace client {
+namespace detail {
+
+  /// 客户端运行时性能统计：每个 RPC 方法的调用次数与延迟，以及每个数据流的
+  /// 消息大小与到达间隔。与 carla/profiler 不同，它无需重新编译即可开关，
+  /// 关闭时每次调用只多一次原子读取。
+  class ClientProfiler : private NonCopyable {
+  public:
+
+    using clock = std::chrono::steady_clock;
+
+    /// 延迟直方图的桶上限（秒），与 Prometheus 的 le 标签一致，最后一个桶为 +Inf。
+    static constexpr std::array<double, 12u> Buckets() {
+      return {{0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0}};
+    }
+
+    struct RpcStats {
+      uint64_t calls = 0u;
+      uint64_t errors = 0u;
+      /// 异步调用不等待结果，只计数
+      uint64_t async_calls = 0u;
+      double total_seconds = 0.0;
+      double min_seconds = 0.0;
+      double max_seconds = 0.0;
+      /// 每个桶的计数（非累计），最后一个为 +Inf
+      std::array<uint64_t, 13u> buckets{};
+    };
+
+    struct StreamStats {
+      uint64_t messages = 0u;
+      uint64_t bytes = 0u;
+      uint64_t max_bytes = 0u;
+      uint64_t intervals = 0u;
+      double total_interval_seconds = 0.0;
+      double min_interval_seconds = 0.0;
+      double max_interval_seconds = 0.0;
+      clock::time_point last_arrival;
+    };
+
+    struct Snapshot {
+      bool enabled = false;
+      std::map<std::string, RpcStats> rpc;
+      std::map<uint32_t, StreamStats> streams;
+    };
+
+    void SetEnabled(bool enabled) {
+      _enabled.store(enabled, std::memory_order_relaxed);
+    }
+
+    bool IsEnabled() const {
+      return _enabled.load(std::memory_order_relaxed);
+    }
+
+    /// 记录一次同步 RPC 调用，start 为发出调用前的时间。
+    void RecordCall(const std::string &function, clock::time_point start, bool succeeded);
+
+    /// 记录一次异步 RPC 调用。
+    void RecordAsyncCall(const std::string &function);
+
+    /// 记录数据流收到的一条消息。
+    void RecordMessage(uint32_t stream_id, size_t size);
+
+    /// 丢弃已有的统计数据，不改变开关状态。
+    void Reset();
+
+    Snapshot GetSnapshot() const;
+
+    /// 以 Prometheus 文本格式输出统计数据。
+    std::string GetPrometheusText() const;
+
+  private:
+
+    std::atomic_bool _enabled{false};
+
+    mutable std::mutex _mutex;
+
+    std::map<std::string, RpcStats> _rpc;
+
+    std::map<uint32_t, StreamStats> _streams;
+  };
+
+} // namespace detail
+} // namespace client
+} // namespace carla
@@ -356,6 +356,50 @@ EpisodeProxy Simulator::GetCurrentEpisode() {
     nav->SetPedestriansSeed(seed);// 设置行人种子值，用于随机生成行人的位置等
   }
 
+  std::vector<geom::Location> Simulator::GetRandomLocationsFromNavigation(size_t count) {
+    DEBUG_ASSERT(_episode != nullptr);
+    auto nav = _episode->CreateNavigationIfMissing();
+    std::vector<geom::Location> locations;
+    locations.reserve(count);
+    for (size_t i = 0u; i < count; ++i) {
+      auto location = nav->GetRandomLocation();
+      if (location.has_value()) {
+        locations.emplace_back(*location);
+      }
+    }
+    return locations;
+  }
+
+  std::vector<ActorId> Simulator::SetWalkersTargets(
+      const std::vector<ActorId> &walkers,
+      const std::vector<geom::Location> &targets) {
+    DEBUG_ASSERT(_episode != nullptr);
+    DEBUG_ASSERT(walkers.size() == targets.size());
+    auto nav = _episode->CreateNavigationIfMissing();
+    std::vector<ActorId> failed;
+    for (size_t i = 0u; i < walkers.size(); ++i) {
+      if (!nav->SetWalkerTarget(walkers[i], targets[i])) {
+        failed.emplace_back(walkers[i]);
+      }
+    }
+    return failed;
+  }
+
+  std::vector<ActorId> Simulator::SetWalkersMaxSpeeds(
+      const std::vector<ActorId> &walkers,
+      const std::vector<float> &speeds) {
+    DEBUG_ASSERT(_episode != nullptr);
+    DEBUG_ASSERT(walkers.size() == speeds.size());
+    auto nav = _episode->CreateNavigationIfMissing();
+    std::vector<ActorId> failed;
+    for (size_t i = 0u; i < walkers.size(); ++i) {
+      if (!nav->SetWalkerMaxSpeed(walkers[i], speeds[i])) {
+        failed.emplace_back(walkers[i]);
+      }
+    }
+    return failed;
+  }
+
   // ===========================================================================
   // -- 参与者的一般操作 --------------------------------------------------------
   // ===========================================================================
@@ -229,6 +229,26 @@ namespace detail {
     	return _client.GetEndpoint();
     }
 
+    void SetProfilerEnabled(bool enabled) {
+      _client.SetProfilerEnabled(enabled);
+    }
+
+    bool IsProfilerEnabled() const {
+      return _client.IsProfilerEnabled();
+    }
+
+    void ResetProfiler() {
+      _client.ResetProfiler();
+    }
+
+    ClientProfiler::Snapshot GetProfilerSnapshot() const {
+      return _client.GetProfilerSnapshot();
+    }
+
+    std::string GetProfilerPrometheusText() const {
+      return _client.GetProfilerPrometheusText();
+    }
+
     /// 查询交通管理器是否正在端口上运行
     bool IsTrafficManagerRunning(uint16_t port) const {
       return _client.IsTrafficManagerRunning(port);
@@ -350,6 +370,16 @@ namespace detail {
     void SetPedestriansCrossFactor(float percentage);
     // 设置行人行为的随机种子，可能影响行人生成或路径选择的随机性
     void SetPedestriansSeed(unsigned int seed);
+    // 一次从导航中获取多个随机位置，失败的不计入
+    std::vector<geom::Location> GetRandomLocationsFromNavigation(size_t count);
+    // 为多个行人设置导航目标，返回设置失败的行人 id
+    std::vector<ActorId> SetWalkersTargets(
+        const std::vector<ActorId> &walkers,
+        const std::vector<geom::Location> &targets);
+    // 为多个行人设置最大速度，返回设置失败的行人 id
+    std::vector<ActorId> SetWalkersMaxSpeeds(
+        const std::vector<ActorId> &walkers,
+        const std::vector<float> &speeds);
 
     /// @}
     // =========================================================================
@@ -71,6 +71,7 @@ class BasicAgent:
         self._speed_ratio = 1
         self._max_brake = 0.5
         self._offset = 0
+        self._traffic_light_mirror = None
 
         # Change parameters according to the dictionary
         opt_dict['target_speed'] = target_speed
@@ -94,6 +95,8 @@ class BasicAgent:
             self._max_brake = opt_dict['max_brake']
         if 'offset' in opt_dict:
             self._offset = opt_dict['offset']
+        if 'traffic_light_mirror' in opt_dict:
+            self._traffic_light_mirror = opt_dict['traffic_light_mirror']
 
         # Initialize the planners
         self._local_planner = LocalPlanner(self._vehicle, opt_dict=opt_dict, map_inst=self._map)
@@ -239,6 +242,19 @@ class BasicAgent:
         """(De)activates the checks for traffic lights"""
         self._ignore_traffic_lights = active
 
+    def set_traffic_light_mirror(self, mirror):
+        """
+        Reads the traffic light states from a TrafficLightMirror, updated by the caller every tick,
+        instead of each traffic light actor. None goes back to the actors.
+        """
+        self._traffic_light_mirror = mirror
+
+    def _traffic_light_state(self, traffic_light):
+        """Current state of a traffic light, from the mirror if there is one"""
+        if self._traffic_light_mirror is not None:
+            return self._traffic_light_mirror.carla_state(traffic_light.id)
+        return traffic_light.state
+
     def ignore_stop_signs(self, active=True):
         """(De)activates the checks for stop signs"""
         self._ignore_stop_signs = active
@@ -292,11 +308,16 @@ class BasicAgent:
             max_distance = self._base_tlight_threshold
 
         if self._last_traffic_light:
-            if self._last_traffic_light.state != carla.TrafficLightState.Red:
+            if self._traffic_light_state(self._last_traffic_light) != carla.TrafficLightState.Red:
                 self._last_traffic_light = None
             else:
                 return TrafficLightDetectionResult(True, self._last_traffic_light)
 
+        if self._traffic_light_mirror is not None:
+            # Only the red lights can affect the vehicle, skip the others before any waypoint query
+            red_lights = set(self._traffic_light_mirror.ids_in_state(carla.TrafficLightState.Red).tolist())
+            lights_list = [traffic_light for traffic_light in lights_list if traffic_light.id in red_lights]
+
         ego_vehicle_location = self._vehicle.get_location()
         ego_vehicle_waypoint = self._map.get_waypoint(ego_vehicle_location)
 
@@ -321,7 +342,7 @@ class BasicAgent:
             if dot_ve_wp < 0:
                 continue
 
-            if traffic_light.state != carla.TrafficLightState.Red:
+            if self._traffic_light_state(traffic_light) != carla.TrafficLightState.Red:
                 continue
 
             if is_within_distance(trigger_wp.transform, self._vehicle.get_transform(), max_distance, [0, 90]):
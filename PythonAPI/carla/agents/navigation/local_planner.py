@@ -59,6 +59,8 @@ class LocalPlanner:
             max_brake: maximum brake applied to the vehicle
             max_steering: maximum steering applied to the vehicle
             offset: distance between the route waypoints and the center of the lane
+            random_seed: seed of the road option choices at intersections, by default
+                the global random module is used
         :param map_inst: carla.Map instance to avoid the expensive call of getting it.
         """
                
@@ -100,6 +102,7 @@ class LocalPlanner:
         self._base_min_distance = 3.0
         self._distance_ratio = 0.5
         self._follow_speed_limits = False
+        self._random = random
 
         # Overload parameters 根据传入字典重载参数
         if opt_dict:
@@ -127,6 +130,8 @@ class LocalPlanner:
                 self._distance_ratio = opt_dict['distance_ratio']
             if 'follow_speed_limits' in opt_dict:
                 self._follow_speed_limits = opt_dict['follow_speed_limits']
+            if 'random_seed' in opt_dict:
+                self._random = random.Random(opt_dict['random_seed'])
 
         # initializing controller 初始化控制器
         self._init_controller()
@@ -199,7 +204,7 @@ class LocalPlanner:
                 # random choice between the possible options
                 road_options_list = _retrieve_options(
                     next_waypoints, last_waypoint)
-                road_option = random.choice(road_options_list)
+                road_option = self._random.choice(road_options_list)
                 next_waypoint = next_waypoints[road_options_list.index(
                     road_option)]
 
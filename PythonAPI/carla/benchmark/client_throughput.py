@@ -0,0 +1,261 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Throughput of the Python client layer, without a simulator.
+
+Each case repeats one client operation (command batches, actor list
+filtering, waypoint chains, transform math and sensor raw_data delivery)
+for a fixed time and reports the median operations per second of several
+repetitions. Record the calls once against a real server and replay them
+with a stand-in server (see benchmark.standin) afterwards, so the numbers
+depend on the client and its bindings only:
+
+    python -m benchmark.client_throughput --port 2000 --record session.cassette
+    python -m benchmark.client_throughput --cassette session.cassette --json new.json --baseline old.json
+
+(run from PythonAPI/carla). Without --cassette nor --record the cases run
+against the server at --host/--port.
+"""
+
+import argparse
+import gc
+import sys
+import time
+
+from benchmark import metrics
+from benchmark.standin import Cassette, RecordingProxy, StandInServer
+
+CASES = ('apply_batch', 'apply_batch_sync', 'get_actors_filter', 'waypoint_next', 'transform_math', 'raw_data')
+
+# 用于匹配基线中同一用例的字段
+CASE_KEY = ('case',)
+
+
+def _carla():
+    try:
+        import carla
+    except ImportError:
+        raise RuntimeError('cannot import carla, make sure the CARLA egg or wheel is installed')
+    return carla
+
+
+def measure(operation, repetitions=5, duration=1.0, warmup=0.2):
+    """
+    Call operation, which returns the number of operations it did, in a loop
+    for duration seconds, repetitions times, with the garbage collector off.
+
+        :return: dict with the median, min and max ops_per_sec of the
+                 repetitions and their relative spread ((max - min) / median)
+    """
+    deadline = time.perf_counter() + warmup
+    while time.perf_counter() < deadline:
+        operation()
+    rates = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repetitions):
+            count = 0
+            start = time.perf_counter()
+            end = start + duration
+            now = start
+            while now < end:
+                count += operation()
+                now = time.perf_counter()
+            rates.append(count / (now - start))
+    finally:
+        if enabled:
+            gc.enable()
+    rates.sort()
+    median = rates[len(rates) // 2] if len(rates) % 2 else 0.5 * (rates[len(rates) // 2 - 1] + rates[len(rates) // 2])
+    return {
+        'ops_per_sec': median,
+        'ops_per_sec_min': rates[0],
+        'ops_per_sec_max': rates[-1],
+        'spread': (rates[-1] - rates[0]) / median if median > 0.0 else float('nan'),
+    }
+
+
+# ==============================================================================
+# -- Cases ---------------------------------------------------------------------
+# ==============================================================================
+
+class Context(object):
+    """
+    Actors and objects used by the cases: a vehicle at the first spawn
+    point with a sensor attached, and the map.
+    """
+
+    def __init__(self, client, sensor='sensor.other.imu', batch_size=100, chain_length=50, points=100):
+        carla = _carla()
+        self.carla = carla
+        self.client = client
+        self.world = client.get_world()
+        self.map = self.world.get_map()
+        self.batch_size = batch_size
+        self.chain_length = chain_length
+        library = self.world.get_blueprint_library()
+        spawn_point = self.map.get_spawn_points()[0]
+        self.vehicle = self.world.spawn_actor(library.filter('vehicle.*')[0], spawn_point)
+        self.sensor = self.world.spawn_actor(
+            library.find(sensor), carla.Transform(carla.Location(z=2.0)), attach_to=self.vehicle)
+        self.waypoint = self.map.get_waypoint(spawn_point.location)
+        self.transform = spawn_point
+        self.points = [carla.Location(x=0.1 * i, y=-0.2 * i, z=0.05 * i) for i in range(points)]
+        self.commands = [carla.command.ApplyTransform(self.vehicle.id, spawn_point) for _ in range(batch_size)]
+        self.messages = 0
+        self.bytes = 0
+
+    def on_data(self, data):
+        # 与用户代码一样访问 raw_data 缓冲区
+        self.bytes += len(memoryview(data.raw_data))
+        self.messages += 1
+
+    def destroy(self):
+        self.sensor.stop()
+        self.client.apply_batch_sync([self.carla.command.DestroyActor(x) for x in (self.sensor.id, self.vehicle.id)])
+
+
+def apply_batch(context):
+    context.client.apply_batch(context.commands)
+    return context.batch_size
+
+
+def apply_batch_sync(context):
+    context.client.apply_batch_sync(context.commands)
+    return context.batch_size
+
+
+def get_actors_filter(context):
+    context.world.get_actors().filter('vehicle.*')
+    return 1
+
+
+def waypoint_next(context):
+    waypoint = context.waypoint
+    for _ in range(context.chain_length):
+        following = waypoint.next(2.0)
+        if not following:
+            break
+        waypoint = following[0]
+    return context.chain_length
+
+
+def transform_math(context):
+    transform = context.transform
+    points = [context.carla.Location(point) for point in context.points]
+    transform.transform(points)
+    for point in points:
+        transform.transform_vector(point)
+        point.distance(transform.location)
+    transform.get_forward_vector()
+    transform.get_matrix()
+    return len(points)
+
+
+def raw_data(context):
+    # 消息在流线程中到达，这里只统计两次调用之间到达的数量
+    before = context.messages
+    time.sleep(0.01)
+    return context.messages - before
+
+
+OPERATIONS = {
+    'apply_batch': apply_batch,
+    'apply_batch_sync': apply_batch_sync,
+    'get_actors_filter': get_actors_filter,
+    'waypoint_next': waypoint_next,
+    'transform_math': transform_math,
+    'raw_data': raw_data,
+}
+
+
+def run_cases(client, cases=CASES, repetitions=5, duration=1.0, **kwargs):
+    """
+    Run the cases against a connected client.
+
+        :return: list of records, one per case
+    """
+    context = Context(client, **kwargs)
+    records = []
+    try:
+        for case in cases:
+            if case == 'raw_data':
+                context.sensor.listen(context.on_data)
+                context.bytes = 0
+            operation = OPERATIONS[case]
+            start = time.perf_counter()
+            record = {'case': case}
+            record.update(measure(lambda: operation(context), repetitions, duration))
+            if case == 'raw_data':
+                context.sensor.stop()
+                elapsed = time.perf_counter() - start
+                record['bytes_per_sec'] = context.bytes / elapsed if elapsed > 0.0 else float('nan')
+            records.append(record)
+    finally:
+        context.destroy()
+    return records
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Measure the throughput of the CARLA Python client')
+    argparser.add_argument('--host', metavar='H', default='localhost', help='IP of the server (default: localhost)')
+    argparser.add_argument('-p', '--port', metavar='P', default=2000, type=int, help='RPC port of the server (default: 2000)')
+    argparser.add_argument('--record', metavar='FILE', default=None,
+                           help='run against the server through a proxy and save the calls in FILE')
+    argparser.add_argument('--cassette', metavar='FILE', default=None,
+                           help='run against a stand-in server replaying FILE instead of a real server')
+    argparser.add_argument('--cases', metavar='NAME', nargs='+', default=list(CASES), choices=CASES,
+                           help='cases to run (default: all)')
+    argparser.add_argument('--repetitions', metavar='N', default=5, type=int, help='repetitions per case (default: 5)')
+    argparser.add_argument('--duration', metavar='S', default=1.0, type=float, help='seconds per repetition (default: 1.0)')
+    argparser.add_argument('--sensor', metavar='BP', default='sensor.other.imu',
+                           help='sensor blueprint for the raw_data case (default: sensor.other.imu)')
+    argparser.add_argument('--json', metavar='FILE', default=None, help='write the records to a JSON file')
+    argparser.add_argument('--baseline', metavar='FILE', default=None,
+                           help='JSON file of a previous run, report the cases that got slower')
+    argparser.add_argument('--threshold', metavar='T', default=0.1, type=float,
+                           help='relative change that is considered a regression (default: 0.1)')
+    args = argparser.parse_args()
+    carla = _carla()
+
+    cassette = None
+    if args.record:
+        cassette = Cassette()
+        server = RecordingProxy(cassette, args.host, args.port)
+    elif args.cassette:
+        server = StandInServer(Cassette.load(args.cassette))
+    else:
+        server = None
+    if server is not None:
+        server.start()
+    try:
+        client = carla.Client(server.host if server else args.host, server.port if server else args.port)
+        client.set_timeout(10.0)
+        records = run_cases(client, args.cases, args.repetitions, args.duration, sensor=args.sensor)
+    finally:
+        if server is not None:
+            server.stop()
+    if cassette is not None:
+        cassette.save(args.record)
+
+    for record in records:
+        print('%-18s %12.1f ops/s  (%.1f%% spread)' % (record['case'], record['ops_per_sec'], 100.0 * record['spread']))
+    if args.json:
+        metrics.write_json(records, args.json, 'stand-in' if args.cassette else '%s:%d' % (args.host, args.port))
+    if args.baseline:
+        regressions = metrics.compare(records, metrics.load_records(args.baseline), args.threshold, CASE_KEY)
+        for regression in regressions:
+            print('regression in %s: %s %.1f -> %.1f (%+.1f%%)' % (
+                regression['scenario']['case'], regression['metric'], regression['baseline'],
+                regression['value'], 100.0 * regression['change']))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Benchmark metrics: tick latency, sensor delivery and client resources.
+
+    timer = TickTimer(world.tick)
+    meters = [SensorMeter() for _ in sensors]      # passed to sensor.listen
+    process = ProcessMeter()
+    process.start()
+    for _ in range(ticks):
+        timer()
+        process.sample()
+    metrics = summarize(timer, meters, process)
+
+The latency of a sensor message is the time between the start of the tick
+that produced its frame and its arrival to the callback. Records can be
+written as JSON or CSV and compared with the records of a baseline run.
+"""
+
+import csv
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+# 指标名后缀 -> 回归方向：'lower' 表示越小越好，'higher' 表示越大越好
+DIRECTIONS = (
+    ('_p50', 'lower'),
+    ('_p95', 'lower'),
+    ('_p99', 'lower'),
+    ('cpu_percent', 'lower'),
+    ('rss_mb', 'lower'),
+    ('fps_mean', 'higher'),
+    ('ticks_per_sec', 'higher'),
+    ('ops_per_sec', 'higher'),
+)
+
+# 用于匹配基线中同一场景的字段
+RECORD_KEY = ('town', 'sensors', 'weather', 'n_vehicles', 'n_walkers')
+
+
+def _psutil():
+    try:
+        import psutil
+    except ImportError:
+        raise RuntimeError('cannot import psutil, make sure psutil package is installed')
+    return psutil
+
+
+def percentiles(values, prefix, scale=1.0):
+    """
+    Return {prefix_pNN: value} for PERCENTILES, plus mean and max (NaN when
+    there are no values).
+    """
+    values = np.asarray(values, dtype=np.float64) * scale
+    result = {}
+    for percentile in PERCENTILES:
+        result['%s_p%d' % (prefix, percentile)] = float(np.percentile(values, percentile)) if len(values) else float('nan')
+    result['%s_mean' % prefix] = float(values.mean()) if len(values) else float('nan')
+    result['%s_max' % prefix] = float(values.max()) if len(values) else float('nan')
+    return result
+
+
+# ==============================================================================
+# -- Meters --------------------------------------------------------------------
+# ==============================================================================
+
+class TickTimer(object):
+    """
+    Wraps world.tick or world.wait_for_tick and times every call.
+    """
+
+    def __init__(self, tick):
+        self._tick = tick
+        self.frames = []
+        self.starts = []
+        self.ends = []
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._tick(*args, **kwargs)
+        end = time.perf_counter()
+        # world.tick 返回帧号，wait_for_tick 返回 WorldSnapshot
+        self.frames.append(getattr(result, 'frame', result))
+        self.starts.append(start)
+        self.ends.append(end)
+        return result
+
+    def reset(self):
+        self.frames, self.starts, self.ends = [], [], []
+
+    @property
+    def durations(self):
+        return np.subtract(self.ends, self.starts)
+
+    @property
+    def window(self):
+        return (self.ends[-1] - self.starts[0]) if self.starts else 0.0
+
+
+class SensorMeter(object):
+    """
+    Sensor callback recording the frame, arrival time and size of every
+    message. It can wrap another callback.
+    """
+
+    def __init__(self, callback=None):
+        self._callback = callback
+        self.arrivals = []
+
+    def __call__(self, data):
+        arrival = time.perf_counter()
+        raw_data = getattr(data, 'raw_data', None)
+        # list.append 是原子操作，回调线程中无需加锁
+        self.arrivals.append((data.frame, arrival, len(raw_data) if raw_data is not None else 0))
+        if self._callback is not None:
+            self._callback(data)
+
+    def reset(self):
+        self.arrivals = []
+
+
+class ProcessMeter(object):
+    """
+    CPU usage and resident memory of this (client) process.
+    """
+
+    def __init__(self):
+        self._process = _psutil().Process(os.getpid())
+        self.rss_max = 0
+
+    def start(self):
+        self._process.cpu_percent(None)
+        self.rss_max = self._process.memory_info().rss
+
+    def sample(self):
+        self.rss_max = max(self.rss_max, self._process.memory_info().rss)
+
+    def stop(self):
+        """
+        :return: dict with the CPU percent since start and the peak RSS in MB
+        """
+        self.sample()
+        return {'cpu_percent': self._process.cpu_percent(None), 'rss_mb': self.rss_max / (1024.0 * 1024.0)}
+
+
+def sensor_metrics(meter, timer):
+    """
+    Throughput and delivery latency of the messages of one sensor received
+    during the ticks of the timer.
+    """
+    starts = dict(zip(timer.frames, timer.starts))
+    latencies = []
+    messages = 0
+    size = 0
+    for frame, arrival, nbytes in list(meter.arrivals):
+        if frame not in starts:
+            continue
+        messages += 1
+        size += nbytes
+        latencies.append(arrival - starts[frame])
+    window = timer.window
+    result = {
+        'messages': messages,
+        'bytes_per_sec': size / window if window > 0.0 else float('nan'),
+    }
+    result.update(percentiles(latencies, 'latency_ms', 1000.0))
+    return result
+
+
+def summarize(timer, meters, process=None, labels=None):
+    """
+    Collect the metrics of a benchmark run.
+
+        :param meters: SensorMeter of every sensor
+        :param process: ProcessMeter started before the ticks, optional
+        :param labels: name of every sensor, stored with its metrics
+        :return: dict with tick latency percentiles, ticks_per_sec, the list
+                 of per-sensor metrics (sensor_metrics) and the process metrics
+    """
+    result = percentiles(timer.durations, 'tick_ms', 1000.0)
+    window = timer.window
+    result['ticks_per_sec'] = len(timer.starts) / window if window > 0.0 else float('nan')
+    sensors = []
+    for index, meter in enumerate(meters):
+        metrics = {'label': labels[index] if labels else str(index)}
+        metrics.update(sensor_metrics(meter, timer))
+        sensors.append(metrics)
+    result['sensor_metrics'] = sensors
+    if process is not None:
+        result.update(process.stop())
+    return result
+
+
+# ==============================================================================
+# -- Output --------------------------------------------------------------------
+# ==============================================================================
+
+def flatten(record):
+    """
+    Flatten the per-sensor metrics of a record into sensorN_<metric> keys.
+    """
+    flat = dict((key, value) for key, value in record.items() if key != 'sensor_metrics')
+    for index, sensor in enumerate(record.get('sensor_metrics', [])):
+        for key, value in sensor.items():
+            flat['sensor%d_%s' % (index, key)] = value
+    return flat
+
+
+def write_json(records, path, system=None):
+    with open(path, 'w') as output:
+        json.dump({'system': system, 'records': records}, output, indent=2)
+
+
+def write_csv(records, path):
+    """
+    Write the flattened records, one row per scenario.
+    """
+    rows = [flatten(record) for record in records]
+    columns = []
+    for row in rows:
+        columns.extend(key for key in row if key not in columns)
+    with open(path, 'w') as output:
+        writer = csv.DictWriter(output, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_records(path):
+    """
+    Read the records of a JSON file written by write_json.
+    """
+    with open(path) as source:
+        return json.load(source)['records']
+
+
+def _direction(metric):
+    for suffix, direction in DIRECTIONS:
+        if metric.endswith(suffix):
+            return direction
+    return None
+
+
+def compare(records, baseline, threshold=0.1, key_fields=RECORD_KEY):
+    """
+    Compare records with the ones of a baseline run of the same scenarios.
+
+        :param threshold: relative change that is considered a regression
+        :param key_fields: fields identifying the same scenario in both runs
+        :return: list of regressions, dicts with the scenario key, the metric,
+                 the baseline and new values and the relative change
+    """
+    reference = dict((tuple(record.get(field) for field in key_fields), flatten(record)) for record in baseline)
+    regressions = []
+    for record in records:
+        key = tuple(record.get(field) for field in key_fields)
+        if key not in reference:
+            continue
+        old = reference[key]
+        for metric, value in sorted(flatten(record).items()):
+            direction = _direction(metric)
+            if direction is None or metric not in old:
+                continue
+            try:
+                value, before = float(value), float(old[metric])
+            except (TypeError, ValueError):
+                continue
+            if math.isnan(value) or math.isnan(before) or before == 0.0:
+                continue
+            change = (value - before) / abs(before)
+            if (direction == 'lower' and change > threshold) or (direction == 'higher' and change < -threshold):
+                regressions.append({
+                    'scenario': dict(zip(key_fields, key)),
+                    'metric': metric,
+                    'baseline': before,
+                    'value': value,
+                    'change': change})
+    return regressions
@@ -0,0 +1,288 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Run the scenario matrix of util/performance_benchmark.py on several servers.
+
+The matrix (town x weather x environment x sensors) is listed once with
+performance_benchmark.py --list_scenarios, split in one shard per server
+keeping the scenarios of a town together as far as the balance allows (so
+each server loads as few maps as possible) and every shard runs in its own
+benchmark process against its own server. The results are merged into a
+single JSON report:
+
+    python -m benchmark.orchestrator -n 4 --carla ~/carla/CarlaUE4.sh -- --ticks 200
+
+(run from PythonAPI/carla). The arguments after "--" are passed to every
+benchmark process. Without --carla the servers must already be listening on
+the ports base_port, base_port + port_step, ... Any script accepting the
+--port, --tm_port, --list_scenarios, --scenarios and --json arguments of
+performance_benchmark.py can be used as --worker, e.g. a stand-in server.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# 每个服务器占用 RPC、streaming 和 secondary 三个连续端口
+PORT_STEP = 3
+TM_BASE_PORT = 8000
+
+DEFAULT_WORKER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'util', 'performance_benchmark.py')
+
+
+# ==============================================================================
+# -- Sharding ------------------------------------------------------------------
+# ==============================================================================
+
+def shard_scenarios(scenarios, shards):
+    """
+    Split the scenarios in balanced shards.
+
+    The scenarios of a town are split in chunks of at most
+    ceil(len(scenarios) / shards) and the chunks are assigned, largest
+    first, to the least loaded shard; each shard keeps the original order
+    so the benchmark loads each of its towns once.
+
+        :return: list of shards, each a list of scenarios
+    """
+    if shards < 1:
+        raise ValueError('at least one shard is needed, got %d' % shards)
+    limit = max(1, -(-len(scenarios) // shards))
+    towns = {}
+    for position, scenario in enumerate(scenarios):
+        towns.setdefault(scenario['town'], []).append(position)
+    chunks = []
+    for positions in towns.values():
+        chunks.extend(positions[start:start + limit] for start in range(0, len(positions), limit))
+    chunks.sort(key=lambda chunk: (-len(chunk), chunk[0]))
+    assigned = [[] for _ in range(shards)]
+    for chunk in chunks:
+        target = min(range(shards), key=lambda index: (len(assigned[index]), index))
+        assigned[target].extend(chunk)
+    return [[scenarios[position] for position in sorted(positions)] for positions in assigned]
+
+
+# ==============================================================================
+# -- Servers -------------------------------------------------------------------
+# ==============================================================================
+
+def wait_for_port(host, port, timeout):
+    """
+    Wait until a TCP port accepts connections.
+
+        :return: True if it did before the timeout
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1.0).close()
+            return True
+        except (OSError, IOError):
+            time.sleep(0.5)
+    return False
+
+
+class ServerPool(object):
+    """
+    Local CARLA servers on consecutive ports, launched from a binary or
+    already running when binary is None.
+    """
+
+    def __init__(self, count, binary=None, host='localhost', base_port=2000, port_step=PORT_STEP,
+                 server_args=('-RenderOffScreen', '-nosound')):
+        self.host = host
+        self.ports = [base_port + index * port_step for index in range(count)]
+        self.tm_ports = [TM_BASE_PORT + index for index in range(count)]
+        self.binary = binary
+        self.server_args = list(server_args)
+        self.processes = []
+
+    def start(self, timeout=120.0):
+        if self.binary is not None:
+            for port in self.ports:
+                command = [self.binary, '-carla-rpc-port=%d' % port] + self.server_args
+                self.processes.append(subprocess.Popen(command))
+        for port in self.ports:
+            if not wait_for_port(self.host, port, timeout):
+                self.stop()
+                raise RuntimeError('CARLA server at %s:%d is not reachable' % (self.host, port))
+
+    def restart(self, index, timeout=120.0):
+        """
+        Relaunch the server index after a crash.
+
+            :return: False if the servers are not launched by the pool
+        """
+        if self.binary is None:
+            return False
+        process = self.processes[index]
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        command = [self.binary, '-carla-rpc-port=%d' % self.ports[index]] + self.server_args
+        self.processes[index] = subprocess.Popen(command)
+        if not wait_for_port(self.host, self.ports[index], timeout):
+            raise RuntimeError('CARLA server at %s:%d is not reachable' % (self.host, self.ports[index]))
+        return True
+
+    def stop(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+# ==============================================================================
+# -- Orchestration -------------------------------------------------------------
+# ==============================================================================
+
+def _worker_command(worker, host, port, tm_port, extra):
+    return [sys.executable, worker, '--host', host, '--port', str(port), '--tm_port', str(tm_port)] + list(extra)
+
+
+def list_scenarios(worker, host, port, extra=(), directory=None):
+    """
+    Ask a benchmark process for the scenario matrix.
+    """
+    path = os.path.join(directory or tempfile.gettempdir(), 'scenarios.json')
+    command = _worker_command(worker, host, port, TM_BASE_PORT, extra) + ['--list_scenarios', path]
+    subprocess.check_call(command)
+    with open(path) as source:
+        return json.load(source)
+
+
+def run_shards(shards, pool, worker=DEFAULT_WORKER, extra=(), directory='.'):
+    """
+    Run one benchmark process per shard concurrently, shard i against the
+    server i of the pool.
+
+        :return: list of (shard index, return code, JSON written by the shard)
+    """
+    processes = []
+    for index, shard in enumerate(shards):
+        if not shard:
+            continue
+        prefix = os.path.join(directory, 'shard%02d' % index)
+        with open(prefix + '_scenarios.json', 'w') as output:
+            json.dump(shard, output)
+        command = _worker_command(worker, pool.host, pool.ports[index], pool.tm_ports[index], extra)
+        command += ['--scenarios', prefix + '_scenarios.json', '--json', prefix + '.json',
+                    '--file', prefix + '.md']
+        log = open(prefix + '.log', 'w')
+        processes.append((index, prefix, log, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT)))
+    results = []
+    for index, prefix, log, process in processes:
+        code = process.wait()
+        log.close()
+        output = {'system': None, 'records': []}
+        if os.path.exists(prefix + '.json'):
+            with open(prefix + '.json') as source:
+                output = json.load(source)
+        results.append((index, code, output))
+    return results
+
+
+def merge_results(scenarios, results, pool, elapsed):
+    """
+    Build the report: the records in the order of the matrix, the shard
+    and server that produced each of them and the scenarios with no record.
+    """
+    records = []
+    failed = []
+    systems = []
+    for index, code, output in results:
+        if output.get('system') and output['system'] not in systems:
+            systems.append(output['system'])
+        for record in output['records']:
+            record = dict(record)
+            record['shard'] = index
+            record['port'] = pool.ports[index]
+            records.append(record)
+        if code != 0:
+            failed.append(index)
+    records.sort(key=lambda record: (record.get('scenario') is None, record.get('scenario')))
+    done = set(record.get('scenario') for record in records)
+    return {
+        'system': systems,
+        'servers': [{'host': pool.host, 'port': port, 'tm_port': tm_port}
+                    for port, tm_port in zip(pool.ports, pool.tm_ports)],
+        'wall_time': elapsed,
+        'failed_shards': failed,
+        'missing': [scenario['id'] for scenario in scenarios if scenario['id'] not in done],
+        'records': records,
+    }
+
+
+def orchestrate(pool, worker=DEFAULT_WORKER, extra=(), directory='.'):
+    """
+    List, shard and run the whole matrix on the servers of a started pool.
+
+        :return: report dictionary (see merge_results)
+    """
+    start = time.time()
+    scenarios = list_scenarios(worker, pool.host, pool.ports[0], extra, directory)
+    shards = shard_scenarios(scenarios, len(pool.ports))
+    results = run_shards(shards, pool, worker, extra, directory)
+    return merge_results(scenarios, results, pool, time.time() - start)
+
+
+def main():
+    argv = sys.argv[1:]
+    extra = []
+    if '--' in argv:
+        extra = argv[argv.index('--') + 1:]
+        argv = argv[:argv.index('--')]
+    argparser = argparse.ArgumentParser(description='Run the CARLA performance benchmark on several servers')
+    argparser.add_argument('-n', '--servers', metavar='N', default=2, type=int, help='number of servers (default: 2)')
+    argparser.add_argument('--host', metavar='H', default='localhost', help='IP of the servers (default: localhost)')
+    argparser.add_argument('-p', '--port', metavar='P', default=2000, type=int, help='port of the first server (default: 2000)')
+    argparser.add_argument('--port-step', metavar='S', default=PORT_STEP, type=int,
+                           help='port distance between servers (default: %d)' % PORT_STEP)
+    argparser.add_argument('--carla', metavar='PATH', default=None,
+                           help='server binary (CarlaUE4.sh) to launch, by default the servers are already running')
+    argparser.add_argument('--worker', metavar='PATH', default=DEFAULT_WORKER,
+                           help='benchmark script (default: util/performance_benchmark.py)')
+    argparser.add_argument('-o', '--output', metavar='FILE', default='benchmark.json', help='report (default: benchmark.json)')
+    argparser.add_argument('--shards-dir', metavar='DIR', default=None,
+                           help='directory for the shard files and logs (default: a temporary one)')
+    args = argparser.parse_args(argv)
+    directory = args.shards_dir or tempfile.mkdtemp(prefix='carla_benchmark_')
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with ServerPool(args.servers, args.carla, args.host, args.port, args.port_step) as pool:
+        report = orchestrate(pool, args.worker, extra, directory)
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print('%d records in %.1f seconds -> %s (logs in %s)' % (
+        len(report['records']), report['wall_time'], args.output, directory))
+    if report['failed_shards'] or report['missing']:
+        print('failed shards: %s, missing scenarios: %s' % (report['failed_shards'], report['missing']))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
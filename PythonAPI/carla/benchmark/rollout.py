@@ -0,0 +1,276 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Parallel rollouts of scenario x parameter grids on several servers.
+
+Every combination of scenario, blueprint and parameter values is a job.
+The jobs are pulled from a shared queue by one worker process per server
+of a ServerPool, each with its own client, and every result is appended
+to a JSON lines file as soon as it is known. Running the same grid again
+with the same file skips the jobs already done, so a sweep interrupted by
+a crash resumes where it stopped:
+
+    jobs = make_jobs(['brake', 'accel'], {'tire_friction': [2.0, 3.5], 'drag': [0.2, 0.3]})
+    with ServerPool(4, '~/carla/CarlaUE4.sh') as pool:
+        RolloutRunner(run_job, pool, ResultStore('sweep.jsonl'), setup=setup).run(jobs)
+
+run_job(world, job) returns a dict of metrics (the row of the job in the
+table) and must be a module-level function. When a server stops
+answering, the job is given to another worker and a server launched by
+the pool is restarted.
+"""
+
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+from queue import Empty
+
+from benchmark.orchestrator import wait_for_port
+
+JOB_COLUMNS = ('key', 'scenario', 'blueprint')
+
+
+# ==============================================================================
+# -- Jobs ----------------------------------------------------------------------
+# ==============================================================================
+
+def parameter_grid(parameters):
+    """
+    All the combinations of parameter values.
+
+        :param parameters: dict name -> list of values
+        :return: list of dicts name -> value, the last name varying fastest
+    """
+    names = sorted(parameters)
+    return [dict(zip(names, values)) for values in itertools.product(*(parameters[name] for name in names))]
+
+
+def job_key(scenario, blueprint, params):
+    values = ','.join('%s=%r' % (name, params[name]) for name in sorted(params))
+    return '%s|%s|%s' % (scenario, blueprint or '', values)
+
+
+def make_jobs(scenarios, parameters=None, blueprints=(None,)):
+    """
+    :param scenarios: scenario names, or (name, arguments dict) pairs
+    :return: list of job dicts with key, scenario, blueprint, args and params
+    """
+    jobs = []
+    for scenario in scenarios:
+        name, args = scenario if isinstance(scenario, tuple) else (scenario, {})
+        for blueprint in blueprints:
+            for params in parameter_grid(parameters or {}):
+                label = name if not args else '%s(%s)' % (name, ','.join(
+                    '%s=%r' % (key, args[key]) for key in sorted(args)))
+                jobs.append({'key': job_key(label, blueprint, params), 'scenario': name, 'blueprint': blueprint,
+                             'args': dict(args), 'params': params})
+    return jobs
+
+
+# ==============================================================================
+# -- ResultStore ---------------------------------------------------------------
+# ==============================================================================
+
+class ResultStore(object):
+    """
+    Append-only JSON lines file of job results; the last row of a key wins.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}
+        if os.path.exists(path):
+            with open(path) as source:
+                for line in source:
+                    line = line.strip()
+                    # 崩溃时可能留下不完整的最后一行
+                    try:
+                        row = json.loads(line) if line else None
+                    except ValueError:
+                        row = None
+                    if row is not None:
+                        self.rows[row['key']] = row
+
+    def completed(self):
+        return set(key for key, row in self.rows.items() if not row.get('error'))
+
+    def add(self, row):
+        with open(self.path, 'a') as output:
+            output.write(json.dumps(row, sort_keys=True) + '\n')
+            output.flush()
+            os.fsync(output.fileno())
+        self.rows[row['key']] = row
+
+    def table(self):
+        """
+        :return: (columns, rows as lists), the job columns first and then
+                 the parameters and metrics in alphabetical order
+        """
+        rows = []
+        for row in self.rows.values():
+            flat = dict((name, row.get(name)) for name in JOB_COLUMNS)
+            flat.update(row.get('args', {}))
+            flat.update(row.get('params', {}))
+            flat.update(row.get('metrics', {}))
+            flat.update((name, row.get(name)) for name in ('port', 'elapsed', 'error'))
+            rows.append(flat)
+        others = sorted(set(name for row in rows for name in row) - set(JOB_COLUMNS))
+        columns = list(JOB_COLUMNS) + others
+        rows.sort(key=lambda row: row['key'])
+        return columns, [[row.get(name) for name in columns] for row in rows]
+
+    def save_csv(self, path):
+        columns, rows = self.table()
+        with open(path, 'w') as output:
+            writer = csv.writer(output)
+            writer.writerow(columns)
+            writer.writerows(rows)
+
+
+# ==============================================================================
+# -- RolloutRunner -------------------------------------------------------------
+# ==============================================================================
+
+def connect(host, port, timeout):
+    import carla
+
+    client = carla.Client(host, port)
+    client.set_timeout(timeout)
+    return client
+
+
+def _default_setup(client):
+    return client.get_world()
+
+
+def _work(function, setup, connector, host, port, timeout, jobs, results):
+    world = setup(connector(host, port, timeout))
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        results.put(('start', port, job))
+        start = time.time()
+        row = dict((name, job[name]) for name in JOB_COLUMNS + ('args', 'params'))
+        try:
+            row['metrics'] = dict(function(world, job) or {})
+            row['error'] = None
+        except Exception as error:
+            if not wait_for_port(host, port, min(timeout, 5.0)):
+                # 服务器已经不可用，任务交给其它服务器
+                results.put(('dead', port, job))
+                return
+            row['metrics'] = {}
+            row['error'] = '%s: %s' % (type(error).__name__, error)
+        row['port'] = port
+        row['elapsed'] = time.time() - start
+        results.put(('done', port, row))
+
+
+class RolloutRunner(object):
+    """
+    Runs jobs on the servers of a started ServerPool, one worker process
+    per server.
+    """
+
+    def __init__(self, function, pool, store, setup=None, timeout=30.0, restarts=1, connector=connect):
+        """
+        :param function: function(world, job) -> dict of metrics
+        :param setup: function(client) -> world, called once per worker
+                      (e.g. to load a map and set synchronous mode)
+        :param restarts: times a crashed server launched by the pool is restarted
+        :param connector: function(host, port, timeout) -> client
+        """
+        self.function = function
+        self.pool = pool
+        self.store = store
+        self.setup = setup or _default_setup
+        self.timeout = timeout
+        self.restarts = restarts
+        self.connector = connector
+        self.dead = []
+
+    def _start_worker(self, port, jobs, results):
+        process = multiprocessing.Process(
+            target=_work, args=(self.function, self.setup, self.connector, self.pool.host, port, self.timeout,
+                                jobs, results))
+        process.daemon = True
+        process.start()
+        return process
+
+    def run(self, jobs, progress=None):
+        """
+        Run the jobs not completed in the store.
+
+            :param progress: called with every result row
+            :return: number of jobs run
+        """
+        done = self.store.completed()
+        pending = [job for job in jobs if job['key'] not in done]
+        if not pending:
+            return 0
+        queue, results = multiprocessing.Queue(), multiprocessing.Queue()
+        for job in pending:
+            queue.put(job)
+        workers = dict((port, self._start_worker(port, queue, results)) for port in self.pool.ports)
+        running = {}
+        restarts = dict((port, self.restarts) for port in self.pool.ports)
+        remaining = len(pending)
+        try:
+            while remaining:
+                try:
+                    kind, port, payload = results.get(timeout=1.0)
+                except Empty:
+                    kind, port, payload = self._check_workers(workers, running)
+                    if kind is None:
+                        continue
+                if kind == 'start':
+                    running[port] = payload
+                    continue
+                if kind == 'done':
+                    running.pop(port, None)
+                    self.store.add(payload)
+                    remaining -= 1
+                    if progress is not None:
+                        progress(payload)
+                    continue
+                # 服务器失效：重新排队正在运行的任务，能重启就重启
+                running.pop(port, None)
+                if payload is not None:
+                    queue.put(payload)
+                workers.pop(port).join()
+                index = self.pool.ports.index(port)
+                if restarts[port] > 0 and self.pool.restart(index):
+                    restarts[port] -= 1
+                    workers[port] = self._start_worker(port, queue, results)
+                else:
+                    self.dead.append(port)
+                if not workers:
+                    raise RuntimeError('all servers are down, %d jobs left (rerun to resume)' % remaining)
+        finally:
+            for _ in workers:
+                queue.put(None)
+            for process in workers.values():
+                process.join(timeout=self.timeout)
+                if process.is_alive():
+                    process.terminate()
+        return len(pending)
+
+    @staticmethod
+    def _check_workers(workers, running):
+        """
+        Turn a worker process that exited without a message into a dead
+        server.
+        """
+        for port, process in workers.items():
+            if not process.is_alive():
+                return 'dead', port, running.get(port)
+        return None, None, None
@@ -0,0 +1,450 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Stand-in CARLA server replaying canned responses.
+
+The client talks msgpack-rpc (rpclib) to the RPC port of the server and
+receives the sensor and episode streams on plain TCP connections opened
+with the tokens returned by get_sensor_token. A RecordingProxy sits
+between a client and a real server, forwards everything and keeps the
+responses and stream messages in a Cassette:
+
+    cassette = Cassette()
+    with RecordingProxy(cassette, 'localhost', 2000) as proxy:
+        client = carla.Client('localhost', proxy.port)
+        ...
+    cassette.save('session.cassette')
+
+A StandInServer answers the same calls from the cassette without a
+simulator, so what is measured is the client and its Python bindings:
+
+    with StandInServer(Cassette.load('session.cassette')) as server:
+        client = carla.Client('localhost', server.port)
+
+A call is answered with a recorded response of the same method and
+arguments, cycling when there are several, or with any response of the
+method when those arguments were never recorded. Stream messages are
+replayed in a loop, the episode stream at its recorded pace and the
+sensor streams, unless burst is False, as fast as the client reads them.
+Requires the msgpack package.
+"""
+
+import hashlib
+import socket
+import struct
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+# rpclib 的消息类型
+REQUEST = 0
+RESPONSE = 1
+NOTIFICATION = 2
+
+# 返回数据流 token 的方法，回放时要把 token 中的地址和端口改为替身服务器的
+TOKEN_METHODS = ('get_sensor_token', 'get_gbuffer_token')
+
+# streaming::Token 的大小：stream_id (4) + port (2) + protocol (1) + address_type (1) + address (16)
+TOKEN_SIZE = 24
+
+STREAM_ID = struct.Struct('<I')
+MESSAGE_SIZE = struct.Struct('<I')
+PORT = struct.Struct('<H')
+# 地址类型（0 未设置，1 IPv4，2 IPv6）及地址在 token 中的偏移
+ADDRESS_TYPE_OFFSET = 7
+ADDRESS_OFFSET = 8
+ADDRESS_NOT_SET, ADDRESS_IPV4, ADDRESS_IPV6 = range(3)
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise RuntimeError('cannot import msgpack, make sure msgpack package is installed')
+    return msgpack
+
+
+def params_key(params):
+    """
+    Digest of the arguments of a call, used to match recorded responses.
+    """
+    return hashlib.sha1(_msgpack().packb(params, use_bin_type=True)).hexdigest()
+
+
+def find_tokens(value):
+    """
+    Return the streaming tokens (24-byte binaries) contained in a decoded
+    msgpack value.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return [bytes(value)] if len(value) == TOKEN_SIZE else []
+    if isinstance(value, (list, tuple)):
+        return [token for item in value for token in find_tokens(item)]
+    if isinstance(value, dict):
+        return [token for item in value.values() for token in find_tokens(item)]
+    return []
+
+
+def stream_id(token):
+    return STREAM_ID.unpack_from(token)[0]
+
+
+def token_port(token):
+    return PORT.unpack_from(token, STREAM_ID.size)[0]
+
+
+def token_address(token):
+    """
+    Address a token points at, None if it has none.
+    """
+    address_type = bytearray(token)[ADDRESS_TYPE_OFFSET]
+    if address_type == ADDRESS_IPV4:
+        return socket.inet_ntoa(token[ADDRESS_OFFSET:ADDRESS_OFFSET + 4])
+    if address_type == ADDRESS_IPV6:
+        return socket.inet_ntop(socket.AF_INET6, token[ADDRESS_OFFSET:ADDRESS_OFFSET + 16])
+    return None
+
+
+def _address_field(host):
+    # 未指定的地址留空，客户端会使用其连接的 RPC 主机
+    if host is None or host in ('', '0.0.0.0', '::'):
+        return ADDRESS_NOT_SET, b'\0' * 16
+    if ':' in host:
+        return ADDRESS_IPV6, socket.inet_pton(socket.AF_INET6, host)
+    return ADDRESS_IPV4, socket.inet_aton(socket.gethostbyname(host)) + b'\0' * 12
+
+
+def patch_tokens(value, port, host=None):
+    """
+    Copy of a decoded msgpack value with every token pointing at port of
+    host instead of the recorded server. Without host (or with an
+    unspecified one) the tokens have no address and the client connects to
+    the host of its RPC connection.
+    """
+    address_type, address = _address_field(host)
+    return _patch_tokens(value, port, address_type, address)
+
+
+def _patch_tokens(value, port, address_type, address):
+    if isinstance(value, (bytes, bytearray)):
+        if len(value) != TOKEN_SIZE:
+            return value
+        token = bytearray(value)
+        PORT.pack_into(token, STREAM_ID.size, port)
+        token[ADDRESS_TYPE_OFFSET] = address_type
+        token[ADDRESS_OFFSET:] = address
+        return bytes(token)
+    if isinstance(value, (list, tuple)):
+        return [_patch_tokens(item, port, address_type, address) for item in value]
+    if isinstance(value, dict):
+        return dict((key, _patch_tokens(item, port, address_type, address)) for key, item in value.items())
+    return value
+
+
+def _read_exactly(connection, size):
+    data = b''
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+# ==============================================================================
+# -- Cassette ------------------------------------------------------------------
+# ==============================================================================
+
+class Cassette(object):
+    """
+    Recorded RPC responses, by method and arguments, and stream messages,
+    by stream id, with their arrival intervals.
+    """
+
+    def __init__(self, max_responses=64, max_messages=32):
+        self.max_responses = max_responses
+        self.max_messages = max_messages
+        # method -> [[params_key, result], ...]
+        self.rpc = {}
+        # stream id -> [[interval, payload], ...]
+        self.streams = {}
+        self.episode_streams = set()
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def add_response(self, method, params, result):
+        with self._lock:
+            responses = self.rpc.setdefault(method, [])
+            if len(responses) < self.max_responses:
+                responses.append([params_key(params), result])
+            if method == 'get_episode_info':
+                self.episode_streams.update(stream_id(token) for token in find_tokens(result))
+
+    def response(self, method, params):
+        """
+        :return: a recorded result of the method for these arguments
+        :raise KeyError: if the method was never recorded
+        """
+        with self._lock:
+            responses = self.rpc[method]
+            key = params_key(params)
+            matches = [result for digest, result in responses if digest == key]
+            if not matches:
+                key, matches = None, [result for _, result in responses]
+            cursor = self._cursors.get((method, key), 0)
+            self._cursors[(method, key)] = cursor + 1
+            return matches[cursor % len(matches)]
+
+    def add_message(self, stream, interval, payload):
+        with self._lock:
+            messages = self.streams.setdefault(stream, [])
+            if len(messages) < self.max_messages:
+                messages.append([interval, bytes(payload)])
+
+    def messages(self, stream):
+        with self._lock:
+            return list(self.streams.get(stream, []))
+
+    def save(self, path):
+        msgpack = _msgpack()
+        with open(path, 'wb') as output:
+            output.write(msgpack.packb({
+                'rpc': self.rpc,
+                'streams': dict((str(key), value) for key, value in self.streams.items()),
+                'episode_streams': sorted(self.episode_streams),
+            }, use_bin_type=True))
+
+    @classmethod
+    def load(cls, path):
+        msgpack = _msgpack()
+        with open(path, 'rb') as source:
+            data = msgpack.unpackb(source.read(), raw=False, strict_map_key=False)
+        cassette = cls()
+        cassette.rpc = data['rpc']
+        cassette.streams = dict((int(key), value) for key, value in data['streams'].items())
+        cassette.episode_streams = set(data['episode_streams'])
+        return cassette
+
+
+# ==============================================================================
+# -- Servers -------------------------------------------------------------------
+# ==============================================================================
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, handler, owner):
+        socketserver.ThreadingTCPServer.__init__(self, address, handler)
+        self.owner = owner
+
+
+class _RPCHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        msgpack = _msgpack()
+        unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+        session = self.server.owner.open_session()
+        try:
+            while True:
+                data = self.request.recv(1 << 16)
+                if not data:
+                    return
+                unpacker.feed(data)
+                for message in unpacker:
+                    reply = self.server.owner.handle_message(session, message)
+                    if reply is not None:
+                        self.request.sendall(reply)
+        except (OSError, IOError):
+            pass
+        finally:
+            self.server.owner.close_session(session)
+
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = _read_exactly(self.request, STREAM_ID.size)
+        if data is None:
+            return
+        try:
+            self.server.owner.serve_stream(self.request, STREAM_ID.unpack(data)[0])
+        except (OSError, IOError):
+            pass
+
+
+class _Server(object):
+    """
+    Listening RPC and streaming sockets served from background threads.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, stream_port=0):
+        self.host = host
+        self._rpc = _TCPServer((host, port), _RPCHandler, self)
+        self._stream = _TCPServer((host, stream_port), _StreamHandler, self)
+        self._threads = []
+
+    @property
+    def port(self):
+        return self._rpc.server_address[1]
+
+    @property
+    def stream_port(self):
+        return self._stream.server_address[1]
+
+    def start(self):
+        for server in (self._rpc, self._stream):
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for server in (self._rpc, self._stream):
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def open_session(self):
+        return None
+
+    def close_session(self, session):
+        pass
+
+    def handle_message(self, session, message):
+        """
+        :return: packed reply to a decoded rpclib message, None for notifications
+        """
+        if message[0] == NOTIFICATION:
+            self.respond(session, message[1], message[2])
+            return None
+        _, msgid, method, params = message
+        error, result = self.respond(session, method, params)
+        return _msgpack().packb([RESPONSE, msgid, error, result], use_bin_type=True)
+
+    def respond(self, session, method, params):
+        raise NotImplementedError
+
+    def serve_stream(self, connection, stream):
+        raise NotImplementedError
+
+
+class StandInServer(_Server):
+    """
+    Answers the client from a cassette.
+    """
+
+    def __init__(self, cassette, host='127.0.0.1', port=0, stream_port=0, burst=True):
+        _Server.__init__(self, host, port, stream_port)
+        self.cassette = cassette
+        self.burst = burst
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def respond(self, session, method, params):
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+        try:
+            result = self.cassette.response(method, params)
+        except KeyError:
+            return 'stand-in server has no response for "%s"' % method, None
+        if method in TOKEN_METHODS:
+            result = patch_tokens(result, self.stream_port, self.host)
+        return None, result
+
+    def serve_stream(self, connection, stream):
+        messages = self.cassette.messages(stream)
+        if not messages:
+            # 没有录制的消息：保持连接直到客户端断开
+            while connection.recv(1 << 12):
+                pass
+            return
+        paced = not self.burst or stream in self.cassette.episode_streams
+        while True:
+            for interval, payload in messages:
+                if paced and interval > 0.0:
+                    time.sleep(interval)
+                connection.sendall(MESSAGE_SIZE.pack(len(payload)) + payload)
+
+
+class RecordingProxy(_Server):
+    """
+    Forwards the client to a real server and records into a cassette.
+    """
+
+    def __init__(self, cassette, server_host, server_port, host='127.0.0.1', port=0, stream_port=0,
+                 timeout=60.0):
+        _Server.__init__(self, host, port, stream_port)
+        self.cassette = cassette
+        self.server_host = server_host
+        self.server_port = server_port
+        self.timeout = timeout
+        # stream id -> 真实服务器上的数据流端口
+        self._stream_ports = {}
+
+    def open_session(self):
+        upstream = socket.create_connection((self.server_host, self.server_port), timeout=self.timeout)
+        return upstream, _msgpack().Unpacker(raw=False, strict_map_key=False)
+
+    def close_session(self, session):
+        session[0].close()
+
+    def handle_message(self, session, message):
+        upstream, unpacker = session
+        upstream.sendall(_msgpack().packb(message, use_bin_type=True))
+        if message[0] == NOTIFICATION:
+            return None
+        _, msgid, method, params = message
+        while True:
+            for reply in unpacker:
+                if reply[1] != msgid:
+                    continue
+                error, result = reply[2], reply[3]
+                if error is None:
+                    self.cassette.add_response(method, params, result)
+                    if method in TOKEN_METHODS:
+                        for token in find_tokens(result):
+                            self._stream_ports[stream_id(token)] = token_port(token)
+                        result = patch_tokens(result, self.stream_port, self.host)
+                return _msgpack().packb([RESPONSE, msgid, error, result], use_bin_type=True)
+            data = upstream.recv(1 << 16)
+            if not data:
+                raise IOError('connection to %s:%d closed' % (self.server_host, self.server_port))
+            unpacker.feed(data)
+
+    def serve_stream(self, connection, stream):
+        port = self._stream_ports.get(stream)
+        if port is None:
+            return
+        upstream = socket.create_connection((self.server_host, port), timeout=self.timeout)
+        try:
+            upstream.sendall(STREAM_ID.pack(stream))
+            last = None
+            while True:
+                header = _read_exactly(upstream, MESSAGE_SIZE.size)
+                if header is None:
+                    return
+                payload = _read_exactly(upstream, MESSAGE_SIZE.unpack(header)[0])
+                if payload is None:
+                    return
+                now = time.time()
+                self.cassette.add_message(stream, (now - last) if last is not None else 0.0, payload)
+                last = now
+                connection.sendall(header + payload)
+        finally:
+            upstream.close()
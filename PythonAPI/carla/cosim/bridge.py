@@ -0,0 +1,150 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Bridge between CARLA and an external model driving some of its actors.
+
+Every step the poses computed by the external model are applied with a
+single apply_batch of ApplyTransform commands, and the actors driven by
+CARLA (walkers, vehicles of other clients) are read from one world
+snapshot instead of one get_transform/get_velocity call per actor:
+
+    bridge = CoSimulationBridge(client, world)
+    bridge.register_external(agent_id, actor)
+    while True:
+        bridge.apply_poses({agent_id: transform, ...})
+        world.tick()
+        added, removed = bridge.sync()
+        for actor_id, actor_snapshot in bridge.internal_states():
+            ...
+
+New actors are found by comparing the actor ids of consecutive snapshots;
+only the ids never seen before are described with world.get_actors(ids).
+"""
+
+from fnmatch import fnmatchcase
+
+
+class ActorTracker(object):
+    """
+    Actors of the world matching some type patterns, updated from
+    snapshots.
+    """
+
+    def __init__(self, world, patterns=('vehicle.*',)):
+        self._world = world
+        self.patterns = tuple(patterns)
+        # id -> carla.Actor，只包含匹配的参与者
+        self.actors = {}
+        # 所有已描述过的参与者 id，包括不匹配的
+        self._seen = set()
+
+    def matches(self, type_id):
+        return any(fnmatchcase(type_id, pattern) for pattern in self.patterns)
+
+    def update(self, snapshot):
+        """
+        Compare the actor ids of a snapshot with the previous ones.
+
+            :return: (added, removed), the new matching actors and the ids
+                     of the matching actors no longer in the world
+        """
+        ids = set(actor_snapshot.id for actor_snapshot in snapshot)
+        removed = [actor_id for actor_id in self.actors if actor_id not in ids]
+        for actor_id in removed:
+            del self.actors[actor_id]
+        self._seen &= ids
+        added = []
+        new = sorted(ids - self._seen)
+        if new:
+            for actor in self._world.get_actors(new):
+                self._seen.add(actor.id)
+                if self.matches(actor.type_id):
+                    self.actors[actor.id] = actor
+                    added.append(actor)
+        return added, removed
+
+
+class CoSimulationBridge(object):
+    """
+    Applies the poses of the externally driven actors in one batch and
+    reads the others from the world snapshot.
+    """
+
+    def __init__(self, client, world, patterns=('vehicle.*', 'walker.*')):
+        self._client = client
+        self._world = world
+        self.tracker = ActorTracker(world, patterns)
+        # 外部模型的代理 key -> 参与者 id
+        self.external = {}
+        self._external_ids = set()
+        self.snapshot = None
+
+    def register_external(self, key, actor):
+        """
+        Let the external model drive an actor (or actor id) under a key.
+        """
+        actor_id = getattr(actor, 'id', actor)
+        self.external[key] = actor_id
+        self._external_ids.add(actor_id)
+
+    def unregister_external(self, key):
+        self._external_ids.discard(self.external.pop(key))
+
+    def is_external(self, actor_id):
+        return actor_id in self._external_ids
+
+    def apply_poses(self, poses, do_tick=False):
+        """
+        Move the external actors with one batch.
+
+            :param poses: dict key -> carla.Transform, unknown keys are ignored
+            :return: number of commands sent
+        """
+        poses = [(self.external[key], transform) for key, transform in poses.items() if key in self.external]
+        if not poses:
+            return 0
+        import carla
+
+        self._client.apply_batch([carla.command.ApplyTransform(actor_id, transform) for actor_id, transform in poses],
+                                 do_tick)
+        return len(poses)
+
+    def sync(self, snapshot=None):
+        """
+        Take the current snapshot (or the given one) and update the tracked
+        actors.
+
+            :return: (added, removed) as in ActorTracker.update; added has
+                     no external actors and the removed external actors
+                     are unregistered
+        """
+        self.snapshot = snapshot if snapshot is not None else self._world.get_snapshot()
+        added, removed = self.tracker.update(self.snapshot)
+        for key in [key for key, actor_id in self.external.items() if actor_id in removed]:
+            self.unregister_external(key)
+        return [actor for actor in added if actor.id not in self._external_ids], removed
+
+    def internal_states(self, actor_ids=None):
+        """
+        Snapshots of the actors not driven by the external model, from the
+        last synced snapshot.
+
+            :param actor_ids: restrict to these actors, by default the tracked ones
+            :return: list of (actor id, carla.ActorSnapshot)
+        """
+        if self.snapshot is None:
+            raise RuntimeError('sync must be called before reading the states')
+        if actor_ids is None:
+            actor_ids = self.tracker.actors
+        states = []
+        for actor_id in actor_ids:
+            if actor_id in self._external_ids:
+                continue
+            actor_snapshot = self.snapshot.find(actor_id)
+            if actor_snapshot is not None:
+                states.append((actor_id, actor_snapshot))
+        return states
@@ -0,0 +1,173 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Co-simulation loop overlapping the external model with the server tick.
+
+A step of a co-simulation with an external traffic model is
+
+    result = drive(observation)     # external model, e.g. iai.large_drive
+    apply(result)                   # e.g. CoSimulationBridge.apply_poses
+    observation = tick()            # world.tick and read back the world
+
+and each part waits for the previous one. PipelinedRunner sends the drive
+request of the next step to a worker thread right after applying the
+current result, so the model computes while the server ticks. The price
+is one step of latency in what the model sees of the actors it does not
+drive: step k + 1 is computed from the observation taken after tick
+k - 1. The actors driven by the model are not affected, their state is the
+model's own output.
+
+Every observation returned by tick, except the one of the last tick, is
+passed to drive exactly once, in order; when pipelined, the drive of the
+second step gets None since no tick has happened yet. The observation of
+the last tick is not driven and is kept in runner.observation, to start
+the next run from. drive is only ever called from the worker thread,
+one call at a time, and apply and tick from the calling thread, so an
+observation must not be modified once returned by tick.
+"""
+
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StepTimes(object):
+    """
+    Durations of every step of a run.
+    """
+
+    def __init__(self):
+        self.drive = []
+        self.tick = []
+        self.wait = []
+        self.step = []
+
+    def _totals(self, warmup):
+        return [sum(values[warmup:]) for values in (self.drive, self.tick, self.wait, self.step)]
+
+    def summary(self, warmup=0):
+        """
+        :param warmup: steps excluded from the statistics
+        :return: dict with the steady-state fps, the mean durations in ms
+                 and the overlap, the fraction of the model time hidden
+                 behind the tick (0 when serial)
+        """
+        steps = len(self.step) - warmup
+        if steps <= 0:
+            raise ValueError('%d steps, need more than the %d warm-up steps' % (len(self.step), warmup))
+        drive, tick, wait, step = self._totals(warmup)
+        return {
+            'steps': steps,
+            'fps': steps / step if step > 0.0 else float('nan'),
+            'drive_ms': 1000.0 * drive / steps,
+            'tick_ms': 1000.0 * tick / steps,
+            'wait_ms': 1000.0 * wait / steps,
+            'step_ms': 1000.0 * step / steps,
+            'overlap': max(0.0, 1.0 - wait / drive) if drive > 0.0 else 0.0,
+        }
+
+
+class PipelinedRunner(object):
+    """
+    Runs drive, apply and tick, with drive in a worker thread overlapped
+    with tick when pipelined is True, or one after the other otherwise.
+    """
+
+    def __init__(self, drive, apply, tick, pipelined=True):
+        self._drive = drive
+        self._apply = apply
+        self._tick = tick
+        self.pipelined = pipelined
+        self.times = StepTimes()
+        self.observation = None
+
+    def _timed_drive(self, observation):
+        start = time.perf_counter()
+        result = self._drive(observation)
+        self.times.drive.append(time.perf_counter() - start)
+        return result
+
+    def _timed_tick(self):
+        start = time.perf_counter()
+        observation = self._tick()
+        self.times.tick.append(time.perf_counter() - start)
+        return observation
+
+    def run(self, steps, observation, step_callback=None):
+        """
+        Run steps co-simulation steps.
+
+            :param observation: observation of the world before the first step
+            :param step_callback: called with the step index after every tick
+            :return: the StepTimes of the run
+        """
+        self.times = StepTimes()
+        if self.pipelined:
+            self.observation = self._run_pipelined(steps, observation, step_callback)
+        else:
+            self.observation = self._run_serial(steps, observation, step_callback)
+        return self.times
+
+    def _run_serial(self, steps, observation, step_callback):
+        for step in range(steps):
+            start = time.perf_counter()
+            self._apply(self._timed_drive(observation))
+            self.times.wait.append(self.times.drive[-1])
+            observation = self._timed_tick()
+            self.times.step.append(time.perf_counter() - start)
+            if step_callback is not None:
+                step_callback(step)
+        return observation
+
+    def _run_pipelined(self, steps, observation, step_callback):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(self._timed_drive, observation)
+            observation = None
+            try:
+                for step in range(steps):
+                    start = time.perf_counter()
+                    result = future.result()
+                    self.times.wait.append(time.perf_counter() - start)
+                    self._apply(result)
+                    # 下一步的外部模型请求与本次 tick 并行，使用的是上一次 tick 后的观测
+                    future = executor.submit(self._timed_drive, observation) if step + 1 < steps else None
+                    observation = self._timed_tick()
+                    self.times.step.append(time.perf_counter() - start)
+                    if step_callback is not None:
+                        step_callback(step)
+            finally:
+                if future is not None:
+                    future.cancel()
+        return observation
+
+
+class StandInModel(object):
+    """
+    Local external model for tests: moves every agent along x at a
+    constant speed and takes latency seconds per call.
+
+    Observations are dicts agent -> x position, overriding the model state
+    of those agents (the ones it does not drive).
+    """
+
+    def __init__(self, agents, speed=1.0, dt=0.1, latency=0.0):
+        self.positions = dict((agent, 0.0) for agent in range(agents))
+        self.speed = speed
+        self.dt = dt
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, observation):
+        with self._lock:
+            if self.latency > 0.0:
+                time.sleep(self.latency)
+            self.calls += 1
+            self.positions.update(observation or {})
+            self.positions = dict((agent, x + self.speed * self.dt) for agent, x in self.positions.items())
+            return dict(self.positions)
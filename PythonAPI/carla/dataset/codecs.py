@@ -0,0 +1,165 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+""" Frame encoders and decoders used by the dataset writer and reader. """
+
+import struct
+import zlib
+
+import numpy as np
+
+# 编解码器名称与写入索引中的编号一一对应，编号一旦发布就不能再修改
+CODECS = ('raw', 'png', 'jpeg', 'lz4', 'zlib')
+CODEC_IDS = {name: idx for idx, name in enumerate(CODECS)}
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG 颜色类型：灰度、RGB、RGBA
+_PNG_COLOR_TYPES = {1: 0, 3: 2, 4: 6}
+
+
+def _lz4():
+    try:
+        import lz4.frame
+    except ImportError:
+        raise RuntimeError('cannot import lz4, make sure lz4 package is installed')
+    return lz4.frame
+
+
+def _pil():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise RuntimeError('cannot import PIL, make sure "Pillow" package is installed')
+    return Image
+
+
+def has_lz4():
+    """
+    Return True if the lz4 package is available.
+    """
+    try:
+        _lz4()
+    except RuntimeError:
+        return False
+    return True
+
+
+def bgra_to_rgb(array):
+    """
+    Convert a (H, W, 4) BGRA buffer as produced by carla.Image into a (H, W, 3) RGB array.
+
+        :param array: uint8 array with shape (H, W, 4)
+        :return: uint8 array with shape (H, W, 3)
+    """
+    # 直接通过反向切片交换通道顺序并丢弃 alpha 通道
+    return np.ascontiguousarray(array[:, :, 2::-1])
+
+
+def _png_chunk(tag, payload):
+    chunk = tag + payload
+    return struct.pack('>I', len(payload)) + chunk + struct.pack('>I', zlib.crc32(chunk) & 0xffffffff)
+
+
+def encode_png(array, level=1):
+    """
+    Encode an uint8 image into PNG bytes without depending on Pillow.
+
+    Every scanline uses filter type 0, which keeps encoding a single zlib pass
+    over the buffer. The result is a standard PNG readable by any decoder.
+
+        :param array: uint8 array with shape (H, W), (H, W, 1), (H, W, 3) or (H, W, 4)
+        :param level: zlib compression level
+        :return: PNG encoded bytes
+    """
+    array = np.asarray(array)
+    if array.dtype != np.uint8:
+        raise ValueError('PNG encoding expects an uint8 array, got %s' % array.dtype)
+    if array.ndim == 2:
+        array = array[:, :, np.newaxis]
+    height, width, channels = array.shape
+    if channels not in _PNG_COLOR_TYPES:
+        raise ValueError('PNG encoding does not support %d channels' % channels)
+    # 每一行前面插入一个值为 0 的过滤类型字节
+    rows = np.zeros((height, width * channels + 1), dtype=np.uint8)
+    rows[:, 1:] = array.reshape(height, width * channels)
+    header = struct.pack('>IIBBBBB', width, height, 8, _PNG_COLOR_TYPES[channels], 0, 0, 0)
+    return b''.join([
+        _PNG_SIGNATURE,
+        _png_chunk(b'IHDR', header),
+        _png_chunk(b'IDAT', zlib.compress(rows.tobytes(), level)),
+        _png_chunk(b'IEND', b'')])
+
+
+def decode_png(payload):
+    """
+    Decode PNG bytes into an uint8 array.
+
+    PNGs written by encode_png are decoded with numpy only, any other PNG is
+    handed over to Pillow.
+    """
+    if payload[:8] != _PNG_SIGNATURE:
+        raise ValueError('payload is not a PNG stream')
+    width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', payload[16:29])
+    channels = {v: k for k, v in _PNG_COLOR_TYPES.items()}.get(color_type)
+    if depth == 8 and channels is not None and interlace == 0:
+        # 收集所有 IDAT 数据块
+        pos, data = 8, []
+        while pos < len(payload):
+            length, tag = struct.unpack('>I4s', payload[pos:pos + 8])
+            if tag == b'IDAT':
+                data.append(payload[pos + 8:pos + 8 + length])
+            pos += length + 12
+        rows = np.frombuffer(zlib.decompress(b''.join(data)), dtype=np.uint8)
+        rows = rows.reshape(height, width * channels + 1)
+        if not rows[:, 0].any():
+            image = rows[:, 1:].reshape(height, width, channels)
+            return image[:, :, 0] if channels == 1 else image
+    import io
+    return np.asarray(_pil().open(io.BytesIO(payload)))
+
+
+def encode(array, codec, quality=90, level=1):
+    """
+    Encode a numpy array with the given codec.
+
+        :param array: array to encode, images must be uint8 with 1, 3 or 4 channels
+        :param codec: one of CODECS
+        :param quality: JPEG quality
+        :param level: compression level for png/zlib/lz4
+        :return: encoded bytes
+    """
+    if codec == 'raw':
+        return np.ascontiguousarray(array).tobytes()
+    if codec == 'png':
+        return encode_png(array, level)
+    if codec == 'jpeg':
+        import io
+        stream = io.BytesIO()
+        _pil().fromarray(np.ascontiguousarray(array)).save(stream, format='JPEG', quality=quality)
+        return stream.getvalue()
+    if codec == 'lz4':
+        return _lz4().compress(np.ascontiguousarray(array).tobytes(), compression_level=level)
+    if codec == 'zlib':
+        return zlib.compress(np.ascontiguousarray(array).tobytes(), level)
+    raise ValueError('unknown codec "%s"' % codec)
+
+
+def decode(payload, codec, dtype, shape):
+    """
+    Decode bytes produced by encode back into an array of the given dtype and shape.
+    """
+    if codec == 'png':
+        return decode_png(payload).reshape(shape)
+    if codec == 'jpeg':
+        import io
+        return np.asarray(_pil().open(io.BytesIO(payload))).reshape(shape)
+    if codec == 'lz4':
+        payload = _lz4().decompress(payload)
+    elif codec == 'zlib':
+        payload = zlib.decompress(payload)
+    elif codec != 'raw':
+        raise ValueError('unknown codec "%s"' % codec)
+    return np.frombuffer(payload, dtype=dtype).reshape(shape)
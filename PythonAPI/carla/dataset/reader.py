@@ -0,0 +1,203 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Memory-mapped random access reader for datasets written by DatasetWriter.
+
+Shards are memory-mapped and samples are located through the offset index,
+so reading a sample never parses the tar headers. Samples stored with the raw
+codec (BGRA images, float32 point clouds) are returned as zero-copy views
+into the mapped shard; every other codec is decoded on access.
+"""
+
+import json
+import mmap
+import os
+
+import numpy as np
+
+from dataset.codecs import CODECS, decode
+from dataset.writer import INDEX_DTYPE, shard_name
+
+_RAW = CODECS.index('raw')
+
+
+def load_index(path):
+    """
+    Load the index of a dataset. Datasets whose writer was not closed have no
+    index.npy, in that case the indices of the completed shards are used.
+    """
+    index_path = os.path.join(path, 'index.npy')
+    if os.path.isfile(index_path):
+        return np.load(index_path)
+    parts = []
+    shard = 0
+    while os.path.isfile(os.path.join(path, 'shard-%06d.idx.npy' % shard)):
+        parts.append(np.load(os.path.join(path, 'shard-%06d.idx.npy' % shard)))
+        shard += 1
+    if not parts:
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    return np.concatenate(parts)
+
+
+class DatasetReader(object):
+    """
+    Random access to the samples of a sensor dataset.
+
+    The reader behaves as a map-style dataset over frames: len(reader) is the
+    number of frames and reader[i] returns a dictionary {sensor: array} with
+    every sample of the i-th frame, so it can be handed directly to a
+    torch.utils.data.DataLoader. Readers can be pickled to worker processes,
+    the shards are mapped again on first access.
+    """
+
+    def __init__(self, path, sensors=None):
+        """
+        Constructor method.
+
+            :param path: directory written by DatasetWriter
+            :param sensors: optional list of sensor names to restrict the reader to
+        """
+        self.path = path
+        manifest_path = os.path.join(path, 'dataset.json')
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as manifest:
+                self.sensors = json.load(manifest)['sensors']
+        else:
+            self.sensors = None
+        index = load_index(path)
+        if self.sensors is None:
+            self.sensors = ['sensor_%d' % i for i in range(int(index['sensor'].max()) + 1 if len(index) else 0)]
+        if sensors is not None:
+            ids = [self.sensors.index(name) for name in sensors]
+            index = index[np.isin(index['sensor'], ids)]
+        # 按帧号、传感器排序，便于二分查找
+        self.index = index[np.lexsort((index['sensor'], index['frame']))]
+        self.frames, self._frame_start = np.unique(self.index['frame'], return_index=True)
+        self._frame_stop = np.append(self._frame_start[1:], len(self.index))
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, item):
+        start, stop = self._frame_start[item], self._frame_stop[item]
+        return {self.sensors[e['sensor']]: self._load(e) for e in self.index[start:stop]}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_maps'] = {}
+        return state
+
+    def close(self):
+        """
+        Release the memory maps. Maps still referenced by returned views are
+        released once those views are garbage collected.
+        """
+        for shard_map in self._maps.values():
+            try:
+                shard_map.close()
+            except BufferError:
+                # 仍有视图引用该映射，交给垃圾回收释放
+                pass
+        self._maps = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # -- Queries -------------------------------------------------------------
+
+    def select(self, sensors=None, frames=None, time_range=None):
+        """
+        Return the index entries matching the given filters.
+
+            :param sensors: list of sensor names
+            :param frames: (first, last) frame range, both inclusive
+            :param time_range: (start, end) simulation time range in seconds, both inclusive
+            :return: structured array with INDEX_DTYPE
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if sensors is not None:
+            mask &= np.isin(self.index['sensor'], [self.sensors.index(name) for name in sensors])
+        if frames is not None:
+            mask &= (self.index['frame'] >= frames[0]) & (self.index['frame'] <= frames[1])
+        if time_range is not None:
+            mask &= (self.index['timestamp'] >= time_range[0]) & (self.index['timestamp'] <= time_range[1])
+        return self.index[mask]
+
+    def get(self, frame, sensor):
+        """
+        Return the sample of a sensor at a given frame.
+        """
+        sensor_id = self.sensors.index(sensor)
+        pos = np.searchsorted(self.frames, frame)
+        if pos < len(self.frames) and self.frames[pos] == frame:
+            entries = self.index[self._frame_start[pos]:self._frame_stop[pos]]
+            entries = entries[entries['sensor'] == sensor_id]
+            if len(entries):
+                return self._load(entries[0])
+        raise KeyError('no sample for sensor "%s" at frame %d' % (sensor, frame))
+
+    def iter_samples(self, entries):
+        """
+        Yield (entry, array) for every entry of a selection in storage order,
+        which keeps reads sequential on disk.
+        """
+        order = np.lexsort((entries['offset'], entries['shard']))
+        for entry in entries[order]:
+            yield entry, self._load(entry)
+
+    def stack(self, sensor, frames=None, time_range=None):
+        """
+        Return the samples of a fixed-shape raw sensor stream as one array
+        with a leading frame axis.
+
+        When the samples of the selection are equally spaced inside a single
+        shard, as the writer produces for a fixed set of sensors, the result
+        is a zero-copy strided view over the memory map. Otherwise the samples
+        are copied into a new array.
+        """
+        entries = self.select([sensor], frames, time_range)
+        if not len(entries):
+            raise KeyError('no samples for sensor "%s" in the selection' % sensor)
+        shape = tuple(entries[0]['shape'][:entries[0]['ndim']])
+        dtype = np.dtype(entries[0]['dtype'].decode('ascii'))
+        if (entries['shape'] != entries[0]['shape']).any():
+            raise ValueError('samples of sensor "%s" do not share the same shape' % sensor)
+        offsets = entries['offset'].astype(np.int64)
+        strides = np.diff(offsets)
+        if (entries['codec'] == _RAW).all() and (entries['shard'] == entries[0]['shard']).all() and \
+                (len(entries) == 1 or ((strides == strides[0]).all() and strides[0] > 0)):
+            # 所有样本等间距地位于同一个 shard 中，可以直接构造跨步视图
+            stride = int(strides[0]) if len(entries) > 1 else int(entries[0]['length'])
+            base = np.frombuffer(self._map(int(entries[0]['shard'])), dtype=np.uint8)
+            view = np.lib.stride_tricks.as_strided(
+                base[offsets[0]:], shape=(len(entries), int(entries[0]['length'])), strides=(stride, 1))
+            return view.view(dtype).reshape((len(entries),) + shape)
+        return np.stack([self._load(entry) for entry in entries])
+
+    # -- Internals -----------------------------------------------------------
+
+    def _map(self, shard):
+        shard_map = self._maps.get(shard)
+        if shard_map is None:
+            with open(os.path.join(self.path, shard_name(shard)), 'rb') as shard_file:
+                shard_map = mmap.mmap(shard_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[shard] = shard_map
+        return shard_map
+
+    def _load(self, entry):
+        shard_map = self._map(int(entry['shard']))
+        offset, length = int(entry['offset']), int(entry['length'])
+        shape = tuple(entry['shape'][:entry['ndim']])
+        dtype = entry['dtype'].decode('ascii')
+        if entry['codec'] == _RAW:
+            # 原始格式直接在内存映射上构造只读视图，不产生拷贝
+            return np.frombuffer(shard_map, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        return decode(shard_map[offset:offset + length], CODECS[entry['codec']], dtype, shape)
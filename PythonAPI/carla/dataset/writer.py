@@ -0,0 +1,357 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+High-throughput sensor dataset writer.
+
+Frames are encoded on a thread pool and appended asynchronously to
+uncompressed tar shards, so the simulation thread only pays for queuing the
+buffer. Every sample is recorded in a structured index (frame, sensor, shard,
+byte offset, codec, dtype and shape) that allows random access without
+scanning the shards. The layout on disk is:
+
+    <path>/dataset.json          manifest with sensor names, codecs and shards
+    <path>/index.npy             index of all the samples (INDEX_DTYPE)
+    <path>/shard-000000.tar      samples, one tar member per (frame, sensor)
+    <path>/shard-000000.idx.npy  index of a single shard, written when it is closed
+"""
+
+import collections
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import queue
+
+import numpy as np
+
+from dataset.codecs import CODECS, CODEC_IDS, bgra_to_rgb, encode, has_lz4
+
+FORMAT_VERSION = 1
+
+# 每个样本在索引中的记录格式，shape 最多支持四维
+INDEX_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('timestamp', '<f8'),
+    ('sensor', '<u2'),
+    ('codec', 'u1'),
+    ('ndim', 'u1'),
+    ('shard', '<u4'),
+    ('offset', '<u8'),
+    ('length', '<u8'),
+    ('shape', '<u4', (4,)),
+    ('dtype', 'S8')])
+
+_EXTENSIONS = {'raw': 'bin', 'png': 'png', 'jpeg': 'jpg', 'lz4': 'lz4', 'zlib': 'zz'}
+
+# 点云默认使用 lz4，未安装时退回 zlib
+DEFAULT_POINT_CLOUD_CODEC = 'lz4' if has_lz4() else 'zlib'
+
+
+class _Shard(object):
+    # 一个打开的 shard：tar 文件、其中的帧和样本索引
+    def __init__(self, number, tar):
+        self.number = number
+        self.tar = tar
+        self.frames = set()
+        self.index = []
+
+
+def shard_name(shard):
+    """
+    Return the file name of the given shard number.
+    """
+    return 'shard-%06d.tar' % shard
+
+
+class DatasetWriter(object):
+    """
+    Asynchronous writer of sensor frames into indexed tar shards.
+
+    Usage:
+
+        with DatasetWriter('_out/run0') as writer:
+            camera.listen(lambda image: writer.add_image(image, 'rgb'))
+            lidar.listen(lambda data: writer.add_point_cloud(data, 'lidar'))
+
+    add*() calls return as soon as the frame is queued. They only block when
+    the raw bytes waiting to be encoded or written exceed max_in_flight_bytes,
+    which bounds the memory used by the writer. Arrays handed to the writer
+    must not be modified afterwards.
+
+    The sensor callbacks may deliver frames out of order. All the samples of
+    a frame go to the same shard, as long as they are added before two newer
+    shards have been started and the older shards are closed only once no
+    queued sample belongs to their frames.
+    """
+
+    def __init__(self, path, frames_per_shard=1000, max_shard_bytes=1 << 30,
+                 max_in_flight_bytes=512 << 20, workers=None, quality=90, level=1):
+        """
+        Constructor method.
+
+            :param path: output directory, created if it does not exist
+            :param frames_per_shard: number of frames stored in each shard
+            :param max_shard_bytes: a new shard is started once a shard grows over this size
+            :param max_in_flight_bytes: memory bound for frames waiting to be encoded or written
+            :param workers: number of encoding threads (default: number of CPUs)
+            :param quality: JPEG quality
+            :param level: compression level used by png, lz4 and zlib
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.frames_per_shard = frames_per_shard
+        self.max_shard_bytes = max_shard_bytes
+        self.max_in_flight_bytes = max_in_flight_bytes
+        self.quality = quality
+        self.level = level
+
+        self.sensors = []
+        self._sensor_ids = {}
+        # add 在各传感器的 listen 回调线程中调用，注册新传感器需要加锁
+        self._sensors_lock = threading.Lock()
+        self._shards = []
+        self._index = []
+        # 仍然打开的 shard（按编号排序）以及其中每一帧所在的 shard
+        self._open = []
+        self._frame_shards = {}
+        # 每一帧已加入但尚未写出的样本数，由 _budget 保护
+        self._queued = collections.Counter()
+
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+        self.samples = 0
+        self._start_time = time.time()
+
+        self._error = None
+        self._closed = False
+        self._in_flight = 0
+        self._budget = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+        # 按提交顺序写出，保证 shard 内样本按帧排序
+        self._pending = queue.Queue()
+        self._thread = threading.Thread(target=self._write_loop, name='DatasetWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # -- Public API ----------------------------------------------------------
+
+    def add(self, frame, sensor, array, codec='raw', timestamp=0.0, to_rgb=False):
+        """
+        Queue an array to be encoded and written.
+
+            :param frame: frame number the sample belongs to
+            :param sensor: name of the sensor stream
+            :param array: numpy array with the sample
+            :param codec: one of dataset.codecs.CODECS
+            :param timestamp: simulation time of the sample
+            :param to_rgb: convert a BGRA image into RGB before encoding
+        """
+        if codec not in CODEC_IDS:
+            raise ValueError('unknown codec "%s"' % codec)
+        self._raise_error()
+        if self._closed:
+            raise RuntimeError('DatasetWriter is closed')
+        array = np.asarray(array)
+        if array.ndim > 4:
+            raise ValueError('samples with more than four dimensions are not supported')
+        nbytes = array.nbytes
+        frame = int(frame)
+        self._reserve(nbytes, frame)
+        sensor_id = self._sensor_id(sensor)
+        future = self._pool.submit(self._encode, array, codec, to_rgb)
+        self._pending.put((future, frame, float(timestamp), sensor_id, codec, nbytes))
+
+    def add_image(self, image, sensor, codec='png'):
+        """
+        Queue a carla.Image. Lossless and lossy image codecs store RGB, raw
+        codecs (raw, lz4, zlib) keep the original BGRA buffer.
+        """
+        array = np.frombuffer(image.raw_data, dtype=np.uint8)
+        array = array.reshape((image.height, image.width, 4))
+        self.add(image.frame, sensor, array, codec, image.timestamp, to_rgb=codec in ('png', 'jpeg'))
+
+    def add_point_cloud(self, measurement, sensor, codec=DEFAULT_POINT_CLOUD_CODEC, channels=4):
+        """
+        Queue a LiDAR-like measurement as a (N, channels) float32 array.
+
+        Use channels=4 for carla.LidarMeasurement and channels=6 for
+        carla.SemanticLidarMeasurement, whose integer fields keep their bits
+        and can be recovered with array.view(np.uint32).
+        """
+        array = np.frombuffer(measurement.raw_data, dtype=np.float32)
+        array = array.reshape((-1, channels))
+        self.add(measurement.frame, sensor, array, codec, measurement.timestamp)
+
+    def flush(self):
+        """
+        Block until every queued sample has been written.
+        """
+        with self._budget:
+            while self._in_flight > 0 and self._error is None:
+                self._budget.wait(0.1)
+        self._raise_error()
+
+    def close(self):
+        """
+        Write the pending samples, the index and the manifest, and release the workers.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._pending.put(None)
+        self._thread.join()
+        self._pool.shutdown()
+        while self._open:
+            self._close_shard()
+        index = np.array(self._index, dtype=INDEX_DTYPE) if not self._index else \
+            np.concatenate(self._index)
+        np.save(os.path.join(self.path, 'index.npy'), index)
+        with open(os.path.join(self.path, 'dataset.json'), 'w') as manifest:
+            json.dump({
+                'version': FORMAT_VERSION,
+                'sensors': self.sensors,
+                'codecs': list(CODECS),
+                'shards': self._shards,
+                'samples': int(index.shape[0])}, manifest, indent=2)
+        self._raise_error()
+
+    def stats(self):
+        """
+        Return a dictionary with the throughput of the writer so far.
+        """
+        elapsed = max(time.time() - self._start_time, 1e-9)
+        return {
+            'samples': self.samples,
+            'raw_bytes': self.raw_bytes,
+            'encoded_bytes': self.encoded_bytes,
+            'compression_ratio': self.raw_bytes / float(max(self.encoded_bytes, 1)),
+            'samples_per_second': self.samples / elapsed,
+            'megabytes_per_second': self.raw_bytes / elapsed / 1e6,
+            'shards': len(self._shards)}
+
+    # -- Internals -----------------------------------------------------------
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _sensor_id(self, sensor):
+        with self._sensors_lock:
+            sensor_id = self._sensor_ids.get(sensor)
+            if sensor_id is None:
+                sensor_id = len(self.sensors)
+                self._sensor_ids[sensor] = sensor_id
+                self.sensors.append(sensor)
+            return sensor_id
+
+    def _reserve(self, nbytes, frame):
+        with self._budget:
+            # 单个样本超过上限时只要队列为空也允许进入，避免死锁
+            while self._in_flight > 0 and self._in_flight + nbytes > self.max_in_flight_bytes:
+                self._budget.wait()
+            self._in_flight += nbytes
+            self._queued[frame] += 1
+
+    def _release(self, nbytes, frame):
+        with self._budget:
+            self._in_flight -= nbytes
+            self._queued[frame] -= 1
+            if not self._queued[frame]:
+                del self._queued[frame]
+            self._budget.notify_all()
+
+    def _encode(self, array, codec, to_rgb):
+        if to_rgb:
+            array = bgra_to_rgb(array)
+        return encode(array, codec, self.quality, self.level), array.dtype.str, array.shape
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            future, frame, timestamp, sensor_id, codec, nbytes = item
+            try:
+                payload, dtype, shape = future.result()
+                self._append(frame, timestamp, sensor_id, codec, payload, dtype, shape)
+                self.raw_bytes += nbytes
+            except Exception as error:  # pylint: disable=broad-except
+                if self._error is None:
+                    self._error = error
+            finally:
+                self._release(nbytes, frame)
+            try:
+                self._close_finished_shards()
+            except Exception as error:  # pylint: disable=broad-except
+                if self._error is None:
+                    self._error = error
+
+    def _open_shard(self):
+        name = shard_name(len(self._shards))
+        self._shards.append(name)
+        tar = tarfile.open(os.path.join(self.path, name), 'w', format=tarfile.GNU_FORMAT)
+        self._open.append(_Shard(len(self._shards) - 1, tar))
+        return self._open[-1]
+
+    def _close_shard(self):
+        shard = self._open.pop(0)
+        shard.tar.close()
+        for frame in shard.frames:
+            del self._frame_shards[frame]
+        index = np.array(shard.index, dtype=INDEX_DTYPE)
+        np.save(os.path.join(self.path, shard_name(shard.number)[:-len('.tar')] + '.idx.npy'), index)
+        self._index.append(index)
+
+    def _close_finished_shards(self):
+        # 最新的两个 shard 保持打开，以接收回调线程中晚到的样本；
+        # 更早的 shard 在没有属于其帧的排队样本后按顺序关闭
+        while len(self._open) > 2:
+            with self._budget:
+                if any(frame in self._queued for frame in self._open[0].frames):
+                    return
+            self._close_shard()
+
+    def _shard_for(self, frame):
+        # 同一帧的所有传感器数据写入同一个 shard，只有没见过的帧才可能开始新的 shard
+        shard = self._frame_shards.get(frame)
+        if shard is None:
+            shard = self._open[-1] if self._open else None
+            if shard is None or len(shard.frames) >= self.frames_per_shard or \
+                    shard.tar.offset >= self.max_shard_bytes:
+                shard = self._open_shard()
+            shard.frames.add(frame)
+            self._frame_shards[frame] = shard
+        return shard
+
+    def _append(self, frame, timestamp, sensor_id, codec, payload, dtype, shape):
+        shard = self._shard_for(frame)
+        tar = shard.tar
+        info = tarfile.TarInfo('%010d.%s.%s' % (frame, self.sensors[sensor_id], _EXTENSIONS[codec]))
+        info.size = len(payload)
+        info.mtime = int(time.time())
+        # 数据紧跟在 tar 头之后，记录其绝对偏移以便随机读取
+        offset = tar.offset + len(info.tobuf(tar.format, tar.encoding, tar.errors))
+        tar.addfile(info, io.BytesIO(payload))
+        padded_shape = tuple(shape) + (0,) * (4 - len(shape))
+        shard.index.append((
+            frame, timestamp, sensor_id, CODEC_IDS[codec], len(shape), shard.number,
+            offset, len(payload), padded_shape, dtype.encode('ascii')))
+        self.encoded_bytes += len(payload)
+        self.samples += 1
@@ -0,0 +1,239 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+In-memory checkpoints of the world state, restored without reloading the
+map.
+
+client.reload_world takes several seconds. A WorldCheckpoint keeps the
+vehicles and walkers of the world (blueprint, transform, velocities,
+control, lights), the traffic lights and the seeds of the traffic manager
+and of the pedestrians. Restoring it brings the actors back with a single
+apply_batch_sync: the actors spawned since the checkpoint are destroyed,
+the ones destroyed are spawned again and all the others are moved back to
+their recorded state.
+
+    checkpoint = WorldCheckpoint.capture(world, autopilot=vehicle_ids, traffic_manager_seed=seed)
+    for episode in range(episodes):
+        ...
+        checkpoint.restore(client, world, traffic_manager, do_tick=True)
+
+Limitations of the client API: the elapsed time of a traffic light in its
+current phase can not be set, restored lights start their phase again, and
+the AI walker controllers are neither restored nor spawned again, only
+destroyed when spawned after the checkpoint.
+"""
+
+from fnmatch import fnmatchcase
+
+PATTERNS = ('vehicle.*', 'walker.pedestrian.*', 'controller.ai.walker')
+
+
+class ActorState(object):
+    """
+    Recorded state of an actor.
+    """
+
+    def __init__(self, actor, actor_snapshot, autopilot=False):
+        self.id = actor.id
+        self.type_id = actor.type_id
+        self.attributes = dict(actor.attributes)
+        self.transform = actor_snapshot.get_transform()
+        self.velocity = actor_snapshot.get_velocity()
+        self.angular_velocity = actor_snapshot.get_angular_velocity()
+        self.autopilot = autopilot
+        self.control = None
+        self.light_state = None
+        if self.type_id.startswith('vehicle.'):
+            self.control = actor.get_control()
+            self.light_state = actor.get_light_state()
+        elif self.type_id.startswith('walker.'):
+            self.control = actor.get_control()
+
+    @property
+    def is_vehicle(self):
+        return self.type_id.startswith('vehicle.')
+
+    @property
+    def is_walker(self):
+        return self.type_id.startswith('walker.')
+
+
+class TrafficLightState(object):
+    """
+    Recorded state and phase durations of a traffic light.
+    """
+
+    def __init__(self, light):
+        self.id = light.id
+        self.state = light.get_state()
+        self.times = (light.get_green_time(), light.get_yellow_time(), light.get_red_time())
+        self.elapsed = light.get_elapsed_time()
+        self.frozen = light.is_frozen()
+
+    def restore(self, light):
+        """
+        Set the state of a traffic light, with one call per value that differs.
+
+            :return: number of calls made
+        """
+        calls = 0
+        current = (light.get_green_time(), light.get_yellow_time(), light.get_red_time())
+        for setter, value, old in zip((light.set_green_time, light.set_yellow_time, light.set_red_time),
+                                      self.times, current):
+            if value != old:
+                setter(value)
+                calls += 1
+        if light.get_state() != self.state:
+            light.set_state(self.state)
+            calls += 1
+        if light.is_frozen() != self.frozen:
+            light.freeze(self.frozen)
+            calls += 1
+        return calls
+
+
+class RestorePlan(object):
+    """
+    What restoring a checkpoint does to the actors of the world.
+    """
+
+    def __init__(self, update, destroy, respawn):
+        # 都是 actor id 的列表：仍然存在的、检查点之后生成的、检查点之后被销毁的
+        self.update = update
+        self.destroy = destroy
+        self.respawn = respawn
+        self.errors = []
+
+
+class WorldCheckpoint(object):
+    """
+    State of the world at a frame, restored with one batch of commands.
+    """
+
+    def __init__(self, frame, actors, traffic_lights, traffic_manager_seed=None, pedestrians_seed=None,
+                 patterns=PATTERNS):
+        self.frame = frame
+        # id -> ActorState / TrafficLightState
+        self.actors = actors
+        self.traffic_lights = traffic_lights
+        self.traffic_manager_seed = traffic_manager_seed
+        self.pedestrians_seed = pedestrians_seed
+        self.patterns = tuple(patterns)
+        # 恢复时重新生成的参与者：原 id -> 新 id
+        self.respawned = {}
+
+    @classmethod
+    def capture(cls, world, autopilot=(), traffic_manager_seed=None, pedestrians_seed=None, patterns=PATTERNS):
+        """
+        Record the current state of the world.
+
+            :param autopilot: ids of the vehicles driven by the traffic
+                              manager, put back on autopilot when spawned again
+            :param traffic_manager_seed: random device seed set again on the
+                                         traffic manager when restoring
+            :param pedestrians_seed: seed set again with set_pedestrians_seed
+            :param patterns: type patterns of the actors of the checkpoint
+        """
+        snapshot = world.get_snapshot()
+        autopilot = set(autopilot)
+        actors, traffic_lights = {}, {}
+        for actor in world.get_actors():
+            if actor.type_id.startswith('traffic.traffic_light'):
+                traffic_lights[actor.id] = TrafficLightState(actor)
+            elif any(fnmatchcase(actor.type_id, pattern) for pattern in patterns):
+                actor_snapshot = snapshot.find(actor.id)
+                if actor_snapshot is not None:
+                    actors[actor.id] = ActorState(actor, actor_snapshot, actor.id in autopilot)
+        return cls(snapshot.frame, actors, traffic_lights, traffic_manager_seed, pedestrians_seed, patterns)
+
+    def current_id(self, actor_id):
+        """
+        Id of a checkpoint actor after the restores that spawned it again.
+        """
+        return self.respawned.get(actor_id, actor_id)
+
+    def plan(self, current):
+        """
+        :param current: ids of the matching actors now in the world
+        :return: RestorePlan, in checkpoint ids for update and respawn
+        """
+        alive = dict((self.current_id(actor_id), actor_id) for actor_id in self.actors)
+        update = [alive[actor_id] for actor_id in sorted(current) if actor_id in alive]
+        destroy = [actor_id for actor_id in sorted(current) if actor_id not in alive]
+        present = set(update)
+        # 控制器需要父行人，不能在同一个批次中重新生成
+        respawn = [actor_id for actor_id, state in sorted(self.actors.items())
+                   if actor_id not in present and (state.is_vehicle or state.is_walker)]
+        return RestorePlan(update, destroy, respawn)
+
+    def _blueprint(self, library, state):
+        blueprint = library.find(state.type_id)
+        for key, value in state.attributes.items():
+            if blueprint.has_attribute(key) and blueprint.get_attribute(key).is_modifiable:
+                blueprint.set_attribute(key, value)
+        return blueprint
+
+    def _state_commands(self, actor_id, state):
+        import carla
+
+        commands = [carla.command.ApplyTransform(actor_id, state.transform),
+                    carla.command.ApplyTargetVelocity(actor_id, state.velocity),
+                    carla.command.ApplyTargetAngularVelocity(actor_id, state.angular_velocity)]
+        if state.is_vehicle:
+            commands.append(carla.command.ApplyVehicleControl(actor_id, state.control))
+            commands.append(carla.command.SetVehicleLightState(actor_id, state.light_state))
+        elif state.is_walker:
+            speed = (state.velocity.x ** 2 + state.velocity.y ** 2 + state.velocity.z ** 2) ** 0.5
+            commands.append(carla.command.ApplyWalkerState(actor_id, state.transform, speed))
+            commands.append(carla.command.ApplyWalkerControl(actor_id, state.control))
+        return commands
+
+    def restore(self, client, world, traffic_manager=None, do_tick=False):
+        """
+        Bring the world back to the checkpoint.
+
+            :param traffic_manager: used for the seed and the autopilot of
+                                    the vehicles spawned again
+            :param do_tick: tick the world in the same batch
+            :return: the RestorePlan applied; respawn failures are in
+                     plan.errors, the new ids in respawned
+        """
+        import carla
+
+        current = [actor.id for actor in world.get_actors()
+                   if any(fnmatchcase(actor.type_id, pattern) for pattern in self.patterns)]
+        plan = self.plan(current)
+        commands = [carla.command.DestroyActor(actor_id) for actor_id in plan.destroy]
+        for actor_id in plan.update:
+            state = self.actors[actor_id]
+            if not state.type_id.startswith('controller.'):
+                commands += self._state_commands(self.current_id(actor_id), state)
+        first_spawn = len(commands)
+        library = world.get_blueprint_library()
+        for actor_id in plan.respawn:
+            state = self.actors[actor_id]
+            command = carla.command.SpawnActor(self._blueprint(library, state), state.transform)
+            for then in self._state_commands(carla.command.FutureActor, state):
+                command = command.then(then)
+            if state.autopilot and traffic_manager is not None:
+                command = command.then(carla.command.SetAutopilot(
+                    carla.command.FutureActor, True, traffic_manager.get_port()))
+            commands.append(command)
+        # 种子在批次之前设置，交通管理器在这一次 tick 中就使用新的随机序列
+        if self.traffic_manager_seed is not None and traffic_manager is not None:
+            traffic_manager.set_random_device_seed(self.traffic_manager_seed)
+        if self.pedestrians_seed is not None:
+            world.set_pedestrians_seed(self.pedestrians_seed)
+        for light in world.get_actors(list(self.traffic_lights)):
+            self.traffic_lights[light.id].restore(light)
+        responses = client.apply_batch_sync(commands, do_tick)
+        for actor_id, response in zip(plan.respawn, responses[first_spawn:]):
+            if response.error:
+                plan.errors.append(response.error)
+            else:
+                self.respawned[actor_id] = response.actor_id
+        return plan
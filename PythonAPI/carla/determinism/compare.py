@@ -0,0 +1,250 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Determinism checks over the outputs of repeated simulations.
+
+The outputs are organised in streams (a sensor, or an actor of a
+SnapshotRecorder file), each with one sequence of frames per repetition.
+Every frame is hashed once from its binary payload and the repetitions are
+grouped by the hashes of the whole sequence, so identical runs cost one
+hash per frame instead of a comparison per pair. Only the representatives
+of different groups are compared with a tolerance, frame by frame, and
+only on the frames whose hashes differ. Streams are checked in parallel:
+
+    streams = [file_stream('0_LiDAR', [['rep0_0001.npy', ...], ['rep1_0001.npy', ...]])]
+    results = check_streams(streams, tolerance=0.01)
+    matrix = consistency_matrix(results, 2)
+"""
+
+import hashlib
+
+from multiprocessing import Pool
+
+import numpy as np
+
+from determinism.snapshot import SnapshotRecorder
+
+
+# ==============================================================================
+# -- Frames --------------------------------------------------------------------
+# ==============================================================================
+
+def load_array(path):
+    """
+    Load a frame written with np.save (.npy) or np.savetxt (anything else).
+    """
+    if path.endswith('.npy'):
+        return np.load(path)
+    return np.loadtxt(path, ndmin=2)
+
+
+def file_digest(path):
+    """
+    Hash the content of a file without parsing it.
+    """
+    with open(path, 'rb') as source:
+        return hashlib.sha1(source.read()).digest()
+
+
+def array_digest(array):
+    """
+    Hash the dtype, shape and bytes of an array.
+    """
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha1(('%s%r' % (array.dtype.str, array.shape)).encode('utf-8'))
+    digest.update(array.tobytes())
+    return digest.digest()
+
+
+def frame_difference(first, second):
+    """
+    Return the largest absolute difference between two frames, infinite if
+    their shapes or their NaN values differ.
+    """
+    first = np.asarray(first, dtype=np.float64)
+    second = np.asarray(second, dtype=np.float64)
+    if first.shape != second.shape:
+        return float('inf')
+    missing = np.isnan(first)
+    if not np.array_equal(missing, np.isnan(second)):
+        return float('inf')
+    if missing.all():
+        return 0.0
+    return float(np.abs(first - second)[~missing].max())
+
+
+# ==============================================================================
+# -- Streams -------------------------------------------------------------------
+# ==============================================================================
+
+def file_stream(name, repetitions):
+    """
+    Describe a stream stored as one file per frame.
+
+        :param repetitions: for each repetition, the list of frame files
+    """
+    return ('files', name, [list(paths) for paths in repetitions])
+
+
+def snapshot_stream(name, repetitions):
+    """
+    Describe an actor recorded in one SnapshotRecorder file per repetition.
+    Each frame is the row of the table of the actor (frame, elapsed, state).
+    """
+    return ('snapshot', name, list(repetitions))
+
+
+def snapshot_streams(repetitions):
+    """
+    Describe every actor of a set of SnapshotRecorder files.
+    """
+    names = SnapshotRecorder.load(repetitions[0]).names if repetitions else []
+    return [snapshot_stream(name, repetitions) for name in names]
+
+
+class _FileFrames(object):
+    def __init__(self, paths):
+        self.paths = paths
+
+    def __len__(self):
+        return len(self.paths)
+
+    def digests(self):
+        return [file_digest(path) for path in self.paths]
+
+    def __getitem__(self, frame):
+        return load_array(self.paths[frame])
+
+
+class _SnapshotFrames(object):
+    def __init__(self, path, name):
+        recorder = SnapshotRecorder.load(path)
+        self.table = recorder.table(name) if name in recorder.names else np.empty((0, 0))
+
+    def __len__(self):
+        return len(self.table)
+
+    def digests(self):
+        return [array_digest(row) for row in self.table]
+
+    def __getitem__(self, frame):
+        return self.table[frame]
+
+
+class StreamResult(object):
+    """
+    Outcome of the check of one stream.
+
+        groups: lists of repetitions with bit-identical outputs, largest first
+        matrix: (repetitions, repetitions) bool array, True where two
+                repetitions are equal within the tolerance
+        divergence: first frame where a repetition departs from the largest
+                    group beyond the tolerance, None if there is none
+    """
+
+    def __init__(self, name, groups, matrix, divergence):
+        self.name = name
+        self.groups = groups
+        self.matrix = matrix
+        self.divergence = divergence
+
+    @property
+    def deterministic(self):
+        return bool(self.matrix.all())
+
+
+def _first_divergence(first, second, digests_first, digests_second, tolerance):
+    common = min(len(first), len(second))
+    for frame in range(common):
+        if digests_first[frame] == digests_second[frame]:
+            continue
+        if not frame_difference(first[frame], second[frame]) < tolerance:
+            return frame
+    if len(first) != len(second):
+        return common
+    return None
+
+
+def check_stream(stream, tolerance=0.01):
+    """
+    Check one stream described by file_stream or snapshot_stream.
+
+        :return: StreamResult
+    """
+    kind, name, repetitions = stream
+    if kind == 'files':
+        frames = [_FileFrames(paths) for paths in repetitions]
+    elif kind == 'snapshot':
+        frames = [_SnapshotFrames(path, name) for path in repetitions]
+    else:
+        raise ValueError('unknown stream kind "%s"' % kind)
+    digests = [source.digests() for source in frames]
+    # 按整段哈希序列分组，完全相同的重复只需比较一次
+    keys = {}
+    for repetition, sequence in enumerate(digests):
+        keys.setdefault(tuple(sequence), []).append(repetition)
+    groups = sorted(keys.values(), key=lambda group: (-len(group), group[0]))
+    equal = np.eye(len(groups), dtype=bool)
+    divergence = None
+    for a in range(len(groups)):
+        for b in range(a + 1, len(groups)):
+            first, second = groups[a][0], groups[b][0]
+            frame = _first_divergence(frames[first], frames[second], digests[first], digests[second], tolerance)
+            equal[a, b] = equal[b, a] = frame is None
+            if a == 0 and frame is not None:
+                divergence = frame if divergence is None else min(divergence, frame)
+    membership = np.empty(len(repetitions), dtype=np.int64)
+    for index, group in enumerate(groups):
+        membership[group] = index
+    matrix = equal[np.ix_(membership, membership)]
+    return StreamResult(name, groups, matrix, divergence)
+
+
+def _check(job):
+    stream, tolerance = job
+    return check_stream(stream, tolerance)
+
+
+def check_streams(streams, tolerance=0.01, processes=None):
+    """
+    Check several streams, in a process pool when there is more than one.
+
+        :param processes: worker processes (default: number of CPUs, 1 to
+                          run in this process)
+        :return: list of StreamResult in the order of the streams
+    """
+    jobs = [(stream, tolerance) for stream in streams]
+    if processes == 1 or len(jobs) < 2:
+        return [_check(job) for job in jobs]
+    pool = Pool(processes)
+    try:
+        return pool.map(_check, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def consistency_matrix(results, repetitions):
+    """
+    Combine the results of the streams of a scenario: two repetitions are
+    equivalent only if every stream is. Without streams all the repetitions
+    are equivalent.
+
+        :param repetitions: number of repetitions of the scenario
+    """
+    matrix = np.ones((repetitions, repetitions), dtype=bool)
+    for result in results:
+        matrix &= result.matrix
+    return matrix
+
+
+def determinism_set(matrix):
+    """
+    Return the sorted (decreasing) distinct numbers of equivalent
+    repetitions, as reported by the determinism scripts.
+    """
+    return sorted(set(matrix.sum(axis=1).tolist()), reverse=True)
@@ -0,0 +1,206 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Array-based capture of actor states for determinism and physics harnesses.
+
+The scenarios of check_collisions_substepping.py and friends used to call
+get_location, get_velocity and get_angular_velocity on every actor every
+tick and to grow one array per actor with np.vstack. SnapshotRecorder reads
+all the tracked actors with a single WorldSnapshot.get_actor_states call
+into a preallocated (ticks, actors, columns) float64 array and saves
+everything as one .npz file:
+
+    recorder = SnapshotRecorder(fields=('location', 'velocity', 'angular_velocity'))
+    recorder.add(vehicle, 'ego')
+    recorder.reserve(ticks)
+    recorder.start(world.get_snapshot())
+    for _ in range(ticks):
+        world.tick()
+        recorder.record(world.get_snapshot())
+    recorder.save('run.npz')
+"""
+
+import numpy as np
+
+# 每个字段对应的列名，顺序与 WorldSnapshot.get_actor_states 返回的列一致
+FIELD_COLUMNS = {
+    'location': ('x', 'y', 'z'),
+    'rotation': ('pitch', 'yaw', 'roll'),
+    'velocity': ('vx', 'vy', 'vz'),
+    'angular_velocity': ('wx', 'wy', 'wz'),
+    'acceleration': ('ax', 'ay', 'az'),
+}
+
+FIELDS = ('location', 'velocity', 'angular_velocity')
+
+STATE_FIELDS = ('location', 'rotation', 'velocity', 'angular_velocity', 'acceleration')
+STATE_WIDTH = 3 * len(STATE_FIELDS)
+
+
+def _state_columns(field):
+    if field not in FIELD_COLUMNS:
+        raise ValueError('unknown snapshot field "%s", use one of %s' % (field, ', '.join(sorted(FIELD_COLUMNS))))
+    start = 3 * STATE_FIELDS.index(field)
+    return range(start, start + 3)
+
+
+class SnapshotRecorder(object):
+    """
+    Records the state of a set of actors tick by tick.
+
+    Frames and elapsed times are stored relative to the origin given to
+    start (by default the first recorded snapshot). Actors missing from a
+    snapshot (e.g. destroyed) are recorded as NaN.
+    """
+
+    def __init__(self, fields=FIELDS, capacity=0):
+        """
+            :param fields: names in FIELD_COLUMNS, in column order
+            :param capacity: number of ticks to preallocate
+        """
+        self.fields = tuple(fields)
+        self._state_columns = np.array([column for field in self.fields for column in _state_columns(field)],
+                                       dtype=np.intp)
+        self.columns = tuple(column for field in self.fields for column in FIELD_COLUMNS[field])
+        self.ids = []
+        self.names = []
+        self.count = 0
+        self.origin = None
+        self._frames = np.zeros(capacity, dtype=np.int64)
+        self._elapsed = np.zeros(capacity)
+        self._data = np.full((capacity, 0, len(self.columns)), np.nan)
+
+    def add(self, actor, name=None):
+        """
+        Track an actor (or actor id), by default named after its id.
+
+            :return: index of the actor in the recorded arrays
+        """
+        actor_id = int(getattr(actor, 'id', actor))
+        self.ids.append(actor_id)
+        self.names.append(name if name is not None else str(actor_id))
+        column = np.full((len(self._data), 1, len(self.columns)), np.nan)
+        self._data = np.concatenate((self._data, column), axis=1)
+        return len(self.ids) - 1
+
+    def reserve(self, ticks):
+        """
+        Make room for at least ticks more records.
+        """
+        needed = self.count + ticks
+        if needed <= len(self._data):
+            return
+        self._frames = np.resize(self._frames, needed)
+        self._elapsed = np.resize(self._elapsed, needed)
+        data = np.full((needed,) + self._data.shape[1:], np.nan)
+        data[:self.count] = self._data[:self.count]
+        self._data = data
+
+    def start(self, snapshot):
+        """
+        Discard the records and take frame and time relative to the snapshot.
+        """
+        self.count = 0
+        self._data[:] = np.nan
+        self.origin = (snapshot.frame, snapshot.timestamp.elapsed_seconds)
+
+    def record(self, snapshot):
+        """
+        Append the state of the tracked actors in a WorldSnapshot.
+        """
+        if self.origin is None:
+            self.origin = (snapshot.frame, snapshot.timestamp.elapsed_seconds)
+        if self.count == len(self._data):
+            # 容量不足时加倍，保持整体线性时间
+            self.reserve(max(self.count, 16))
+        if self.ids:
+            # 一次调用读取所有参与者，缺失的参与者整行为 NaN
+            states = np.frombuffer(snapshot.get_actor_states(self.ids), dtype=np.float64)
+            self._data[self.count] = states.reshape(-1, STATE_WIDTH)[:, self._state_columns]
+        self._frames[self.count] = snapshot.frame - self.origin[0]
+        self._elapsed[self.count] = snapshot.timestamp.elapsed_seconds - self.origin[1]
+        self.count += 1
+
+    @property
+    def frames(self):
+        return self._frames[:self.count]
+
+    @property
+    def elapsed(self):
+        return self._elapsed[:self.count]
+
+    @property
+    def data(self):
+        """
+        (ticks, actors, columns) array of the recorded states.
+        """
+        return self._data[:self.count]
+
+    def index(self, name):
+        """
+        Return the index of an actor from its name or id.
+        """
+        if name in self.names:
+            return self.names.index(name)
+        if name in self.ids:
+            return self.ids.index(name)
+        raise KeyError('actor "%s" is not recorded' % name)
+
+    def table(self, name):
+        """
+        Return the (ticks, 2 + columns) table of one actor, with the frame and
+        elapsed time as first columns (the layout of the old .out files).
+        """
+        return np.column_stack((self.frames, self.elapsed, self.data[:, self.index(name)]))
+
+    def save(self, path):
+        """
+        Write the records to a single uncompressed .npz file.
+        """
+        np.savez(path,
+                 frames=self.frames,
+                 elapsed=self.elapsed,
+                 data=self.data,
+                 ids=np.array(self.ids, dtype=np.int64),
+                 names=np.array(self.names, dtype=np.str_),
+                 fields=np.array(self.fields, dtype=np.str_))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a file written by save.
+        """
+        with np.load(path) as archive:
+            recorder = cls(fields=archive['fields'].tolist())
+            recorder.ids = archive['ids'].tolist()
+            recorder.names = archive['names'].tolist()
+            recorder._frames = archive['frames']
+            recorder._elapsed = archive['elapsed']
+            recorder._data = archive['data']
+        recorder.count = len(recorder._frames)
+        recorder.origin = (0, 0.0)
+        return recorder
+
+
+def max_difference(first, second):
+    """
+    Return the largest absolute difference between the records of two runs.
+
+    Runs with different actors, frames or missing actors at different ticks
+    are infinitely different.
+    """
+    if first.names != second.names or first.data.shape != second.data.shape:
+        return float('inf')
+    if not np.array_equal(first.frames, second.frames):
+        return float('inf')
+    missing = np.isnan(first.data)
+    if not np.array_equal(missing, np.isnan(second.data)):
+        return float('inf')
+    if missing.all():
+        return 0.0
+    difference = np.abs(first.data - second.data)[~missing]
+    return float(max(difference.max(), np.abs(first.elapsed - second.elapsed).max(initial=0.0)))
@@ -0,0 +1,131 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Vectorized vehicle dynamics metrics computed on recorded telemetry.
+
+The functions take the columns of a SnapshotRecorder (elapsed seconds,
+(ticks, 3) locations, rotations, velocities and accelerations) and work on
+whole arrays, so a sweep over many physics configurations spends its time
+in the simulator and not in per-frame Python arithmetic:
+
+    recorder = SnapshotRecorder(fields=TELEMETRY_FIELDS)
+    ...
+    table = recorder.data[:, 0]
+    metrics = summarize(recorder.elapsed, *split(table))
+"""
+
+import numpy as np
+
+from determinism.snapshot import FIELD_COLUMNS
+
+TELEMETRY_FIELDS = ('location', 'rotation', 'velocity', 'acceleration')
+
+
+def split(table, fields=TELEMETRY_FIELDS):
+    """
+    Split the (ticks, columns) table of one actor in one (ticks, 3) array
+    per field.
+    """
+    arrays = []
+    start = 0
+    for field in fields:
+        width = len(FIELD_COLUMNS[field])
+        arrays.append(table[:, start:start + width])
+        start += width
+    return arrays
+
+
+def speed(velocity):
+    """
+    Norm of the velocity of every tick, in m/s.
+    """
+    return np.sqrt(np.sum(np.square(velocity), axis=-1))
+
+
+def path_length(location, start=0, end=None):
+    """
+    Distance travelled between two ticks, following the recorded path.
+    """
+    steps = np.diff(location[start:end], axis=0)
+    return float(np.sum(np.sqrt(np.sum(np.square(steps), axis=-1))))
+
+
+def _first(mask):
+    indices = np.flatnonzero(mask)
+    return int(indices[0]) if len(indices) else None
+
+
+def stopping_distance(location, velocity, start=0, threshold=0.1):
+    """
+    Distance travelled from the tick start until the speed drops below
+    threshold, nan if the vehicle does not stop.
+    """
+    stop = _first(speed(velocity[start:]) < threshold)
+    if stop is None:
+        return float('nan')
+    return path_length(location, start, start + stop + 1)
+
+
+def time_to_speed(elapsed, velocity, target, start=0):
+    """
+    Time from the tick start until the speed reaches target, interpolated
+    between ticks, nan if it never does.
+    """
+    values = speed(velocity[start:])
+    times = elapsed[start:]
+    reached = _first(values >= target)
+    if reached is None:
+        return float('nan')
+    if reached == 0:
+        return 0.0
+    low, high = values[reached - 1], values[reached]
+    fraction = (target - low) / (high - low) if high > low else 1.0
+    return float(times[reached - 1] + fraction * (times[reached] - times[reached - 1]) - times[0])
+
+
+def yaw_rate(elapsed, rotation):
+    """
+    Yaw rate of every tick in degrees per second, from the unwrapped yaw.
+    """
+    if len(elapsed) < 2:
+        return np.zeros(len(elapsed))
+    yaw = np.degrees(np.unwrap(np.radians(rotation[:, 1])))
+    return np.gradient(yaw, elapsed)
+
+
+def lateral_acceleration(rotation, acceleration):
+    """
+    Acceleration of every tick across the heading of the vehicle, in m/s^2
+    (positive to the right, as the CARLA y axis).
+    """
+    yaw = np.radians(rotation[:, 1])
+    return -acceleration[:, 0] * np.sin(yaw) + acceleration[:, 1] * np.cos(yaw)
+
+
+def summarize(elapsed, location, rotation, velocity, acceleration, start=0, end=None):
+    """
+    Metrics of the ticks [start, end).
+
+        :return: dict with duration, distance, the start, end and maximum
+                 speeds in km/h, the maximum absolute lateral acceleration
+                 and yaw rate
+    """
+    window = slice(start, end)
+    elapsed, location, rotation = elapsed[window], location[window], rotation[window]
+    velocity, acceleration = velocity[window], acceleration[window]
+    if len(elapsed) == 0:
+        raise ValueError('no telemetry between ticks %s and %s' % (start, end))
+    speeds = 3.6 * speed(velocity)
+    return {
+        'duration': float(elapsed[-1] - elapsed[0]),
+        'distance': path_length(location),
+        'start_speed': float(speeds[0]),
+        'end_speed': float(speeds[-1]),
+        'max_speed': float(speeds.max()),
+        'max_lateral_acceleration': float(np.abs(lateral_acceleration(rotation, acceleration)).max()),
+        'max_yaw_rate': float(np.abs(yaw_rate(elapsed, rotation)).max()),
+    }
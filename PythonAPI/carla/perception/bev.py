@@ -0,0 +1,413 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Headless bird's-eye-view rasterizer.
+
+The static layers of a map (roads, lane markings, sidewalks, crosswalks) are
+rasterized once into a packed bitmask, one bit per layer, and can be cached
+on disk. Every tick, the ego-centric window is gathered from that bitmask
+with a single vectorized lookup and the vehicles and walkers are stamped as
+rotated boxes, producing a (C, H, W) uint8 tensor without pygame or a
+display.
+
+Raster conventions follow no_rendering_mode.py: world x maps to columns and
+world y to rows. In the ego-centric output the ego looks up (decreasing
+rows) and its right hand side is on increasing columns.
+
+    bev = BirdEyeViewRasterizer(MapRaster.from_carla_map(world.get_map()))
+    tensor = bev.render_world(world, hero)
+"""
+
+import hashlib
+import math
+import os
+import time
+
+import numpy as np
+
+STATIC_LAYERS = ('road', 'lane_marking', 'sidewalk', 'crosswalk')
+DYNAMIC_LAYERS = ('vehicle', 'walker', 'ego')
+
+
+# ==============================================================================
+# -- Vectorized drawing --------------------------------------------------------
+# ==============================================================================
+
+def fill_boxes(grid, centers, forward, half_extents, value=1, chunk=1024):
+    """
+    Fill oriented boxes into a 2D grid.
+
+    Boxes are processed in chunks of similar size; inside a chunk every box
+    is tested against the same square window of candidate pixels at once.
+
+        :param grid: (H, W) array to draw into
+        :param centers: (K, 2) box centers in continuous pixel coordinates (col, row)
+        :param forward: (K, 2) unit vectors of the box length axis in pixel space
+        :param half_extents: (K, 2) half length and half width in pixels
+        :param value: value written into the covered pixels
+    """
+    centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+    if not len(centers):
+        return grid
+    forward = np.asarray(forward, dtype=np.float64).reshape(-1, 2)
+    half_extents = np.asarray(half_extents, dtype=np.float64).reshape(-1, 2)
+    height, width = grid.shape
+    radius = np.ceil(np.hypot(half_extents[:, 0], half_extents[:, 1])).astype(np.int64) + 1
+    # 按外接半径排序分块，避免小目标使用大目标的候选窗口
+    order = np.argsort(radius, kind='stable')
+    for start in range(0, len(order), chunk):
+        ids = order[start:start + chunk]
+        r_max = int(radius[ids].max())
+        offsets = np.arange(-r_max, r_max + 1)
+        off_col, off_row = [o.ravel() for o in np.meshgrid(offsets, offsets)]
+        base = np.floor(centers[ids]).astype(np.int64)
+        cols = base[:, 0:1] + off_col
+        rows = base[:, 1:2] + off_row
+        d_col = cols + 0.5 - centers[ids, 0:1]
+        d_row = rows + 0.5 - centers[ids, 1:2]
+        f_col, f_row = forward[ids, 0:1], forward[ids, 1:2]
+        along = d_col * f_col + d_row * f_row
+        across = d_row * f_col - d_col * f_row
+        inside = (np.abs(along) <= half_extents[ids, 0:1]) & (np.abs(across) <= half_extents[ids, 1:2])
+        inside &= (cols >= 0) & (cols < width) & (rows >= 0) & (rows < height)
+        grid[rows[inside], cols[inside]] = value
+    return grid
+
+
+def fill_polygon(grid, polygon, value=1):
+    """
+    Fill a simple polygon with the even-odd rule, testing all the pixels of
+    its bounding box at once.
+
+        :param polygon: (P, 2) vertices in continuous pixel coordinates (col, row)
+    """
+    polygon = np.asarray(polygon, dtype=np.float64)
+    if len(polygon) < 3:
+        return grid
+    height, width = grid.shape
+    col0, row0 = np.maximum(np.floor(polygon.min(axis=0)).astype(np.int64), 0)
+    col1 = min(int(np.ceil(polygon[:, 0].max())), width)
+    row1 = min(int(np.ceil(polygon[:, 1].max())), height)
+    if col0 >= col1 or row0 >= row1:
+        return grid
+    cols, rows = np.meshgrid(np.arange(col0, col1) + 0.5, np.arange(row0, row1) + 0.5)
+    inside = np.zeros(cols.shape, dtype=bool)
+    start, end = polygon, np.roll(polygon, -1, axis=0)
+    for (x0, y0), (x1, y1) in zip(start, end):
+        if y0 == y1:
+            continue
+        crosses = (y0 > rows) != (y1 > rows)
+        x_cross = x0 + (rows - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (cols < x_cross)
+    grid[row0:row1, col0:col1][inside] = value
+    return grid
+
+
+# ==============================================================================
+# -- Static map layers ---------------------------------------------------------
+# ==============================================================================
+
+class MapRaster(object):
+    """
+    Static layers of a map rasterized in world coordinates, packed as one bit
+    per layer of STATIC_LAYERS into an uint8 grid.
+    """
+
+    def __init__(self, packed, origin, pixels_per_meter):
+        """
+        Constructor method.
+
+            :param packed: (H, W) uint8 grid, bit i set where STATIC_LAYERS[i] is present
+            :param origin: world (x, y) of the corner of pixel (0, 0)
+            :param pixels_per_meter: resolution of the grid
+        """
+        self.packed = packed
+        self.origin = (float(origin[0]), float(origin[1]))
+        self.pixels_per_meter = float(pixels_per_meter)
+
+    def layer(self, name):
+        """
+        Return a static layer as a boolean grid.
+        """
+        return (self.packed & (1 << STATIC_LAYERS.index(name))) != 0
+
+    def world_to_pixel(self, xy):
+        """
+        Convert (N, 2) world coordinates into continuous pixel coordinates (col, row).
+        """
+        return (np.asarray(xy, dtype=np.float64) - self.origin) * self.pixels_per_meter
+
+    def save(self, path):
+        np.savez_compressed(path, packed=self.packed, origin=self.origin,
+                            pixels_per_meter=self.pixels_per_meter)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['packed'], tuple(data['origin']), float(data['pixels_per_meter']))
+
+    @classmethod
+    def from_layers(cls, layers, origin, pixels_per_meter):
+        """
+        Build a raster from a dictionary {layer name: boolean grid}.
+        """
+        shape = next(iter(layers.values())).shape
+        packed = np.zeros(shape, dtype=np.uint8)
+        for name, grid in layers.items():
+            packed |= (np.asarray(grid, dtype=bool).astype(np.uint8) << STATIC_LAYERS.index(name))
+        return cls(packed, origin, pixels_per_meter)
+
+    @classmethod
+    def from_carla_map(cls, carla_map, pixels_per_meter=5.0, precision=1.0, margin=30.0, cache_dir=None):
+        """
+        Rasterize the static layers of a carla.Map.
+
+        Lanes are sampled every precision meters and every sample is stamped
+        as an oriented box, so the map is rendered with a few vectorized
+        calls instead of one pygame call per polygon. When cache_dir is given
+        the raster is stored there, keyed by the OpenDRIVE content as
+        no_rendering_mode.py does for its map image.
+        """
+        import carla
+
+        cache_path = None
+        if cache_dir is not None:
+            digest = hashlib.sha1(carla_map.to_opendrive().encode('UTF-8')).hexdigest()
+            cache_path = os.path.join(cache_dir, '%s_%s_%g.npz' % (
+                carla_map.name.split('/')[-1], digest, pixels_per_meter))
+            if os.path.isfile(cache_path):
+                return cls.load(cache_path)
+
+        # 收集所有需要绘制的车道采样点：(x, y, yaw, 半长, 半宽)
+        roads, sidewalks, markings = [], [], []
+        half_length = precision * 0.6
+        for waypoint in carla_map.generate_waypoints(precision):
+            transform = waypoint.transform
+            x, y, yaw = transform.location.x, transform.location.y, math.radians(transform.rotation.yaw)
+            half_width = waypoint.lane_width * 0.5
+            roads.append((x, y, yaw, half_length, half_width))
+            side = (-math.sin(yaw), math.cos(yaw))
+            for marking, sign in ((waypoint.left_lane_marking, -1.0), (waypoint.right_lane_marking, 1.0)):
+                if marking.type != carla.LaneMarkingType.NONE:
+                    markings.append((x + sign * half_width * side[0], y + sign * half_width * side[1],
+                                     yaw, half_length, 0.1))
+            for step in (lambda w: w.get_left_lane(), lambda w: w.get_right_lane()):
+                lane = step(waypoint)
+                while lane is not None and lane.lane_type != carla.LaneType.Driving:
+                    if lane.lane_type in (carla.LaneType.Sidewalk, carla.LaneType.Shoulder,
+                                          carla.LaneType.Parking):
+                        location = lane.transform.location
+                        sidewalks.append((location.x, location.y, math.radians(lane.transform.rotation.yaw),
+                                          half_length, lane.lane_width * 0.5))
+                    lane = step(lane)
+
+        crosswalks, polygon = [], []
+        for location in carla_map.get_crosswalks():
+            point = (location.x, location.y)
+            # 人行横道按闭合多边形依次给出，回到起点即结束一个多边形
+            if polygon and point == polygon[0]:
+                crosswalks.append(polygon)
+                polygon = []
+            else:
+                polygon.append(point)
+        if polygon:
+            crosswalks.append(polygon)
+
+        raster = cls.from_samples(roads, markings, sidewalks, crosswalks, pixels_per_meter, margin)
+        if cache_path is not None:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            raster.save(cache_path)
+        return raster
+
+    @classmethod
+    def from_samples(cls, roads, markings, sidewalks, crosswalks, pixels_per_meter=5.0, margin=30.0):
+        """
+        Rasterize lane samples given as (x, y, yaw, half_length, half_width)
+        rows and crosswalks given as lists of world (x, y) vertices.
+        """
+        samples = {'road': np.asarray(roads, dtype=np.float64).reshape(-1, 5),
+                   'lane_marking': np.asarray(markings, dtype=np.float64).reshape(-1, 5),
+                   'sidewalk': np.asarray(sidewalks, dtype=np.float64).reshape(-1, 5)}
+        points = [s[:, :2] for s in samples.values() if len(s)]
+        points += [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in crosswalks]
+        points = np.concatenate(points)
+        origin = points.min(axis=0) - margin
+        size = np.ceil((points.max(axis=0) + margin - origin) * pixels_per_meter).astype(np.int64)
+        raster = cls(np.zeros((size[1], size[0]), dtype=np.uint8), origin, pixels_per_meter)
+        for name, rows in samples.items():
+            grid = np.zeros(raster.packed.shape, dtype=np.uint8)
+            forward = np.c_[np.cos(rows[:, 2]), np.sin(rows[:, 2])]
+            fill_boxes(grid, raster.world_to_pixel(rows[:, :2]), forward, rows[:, 3:5] * pixels_per_meter)
+            raster.packed |= grid << STATIC_LAYERS.index(name)
+        grid = np.zeros(raster.packed.shape, dtype=np.uint8)
+        for polygon in crosswalks:
+            fill_polygon(grid, raster.world_to_pixel(np.asarray(polygon).reshape(-1, 2)))
+        raster.packed |= grid << STATIC_LAYERS.index('crosswalk')
+        return raster
+
+
+# ==============================================================================
+# -- Ego-centric rasterizer ----------------------------------------------------
+# ==============================================================================
+
+class BirdEyeViewRasterizer(object):
+    """
+    Renders ego-centric multi-channel BEV tensors.
+
+    The output channels are STATIC_LAYERS followed by DYNAMIC_LAYERS, each
+    one an uint8 mask with values 0 or 1.
+    """
+
+    def __init__(self, map_raster, size=(192, 192), pixels_per_meter=4.0, ego_position=(0.5, 0.75)):
+        """
+        Constructor method.
+
+            :param map_raster: MapRaster with the static layers
+            :param size: (height, width) of the output in pixels
+            :param pixels_per_meter: resolution of the output
+            :param ego_position: (column, row) of the ego in the output as a fraction of its size
+        """
+        self.map_raster = map_raster
+        self.height, self.width = size
+        self.pixels_per_meter = float(pixels_per_meter)
+        self.ego_pixel = (ego_position[0] * self.width, ego_position[1] * self.height)
+        self.channels = STATIC_LAYERS + DYNAMIC_LAYERS
+        # 预先计算输出像素中心在自车坐标系下的位置（米）：x 向前，y 向右
+        cols, rows = np.meshgrid(np.arange(self.width) + 0.5, np.arange(self.height) + 0.5)
+        self._local_x = ((self.ego_pixel[1] - rows) / self.pixels_per_meter).ravel()
+        self._local_y = ((cols - self.ego_pixel[0]) / self.pixels_per_meter).ravel()
+        self._extents = {}
+
+    def render(self, ego, vehicles=None, walkers=None, out=None):
+        """
+        Render one BEV tensor.
+
+            :param ego: (x, y, yaw_degrees, extent_x, extent_y) of the ego vehicle
+            :param vehicles: (N, 5) array of (x, y, yaw_degrees, extent_x, extent_y)
+            :param walkers: (M, 5) array with the same layout as vehicles
+            :param out: optional (C, H, W) uint8 array to render into
+            :return: (C, H, W) uint8 array, channels ordered as self.channels
+        """
+        if out is None:
+            out = np.zeros((len(self.channels), self.height, self.width), dtype=np.uint8)
+        else:
+            out[len(STATIC_LAYERS):] = 0
+        ego_x, ego_y, ego_yaw = float(ego[0]), float(ego[1]), math.radians(float(ego[2]))
+        cos, sin = math.cos(ego_yaw), math.sin(ego_yaw)
+
+        # 静态图层：一次 gather 取出打包的位图，再拆成各个通道
+        raster = self.map_raster
+        ppm = raster.pixels_per_meter
+        world_x = ego_x + cos * self._local_x - sin * self._local_y
+        world_y = ego_y + sin * self._local_x + cos * self._local_y
+        cols = np.floor((world_x - raster.origin[0]) * ppm).astype(np.int64)
+        rows = np.floor((world_y - raster.origin[1]) * ppm).astype(np.int64)
+        valid = (cols >= 0) & (cols < raster.packed.shape[1]) & (rows >= 0) & (rows < raster.packed.shape[0])
+        packed = np.zeros(self.height * self.width, dtype=np.uint8)
+        packed[valid] = raster.packed[rows[valid], cols[valid]]
+        packed = packed.reshape(self.height, self.width)
+        for bit in range(len(STATIC_LAYERS)):
+            np.bitwise_and(np.right_shift(packed, bit), 1, out=out[bit])
+
+        offset = len(STATIC_LAYERS)
+        for channel, boxes in ((0, vehicles), (1, walkers), (2, np.asarray(ego, dtype=np.float64).reshape(1, 5))):
+            if boxes is None or not len(boxes):
+                continue
+            boxes = np.asarray(boxes, dtype=np.float64)
+            self._stamp(out[offset + channel], boxes, ego_x, ego_y, ego_yaw)
+        return out
+
+    def _stamp(self, grid, boxes, ego_x, ego_y, ego_yaw):
+        cos, sin = math.cos(ego_yaw), math.sin(ego_yaw)
+        d_x, d_y = boxes[:, 0] - ego_x, boxes[:, 1] - ego_y
+        # 世界坐标转自车坐标
+        local_x = cos * d_x + sin * d_y
+        local_y = -sin * d_x + cos * d_y
+        heading = np.radians(boxes[:, 2]) - ego_yaw
+        centers = np.c_[self.ego_pixel[0] + local_y * self.pixels_per_meter,
+                        self.ego_pixel[1] - local_x * self.pixels_per_meter]
+        # 前进方向 (cos, sin) 在输出图像中对应 (列, 行) = (sin, -cos)
+        forward = np.c_[np.sin(heading), -np.cos(heading)]
+        reach = np.hypot(boxes[:, 3], boxes[:, 4]) * self.pixels_per_meter
+        visible = (centers[:, 0] + reach >= 0) & (centers[:, 0] - reach < self.width) & \
+            (centers[:, 1] + reach >= 0) & (centers[:, 1] - reach < self.height)
+        fill_boxes(grid, centers[visible], forward[visible], boxes[visible, 3:5] * self.pixels_per_meter)
+
+    # -- CARLA helpers -------------------------------------------------------
+
+    def actor_boxes(self, world, snapshot=None, exclude=None):
+        """
+        Build the vehicle and walker arrays expected by render from one world
+        snapshot. Bounding box extents are static and only queried the first
+        time an actor is seen.
+
+            :return: tuple (vehicles, walkers) of (N, 5) arrays
+        """
+        snapshot = snapshot if snapshot is not None else world.get_snapshot()
+        missing = [s.id for s in snapshot if s.id not in self._extents]
+        if missing:
+            # 先全部标记为无关，已被销毁的演员不会在每一帧重复查询
+            self._extents.update(dict.fromkeys(missing))
+            for actor in world.get_actors(missing):
+                if actor.type_id.startswith('vehicle.') or actor.type_id.startswith('walker.pedestrian'):
+                    extent = actor.bounding_box.extent
+                    self._extents[actor.id] = (0 if actor.type_id.startswith('vehicle.') else 1, extent.x, extent.y)
+                else:
+                    self._extents[actor.id] = None
+        rows = ([], [])
+        for actor_snapshot in snapshot:
+            info = self._extents.get(actor_snapshot.id)
+            if info is None or actor_snapshot.id == exclude:
+                continue
+            transform = actor_snapshot.get_transform()
+            rows[info[0]].append((transform.location.x, transform.location.y, transform.rotation.yaw,
+                                  info[1], info[2]))
+        return tuple(np.asarray(r, dtype=np.float64).reshape(-1, 5) for r in rows)
+
+    def render_world(self, world, ego_actor, snapshot=None, out=None):
+        """
+        Render the BEV tensor centered on ego_actor from a single world snapshot.
+        """
+        snapshot = snapshot if snapshot is not None else world.get_snapshot()
+        vehicles, walkers = self.actor_boxes(world, snapshot, exclude=ego_actor.id)
+        transform = snapshot.find(ego_actor.id).get_transform()
+        extent = ego_actor.bounding_box.extent
+        ego = (transform.location.x, transform.location.y, transform.rotation.yaw, extent.x, extent.y)
+        return self.render(ego, vehicles, walkers, out)
+
+
+# ==============================================================================
+# -- Benchmark -----------------------------------------------------------------
+# ==============================================================================
+
+def benchmark(vehicles=300, walkers=300, frames=200):
+    """
+    Render frames around a synthetic grid town and return the frames per second.
+    """
+    rng = np.random.RandomState(0)
+    roads = []
+    for offset in np.arange(-500.0, 501.0, 100.0):
+        for s in np.arange(-500.0, 501.0, 1.0):
+            roads.append((s, offset, 0.0, 0.6, 7.0))
+            roads.append((offset, s, math.pi / 2, 0.6, 7.0))
+    raster = MapRaster.from_samples(roads, [], [], [[(0, 0), (10, 0), (10, 4), (0, 4)]])
+    bev = BirdEyeViewRasterizer(raster)
+    vehicle_boxes = np.c_[rng.uniform(-500, 500, (vehicles, 2)), rng.uniform(-180, 180, vehicles),
+                          np.full(vehicles, 2.4), np.full(vehicles, 1.0)]
+    walker_boxes = np.c_[rng.uniform(-500, 500, (walkers, 2)), rng.uniform(-180, 180, walkers),
+                         np.full(walkers, 0.3), np.full(walkers, 0.3)]
+    out = np.zeros((len(bev.channels), bev.height, bev.width), dtype=np.uint8)
+    start = time.perf_counter()
+    for frame in range(frames):
+        ego = vehicle_boxes[frame % vehicles]
+        bev.render(ego, vehicle_boxes, walker_boxes, out=out)
+    return frames / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    print('%.1f frames/s' % benchmark())
@@ -0,0 +1,302 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Point cloud preprocessing for LiDAR consumers.
+
+All the stages work on (N, C) float32 arrays whose first three columns are
+x, y, z in the sensor frame, such as the (N, 4) view of a
+carla.LidarMeasurement raw_data returned by lidar_points. Extra columns
+(intensity, ...) travel along with the points.
+
+A typical pipeline, which usually reduces the point count by an order of
+magnitude before any downstream processing:
+
+    preprocessor = PointCloudPreprocessor(max_range=50.0, voxel_size=0.2, remove_ground=True)
+    points = preprocessor(lidar_points(measurement))
+"""
+
+import math
+
+import numpy as np
+
+# 体素键每个坐标占用 21 位，可表示约 ±100 万个体素
+_KEY_BITS = 21
+_KEY_OFFSET = 1 << (_KEY_BITS - 1)
+_KEY_MASK = (1 << _KEY_BITS) - 1
+
+
+def lidar_points(measurement, channels=4):
+    """
+    Return the points of a carla.LidarMeasurement as a (N, channels) float32 view.
+    """
+    return np.frombuffer(measurement.raw_data, dtype=np.float32).reshape((-1, channels))
+
+
+# ==============================================================================
+# -- Cropping ------------------------------------------------------------------
+# ==============================================================================
+
+def crop_mask(points, min_range=0.0, max_range=None, horizontal_fov=None, z_range=None):
+    """
+    Return the mask of the points inside the given limits.
+
+        :param min_range: drop points closer than this distance, e.g. the ego vehicle
+        :param max_range: drop points further than this distance
+        :param horizontal_fov: (min, max) azimuth in degrees, 0 being the x axis
+        :param z_range: (min, max) height in the sensor frame
+    """
+    xyz = points[:, :3]
+    mask = np.ones(len(points), dtype=bool)
+    if min_range > 0.0 or max_range is not None:
+        # 比较平方距离，避免开方
+        squared = np.einsum('ij,ij->i', xyz, xyz)
+        if min_range > 0.0:
+            mask &= squared >= min_range * min_range
+        if max_range is not None:
+            mask &= squared <= max_range * max_range
+    if horizontal_fov is not None:
+        azimuth = np.degrees(np.arctan2(xyz[:, 1], xyz[:, 0]))
+        low, high = horizontal_fov
+        if low <= high:
+            mask &= (azimuth >= low) & (azimuth <= high)
+        else:
+            mask &= (azimuth >= low) | (azimuth <= high)
+    if z_range is not None:
+        mask &= (xyz[:, 2] >= z_range[0]) & (xyz[:, 2] <= z_range[1])
+    return mask
+
+
+def crop(points, **limits):
+    """
+    Return the points inside the limits accepted by crop_mask.
+    """
+    return points[crop_mask(points, **limits)]
+
+
+# ==============================================================================
+# -- Voxel grid ----------------------------------------------------------------
+# ==============================================================================
+
+def voxel_keys(points, voxel_size):
+    """
+    Hash the voxel of every point into a single int64 key.
+
+        :param voxel_size: edge of the voxel in meters, or a (sx, sy, sz) tuple
+        :return: (N,) int64 array
+    """
+    cells = np.floor(points[:, :3] / np.asarray(voxel_size, dtype=np.float32)).astype(np.int64)
+    cells += _KEY_OFFSET
+    return (cells[:, 0] << (2 * _KEY_BITS)) | (cells[:, 1] << _KEY_BITS) | cells[:, 2]
+
+
+def voxel_downsample(points, voxel_size, mode='mean'):
+    """
+    Keep a single point per occupied voxel.
+
+        :param voxel_size: edge of the voxel in meters, or a (sx, sy, sz) tuple
+        :param mode: 'mean' averages every column of the points in the voxel,
+                     'first' keeps one of the original points (faster)
+        :return: (M, C) array with M the number of occupied voxels
+    """
+    if not len(points):
+        return points
+    keys = voxel_keys(points, voxel_size)
+    if mode == 'first':
+        _, first = np.unique(keys, return_index=True)
+        return points[np.sort(first)]
+    if mode != 'mean':
+        raise ValueError('unknown voxel downsample mode "%s"' % mode)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    result = np.empty((len(counts), points.shape[1]), dtype=points.dtype)
+    for column in range(points.shape[1]):
+        result[:, column] = np.bincount(inverse, weights=points[:, column], minlength=len(counts)) / counts
+    return result
+
+
+# ==============================================================================
+# -- Ground segmentation -------------------------------------------------------
+# ==============================================================================
+
+# 示例中激光雷达安装在地面以上约 1.8 米处
+DEFAULT_SENSOR_HEIGHT = 1.8
+
+
+def ground_height_limit(sensor_height=DEFAULT_SENSOR_HEIGHT, margin=0.5):
+    """
+    Highest z, in sensor coordinates, of a column floor that can be ground
+    for a sensor mounted sensor_height meters above the road.
+    """
+    return margin - sensor_height
+
+
+def ground_mask_height_map(points, cell_size=0.5, height_threshold=0.2, max_ground_height=ground_height_limit()):
+    """
+    Classify ground points with a 2D height map.
+
+    Every point closer than height_threshold to the lowest point of its
+    (cell_size x cell_size) column is ground. Columns whose lowest point is
+    above max_ground_height are not, so isolated elevated returns (poles,
+    vehicle roofs, overhangs) with nothing below them are kept. The default
+    suits a sensor mounted DEFAULT_SENSOR_HEIGHT meters high, use
+    ground_height_limit for other mounts or None to disable the limit.
+
+        :return: boolean mask, True for the ground points
+    """
+    if not len(points):
+        return np.zeros(0, dtype=bool)
+    cells = np.floor(points[:, :2] / cell_size).astype(np.int64) + _KEY_OFFSET
+    keys = (cells[:, 0] << _KEY_BITS) | cells[:, 1]
+    # 排序后按列分段，用 reduceat 求每列最低点
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    column_min = np.minimum.reduceat(points[order, 2], starts)
+    lengths = np.diff(np.r_[starts, len(points)])
+    floor = np.empty(len(points), dtype=points.dtype)
+    floor[order] = np.repeat(column_min, lengths)
+    mask = points[:, 2] - floor <= height_threshold
+    if max_ground_height is not None:
+        mask &= floor <= max_ground_height
+    return mask
+
+
+def fit_ground_plane(points, iterations=100, threshold=0.15, max_tilt=15.0, seed=0, batch=32):
+    """
+    Fit the ground plane with RANSAC, evaluating the hypotheses in batches.
+
+        :param iterations: number of random plane hypotheses
+        :param threshold: inlier distance to the plane in meters
+        :param max_tilt: hypotheses tilted more than this (degrees) are discarded
+        :param seed: seed of the hypothesis sampler
+        :param batch: number of hypotheses scored together
+        :return: tuple (plane, mask) with the (a, b, c, d) plane of unit normal,
+                 c > 0, and the boolean mask of its inliers
+    """
+    xyz = points[:, :3].astype(np.float64)
+    if len(xyz) < 3:
+        return None, np.zeros(len(xyz), dtype=bool)
+    rng = np.random.RandomState(seed)
+    samples = xyz[rng.randint(0, len(xyz), size=(iterations, 3))]
+    normals = np.cross(samples[:, 1] - samples[:, 0], samples[:, 2] - samples[:, 0])
+    norms = np.linalg.norm(normals, axis=1)
+    valid = norms > 1e-9
+    normals[valid] /= norms[valid, np.newaxis]
+    normals *= np.where(normals[:, 2:] < 0.0, -1.0, 1.0)
+    valid &= normals[:, 2] >= math.cos(math.radians(max_tilt))
+    normals, samples = normals[valid], samples[valid]
+    if not len(normals):
+        return None, np.zeros(len(xyz), dtype=bool)
+    offsets = -np.einsum('ij,ij->i', normals, samples[:, 0])
+    best, best_count = 0, -1
+    for start in range(0, len(normals), batch):
+        # 一次计算所有点到一批平面的距离，得到 (N, batch) 矩阵
+        distances = np.abs(xyz.dot(normals[start:start + batch].T) + offsets[start:start + batch])
+        counts = (distances <= threshold).sum(axis=0)
+        if counts.max() > best_count:
+            best, best_count = start + int(counts.argmax()), int(counts.max())
+    mask = np.abs(xyz.dot(normals[best]) + offsets[best]) <= threshold
+    # 用内点做最小二乘精修
+    inliers = xyz[mask]
+    centroid = inliers.mean(axis=0)
+    normal = np.linalg.svd(inliers - centroid, full_matrices=False)[2][-1]
+    if normal[2] < 0.0:
+        normal = -normal
+    plane = np.r_[normal, -normal.dot(centroid)]
+    mask = np.abs(xyz.dot(plane[:3]) + plane[3]) <= threshold
+    return plane, mask
+
+
+# ==============================================================================
+# -- Motion compensation -------------------------------------------------------
+# ==============================================================================
+
+def deskew(points, rotation_frequency, end_angle, velocity=(0.0, 0.0, 0.0), yaw_rate=0.0):
+    """
+    Compensate the ego-motion of a spinning LiDAR during one scan.
+
+    CARLA simulates the rotation of the sensor, so the points of a
+    measurement are captured at different times during the simulation step.
+    The capture time of every point is recovered from its azimuth, relative
+    to the azimuth of the last ray (carla.LidarMeasurement.horizontal_angle),
+    and the point is moved to the sensor frame at the end of the scan assuming
+    constant velocity and yaw rate.
+
+        :param rotation_frequency: rotation frequency of the sensor in Hz
+        :param end_angle: horizontal angle of the last ray in radians
+        :param velocity: (vx, vy, vz) sensor velocity in the sensor frame in m/s
+        :param yaw_rate: sensor yaw rate in rad/s (carla reports angular velocities in deg/s)
+        :return: new array with the corrected points
+    """
+    result = np.array(points, copy=True)
+    azimuth = np.arctan2(points[:, 1], points[:, 0])
+    # 每个点相对扫描结束时刻的时间（非正），由方位角差推算
+    lag = np.mod(end_angle - azimuth, 2.0 * math.pi)
+    times = -lag / (2.0 * math.pi * rotation_frequency)
+    angles = yaw_rate * times
+    cos, sin = np.cos(angles), np.sin(angles)
+    x, y = points[:, 0], points[:, 1]
+    result[:, 0] = cos * x - sin * y + velocity[0] * times
+    result[:, 1] = sin * x + cos * y + velocity[1] * times
+    result[:, 2] = points[:, 2] + velocity[2] * times
+    return result
+
+
+# ==============================================================================
+# -- Pipeline ------------------------------------------------------------------
+# ==============================================================================
+
+class PointCloudPreprocessor(object):
+    """
+    Chain of cropping, ground removal and voxel downsampling stages.
+
+    The stages run in that order, so the ground is segmented on the full
+    resolution cloud and the voxel grid only processes the remaining points.
+    The counters reduction() reports are accumulated across calls.
+    """
+
+    def __init__(self, min_range=0.0, max_range=None, horizontal_fov=None, z_range=None,
+                 voxel_size=None, voxel_mode='mean', remove_ground=False, ground_method='height_map',
+                 **ground_args):
+        """
+        Constructor method.
+
+            :param voxel_size: voxel edge in meters, None disables downsampling
+            :param remove_ground: drop the ground points
+            :param ground_method: 'height_map' or 'ransac'
+            :param ground_args: extra arguments of ground_mask_height_map or fit_ground_plane
+        """
+        if ground_method not in ('height_map', 'ransac'):
+            raise ValueError('unknown ground segmentation method "%s"' % ground_method)
+        self.limits = {'min_range': min_range, 'max_range': max_range,
+                       'horizontal_fov': horizontal_fov, 'z_range': z_range}
+        self.voxel_size = voxel_size
+        self.voxel_mode = voxel_mode
+        self.remove_ground = remove_ground
+        self.ground_method = ground_method
+        self.ground_args = ground_args
+        self.points_in = 0
+        self.points_out = 0
+
+    def __call__(self, points):
+        self.points_in += len(points)
+        points = points[crop_mask(points, **self.limits)]
+        if self.remove_ground:
+            if self.ground_method == 'ransac':
+                _, ground = fit_ground_plane(points, **self.ground_args)
+            else:
+                ground = ground_mask_height_map(points, **self.ground_args)
+            points = points[~ground]
+        if self.voxel_size:
+            points = voxel_downsample(points, self.voxel_size, self.voxel_mode)
+        self.points_out += len(points)
+        return points
+
+    def reduction(self):
+        """
+        Return the ratio between the input and output point counts so far.
+        """
+        return self.points_in / float(max(self.points_out, 1))
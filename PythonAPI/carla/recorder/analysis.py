@@ -0,0 +1,284 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Offline equivalents of client.show_recorder_actors_blocked and
+client.show_recorder_collisions.
+
+Both follow the rules of CarlaRecorderQuery::QueryBlocked and
+CarlaRecorderQuery::QueryCollisions but work on a RecorderFile, so no server
+round trip is needed and many recordings can be analysed in parallel:
+
+    python -m recorder.analysis blocked recordings/ -t 30 -d 100 -j 8
+    python -m recorder.analysis collisions recordings/ --types hv
+
+(run from PythonAPI/carla).
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+from multiprocessing import Pool
+
+import numpy as np
+
+from recorder.reader import RecorderFile
+
+BLOCKED_DTYPE = np.dtype([
+    ('actor', '<u4'),
+    ('start', '<f8'),         # 开始静止时的录制时间（秒）
+    ('duration', '<f8'),
+    ('first_frame', '<i8'),
+    ('last_frame', '<i8')])
+
+COLLISION_DTYPE = np.dtype([
+    ('frame', '<i8'),
+    ('elapsed', '<f8'),
+    ('type1', 'U1'),
+    ('type2', 'U1'),
+    ('actor1', '<u4'),
+    ('actor2', '<u4')])
+
+# 碰撞类型字母，与 show_recorder_collisions.py 的 --types 参数一致
+CATEGORIES = 'ahvwto'
+_TYPE_LETTERS = {'vehicle': 'v', 'walker': 'w', 'traffic_light': 't'}
+
+# 与场景中非actor物体的碰撞记录为 uint32(-1)
+NO_ACTOR = 0xffffffff
+
+
+# ==============================================================================
+# -- Blocked actors ------------------------------------------------------------
+# ==============================================================================
+
+def blocked_actors(recording, min_time=30.0, min_distance=100.0):
+    """
+    Find the intervals during which actors did not move.
+
+    As in the server query, an actor is blocked while it stays closer than
+    min_distance to the position where it last moved, and the time is
+    accumulated with the duration of the frames. The positions of every frame
+    are compared for all the actors at once.
+
+        :param recording: RecorderFile
+        :param min_time: minimum blocked time in seconds
+        :param min_distance: distance in centimeters an actor has to move to
+                             not be considered blocked
+        :return: BLOCKED_DTYPE array sorted by decreasing duration
+    """
+    positions = recording.positions()
+    frames = recording.frames
+    ids, dense = np.unique(positions['id'], return_inverse=True)
+    locations = np.ascontiguousarray(positions['location'], dtype=np.float64)
+    # 记录已按帧排列，每帧对应一段连续的切片
+    bounds = np.searchsorted(positions['frame'], np.arange(len(frames) + 1))
+    # 初始锚点为 NaN，第一次出现时总被视为移动
+    anchor = np.full((len(ids), 3), np.nan)
+    duration = np.zeros(len(ids))
+    start = np.zeros(len(ids))
+    first_frame = np.zeros(len(ids), dtype=np.int64)
+    last_frame = np.zeros(len(ids), dtype=np.int64)
+    blocked = np.zeros(len(ids), dtype=bool)
+    squared = min_distance * min_distance
+    intervals = []
+
+    def close(index):
+        done = index[duration[index] >= min_time]
+        if len(done):
+            result = np.empty(len(done), dtype=BLOCKED_DTYPE)
+            result['actor'] = ids[done]
+            result['start'] = start[done]
+            result['duration'] = duration[done]
+            result['first_frame'] = first_frame[done]
+            result['last_frame'] = last_frame[done]
+            intervals.append(result)
+
+    for frame in range(len(frames)):
+        begin, end = bounds[frame], bounds[frame + 1]
+        if begin == end:
+            continue
+        index = dense[begin:end]
+        delta = locations[begin:end] - anchor[index]
+        with np.errstate(invalid='ignore'):
+            still = np.einsum('ij,ij->i', delta, delta) < squared
+        staying = index[still]
+        fresh = staying[~blocked[staying]]
+        start[fresh] = frames['elapsed'][frame]
+        first_frame[fresh] = frame
+        blocked[staying] = True
+        duration[staying] += frames['duration'][frame]
+        last_frame[staying] = frame
+        moved = index[~still]
+        close(moved[blocked[moved]])
+        blocked[moved] = False
+        duration[moved] = 0.0
+        anchor[moved] = locations[begin:end][~still]
+    close(np.flatnonzero(blocked))
+    if not intervals:
+        return np.empty(0, dtype=BLOCKED_DTYPE)
+    result = np.concatenate(intervals)
+    return result[np.argsort(-result['duration'], kind='stable')]
+
+
+# ==============================================================================
+# -- Collisions ----------------------------------------------------------------
+# ==============================================================================
+
+def actor_letters(recording, actor_ids):
+    """
+    Return the collision type letter (v, w, t or o) of every actor id.
+    """
+    actors = recording.actors()
+    letters = np.full(len(actor_ids), 'o', dtype='U1')
+    unique, inverse = np.unique(actor_ids, return_inverse=True)
+    table = np.array([_TYPE_LETTERS.get(actors[actor]['type'], 'o') if actor in actors else 'o'
+                      for actor in unique.tolist()], dtype='U1')
+    if len(unique):
+        letters[:] = table[inverse]
+    return letters
+
+
+def _matches(category, letters, hero):
+    if category == 'a':
+        return np.ones(len(letters), dtype=bool)
+    if category == 'h':
+        return np.asarray(hero, dtype=bool)
+    return letters == category
+
+
+def collisions(recording, types='aa'):
+    """
+    List the collisions between two categories of actors.
+
+    A collision between the same pair of actors is only reported on the
+    first of a run of consecutive frames, as the server query does.
+
+        :param recording: RecorderFile
+        :param types: pair of letters, a=any, h=hero, v=vehicle, w=walker,
+                      t=traffic light, o=other
+        :return: COLLISION_DTYPE array sorted by frame
+    """
+    if len(types) != 2 or any(category not in CATEGORIES for category in types):
+        raise ValueError('invalid collision types "%s", use two of "%s"' % (types, CATEGORIES))
+    records = recording.collisions()
+    type1 = actor_letters(recording, records['actor1'])
+    type2 = actor_letters(recording, records['actor2'])
+    valid = _matches(types[0], type1, records['hero1']) & _matches(types[1], type2, records['hero2'])
+    records, type1, type2 = records[valid], type1[valid], type2[valid]
+    # 按 (actor对, 帧) 排序，连续帧中重复出现的同一对不再报告
+    keys = (records['actor1'].astype(np.uint64) << np.uint64(32)) | records['actor2']
+    order = np.lexsort((records['frame'], keys))
+    keys, frames = keys[order], records['frame'][order]
+    repeated = np.zeros(len(order), dtype=bool)
+    repeated[1:] = (keys[1:] == keys[:-1]) & (frames[1:] == frames[:-1] + 1)
+    reported = np.sort(order[~repeated])
+    result = np.empty(len(reported), dtype=COLLISION_DTYPE)
+    result['frame'] = records['frame'][reported]
+    result['elapsed'] = recording.frames['elapsed'][result['frame']]
+    result['type1'] = type1[reported]
+    result['type2'] = type2[reported]
+    result['actor1'] = records['actor1'][reported]
+    result['actor2'] = records['actor2'][reported]
+    return result
+
+
+# ==============================================================================
+# -- Reports -------------------------------------------------------------------
+# ==============================================================================
+
+def _type_id(actors, actor):
+    return actors[actor]['type_id'] if actor in actors else ''
+
+
+def _footer(recording):
+    frame_id = int(recording.frames['id'][-1]) if len(recording.frames) else 0
+    return '\nFrames: %d\nDuration: %g seconds\n' % (frame_id, recording.duration)
+
+
+def format_blocked(recording, blocked):
+    """
+    Format the result of blocked_actors as the server query does.
+    """
+    actors = recording.actors()
+    lines = ['%8s %6s %-35s %10s' % ('Time', 'Id', 'Actor', 'Duration')]
+    for row in blocked:
+        lines.append('%8.0f %6d %-35s %10.0f' % (
+            row['start'], row['actor'], _type_id(actors, int(row['actor'])), row['duration']))
+    return '\n'.join(lines) + '\n' + _footer(recording)
+
+
+def format_collisions(recording, result):
+    """
+    Format the result of collisions as the server query does.
+    """
+    actors = recording.actors()
+    lines = ['%8s %6s %6s %-35s %6s %-35s' % ('Time', 'Types', 'Id', 'Actor 1', 'Id', 'Actor 2')]
+    for row in result:
+        lines.append('%8.0f   %s %s  %6d %-35s %6d %-35s' % (
+            row['elapsed'], row['type1'], row['type2'],
+            row['actor1'], _type_id(actors, int(row['actor1'])),
+            row['actor2'], _type_id(actors, int(row['actor2']))))
+    return '\n'.join(lines) + '\n' + _footer(recording)
+
+
+def _report(job):
+    query, path, options = job
+    try:
+        with RecorderFile(path) as recording:
+            if query == 'blocked':
+                return path, format_blocked(recording, blocked_actors(recording, **options))
+            return path, format_collisions(recording, collisions(recording, **options))
+    except (IOError, ValueError) as error:
+        return path, 'Error: %s\n' % error
+
+
+def recording_files(paths):
+    """
+    Expand directories into the .rec files they contain.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.rec'))))
+        else:
+            files.append(path)
+    return files
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Analyse CARLA recorder files without a server')
+    argparser.add_argument('query', choices=['blocked', 'collisions'], help='query to run')
+    argparser.add_argument('paths', nargs='+', help='recorder files or directories with .rec files')
+    argparser.add_argument('-t', '--time', metavar='T', default=30.0, type=float,
+                           help='blocked: minimum time in seconds to be considered blocked (default: 30)')
+    argparser.add_argument('-d', '--distance', metavar='D', default=100.0, type=float,
+                           help='blocked: minimum distance in centimeters to not be considered blocked (default: 100)')
+    argparser.add_argument('--types', metavar='T', default='aa',
+                           help='collisions: pair of types (a=any, h=hero, v=vehicle, w=walkers, '
+                                't=trafficLight, o=others) (default: aa)')
+    argparser.add_argument('-j', '--processes', metavar='N', default=None, type=int,
+                           help='worker processes (default: number of CPUs)')
+    args = argparser.parse_args()
+    if args.query == 'blocked':
+        options = {'min_time': args.time, 'min_distance': args.distance}
+    else:
+        options = {'types': args.types}
+    jobs = [(args.query, path, options) for path in recording_files(args.paths)]
+    pool = Pool(args.processes)
+    try:
+        # imap 保持文件顺序，结果一到即输出
+        for path, report in pool.imap(_report, jobs, chunksize=1):
+            print('== %s\n%s' % (path, report))
+    finally:
+        pool.close()
+        pool.join()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,413 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Columnar export of recorder files and a small query helper.
+
+A recording is converted in a single pass into tables partitioned by frame
+range, one column per file, so a query only touches the partitions and the
+columns it needs. The layout on disk is:
+
+    <path>/manifest.json                        tables, columns and partitions
+    <path>/<table>/part-000000/<column>.npy     'npy' format (no dependencies)
+    <path>/<table>/part-000000.parquet          'parquet' format (needs pyarrow)
+
+The tables are:
+
+    frames          frame, id, elapsed, duration, offset
+    positions       frame, actor, x, y, z, roll, pitch, yaw
+    kinematics      frame, actor, vx, vy, vz, wx, wy, wz
+    collisions      frame, collision, actor1, actor2, hero1, hero2
+    events          frame, actor, event (EVENT_*), type, type_id, role_name, parent
+    traffic_lights  frame, actor, state, frozen, elapsed
+
+'frame' is always the index of the frame in the recording. Positions keep
+the Unreal units of the recorder (centimeters and degrees).
+
+    export('recording.rec', '_out/recording')
+    tables = RecordingTables('_out/recording')
+    hero = tables.read('positions', actors=[24], time_range=(60.0, 120.0))
+
+To convert many recordings in parallel, run from PythonAPI/carla:
+
+    python -m recorder.columnar -o _out/tables -j 8 recordings/*.rec
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from multiprocessing import Pool
+
+import numpy as np
+
+from recorder import reader
+
+FORMAT_VERSION = 1
+FORMATS = ('npy', 'parquet')
+
+EVENT_ADD = 0
+EVENT_DEL = 1
+EVENT_PARENT = 2
+
+TABLES = ('frames', 'positions', 'kinematics', 'collisions', 'events', 'traffic_lights')
+
+# 每张表中用于按actor过滤的列
+ACTOR_COLUMNS = {
+    'positions': ('actor',),
+    'kinematics': ('actor',),
+    'collisions': ('actor1', 'actor2'),
+    'events': ('actor',),
+    'traffic_lights': ('actor',),
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('cannot import pyarrow, make sure pyarrow package is installed')
+    return pyarrow
+
+
+def partition_name(partition):
+    """
+    Return the name of the given partition number, without extension.
+    """
+    return 'part-%06d' % partition
+
+
+# ==============================================================================
+# -- Conversion ----------------------------------------------------------------
+# ==============================================================================
+
+def _frames_table(recording, first, last):
+    frames = recording.frames[first:last + 1]
+    return [('frame', np.arange(first, first + len(frames), dtype=np.int64)),
+            ('id', frames['id']),
+            ('elapsed', frames['elapsed']),
+            ('duration', frames['duration']),
+            ('offset', frames['offset'])]
+
+
+def _vector_table(records, vectors):
+    columns = [('frame', records['frame']), ('actor', records['id'])]
+    for field, names in vectors:
+        for axis, name in enumerate(names):
+            columns.append((name, records[field][:, axis]))
+    return columns
+
+
+def _events_table(recording, first, last):
+    spawned = recording.spawn_events((first, last))
+    deleted = recording.records(reader.EVENT_DEL, (first, last))
+    parents = recording.records(reader.EVENT_PARENT, (first, last))
+    count = len(spawned) + len(deleted) + len(parents)
+    frame = np.empty(count, dtype=np.int64)
+    actor = np.empty(count, dtype=np.uint32)
+    event = np.empty(count, dtype=np.uint8)
+    parent = np.zeros(count, dtype=np.uint32)
+    types = np.full(count, '', dtype=object)
+    type_ids = np.full(count, '', dtype=object)
+    role_names = np.full(count, '', dtype=object)
+    for row, spawn in enumerate(spawned):
+        frame[row], actor[row], event[row] = spawn['frame'], spawn['id'], EVENT_ADD
+        types[row], type_ids[row] = spawn['type'], spawn['type_id']
+        role_names[row] = spawn['attributes'].get('role_name', '')
+    start = len(spawned)
+    for records, code in ((deleted, EVENT_DEL), (parents, EVENT_PARENT)):
+        stop = start + len(records)
+        frame[start:stop], actor[start:stop], event[start:stop] = records['frame'], records['id'], code
+        if code == EVENT_PARENT:
+            parent[start:stop] = records['parent']
+        start = stop
+    # 同一帧内按记录顺序：先创建，再删除，最后挂接父节点
+    order = np.argsort(frame, kind='stable')
+    columns = [('frame', frame), ('actor', actor), ('event', event), ('type', types),
+               ('type_id', type_ids), ('role_name', role_names), ('parent', parent)]
+    return [(name, _strings(column[order]) if column.dtype == object else column[order])
+            for name, column in columns]
+
+
+def _strings(column):
+    # 对象数组转换为定长 unicode 数组，保存 .npy 时无需 pickle
+    return column.astype('U%d' % max([len(value) for value in column] + [1]))
+
+
+def _table(recording, table, first, last):
+    frames = (first, last)
+    if table == 'frames':
+        return _frames_table(recording, first, last)
+    if table == 'positions':
+        return _vector_table(recording.records(reader.POSITION, frames),
+                             [('location', ('x', 'y', 'z')), ('rotation', ('roll', 'pitch', 'yaw'))])
+    if table == 'kinematics':
+        return _vector_table(recording.records(reader.KINEMATICS, frames),
+                             [('linear_velocity', ('vx', 'vy', 'vz')),
+                              ('angular_velocity', ('wx', 'wy', 'wz'))])
+    if table == 'collisions':
+        records = recording.records(reader.COLLISION, frames)
+        return [(name, records[name]) for name in ('frame', 'collision', 'actor1', 'actor2', 'hero1', 'hero2')]
+    if table == 'events':
+        return _events_table(recording, first, last)
+    if table == 'traffic_lights':
+        records = recording.records(reader.STATE, frames)
+        return [('frame', records['frame']), ('actor', records['id']), ('state', records['state']),
+                ('frozen', records['frozen']), ('elapsed', records['elapsed'])]
+    raise ValueError('unknown table "%s"' % table)
+
+
+def _write_partition(path, columns, file_format):
+    if file_format == 'parquet':
+        pyarrow = _pyarrow()
+        table = pyarrow.table([pyarrow.array(column) for _, column in columns],
+                              names=[name for name, _ in columns])
+        pyarrow.parquet.write_table(table, path + '.parquet')
+        return
+    os.makedirs(path)
+    for name, column in columns:
+        np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(column))
+
+
+def export(source, path, frames_per_partition=6000, tables=TABLES, file_format='npy'):
+    """
+    Convert a recorder file into partitioned columnar tables.
+
+    The packets are decoded one frame range at a time, in file order and
+    for all the tables at once, so the file is read in a single pass and
+    the memory used only depends on the size of a partition.
+
+        :param source: path of the .rec file
+        :param path: output directory, it must not exist
+        :param frames_per_partition: number of frames of every partition
+        :param tables: names of the tables to write
+        :param file_format: 'npy' or 'parquet'
+        :return: the manifest written to <path>/manifest.json
+    """
+    if file_format not in FORMATS:
+        raise ValueError('unknown columnar format "%s"' % file_format)
+    for table in tables:
+        if table not in TABLES:
+            raise ValueError('unknown table "%s"' % table)
+    if file_format == 'parquet':
+        _pyarrow()
+    os.makedirs(path)
+    manifest = {'version': FORMAT_VERSION, 'format': file_format, 'tables': {}}
+    with reader.RecorderFile(source) as recording:
+        manifest.update({
+            'source': os.path.abspath(source),
+            'map': recording.map_name,
+            'recorder_version': recording.version,
+            'date': recording.date,
+            'frames': len(recording.frames),
+            'duration': recording.duration,
+            'frames_per_partition': frames_per_partition,
+        })
+        for table in tables:
+            os.makedirs(os.path.join(path, table))
+            # 空的帧范围只用来得到列名
+            manifest['tables'][table] = {
+                'columns': [name for name, _ in _table(recording, table, 0, -1)],
+                'partitions': [],
+            }
+        for number, first in enumerate(range(0, len(recording.frames), frames_per_partition)):
+            last = min(first + frames_per_partition, len(recording.frames)) - 1
+            for table in tables:
+                columns = _table(recording, table, first, last)
+                name = os.path.join(table, partition_name(number))
+                _write_partition(os.path.join(path, name), columns, file_format)
+                manifest['tables'][table]['partitions'].append(
+                    {'path': name, 'first': first, 'last': last, 'rows': len(columns[0][1])})
+    with open(os.path.join(path, 'manifest.json'), 'w') as output:
+        json.dump(manifest, output, indent=2)
+    return manifest
+
+
+def _export_job(job):
+    source, path, options = job
+    try:
+        export(source, path, **options)
+    except Exception as error:
+        return source, str(error)
+    return source, None
+
+
+def export_many(sources, root, processes=None, **options):
+    """
+    Convert several recordings in parallel, each into <root>/<file name>.
+
+        :param processes: number of worker processes (default: number of CPUs)
+        :return: dictionary {source: error message or None}
+    """
+    jobs = [(source, os.path.join(root, os.path.splitext(os.path.basename(source))[0]), options)
+            for source in sources]
+    pool = Pool(processes)
+    try:
+        return dict(pool.map(_export_job, jobs, chunksize=1))
+    finally:
+        pool.close()
+        pool.join()
+
+
+# ==============================================================================
+# -- Queries -------------------------------------------------------------------
+# ==============================================================================
+
+class RecordingTables(object):
+    """
+    Read access to the tables written by export.
+
+    Frame filters are pushed down to the partitions, so only the partitions
+    overlapping the range are opened. With the 'npy' format the columns are
+    memory mapped and actor filters only read the actor columns in full,
+    the rest of the columns are gathered for the matching rows.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor method.
+
+            :param path: directory written by export
+        """
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as manifest:
+            self.manifest = json.load(manifest)
+        self._frames = None
+
+    @property
+    def tables(self):
+        return sorted(self.manifest['tables'])
+
+    def columns(self, table):
+        return list(self._table(table)['columns'])
+
+    def _table(self, table):
+        if table not in self.manifest['tables']:
+            raise KeyError('table "%s" not found in %s' % (table, self.path))
+        return self.manifest['tables'][table]
+
+    def frame_range(self, time_range):
+        """
+        Convert a (start, end) range of elapsed seconds into frame indices.
+        """
+        if self._frames is None:
+            self._frames = self.read('frames', columns=['elapsed'])['elapsed']
+        elapsed = self._frames
+        first = int(np.searchsorted(elapsed, time_range[0], side='left'))
+        last = int(np.searchsorted(elapsed, time_range[1], side='right')) - 1
+        return first, last
+
+    def partitions(self, table, frames=None):
+        """
+        Return the manifest entries of the partitions overlapping a frame range.
+        """
+        partitions = self._table(table)['partitions']
+        if frames is None:
+            return list(partitions)
+        return [part for part in partitions if part['last'] >= frames[0] and part['first'] <= frames[1]]
+
+    def _load(self, partition, columns):
+        base = os.path.join(self.path, partition['path'])
+        if self.manifest['format'] == 'parquet':
+            parquet = _pyarrow().parquet
+            table = parquet.read_table(base + '.parquet', columns=columns)
+            return {name: table.column(name).to_numpy() for name in columns}
+        return {name: np.load(os.path.join(base, name + '.npy'), mmap_mode='r') for name in columns}
+
+    def read(self, table, columns=None, frames=None, time_range=None, actors=None):
+        """
+        Read the rows of a table that match the filters.
+
+            :param columns: names of the columns to return (default: all)
+            :param frames: (first, last) range of frame indices, inclusive
+            :param time_range: (start, end) range of elapsed seconds, instead of frames
+            :param actors: ids of the actors to keep, a row matches if any of its
+                           actor columns (ACTOR_COLUMNS) is in the list
+            :return: dictionary {column: array}
+        """
+        names = self.columns(table)
+        columns = names if columns is None else list(columns)
+        for name in columns:
+            if name not in names:
+                raise KeyError('column "%s" not found in table "%s"' % (name, table))
+        if time_range is not None:
+            frames = self.frame_range(time_range)
+        actor_columns = ACTOR_COLUMNS.get(table, ()) if actors is not None else ()
+        if actors is not None and not actor_columns:
+            raise ValueError('table "%s" cannot be filtered by actor' % table)
+        filters = (['frame'] if frames is not None else []) + list(actor_columns)
+        actors = np.asarray(actors, dtype=np.uint32) if actors is not None else None
+        chunks = {name: [] for name in columns}
+        for partition in self.partitions(table, frames):
+            data = self._load(partition, sorted(set(columns) | set(filters)))
+            mask = None
+            if frames is not None and (partition['first'] < frames[0] or partition['last'] > frames[1]):
+                mask = (data['frame'] >= frames[0]) & (data['frame'] <= frames[1])
+            if actor_columns:
+                selected = np.zeros(partition['rows'], dtype=bool)
+                for name in actor_columns:
+                    selected |= np.isin(data[name], actors)
+                mask = selected if mask is None else mask & selected
+            for name in columns:
+                chunks[name].append(np.asarray(data[name] if mask is None else data[name][mask]))
+        return {name: np.concatenate(values) if values else np.empty(0) for name, values in chunks.items()}
+
+
+def _read_job(job):
+    path, table, filters = job
+    return RecordingTables(path).read(table, **filters)
+
+
+def read_many(paths, table, processes=None, **filters):
+    """
+    Run the same read on several exported recordings in parallel.
+
+        :param paths: directories written by export
+        :param processes: number of worker processes, 1 reads in this process
+        :param filters: arguments of RecordingTables.read
+        :return: dictionary {column: array} with an extra 'recording' column,
+                 the index in paths of the recording of every row
+    """
+    jobs = [(path, table, filters) for path in paths]
+    if processes == 1:
+        results = [_read_job(job) for job in jobs]
+    else:
+        pool = Pool(processes)
+        try:
+            results = pool.map(_read_job, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    merged = {}
+    if results:
+        for name in results[0]:
+            merged[name] = np.concatenate([result[name] for result in results])
+        rows = [len(result[name]) for result in results]
+        merged['recording'] = np.repeat(np.arange(len(results), dtype=np.int32), rows)
+    return merged
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Export CARLA recorder files into columnar tables')
+    argparser.add_argument('files', nargs='+', help='recorder files (.rec)')
+    argparser.add_argument('-o', '--output', required=True, help='output directory, one subdirectory per file')
+    argparser.add_argument('-f', '--format', choices=FORMATS, default='npy', help='table format (default: npy)')
+    argparser.add_argument('--frames-per-partition', type=int, default=6000,
+                           help='frames of every partition (default: 6000)')
+    argparser.add_argument('-j', '--processes', type=int, default=None,
+                           help='worker processes (default: number of CPUs)')
+    args = argparser.parse_args()
+    errors = export_many(args.files, args.output, args.processes, file_format=args.format,
+                         frames_per_partition=args.frames_per_partition)
+    for source, error in sorted(errors.items()):
+        print('%s: %s' % (source, error or 'ok'))
+    return 1 if any(errors.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,424 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Offline reader for the files written by the CARLA recorder (.rec).
+
+The file is memory mapped and walked once to build an index of frames and
+packets, following the layout of Carla/Recorder/CarlaRecorder*.cpp: a header
+(CarlaRecorderInfo) and a stream of packets made of a one byte id
+(CarlaRecorderPacketId), a uint32 size and the payload. Fixed size records
+(positions, kinematics, states, collisions...) are decoded with numpy
+structured dtypes directly over the mapped file, so no simulator is needed:
+
+    with RecorderFile('recording.rec') as recording:
+        print(recording.map_name, len(recording.frames))
+        trajectory = recording.trajectory(actor_id)
+
+Run this module as a script to print a summary of a recording.
+"""
+
+import argparse
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+# 与 CarlaRecorder.h 中的 CarlaRecorderPacketId 保持一致
+FRAME_START = 0
+FRAME_END = 1
+EVENT_ADD = 2
+EVENT_DEL = 3
+EVENT_PARENT = 4
+COLLISION = 5
+POSITION = 6
+STATE = 7
+ANIM_VEHICLE = 8
+ANIM_WALKER = 9
+VEHICLE_LIGHT = 10
+SCENE_LIGHT = 11
+KINEMATICS = 12
+BOUNDING_BOX = 13
+PLATFORM_TIME = 14
+PHYSICS_CONTROL = 15
+TRAFFIC_LIGHT_TIME = 16
+TRIGGER_VOLUME = 17
+FRAME_COUNTER = 18
+WALKER_BONES = 19
+VISUAL_TIME = 20
+VEHICLE_DOOR = 21
+ANIM_VEHICLE_WHEELS = 22
+ANIM_BIKER = 23
+
+PACKET_NAMES = (
+    'FrameStart', 'FrameEnd', 'EventAdd', 'EventDel', 'EventParent', 'Collision', 'Position',
+    'State', 'AnimVehicle', 'AnimWalker', 'VehicleLight', 'SceneLight', 'Kinematics',
+    'BoundingBox', 'PlatformTime', 'PhysicsControl', 'TrafficLightTime', 'TriggerVolume',
+    'FrameCounter', 'WalkerBones', 'VisualTime', 'VehicleDoor', 'AnimVehicleWheels', 'AnimBiker')
+
+# 与 carla::rpc::ActorType / FCarlaActor::ActorType 保持一致
+ACTOR_TYPES = ('other', 'vehicle', 'walker', 'traffic_light', 'traffic_sign', 'sensor', 'invalid')
+
+MAGIC = 'CARLA_RECORDER'
+
+# 包头：char id + uint32 size
+PACKET_HEADER_SIZE = 5
+
+# 录制文件中的结构体都以 #pragma pack(1) 写入，小端序
+FRAME_DTYPE = np.dtype([('id', '<u8'), ('duration', '<f8'), ('elapsed', '<f8')])
+
+# 带有 uint16 记录数前缀的定长记录包
+RECORD_DTYPES = {
+    POSITION: np.dtype([('id', '<u4'), ('location', '<f4', (3,)), ('rotation', '<f4', (3,))]),
+    KINEMATICS: np.dtype([('id', '<u4'), ('linear_velocity', '<f4', (3,)),
+                          ('angular_velocity', '<f4', (3,))]),
+    STATE: np.dtype([('id', '<u4'), ('frozen', '?'), ('elapsed', '<f4'), ('state', 'i1')]),
+    COLLISION: np.dtype([('collision', '<u4'), ('actor1', '<u4'), ('actor2', '<u4'),
+                         ('hero1', '?'), ('hero2', '?')]),
+    EVENT_DEL: np.dtype([('id', '<u4')]),
+    EVENT_PARENT: np.dtype([('id', '<u4'), ('parent', '<u4')]),
+    TRAFFIC_LIGHT_TIME: np.dtype([('id', '<u4'), ('green', '<f4'), ('yellow', '<f4'), ('red', '<f4')]),
+}
+
+PACKET_INDEX_DTYPE = np.dtype([
+    ('frame', '<i8'),     # 所在帧在 frames 中的下标，帧开始之前的包为 -1
+    ('type', 'u1'),
+    ('offset', '<u8'),    # 负载在文件中的偏移
+    ('size', '<u4'),
+    ('count', '<u4'),     # 定长记录包的记录数，其余为 0
+])
+
+_HEADER = struct.Struct('<BI')
+_UINT16 = struct.Struct('<H')
+_UINT32 = struct.Struct('<I')
+_INT64 = struct.Struct('<q')
+
+
+def _read_string(buffer, offset):
+    # FString 以 uint16 长度加 UTF-8 字节写入
+    length = _UINT16.unpack_from(buffer, offset)[0]
+    offset += 2
+    return bytes(buffer[offset:offset + length]).decode('utf-8', 'replace'), offset + length
+
+
+class RecorderFile(object):
+    """
+    Memory mapped, indexed view of a recorder file.
+
+    The packet walk only reads the packet headers, the payloads are decoded
+    on demand and cached, so opening a multi-GB recording takes about one
+    second per million packets.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor method.
+
+            :param path: path of the .rec file
+        """
+        self.path = path
+        with open(path, 'rb') as recording:
+            self._mmap = mmap.mmap(recording.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cache = {}
+        self._actors = None
+        try:
+            self._read_info()
+            self._build_index()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Release the mapped file. Arrays returned before stay valid.
+        """
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 仍有视图引用映射时交给垃圾回收释放
+                pass
+            self._mmap = None
+
+    def _read_info(self):
+        buffer = self._mmap
+        try:
+            self.version = _UINT16.unpack_from(buffer, 0)[0]
+            magic, offset = _read_string(buffer, 2)
+            self.date = _INT64.unpack_from(buffer, offset)[0]
+            self.map_name, offset = _read_string(buffer, offset + 8)
+        except struct.error:
+            raise ValueError('"%s" is too short to be a recorder file' % self.path)
+        if magic != MAGIC:
+            raise ValueError('"%s" is not a recorder file' % self.path)
+        self._data_offset = offset
+
+    def _build_index(self):
+        buffer = self._mmap
+        end = len(buffer)
+        offset = self._data_offset
+        frame = -1
+        frames, packets = [], []
+        counted = set(RECORD_DTYPES) | {EVENT_ADD}
+        unpack_header = _HEADER.unpack_from
+        while offset + _HEADER.size <= end:
+            packet_type, size = unpack_header(buffer, offset)
+            payload = offset + _HEADER.size
+            if payload + size > end:
+                # 录制被中断时最后一个包可能不完整
+                break
+            if packet_type == FRAME_START:
+                frame += 1
+                frames.append(offset)
+            count = _UINT16.unpack_from(buffer, payload)[0] if packet_type in counted and size else 0
+            packets.append((frame, packet_type, payload, size, count))
+            offset = payload + size
+        self.truncated = offset != end
+        self.packets = np.array(packets, dtype=PACKET_INDEX_DTYPE)
+        starts = self.packets[self.packets['type'] == FRAME_START]
+        self.frames = np.empty(len(starts), dtype=FRAME_DTYPE.descr + [('offset', '<u8')])
+        if len(starts):
+            records = self._gather(starts['offset'], FRAME_DTYPE)
+            for name in FRAME_DTYPE.names:
+                self.frames[name] = records[name]
+        self.frames['offset'] = frames
+        # 帧时长在下一帧开始时才回写，最后一帧保留占位值 -1
+        if len(self.frames) > 1 and self.frames['duration'][-1] < 0.0:
+            self.frames['duration'][-1] = self.frames['elapsed'][-1] - self.frames['elapsed'][-2]
+
+    def _gather(self, offsets, dtype):
+        # 每个偏移处读取一条记录
+        raw = np.frombuffer(self._mmap, dtype=np.uint8)
+        index = np.asarray(offsets, dtype=np.int64)[:, np.newaxis] + np.arange(dtype.itemsize)
+        return raw[index].view(dtype)[:, 0]
+
+    # ==========================================================================
+    # -- Frames ----------------------------------------------------------------
+    # ==========================================================================
+
+    @property
+    def duration(self):
+        """
+        Total recorded time in seconds.
+        """
+        if not len(self.frames):
+            return 0.0
+        return float(self.frames['elapsed'][-1] + max(self.frames['duration'][-1], 0.0))
+
+    def frame_at(self, elapsed):
+        """
+        Return the index of the frame being played at the given elapsed time.
+        """
+        return max(int(np.searchsorted(self.frames['elapsed'], elapsed, side='right')) - 1, 0)
+
+    def frame_offset(self, index):
+        """
+        Return the file offset of the FrameStart packet of a frame, the
+        position the replayer would seek to.
+        """
+        return int(self.frames['offset'][index])
+
+    def packet_counts(self):
+        """
+        Return a dictionary {packet name: number of packets}.
+        """
+        counts = np.bincount(self.packets['type'], minlength=len(PACKET_NAMES))
+        return {PACKET_NAMES[i] if i < len(PACKET_NAMES) else str(i): int(count)
+                for i, count in enumerate(counts) if count}
+
+    # ==========================================================================
+    # -- Records ---------------------------------------------------------------
+    # ==========================================================================
+
+    def _select_packets(self, packet_type, frames=None):
+        packets = self.packets
+        if frames is not None:
+            # 包按帧的顺序排列，二分查找帧范围，只检查范围内的包
+            first, stop = np.searchsorted(packets['frame'], [frames[0], frames[1] + 1])
+            packets = packets[first:max(first, stop)]
+        return packets[packets['type'] == packet_type]
+
+    def records(self, packet_type, frames=None):
+        """
+        Decode the records of a fixed size packet type.
+
+        The records of the whole file are cached, a frame range decodes only
+        the packets inside it without touching the cache.
+
+            :param packet_type: one of the keys of RECORD_DTYPES, e.g. POSITION
+            :param frames: optional (first, last) range of frame indices
+            :return: structured array with the fields of RECORD_DTYPES[packet_type]
+                     plus 'frame', the index of the frame of every record
+        """
+        if frames is None and packet_type in self._cache:
+            return self._cache[packet_type]
+        if packet_type not in RECORD_DTYPES:
+            raise ValueError('packet type %d does not hold fixed size records' % packet_type)
+        dtype = RECORD_DTYPES[packet_type]
+        packets = self._select_packets(packet_type, frames)
+        packets = packets[packets['count'] > 0]
+        counts = packets['count'].astype(np.int64)
+        result = np.empty(int(counts.sum()), dtype=[('frame', '<i8')] + dtype.descr)
+        result['frame'] = np.repeat(packets['frame'], counts)
+        if len(result):
+            # 每个包的记录在文件中连续存放，逐包读取视图后一次性拼接
+            chunks = [np.frombuffer(self._mmap, dtype=dtype, count=int(count), offset=int(offset) + 2)
+                      for offset, count in zip(packets['offset'], counts)]
+            records = np.concatenate(chunks)
+            for name in dtype.names:
+                result[name] = records[name]
+        if frames is None:
+            self._cache[packet_type] = result
+        return result
+
+    def packet_records(self, index):
+        """
+        Decode the records of a single packet of the packet index.
+        """
+        packet = self.packets[index]
+        dtype = RECORD_DTYPES[int(packet['type'])]
+        return np.frombuffer(self._mmap, dtype=dtype, count=int(packet['count']),
+                             offset=int(packet['offset']) + 2).copy()
+
+    def positions(self):
+        return self.records(POSITION)
+
+    def kinematics(self):
+        return self.records(KINEMATICS)
+
+    def states(self):
+        return self.records(STATE)
+
+    def collisions(self):
+        return self.records(COLLISION)
+
+    def platform_times(self):
+        """
+        Return the (frame index, platform time) arrays of the PlatformTime packets.
+        """
+        packets = self.packets[self.packets['type'] == PLATFORM_TIME]
+        return packets['frame'], self._gather(packets['offset'], np.dtype('<f8'))
+
+    # ==========================================================================
+    # -- Actors ----------------------------------------------------------------
+    # ==========================================================================
+
+    def spawn_events(self, frames=None):
+        """
+        Decode the EventAdd packets.
+
+            :param frames: optional (first, last) range of frame indices
+            :return: list of dictionaries with keys id, frame, type, type_id,
+                     uid, attributes, location, rotation and packet (file
+                     offset of the EventAdd packet)
+        """
+        buffer = self._mmap
+        events = []
+        for packet in self._select_packets(EVENT_ADD, frames):
+            offset = int(packet['offset']) + 2
+            for _ in range(int(packet['count'])):
+                actor_id, actor_type = struct.unpack_from('<IB', buffer, offset)
+                transform = struct.unpack_from('<6f', buffer, offset + 5)
+                uid = _UINT32.unpack_from(buffer, offset + 29)[0]
+                type_id, offset = _read_string(buffer, offset + 33)
+                attributes = {}
+                total = _UINT16.unpack_from(buffer, offset)[0]
+                offset += 2
+                for _ in range(total):
+                    # 跳过属性类型（uint8），读取属性名和值
+                    name, offset = _read_string(buffer, offset + 1)
+                    attributes[name], offset = _read_string(buffer, offset)
+                events.append({
+                    'id': actor_id, 'frame': int(packet['frame']),
+                    'type': ACTOR_TYPES[actor_type] if actor_type < len(ACTOR_TYPES) else 'invalid',
+                    'type_id': type_id, 'uid': uid, 'attributes': attributes,
+                    'location': transform[:3], 'rotation': transform[3:],
+                    'packet': int(packet['offset']) - PACKET_HEADER_SIZE})
+        return events
+
+    def actors(self):
+        """
+        Return the actors created during the recording.
+
+            :return: dictionary {actor id: info} where info is a dictionary with
+                     the keys of spawn_events plus created and destroyed (frame
+                     indices, destroyed is None if the actor outlives the
+                     recording) and parent
+        """
+        if self._actors is not None:
+            return self._actors
+        actors = {}
+        for event in self.spawn_events():
+            event['created'] = event.pop('frame')
+            event['destroyed'] = event['parent'] = None
+            actors[event['id']] = event
+        for record in self.records(EVENT_DEL):
+            if record['id'] in actors:
+                actors[record['id']]['destroyed'] = int(record['frame'])
+        for record in self.records(EVENT_PARENT):
+            if record['id'] in actors:
+                actors[record['id']]['parent'] = int(record['parent'])
+        self._actors = actors
+        return actors
+
+    def trajectory(self, actor_id):
+        """
+        Return the recorded trajectory of an actor.
+
+            :return: dictionary of arrays with keys frame (frame indices),
+                     elapsed (seconds), location (N, 3) in centimeters and
+                     rotation (N, 3) in degrees as (roll, pitch, yaw), both in
+                     Unreal coordinates as the recorder stores them
+        """
+        if 'trajectories' not in self._cache:
+            positions = self.positions()
+            # 记录已按帧排列，按id稳定排序一次后每个actor只需二分查找
+            order = np.argsort(positions['id'], kind='stable')
+            self._cache['trajectories'] = positions['id'][order], order
+        ids, order = self._cache['trajectories']
+        start = np.searchsorted(ids, actor_id, side='left')
+        stop = np.searchsorted(ids, actor_id, side='right')
+        selected = self.positions()[order[start:stop]]
+        return {
+            'frame': selected['frame'],
+            'elapsed': self.frames['elapsed'][selected['frame']],
+            'location': selected['location'],
+            'rotation': selected['rotation'],
+        }
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Print a summary of a CARLA recorder file')
+    argparser.add_argument('path', help='recorder file (.rec)')
+    argparser.add_argument('-a', '--actors', action='store_true', help='list the recorded actors')
+    args = argparser.parse_args()
+    with RecorderFile(args.path) as recording:
+        print('Version: %d' % recording.version)
+        print('Map: %s' % recording.map_name)
+        print('Frames: %d' % len(recording.frames))
+        print('Duration: %.3f seconds' % recording.duration)
+        if recording.truncated:
+            print('Warning: the recording ends with an incomplete packet')
+        for name, count in sorted(recording.packet_counts().items()):
+            print('  %-18s %d' % (name, count))
+        print('Collisions: %d' % len(recording.collisions()))
+        actors = recording.actors()
+        print('Actors: %d' % len(actors))
+        if args.actors:
+            for actor_id, info in sorted(actors.items()):
+                print('  %5d %-14s %s' % (actor_id, info['type'], info['type_id']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Seekable replay index for recorder files.
+
+client.replay_file has to rebuild the actors alive at the start time, and
+without help the replayer scans the recording from the beginning to do so.
+This module writes a sidecar "<recording>.index" next to the recording with
+
+    * the elapsed time and byte offset of every frame;
+    * the frame and byte offset of every EventAdd, EventDel and EventParent packet;
+    * keyframes every few seconds with the actors alive at that frame, the
+      EventAdd packet that created each of them and their parents.
+
+When the sidecar is present (and matches the size of the recording), the
+replayer (CarlaReplayerIndex) creates the actors of the closest keyframe,
+replays only the event packets after it and seeks straight to the start
+frame. Build it on the machine where the server reads the recordings:
+
+    python -m recorder.replay_index /path/to/CarlaUE4/Saved/recording01.rec
+
+(run from PythonAPI/carla).
+"""
+
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+from recorder import reader
+
+VERSION = 1
+MAGIC = 'CARLA_REPLAY_INDEX'
+
+# 与 CarlaReplayerIndex.h 中的 pack(1) 结构体一致
+FRAME_DTYPE = np.dtype([('elapsed', '<f8'), ('offset', '<u8')])
+EVENT_DTYPE = np.dtype([('frame', '<u4'), ('offset', '<u8')])
+ACTOR_DTYPE = np.dtype([('id', '<u4'), ('offset', '<u8')])
+PARENT_DTYPE = np.dtype([('id', '<u4'), ('parent', '<u4')])
+
+_EVENT_TYPES = (reader.EVENT_ADD, reader.EVENT_DEL, reader.EVENT_PARENT)
+
+
+def index_filename(recording):
+    """
+    Return the path of the sidecar index of a recording.
+    """
+    return recording + '.index'
+
+
+class ReplayIndex(object):
+    """
+    In-memory replay index: frames, event packets and keyframes.
+
+    A keyframe at frame k holds the state before the events of frame k,
+    so seeking to frame f means creating the actors of the last keyframe at
+    or before f and then replaying the event packets from the keyframe up to
+    (not including) frame f.
+    """
+
+    def __init__(self, recording_size, total_time, frames, events, keyframes):
+        self.recording_size = recording_size
+        self.total_time = total_time
+        self.frames = frames
+        self.events = events
+        # (frame, first event, ACTOR_DTYPE array, PARENT_DTYPE array)
+        self.keyframes = keyframes
+
+    @classmethod
+    def build(cls, recording, interval=60.0):
+        """
+        Build the index of an open RecorderFile.
+
+            :param interval: seconds between keyframes
+        """
+        frames = np.empty(len(recording.frames), dtype=FRAME_DTYPE)
+        frames['elapsed'] = recording.frames['elapsed']
+        frames['offset'] = recording.frames['offset']
+        positions = np.flatnonzero(np.isin(recording.packets['type'], _EVENT_TYPES))
+        packets = recording.packets[positions]
+        events = np.empty(len(packets), dtype=EVENT_DTYPE)
+        events['frame'] = np.maximum(packets['frame'], 0)
+        events['offset'] = packets['offset'] - reader.PACKET_HEADER_SIZE
+        # 每个 EventAdd 包中创建的 actor
+        spawned = {}
+        for event in recording.spawn_events():
+            spawned.setdefault(event['packet'], []).append(event['id'])
+        # 关键帧所在的帧：每隔 interval 秒取一帧
+        elapsed = recording.frames['elapsed']
+        times = np.arange(interval, elapsed[-1] if len(elapsed) else 0.0, interval)
+        marks = np.unique(np.searchsorted(elapsed, times, side='left'))
+        keyframes = []
+        alive, parents = {}, {}
+        event = 0
+        for mark in marks.tolist():
+            # 处理关键帧之前的所有事件包
+            while event < len(events) and events['frame'][event] < mark:
+                packet_type = int(packets['type'][event])
+                if packet_type == reader.EVENT_ADD:
+                    for actor in spawned.get(int(events['offset'][event]), []):
+                        alive[actor] = int(events['offset'][event])
+                elif packet_type == reader.EVENT_DEL:
+                    for actor in recording.packet_records(positions[event])['id'].tolist():
+                        alive.pop(actor, None)
+                        parents.pop(actor, None)
+                else:
+                    for record in recording.packet_records(positions[event]).tolist():
+                        parents[record[0]] = record[1]
+                event += 1
+            actors = np.array(sorted(alive.items()), dtype=ACTOR_DTYPE)
+            links = np.array(sorted((child, parent) for child, parent in parents.items()
+                                    if child in alive and parent in alive), dtype=PARENT_DTYPE)
+            keyframes.append((mark, event, actors, links))
+        total_time = float(elapsed[-1]) if len(elapsed) else 0.0
+        return cls(os.path.getsize(recording.path), total_time, frames, events, keyframes)
+
+    def save(self, path):
+        """
+        Write the index in the binary layout read by CarlaReplayerIndex::Load.
+        """
+        with open(path, 'wb') as output:
+            magic = MAGIC.encode('utf-8')
+            output.write(struct.pack('<HH', VERSION, len(magic)) + magic)
+            output.write(struct.pack('<Qd', self.recording_size, self.total_time))
+            for table in (self.frames, self.events):
+                output.write(struct.pack('<I', len(table)) + table.tobytes())
+            output.write(struct.pack('<I', len(self.keyframes)))
+            for frame, first_event, actors, links in self.keyframes:
+                output.write(struct.pack('<III', frame, first_event, len(actors)) + actors.tobytes())
+                output.write(struct.pack('<I', len(links)) + links.tobytes())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by save.
+        """
+        with open(path, 'rb') as source:
+            data = source.read()
+        version, length = struct.unpack_from('<HH', data, 0)
+        offset = 4 + length
+        if version != VERSION or data[4:offset].decode('utf-8', 'replace') != MAGIC:
+            raise ValueError('"%s" is not a replay index' % path)
+        recording_size, total_time = struct.unpack_from('<Qd', data, offset)
+        offset += 16
+
+        def table(dtype, offset):
+            count = struct.unpack_from('<I', data, offset)[0]
+            array = np.frombuffer(data, dtype=dtype, count=count, offset=offset + 4)
+            return array, offset + 4 + count * dtype.itemsize
+
+        frames, offset = table(FRAME_DTYPE, offset)
+        events, offset = table(EVENT_DTYPE, offset)
+        keyframes = []
+        count = struct.unpack_from('<I', data, offset)[0]
+        offset += 4
+        for _ in range(count):
+            frame, first_event = struct.unpack_from('<II', data, offset)
+            actors, offset = table(ACTOR_DTYPE, offset + 8)
+            links, offset = table(PARENT_DTYPE, offset)
+            keyframes.append((frame, first_event, actors, links))
+        return cls(recording_size, total_time, frames, events, keyframes)
+
+    def find_frame(self, time):
+        """
+        Return the last frame starting at or before the time.
+        """
+        return max(int(np.searchsorted(self.frames['elapsed'], time, side='right')) - 1, 0)
+
+    def seek(self, time):
+        """
+        Plan a seek as the replayer does.
+
+            :return: tuple (frame, keyframe, events) with the target frame,
+                     the keyframe to restore (None to start from scratch)
+                     and the EVENT_DTYPE rows to replay after it
+        """
+        frame = self.find_frame(time)
+        keyframe = None
+        for candidate in self.keyframes:
+            if candidate[0] > frame:
+                break
+            keyframe = candidate
+        first = keyframe[1] if keyframe is not None else 0
+        stop = first + int(np.searchsorted(self.events['frame'][first:], frame, side='left'))
+        return frame, keyframe, self.events[first:stop]
+
+
+def build_index(path, interval=60.0, output=None):
+    """
+    Build and write the sidecar index of a recording.
+
+        :param interval: seconds between keyframes
+        :param output: path of the index (default: index_filename(path))
+        :return: the path written
+    """
+    output = output or index_filename(path)
+    with reader.RecorderFile(path) as recording:
+        index = ReplayIndex.build(recording, interval)
+    index.save(output)
+    return output
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Build the seekable replay index of CARLA recorder files')
+    argparser.add_argument('files', nargs='+', help='recorder files (.rec)')
+    argparser.add_argument('-i', '--interval', metavar='S', default=60.0, type=float,
+                           help='seconds between keyframes (default: 60)')
+    args = argparser.parse_args()
+    for path in args.files:
+        output = build_index(path, args.interval)
+        print('%s -> %s' % (path, output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
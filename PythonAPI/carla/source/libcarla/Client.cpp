@@ -11,6 +11,7 @@
 #include "carla/rpc/ActorId.h"
 #include "carla/trafficmanager/TrafficManager.h"
 
+#include <limits>
 #include <thread>
 
 #include <boost/python/stl_iterator.hpp>
@@ -28,6 +29,57 @@ static void SetTimeout(carla::client::Client &client, double seconds) {
 }
 
 //这是一个静态函数，用于设置carla::client::Client对象的超时时间。它接受一个客户端对象引用和一个表示秒数的双精度浮点数作为参数，通过调用客户端对象的SetTimeout方法，并将秒数转换为相应的时间持续类型（可能是通过TimeDurationFromSeconds函数进行转换，该函数应该在其他地方定义）来设置超时时间。
+
+/// 开启或关闭客户端的 RPC 与流分析器
+static void EnableProfiler(carla::client::Client &self, bool enabled) {
+  self.SetProfilerEnabled(enabled);
+}
+
+/// 将分析器快照转换为 Python 字典，时间以毫秒为单位
+static boost::python::dict GetProfilerStats(const carla::client::Client &self) {
+  namespace py = boost::python;
+  using Profiler = carla::client::detail::ClientProfiler;
+  const auto snapshot = self.GetProfilerSnapshot();
+  const auto limits = Profiler::Buckets();
+  py::dict rpc;
+  for (const auto &item : snapshot.rpc) {
+    const auto &stats = item.second;
+    py::list buckets;
+    for (size_t i = 0u; i < limits.size(); ++i) {
+      buckets.append(py::make_tuple(limits[i], stats.buckets[i]));
+    }
+    buckets.append(py::make_tuple(std::numeric_limits<double>::infinity(), stats.buckets[limits.size()]));
+    py::dict method;
+    method["calls"] = stats.calls;
+    method["errors"] = stats.errors;
+    method["async_calls"] = stats.async_calls;
+    method["total_ms"] = 1e3 * stats.total_seconds;
+    method["mean_ms"] = stats.calls > 0u ? 1e3 * stats.total_seconds / static_cast<double>(stats.calls) : 0.0;
+    method["min_ms"] = 1e3 * stats.min_seconds;
+    method["max_ms"] = 1e3 * stats.max_seconds;
+    method["buckets"] = buckets;
+    rpc[item.first] = method;
+  }
+  py::dict streams;
+  for (const auto &item : snapshot.streams) {
+    const auto &stats = item.second;
+    py::dict stream;
+    stream["messages"] = stats.messages;
+    stream["bytes"] = stats.bytes;
+    stream["max_bytes"] = stats.max_bytes;
+    stream["mean_interval_ms"] = stats.intervals > 0u ?
+        1e3 * stats.total_interval_seconds / static_cast<double>(stats.intervals) : 0.0;
+    stream["min_interval_ms"] = 1e3 * stats.min_interval_seconds;
+    stream["max_interval_ms"] = 1e3 * stats.max_interval_seconds;
+    streams[item.first] = stream;
+  }
+  py::dict result;
+  result["enabled"] = snapshot.enabled;
+  result["rpc"] = rpc;
+  result["streams"] = streams;
+  return result;
+}
+
 static auto GetAvailableMaps(const carla::client::Client &self) {
   boost::python::list result;
   std::vector<std::string> maps;
@@ -238,5 +290,10 @@ void export_client() {
     .def("apply_batch", &ApplyBatchCommands, (arg("commands"), arg("do_tick")=false))
     .def("apply_batch_sync", &ApplyBatchCommandsSync, (arg("commands"), arg("do_tick")=false))
     .def("get_trafficmanager", CONST_CALL_WITHOUT_GIL_1(cc::Client, GetInstanceTM, uint16_t), (arg("port")=ctm::TM_DEFAULT_PORT))
+    .def("enable_profiler", &EnableProfiler, (arg("enabled")=true))
+    .def("is_profiler_enabled", &cc::Client::IsProfilerEnabled)
+    .def("reset_profiler", &cc::Client::ResetProfiler)
+    .def("get_profiler_stats", &GetProfilerStats)
+    .def("get_profiler_prometheus", &cc::Client::GetProfilerPrometheusText)
   ;
 }
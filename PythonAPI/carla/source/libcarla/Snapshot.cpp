@@ -10,6 +10,11 @@
 #include <carla/client/World.h>
 
 #include <boost/python/suite/indexing/vector_indexing_suite.hpp>
+
+#include <algorithm>
+#include <limits>
+#include <string>
+#include <vector>
 // 命名空间 carla 和 carla::client
 namespace carla {
 namespace client {
@@ -27,6 +32,65 @@ namespace client {
 } // namespace client
 } // namespace carla
 
+static boost::python::object MakeBytes(const char *data, size_t size) {
+  return boost::python::object(boost::python::handle<>(PyBytes_FromStringAndSize(data, size)));
+}
+
+// 一次读取多个交通灯在快照中的状态，不需要逐个访问参与者。
+// 返回 (状态, 冻结标志, 时间) 三个字节串：每个灯一个 uint8 状态（不在快照中为 255）、
+// 一个 uint8 冻结标志和四个 float32（已过时间、绿灯、黄灯、红灯时长，不在快照中为 NaN）。
+// 快照中的类型相关数据只对交通灯有效，id 必须是交通灯的 id。
+static boost::python::tuple GetTrafficLightData(const carla::client::WorldSnapshot &self, boost::python::object ids) {
+  namespace bp = boost::python;
+  const auto size = static_cast<size_t>(bp::len(ids));
+  std::string states(size, static_cast<char>(0xFF));
+  std::string frozen(size, '\0');
+  std::vector<float> times(4u * size, std::numeric_limits<float>::quiet_NaN());
+  for (auto i = 0u; i < size; ++i) {
+    const auto actor = self.Find(bp::extract<carla::ActorId>(ids[i]));
+    if (!actor) {
+      continue;
+    }
+    const auto &data = actor->state.traffic_light_data;
+    states[i] = static_cast<char>(data.state);
+    frozen[i] = data.time_is_frozen ? 1 : 0;
+    times[4u * i] = data.elapsed_time;
+    times[4u * i + 1u] = data.green_time;
+    times[4u * i + 2u] = data.yellow_time;
+    times[4u * i + 3u] = data.red_time;
+  }
+  return bp::make_tuple(
+      MakeBytes(states.data(), states.size()),
+      MakeBytes(frozen.data(), frozen.size()),
+      MakeBytes(reinterpret_cast<const char *>(times.data()), times.size() * sizeof(float)));
+}
+
+// 一次读取多个参与者在快照中的运动状态，不需要逐个调用 find 和 getter。
+// 返回一个字节串：每个参与者 15 个 float64，依次为位置、旋转（pitch, yaw, roll）、
+// 速度、角速度和加速度，不在快照中的参与者为 NaN。
+static boost::python::object GetActorStates(const carla::client::WorldSnapshot &self, boost::python::object ids) {
+  namespace bp = boost::python;
+  constexpr size_t columns = 15u;
+  const auto size = static_cast<size_t>(bp::len(ids));
+  std::vector<double> states(columns * size, std::numeric_limits<double>::quiet_NaN());
+  for (auto i = 0u; i < size; ++i) {
+    const auto actor = self.Find(bp::extract<carla::ActorId>(ids[i]));
+    if (!actor) {
+      continue;
+    }
+    const auto &location = actor->transform.location;
+    const auto &rotation = actor->transform.rotation;
+    const double values[columns] = {
+        location.x, location.y, location.z,
+        rotation.pitch, rotation.yaw, rotation.roll,
+        actor->velocity.x, actor->velocity.y, actor->velocity.z,
+        actor->angular_velocity.x, actor->angular_velocity.y, actor->angular_velocity.z,
+        actor->acceleration.x, actor->acceleration.y, actor->acceleration.z};
+    std::copy(values, values + columns, states.begin() + columns * i);
+  }
+  return MakeBytes(reinterpret_cast<const char *>(states.data()), states.size() * sizeof(double));
+}
+
 void export_snapshot() {
   using namespace boost::python;
   namespace cc = carla::client;
@@ -52,6 +116,8 @@ void export_snapshot() {
     /// @}
     .def("has_actor", &cc::WorldSnapshot::Contains, (arg("actor_id")))
     .def("find", CALL_RETURNING_OPTIONAL_1(cc::WorldSnapshot, Find, carla::ActorId), (arg("actor_id")))
+    .def("get_actor_states", &GetActorStates, (arg("actor_ids")))// 定义方法 get_actor_states，一次读取多个参与者的位姿、速度和加速度
+    .def("get_traffic_light_data", &GetTrafficLightData, (arg("actor_ids")))// 定义方法 get_traffic_light_data，一次读取多个交通灯的状态和时间
     .def("__len__", &cc::WorldSnapshot::size)// 定义方法 __len__，返回 WorldSnapshot 中的元素数量
     .def("__iter__", range(&cc::WorldSnapshot::begin, &cc::WorldSnapshot::end)) // 定义方法 __iter__，用于迭代 WorldSnapshot 的元素
     .def("__eq__", &cc::WorldSnapshot::operator==)// 定义方法 __eq__，用于比较两个 WorldSnapshot 对象是否相等
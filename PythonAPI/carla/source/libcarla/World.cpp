@@ -138,6 +138,77 @@ static void EnableEnvironmentObjects(
   self.EnableEnvironmentObjects(env_objects_ids, enable);
 }
 
+static boost::python::list ActorIdsToList(const std::vector<carla::ActorId> &ids) {
+  boost::python::list result;
+  for (auto id : ids) {
+    result.append(id);
+  }
+  return result;
+}
+
+static boost::python::list GetRandomLocationsFromNavigation(const carla::client::World &self, size_t count) {
+  std::vector<carla::geom::Location> locations;
+  {
+    carla::PythonUtil::ReleaseGIL unlock;
+    locations = self.GetRandomLocationsFromNavigation(count);
+  }
+  boost::python::list result;
+  for (const auto &location : locations) {
+    result.append(location);
+  }
+  return result;
+}
+
+// 为多个行人设置导航目标，返回设置失败的行人 id
+static boost::python::list SetWalkersTargets(
+  carla::client::World &self,
+  const boost::python::object &py_walker_ids,
+  const boost::python::object &py_locations) {
+
+  std::vector<carla::ActorId> walker_ids {
+    boost::python::stl_input_iterator<carla::ActorId>(py_walker_ids),
+    boost::python::stl_input_iterator<carla::ActorId>()
+  };
+  std::vector<carla::geom::Location> locations {
+    boost::python::stl_input_iterator<carla::geom::Location>(py_locations),
+    boost::python::stl_input_iterator<carla::geom::Location>()
+  };
+  if (walker_ids.size() != locations.size()) {
+    throw std::invalid_argument("walker_ids and locations must have the same length");
+  }
+  std::vector<carla::ActorId> failed;
+  {
+    carla::PythonUtil::ReleaseGIL unlock;
+    failed = self.SetWalkersTargets(walker_ids, locations);
+  }
+  return ActorIdsToList(failed);
+}
+
+// 为多个行人设置最大速度，返回设置失败的行人 id
+static boost::python::list SetWalkersMaxSpeeds(
+  carla::client::World &self,
+  const boost::python::object &py_walker_ids,
+  const boost::python::object &py_speeds) {
+
+  std::vector<carla::ActorId> walker_ids {
+    boost::python::stl_input_iterator<carla::ActorId>(py_walker_ids),
+    boost::python::stl_input_iterator<carla::ActorId>()
+  };
+  std::vector<float> speeds {
+    boost::python::stl_input_iterator<float>(py_speeds),
+    boost::python::stl_input_iterator<float>()
+  };
+  if (walker_ids.size() != speeds.size()) {
+    throw std::invalid_argument("walker_ids and speeds must have the same length");
+  }
+  std::vector<carla::ActorId> failed;
+  {
+    carla::PythonUtil::ReleaseGIL unlock;
+    failed = self.SetWalkersMaxSpeeds(walker_ids, speeds);
+  }
+  return ActorIdsToList(failed);
+}
+
 void export_world() {
   using namespace boost::python;
   namespace cc = carla::client;
@@ -332,6 +403,9 @@ void export_world() {
     .def("get_vehicles_light_states", &GetVehiclesLightStates)
     .def("get_map", CONST_CALL_WITHOUT_GIL(cc::World, GetMap))
     .def("get_random_location_from_navigation", CALL_RETURNING_OPTIONAL_WITHOUT_GIL(cc::World, GetRandomLocationFromNavigation))
+    .def("get_random_locations_from_navigation", &GetRandomLocationsFromNavigation, (arg("count")))
+    .def("set_walkers_targets", &SetWalkersTargets, (arg("walker_ids"), arg("locations")))
+    .def("set_walkers_max_speeds", &SetWalkersMaxSpeeds, (arg("walker_ids"), arg("speeds")))
     .def("get_spectator", CONST_CALL_WITHOUT_GIL(cc::World, GetSpectator))
     .def("get_settings", CONST_CALL_WITHOUT_GIL(cc::World, GetSettings))
     .def("apply_settings", &ApplySettings, (arg("settings"), arg("seconds")=0.0))
@@ -0,0 +1,201 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Crowds of walkers driven by AI controllers, sent to new destinations in
+bounded batches.
+
+go_to_location and set_max_speed are one Python call per controller, each
+looking up the parent walker. A WalkerCrowd keeps the walkers, their
+speeds and their current targets in arrays and sends the destinations and
+speeds of many walkers with one world.set_walkers_targets /
+world.set_walkers_max_speeds call. The destinations are drawn from a pool
+of navigation locations sampled in bulk with
+world.get_random_locations_from_navigation.
+
+Every tick, the walkers whose retarget period is over and the ones found
+at their target (checked on a rotating window of the crowd) get a new
+destination, at most budget walkers per tick, so the cost of a tick does
+not grow with the size of the crowd:
+
+    crowd = WalkerCrowd(world, population.walkers, seed=0, period=(20.0, 60.0), budget=100)
+    crowd.start()
+    while True:
+        world.tick()
+        crowd.tick(world.get_snapshot())
+
+With traffic.population.TrafficPopulation the crowd is created by
+start_walkers and available as population.crowd.
+"""
+
+import numpy as np
+
+
+class WalkerCrowd(object):
+    """
+    Walkers with AI controllers, re-targeted with batched commands.
+    """
+
+    def __init__(self, world, walkers, seed=None, destinations=None, pool_size=1000, period=(30.0, 90.0),
+                 arrival_radius=2.0, budget=200):
+        """
+        :param walkers: list of dicts with 'id', 'con' and 'speed' keys
+        :param destinations: carla.Location of the initial destination pool,
+                             by default pool_size are sampled
+        :param period: (minimum, maximum) seconds before a walker is sent
+                       to another destination, None to only re-target the
+                       walkers that arrive
+        :param arrival_radius: distance in meters to the target under which
+                               a walker has arrived
+        :param budget: maximum walkers re-targeted and checked per tick
+        """
+        self._world = world
+        self.ids = np.array([walker['id'] for walker in walkers], dtype=np.int64)
+        self.controllers = np.array([walker['con'] for walker in walkers], dtype=np.int64)
+        self.speeds = np.array([walker['speed'] for walker in walkers], dtype=np.float32)
+        self.targets = np.full((len(walkers), 3), np.nan)
+        self.deadlines = np.full(len(walkers), np.inf)
+        self.active = np.ones(len(walkers), dtype=bool)
+        self.rng = np.random.default_rng(seed)
+        self.pool_size = pool_size
+        self.period = period
+        self.arrival_radius = arrival_radius
+        self.budget = budget
+        self.retargeted = 0
+        self._cursor = 0
+        self.destinations = []
+        self._destination_xyz = np.zeros((0, 3))
+        if destinations is not None:
+            self._set_destinations(list(destinations))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _set_destinations(self, locations):
+        self.destinations = locations
+        self._destination_xyz = np.array([(location.x, location.y, location.z) for location in locations],
+                                         dtype=np.float64).reshape(-1, 3)
+
+    def sample_destinations(self, count=None):
+        """
+        Replace the destination pool with locations sampled from the
+        navigation mesh in one call.
+
+            :return: number of destinations in the pool
+        """
+        self._set_destinations(self._world.get_random_locations_from_navigation(count or self.pool_size))
+        return len(self.destinations)
+
+    def start(self, elapsed=None):
+        """
+        Start the controllers, then send every walker to a destination and
+        set its speed with one batch each. Call it after a tick following
+        the spawn of the controllers.
+
+            :param elapsed: simulation time the retarget periods start from,
+                            by default the one of the current snapshot
+        """
+        if not len(self.ids):
+            return
+        if elapsed is None:
+            elapsed = self._world.get_snapshot().timestamp.elapsed_seconds
+        # 控制器的启动需要注册到导航中，只能逐个进行，且每个行人只有一次
+        for controller in self._world.get_actors(self.controllers.tolist()):
+            controller.start()
+        if not self.destinations:
+            self.sample_destinations()
+        self.set_max_speeds(self.speeds)
+        self.retarget(np.arange(len(self.ids)), elapsed)
+
+    def _deactivate(self, failed):
+        if failed:
+            failed = np.isin(self.ids, failed)
+            self.active[failed] = False
+            self.deadlines[failed] = np.inf
+
+    def set_max_speeds(self, speeds, walker_ids=None):
+        """
+        Set the maximum speed of walkers with one call.
+
+            :param speeds: speed for every walker, or one for all of them
+            :param walker_ids: by default the whole crowd
+            :return: ids of the walkers that are not in the navigation any more
+        """
+        positions = np.arange(len(self.ids)) if walker_ids is None else self._positions(walker_ids)
+        speeds = np.broadcast_to(np.asarray(speeds, dtype=np.float32), positions.shape)
+        self.speeds[positions] = speeds
+        failed = self._world.set_walkers_max_speeds(self.ids[positions].tolist(), speeds.tolist())
+        self._deactivate(failed)
+        return failed
+
+    def _positions(self, walker_ids):
+        order = np.argsort(self.ids)
+        walker_ids = np.asarray(walker_ids, dtype=np.int64)
+        found = np.searchsorted(self.ids[order], walker_ids)
+        found = np.minimum(found, len(order) - 1)
+        if not len(order) or np.any(self.ids[order][found] != walker_ids):
+            missing = sorted(set(walker_ids.tolist()) - set(self.ids.tolist()))
+            raise KeyError('walkers %s are not in the crowd' % missing)
+        return order[found]
+
+    def retarget(self, positions, elapsed=0.0):
+        """
+        Send the walkers at the given positions of the crowd to random
+        destinations of the pool with one call.
+
+            :return: ids of the walkers whose destination could not be set
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        positions = positions[self.active[positions]]
+        if not len(positions):
+            return []
+        if not self.destinations:
+            raise RuntimeError('the destination pool is empty')
+        picks = self.rng.integers(len(self.destinations), size=len(positions))
+        self.targets[positions] = self._destination_xyz[picks]
+        if self.period is not None:
+            self.deadlines[positions] = elapsed + self.rng.uniform(self.period[0], self.period[1], size=len(positions))
+        failed = self._world.set_walkers_targets(self.ids[positions].tolist(),
+                                                 [self.destinations[pick] for pick in picks.tolist()])
+        self.retargeted += len(positions)
+        self._deactivate(failed)
+        return failed
+
+    def _arrived(self, snapshot, window):
+        arrived = []
+        for position in window.tolist():
+            actor_snapshot = snapshot.find(int(self.ids[position]))
+            if actor_snapshot is None:
+                continue
+            location = actor_snapshot.get_transform().location
+            dx, dy = location.x - self.targets[position, 0], location.y - self.targets[position, 1]
+            if dx * dx + dy * dy <= self.arrival_radius ** 2:
+                arrived.append(position)
+        return np.array(arrived, dtype=np.int64)
+
+    def tick(self, snapshot):
+        """
+        Re-target the walkers whose period is over or that arrived, at most
+        budget of them, the most overdue first.
+
+            :param snapshot: carla.WorldSnapshot of the current frame
+            :return: ids of the walkers sent to a new destination
+        """
+        if not len(self.ids):
+            return np.empty(0, dtype=np.int64)
+        elapsed = snapshot.timestamp.elapsed_seconds
+        due = np.flatnonzero(self.deadlines <= elapsed)
+        due = due[np.argsort(self.deadlines[due], kind='stable')][:self.budget]
+        # 到达检查每次只看一段窗口，所有行人依次轮到
+        size = min(self.budget, len(self.ids))
+        window = (self._cursor + np.arange(size)) % len(self.ids)
+        self._cursor = (self._cursor + size) % len(self.ids)
+        window = window[self.active[window]]
+        arrived = self._arrived(snapshot, window)
+        arrived = arrived[~np.isin(arrived, due)][:self.budget - len(due)]
+        positions = np.concatenate((due, arrived))
+        self.retarget(positions, elapsed)
+        return self.ids[positions[self.active[positions]]]
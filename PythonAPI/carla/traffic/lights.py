@@ -0,0 +1,179 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+States of all the traffic lights of the world, read from one snapshot per
+tick.
+
+Reading light.state, light.get_elapsed_time()... for every light of the
+map is one Python call per light and value. A TrafficLightMirror reads the
+states, frozen flags and phase times of all the lights with a single
+WorldSnapshot.get_traffic_light_data call into NumPy arrays indexed by
+light id, compares them with the previous tick and only calls back for the
+lights that changed, so consumers do work proportional to the changes:
+
+    lights = TrafficLightMirror(world)
+    lights.on_change(lambda light_id, old, new: redraw(light_id))
+    while True:
+        world.tick()
+        changed = lights.update(world.get_snapshot())
+        if lights.state(hero_light) == RED:
+            ...
+
+The states are the values of carla.TrafficLightState (RED, YELLOW, GREEN,
+OFF, UNKNOWN) and MISSING for the ids not in the snapshot. The groups of
+lights sharing a controller are read once, with one call per group.
+"""
+
+import numpy as np
+
+# 与 carla.TrafficLightState 的取值一致
+RED, YELLOW, GREEN, OFF, UNKNOWN = range(5)
+MISSING = 255
+
+# 每个状态对应的时长列（绿、黄、红），其它状态没有时长
+_DURATION_COLUMN = {GREEN: 0, YELLOW: 1, RED: 2}
+
+
+class TrafficLightMirror(object):
+    """
+    Traffic light states and phase timing of the last snapshot, in arrays
+    indexed by light id.
+    """
+
+    def __init__(self, world, lights=None):
+        """
+        :param lights: traffic light actors to mirror, by default all the
+                       ones of the world
+        """
+        if lights is None:
+            lights = world.get_actors().filter('traffic.traffic_light*')
+        lights = sorted(lights, key=lambda light: light.id)
+        self.ids = np.array([light.id for light in lights], dtype=np.int64)
+        self._id_list = self.ids.tolist()
+        size = int(self.ids.max()) + 1 if len(self.ids) else 0
+        self.states = np.full(size, MISSING, dtype=np.uint8)
+        self.frozen = np.zeros(size, dtype=bool)
+        self.elapsed = np.full(size, np.nan, dtype=np.float32)
+        # 绿灯、黄灯、红灯时长
+        self.durations = np.full((size, 3), np.nan, dtype=np.float32)
+        self.groups = np.full(size, -1, dtype=np.int32)
+        self.group_ids = []
+        self.frame = None
+        self._callbacks = {}
+        self._next_callback = 0
+        self._read_groups(lights)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _read_groups(self, lights):
+        known = set(self._id_list)
+        for light in lights:
+            if self.groups[light.id] >= 0:
+                continue
+            members = set(other.id for other in light.get_group_traffic_lights()) & known
+            members.add(light.id)
+            members = np.array(sorted(members), dtype=np.int64)
+            self.groups[members] = len(self.group_ids)
+            self.group_ids.append(members)
+
+    def on_change(self, callback):
+        """
+        Call callback(light_id, old_state, new_state) for every light whose
+        state changes in update.
+
+            :return: id to pass to remove_on_change
+        """
+        self._next_callback += 1
+        self._callbacks[self._next_callback] = callback
+        return self._next_callback
+
+    def remove_on_change(self, callback_id):
+        del self._callbacks[callback_id]
+
+    def update(self, snapshot):
+        """
+        Read the lights from a carla.WorldSnapshot. The first update reports
+        every light in the snapshot as changed.
+
+            :return: array of the ids of the lights whose state changed
+        """
+        if snapshot.frame == self.frame or not self._id_list:
+            return np.empty(0, dtype=np.int64)
+        states, frozen, times = snapshot.get_traffic_light_data(self._id_list)
+        states = np.frombuffer(states, dtype=np.uint8)
+        times = np.frombuffer(times, dtype=np.float32).reshape(-1, 4)
+        old = self.states[self.ids]
+        changed = np.flatnonzero(states != old)
+        self.states[self.ids] = states
+        self.frozen[self.ids] = np.frombuffer(frozen, dtype=np.uint8) != 0
+        self.elapsed[self.ids] = times[:, 0]
+        self.durations[self.ids] = times[:, 1:]
+        self.frame = snapshot.frame
+        changed_ids = self.ids[changed]
+        if self._callbacks:
+            for index, light_id in zip(changed.tolist(), changed_ids.tolist()):
+                for callback in list(self._callbacks.values()):
+                    callback(light_id, int(old[index]), int(states[index]))
+        return changed_ids
+
+    def state(self, light_id):
+        """
+        State of a light as an int, MISSING if it is not mirrored.
+        """
+        if light_id < 0 or light_id >= len(self.states):
+            return MISSING
+        return int(self.states[light_id])
+
+    def carla_state(self, light_id):
+        """
+        State of a light as a carla.TrafficLightState, Unknown if it is not
+        mirrored.
+        """
+        import carla
+
+        state = self.state(light_id)
+        return carla.TrafficLightState.values[UNKNOWN if state == MISSING else state]
+
+    def ids_in_state(self, state):
+        """
+        Ids of the lights in a state (int or carla.TrafficLightState).
+        """
+        return self.ids[self.states[self.ids] == int(state)]
+
+    def remaining(self, light_ids=None):
+        """
+        Time left in the current phase of the lights, nan for the lights
+        that are off, unknown or missing.
+
+            :param light_ids: ids of the lights, all the mirrored ones by default
+            :return: float array
+        """
+        light_ids = self.ids if light_ids is None else np.asarray(light_ids, dtype=np.int64)
+        states = self.states[light_ids]
+        result = np.full(len(light_ids), np.nan, dtype=np.float32)
+        for state, column in _DURATION_COLUMN.items():
+            mask = states == state
+            result[mask] = self.durations[light_ids[mask], column] - self.elapsed[light_ids[mask]]
+        return result
+
+    def group(self, light_id):
+        """
+        Ids of the lights controlled together with a light, itself included,
+        empty if the light is not mirrored.
+        """
+        if light_id < 0 or light_id >= len(self.groups) or self.groups[light_id] < 0:
+            return np.empty(0, dtype=np.int64)
+        return self.group_ids[self.groups[light_id]]
+
+    def group_states(self, light_id):
+        """
+        :return: (ids, states) of the lights of the group of a light
+        """
+        members = self.group(light_id)
+        return members, self.states[members]
+
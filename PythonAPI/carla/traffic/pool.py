@@ -0,0 +1,207 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Pool of idle vehicles and walkers kept alive between episodes.
+
+Destroying and spawning actors are among the slowest operations of the
+server. Instead of destroying the actors at the end of an episode, an
+ActorPool parks them: autopilot off, physics disabled and moved far below
+the map, where no sensor sees them. On the next reset the parked actors
+are moved to their new transforms and reactivated with one batch, with
+the blueprint (and color, driver...) they were spawned with.
+
+Used through TrafficPopulation, which takes the parked actors before
+spawning new ones:
+
+    pool = ActorPool(client, world, traffic_manager)
+    population = TrafficPopulation(client, world, traffic_manager, pool=pool)
+    for episode in range(episodes):
+        population.spawn_vehicles(blueprints, 200)
+        population.spawn_walkers(walker_blueprints, 100)
+        world.tick()
+        population.start_walkers()
+        ...
+        population.release()
+    pool.destroy()
+"""
+
+# 停放位置在地图下方，按参与者 id 分配格子，互不重叠
+PARKING_Z = -1000.0
+PARKING_SPACING = 10.0
+PARKING_ROW = 64
+
+
+def parking_offset(actor_id):
+    """
+    Offset (x, y) of the parking slot of an actor from the parking origin.
+    """
+    return PARKING_SPACING * (actor_id % PARKING_ROW), PARKING_SPACING * (actor_id // PARKING_ROW)
+
+
+class ActorPool(object):
+    """
+    Parks and reactivates vehicles and walkers with batched commands.
+    """
+
+    def __init__(self, client, world, traffic_manager=None, parking_origin=(0.0, 0.0, PARKING_Z)):
+        self._client = client
+        self._world = world
+        self._traffic_manager = traffic_manager
+        self.parking_origin = parking_origin
+        # 空闲车辆 (id, type_id)，空闲行人 {'id', 'con', 'speed'}
+        self.vehicles = []
+        self.walkers = []
+
+    def __len__(self):
+        return len(self.vehicles) + len(self.walkers)
+
+    def _parking(self, actor_id):
+        import carla
+
+        x, y, z = self.parking_origin
+        dx, dy = parking_offset(actor_id)
+        return carla.Transform(carla.Location(x + dx, y + dy, z))
+
+    def _autopilot(self, actor_id, enabled):
+        import carla
+
+        return carla.command.SetAutopilot(actor_id, enabled, self._traffic_manager.get_port())
+
+    def _apply(self, commands, do_tick=False):
+        """
+        :return: list of the errors, None for the commands that succeeded
+        """
+        return [response.error or None for response in self._client.apply_batch_sync(commands, do_tick)]
+
+    @staticmethod
+    def _group_errors(errors, actors):
+        """
+        First error of the commands of every actor, the commands of an
+        actor being consecutive and as many for all of them.
+        """
+        if not actors:
+            return []
+        size = len(errors) // actors
+        return [next((error for error in errors[index:index + size] if error), None)
+                for index in range(0, size * actors, size)]
+
+    def park_vehicles(self, actor_ids, do_tick=False):
+        """
+        Stop and hide vehicles, and keep them for take_vehicles.
+
+            :return: number of vehicles parked
+        """
+        import carla
+
+        if not actor_ids:
+            return 0
+        actors = self._world.get_actors(list(actor_ids))
+        commands = []
+        for actor in actors:
+            if self._traffic_manager is not None:
+                commands.append(self._autopilot(actor.id, False))
+            commands.append(carla.command.SetSimulatePhysics(actor.id, False))
+            commands.append(carla.command.ApplyTransform(actor.id, self._parking(actor.id)))
+        self._client.apply_batch(commands, do_tick)
+        self.vehicles.extend((actor.id, actor.type_id) for actor in actors)
+        return len(actors)
+
+    def park_walkers(self, walkers, do_tick=False):
+        """
+        Stop the AI controllers of walkers, hide the walkers and keep them
+        for take_walkers.
+
+            :param walkers: list of dicts with 'id', 'con' and 'speed' keys
+            :return: number of walkers parked
+        """
+        import carla
+
+        if not walkers:
+            return 0
+        # 停止控制器会把行人从导航人群中移除，只在客户端执行
+        for controller in self._world.get_actors([walker['con'] for walker in walkers]):
+            controller.stop()
+        commands = []
+        for walker in walkers:
+            commands.append(carla.command.SetSimulatePhysics(walker['id'], False))
+            commands.append(carla.command.ApplyTransform(walker['id'], self._parking(walker['id'])))
+        self._client.apply_batch(commands, do_tick)
+        self.walkers.extend(walkers)
+        return len(walkers)
+
+    def take_vehicles(self, count, type_ids=None):
+        """
+        Remove up to count parked vehicles from the pool, the ones of the
+        given types if type_ids is not None.
+
+            :return: list of (id, type_id), to be passed to activate_vehicles
+        """
+        taken, kept = [], []
+        for vehicle in self.vehicles:
+            if len(taken) < count and (type_ids is None or vehicle[1] in type_ids):
+                taken.append(vehicle)
+            else:
+                kept.append(vehicle)
+        self.vehicles = kept
+        return taken
+
+    def take_walkers(self, count):
+        taken, self.walkers = self.walkers[:count], self.walkers[count:]
+        return taken
+
+    def activate_vehicles(self, slots, autopilot=True, do_tick=False):
+        """
+        Move taken vehicles to their new transforms and enable them, with
+        one batch.
+
+            :param slots: list of (actor id, carla.Transform)
+            :return: list of the errors, None for the vehicles reactivated
+        """
+        import carla
+
+        # 只有 SpawnActor 支持 then，每个车辆的命令依次放入同一个批次
+        commands = []
+        for actor_id, transform in slots:
+            commands.append(carla.command.ApplyTransform(actor_id, transform))
+            commands.append(carla.command.SetSimulatePhysics(actor_id, True))
+            commands.append(carla.command.ApplyTargetVelocity(actor_id, carla.Vector3D()))
+            commands.append(carla.command.ApplyTargetAngularVelocity(actor_id, carla.Vector3D()))
+            if autopilot and self._traffic_manager is not None:
+                commands.append(self._autopilot(actor_id, True))
+        return self._group_errors(self._apply(commands, do_tick), len(slots))
+
+    def activate_walkers(self, walkers, locations, do_tick=False):
+        """
+        Move taken walkers to new locations and enable them, with one batch.
+        Their controllers are started again by TrafficPopulation.start_walkers.
+
+            :return: list of the errors, None for the walkers reactivated
+        """
+        import carla
+
+        commands = []
+        for walker, location in zip(walkers, locations):
+            commands.append(carla.command.ApplyTransform(walker['id'], carla.Transform(location)))
+            commands.append(carla.command.SetSimulatePhysics(walker['id'], True))
+        return self._group_errors(self._apply(commands, do_tick), min(len(walkers), len(locations)))
+
+    def destroy(self):
+        """
+        Destroy every parked actor.
+
+            :return: number of actors destroyed
+        """
+        import carla
+
+        ids = [actor_id for actor_id, _ in self.vehicles]
+        for walker in self.walkers:
+            ids += [walker['con'], walker['id']]
+        if ids:
+            self._client.apply_batch([carla.command.DestroyActor(actor_id) for actor_id in ids])
+        self.vehicles, self.walkers = [], []
+        return len(ids)
+
@@ -0,0 +1,520 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Spawning of large vehicle and walker populations.
+
+Vehicles are placed on spawn slots reserved in a spatial grid: every
+reserved slot holds the footprint (an oriented box) of the blueprint that
+will be spawned there, and a spawn point is only used if its footprint
+does not overlap a reserved one or a vehicle already in the world. All
+vehicles are spawned with one batch and the ones that still fail are
+retried, on other free slots, with a single follow-up batch.
+
+Walker locations are drawn in bulk from the navigation mesh before
+spawning, kept apart from each other in the same kind of grid, and also
+used as destinations for the AI controllers:
+
+    population = TrafficPopulation(client, world, traffic_manager, seed=0)
+    print(population.spawn_vehicles(blueprints, 2000))
+    print(population.spawn_walkers(walker_blueprints, 1000))
+    world.tick()
+    population.start_walkers(period=(30.0, 90.0))
+    while True:
+        world.tick()
+        population.crowd.tick(world.get_snapshot())
+    ...
+    population.destroy()
+
+With a traffic.pool.ActorPool, release parks the actors instead of
+destroying them and the next spawn calls reactivate them first.
+"""
+
+import math
+import random
+import time
+
+from traffic.crowd import WalkerCrowd
+
+# 未知蓝图使用的车辆半长、半宽（米）
+DEFAULT_VEHICLE_EXTENT = (2.5, 1.1)
+WALKER_RADIUS = 0.5
+
+
+class SpawnReport(object):
+    """
+    Outcome of spawning a group of actors.
+    """
+
+    def __init__(self, kind, requested):
+        self.kind = kind
+        self.requested = requested
+        self.spawned = 0
+        self.reused = 0
+        self.retried = 0
+        self.batches = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def success_rate(self):
+        return self.spawned / float(self.requested) if self.requested else 1.0
+
+    @property
+    def throughput(self):
+        """
+        Actors spawned per second.
+        """
+        return self.spawned / self.elapsed if self.elapsed > 0.0 else float('nan')
+
+    def __str__(self):
+        return '%d/%d %s spawned (%.1f%%, %d reused) in %.2f s, %.0f actors/s, %d retried in %d batches' % (
+            self.spawned, self.requested, self.kind, 100.0 * self.success_rate, self.reused, self.elapsed,
+            self.throughput, self.retried, self.batches)
+
+
+# ==============================================================================
+# -- SpawnGrid -----------------------------------------------------------------
+# ==============================================================================
+
+class _Box(object):
+    __slots__ = ('x', 'y', 'axes', 'half_extents', 'radius')
+
+    def __init__(self, x, y, yaw, half_length, half_width):
+        self.x = x
+        self.y = y
+        cos, sin = math.cos(math.radians(yaw)), math.sin(math.radians(yaw))
+        self.axes = ((cos, sin), (-sin, cos))
+        self.half_extents = (half_length, half_width)
+        self.radius = math.hypot(half_length, half_width)
+
+    def _projection(self, axis):
+        return sum(abs(axis[0] * own[0] + axis[1] * own[1]) * extent
+                   for own, extent in zip(self.axes, self.half_extents))
+
+    def overlaps(self, other):
+        dx, dy = other.x - self.x, other.y - self.y
+        if math.hypot(dx, dy) > self.radius + other.radius:
+            return False
+        # 分离轴定理：两个矩形的四条边法线上的投影都重叠时才相交
+        for axis in self.axes + other.axes:
+            distance = abs(dx * axis[0] + dy * axis[1])
+            if distance > self._projection(axis) + other._projection(axis):
+                return False
+        return True
+
+
+class SpawnGrid(object):
+    """
+    Uniform grid of reserved footprints, oriented boxes on the XY plane.
+    """
+
+    def __init__(self, cell_size=8.0):
+        self.cell_size = float(cell_size)
+        self._cells = {}
+        self._max_radius = 0.0
+        self.count = 0
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def _neighbours(self, box):
+        # 格子按中心点存放，所以要覆盖到最大的已占用外接圆
+        reach = int(math.ceil((box.radius + self._max_radius) / self.cell_size))
+        cx, cy = self._cell(box.x, box.y)
+        for i in range(cx - reach, cx + reach + 1):
+            for j in range(cy - reach, cy + reach + 1):
+                for other in self._cells.get((i, j), ()):
+                    yield other
+
+    def is_free(self, x, y, yaw=0.0, half_length=WALKER_RADIUS, half_width=WALKER_RADIUS):
+        box = _Box(x, y, yaw, half_length, half_width)
+        return not any(box.overlaps(other) for other in self._neighbours(box))
+
+    def occupy(self, x, y, yaw=0.0, half_length=WALKER_RADIUS, half_width=WALKER_RADIUS):
+        """
+        Mark a footprint as taken, whether it overlaps others or not.
+        """
+        box = _Box(x, y, yaw, half_length, half_width)
+        self._cells.setdefault(self._cell(x, y), []).append(box)
+        self._max_radius = max(self._max_radius, box.radius)
+        self.count += 1
+
+    def reserve(self, x, y, yaw=0.0, half_length=WALKER_RADIUS, half_width=WALKER_RADIUS):
+        """
+        Take a footprint if it is free.
+
+            :return: True if it was reserved
+        """
+        if not self.is_free(x, y, yaw, half_length, half_width):
+            return False
+        self.occupy(x, y, yaw, half_length, half_width)
+        return True
+
+
+# ==============================================================================
+# -- TrafficPopulation ---------------------------------------------------------
+# ==============================================================================
+
+class TrafficPopulation(object):
+    """
+    Spawns and destroys vehicles on autopilot and walkers with AI
+    controllers.
+    """
+
+    def __init__(self, client, world, traffic_manager=None, seed=None, margin=0.3, extents=None, pool=None):
+        """
+        :param margin: clearance in meters added around every vehicle footprint
+        :param extents: dict blueprint id -> (half length, half width), it is
+                        completed with the bounding boxes of the spawned vehicles
+        :param pool: traffic.pool.ActorPool, its parked actors are reused
+                     before spawning new ones and release parks them there
+        """
+        self._client = client
+        self._world = world
+        self._traffic_manager = traffic_manager
+        self.random = random.Random(seed)
+        self.margin = margin
+        self.extents = dict(extents or {})
+        self.pool = pool
+        self.grid = SpawnGrid()
+        self.vehicles = []
+        # hero 的 role_name 不同，不放入 pool
+        self.hero = None
+        # 每个行人为 {'id': 行人 id, 'con': 控制器 id, 'speed': 最大速度}
+        self.walkers = []
+        self.destinations = []
+        self.crossing = 0.0
+        self.crowd = None
+        self._occupied_existing = False
+
+    def _extent(self, type_id):
+        half_length, half_width = self.extents.get(type_id, DEFAULT_VEHICLE_EXTENT)
+        return half_length + self.margin, half_width + self.margin
+
+    def _occupy_existing_vehicles(self):
+        if self._occupied_existing:
+            return
+        self._occupied_existing = True
+        # 停放的车辆在客户端的状态可能还是上一回合的位置
+        parked = set(actor_id for actor_id, _ in self.pool.vehicles) if self.pool is not None else set()
+        for actor in self._world.get_actors().filter('vehicle.*'):
+            if actor.id in parked:
+                continue
+            transform = actor.get_transform()
+            extent = actor.bounding_box.extent
+            self.grid.occupy(transform.location.x, transform.location.y, transform.rotation.yaw,
+                             extent.x + self.margin, extent.y + self.margin)
+
+    def _reserve_slots(self, candidates, blueprints, count):
+        """
+        Take spawn points from candidates (consumed in order) until count
+        footprints are reserved.
+
+            :return: list of (blueprint, transform)
+        """
+        slots = []
+        while candidates and len(slots) < count:
+            blueprint = self.random.choice(blueprints)
+            transform = self._reserve_slot(candidates, blueprint.id)
+            if transform is not None:
+                slots.append((blueprint, transform))
+        return slots
+
+    def _reserve_slot(self, candidates, type_id):
+        """
+        Take spawn points from candidates until the footprint of type_id
+        fits on one.
+
+            :return: the transform reserved, None if candidates ran out
+        """
+        half_length, half_width = self._extent(type_id)
+        while candidates:
+            transform = candidates.pop()
+            if self.grid.reserve(transform.location.x, transform.location.y, transform.rotation.yaw,
+                                 half_length, half_width):
+                return transform
+        return None
+
+    def _reuse_vehicles(self, blueprints, count, candidates, do_tick, report):
+        """
+        Move parked vehicles of the pool to free spawn points.
+
+            :return: ids of the vehicles reactivated
+        """
+        taken = self.pool.take_vehicles(count, set(blueprint.id for blueprint in blueprints))
+        slots = []
+        for actor_id, type_id in taken:
+            transform = self._reserve_slot(candidates, type_id)
+            if transform is None:
+                break
+            slots.append((actor_id, transform))
+        # 没有位置的车辆放回 pool
+        self.pool.vehicles.extend(taken[len(slots):])
+        if not slots:
+            return []
+        report.batches += 1
+        ids = []
+        for (actor_id, _), error in zip(slots, self.pool.activate_vehicles(slots, do_tick=do_tick)):
+            if error:
+                report.errors.append(error)
+            else:
+                ids.append(actor_id)
+        report.reused += len(ids)
+        return ids
+
+    def _vehicle_command(self, blueprint, transform, role_name):
+        import carla
+
+        if blueprint.has_attribute('color'):
+            blueprint.set_attribute('color', self.random.choice(blueprint.get_attribute('color').recommended_values))
+        if blueprint.has_attribute('driver_id'):
+            blueprint.set_attribute(
+                'driver_id', self.random.choice(blueprint.get_attribute('driver_id').recommended_values))
+        blueprint.set_attribute('role_name', role_name)
+        command = carla.command.SpawnActor(blueprint, transform)
+        if self._traffic_manager is not None:
+            command = command.then(carla.command.SetAutopilot(
+                carla.command.FutureActor, True, self._traffic_manager.get_port()))
+        return command
+
+    def _apply(self, commands, do_tick, report):
+        report.batches += 1
+        ids, failed = [], []
+        for index, response in enumerate(self._client.apply_batch_sync(commands, do_tick)):
+            if response.error:
+                report.errors.append(response.error)
+                failed.append(index)
+            else:
+                ids.append(response.actor_id)
+        return ids, failed
+
+    def spawn_vehicles(self, blueprints, count, spawn_points=None, hero=False, do_tick=False):
+        """
+        Spawn count vehicles on free spawn points, on autopilot when the
+        population has a traffic manager.
+
+            :param spawn_points: candidate transforms, by default the ones of the map
+            :param hero: give the first vehicle the 'hero' role name
+            :return: SpawnReport
+        """
+        start = time.time()
+        report = SpawnReport('vehicles', count)
+        blueprints = list(blueprints)
+        if not blueprints or count <= 0:
+            return report
+        self._occupy_existing_vehicles()
+        candidates = list(spawn_points if spawn_points is not None else self._world.get_map().get_spawn_points())
+        self.random.shuffle(candidates)
+        reused = []
+        if self.pool is not None:
+            reused = self._reuse_vehicles(blueprints, count - 1 if hero else count, candidates, do_tick, report)
+        slots = self._reserve_slots(candidates, blueprints, count - len(reused))
+        roles = ['hero' if hero and index == 0 else 'autopilot' for index in range(len(slots))]
+        commands = [self._vehicle_command(blueprint, transform, role)
+                    for (blueprint, transform), role in zip(slots, roles)]
+        ids, failed = self._apply(commands, do_tick, report) if commands else ([], [])
+        if hero and ids and 0 not in failed:
+            self.hero = ids[0]
+        # 失败的位置仍然保留（已被未知物体占用），在剩余的空闲位置上一次性重试
+        missing = count - len(reused) - len(ids)
+        if missing > 0 and candidates:
+            retry = self._reserve_slots(candidates, blueprints, missing)
+            if retry:
+                retry_roles = [roles[index] for index in failed][:len(retry)]
+                retry_roles += ['autopilot'] * (len(retry) - len(retry_roles))
+                report.retried = len(retry)
+                retry_ids, retry_failed = self._apply([self._vehicle_command(blueprint, transform, role)
+                                                       for (blueprint, transform), role in zip(retry, retry_roles)],
+                                                      do_tick, report)
+                if retry_roles[:1] == ['hero'] and retry_ids and 0 not in retry_failed:
+                    self.hero = retry_ids[0]
+                ids += retry_ids
+        self._learn_extents(ids)
+        ids = reused + ids
+        self.vehicles.extend(ids)
+        report.spawned = len(ids)
+        report.elapsed = time.time() - start
+        return report
+
+    def _learn_extents(self, ids):
+        if not ids:
+            return
+        for actor in self._world.get_actors(ids):
+            if actor.type_id not in self.extents:
+                extent = actor.bounding_box.extent
+                self.extents[actor.type_id] = (extent.x, extent.y)
+
+    def sample_navigation(self, count):
+        """
+        Draw count locations from the navigation mesh, keeping them one
+        walker apart.
+
+            :return: list of carla.Location, possibly fewer than count
+        """
+        grid = SpawnGrid(cell_size=4.0 * WALKER_RADIUS)
+        locations = []
+        # 导航网格的随机点在客户端计算，失败或重叠的点不计入
+        for _ in range(2 * count):
+            if len(locations) >= count:
+                break
+            location = self._world.get_random_location_from_navigation()
+            if location is not None and grid.reserve(location.x, location.y):
+                locations.append(location)
+        return locations
+
+    def _walker_command(self, blueprint, location, running):
+        import carla
+
+        if blueprint.has_attribute('is_invincible'):
+            blueprint.set_attribute('is_invincible', 'false')
+        if blueprint.has_attribute('can_use_wheelchair') and self.random.randint(0, 100) < 11:
+            blueprint.set_attribute('use_wheelchair', 'true')
+        speed = 0.0
+        if blueprint.has_attribute('speed'):
+            speed = float(blueprint.get_attribute('speed').recommended_values[2 if self.random.random() < running else 1])
+        return carla.command.SpawnActor(blueprint, carla.Transform(location)), speed
+
+    def _spawn_walker_batch(self, blueprints, locations, running, do_tick, report):
+        commands, speeds = [], []
+        for location in locations:
+            command, speed = self._walker_command(self.random.choice(blueprints), location, running)
+            commands.append(command)
+            speeds.append(speed)
+        ids, failed = self._apply(commands, do_tick, report)
+        failed = set(failed)
+        speeds = [speed for index, speed in enumerate(speeds) if index not in failed]
+        return [{'id': actor_id, 'speed': speed} for actor_id, speed in zip(ids, speeds)]
+
+    def _reuse_walkers(self, locations, do_tick, report):
+        """
+        Move parked walkers of the pool, with their controllers, to the
+        first locations.
+
+            :return: the walkers reactivated
+        """
+        taken = self.pool.take_walkers(len(locations))
+        if not taken:
+            return []
+        report.batches += 1
+        walkers = []
+        for walker, error in zip(taken, self.pool.activate_walkers(taken, locations, do_tick)):
+            if error:
+                report.errors.append(error)
+            else:
+                walkers.append(walker)
+        report.reused += len(walkers)
+        return walkers
+
+    def spawn_walkers(self, blueprints, count, running=0.0, crossing=0.0, oversample=2.0, do_tick=True):
+        """
+        Spawn count walkers and their AI controllers.
+
+            :param running: fraction of walkers that run
+            :param crossing: fraction of walkers that cross the road
+            :param oversample: navigation locations drawn per walker, the
+                               extra ones replace failed spawns and serve
+                               as destinations
+            :return: SpawnReport
+        """
+        import carla
+
+        start = time.time()
+        report = SpawnReport('walkers', count)
+        blueprints = list(blueprints)
+        if not blueprints or count <= 0:
+            return report
+        self.crossing = crossing
+        locations = self.sample_navigation(int(math.ceil(count * max(oversample, 1.0))))
+        self.destinations = list(locations)
+        reused = self._reuse_walkers(locations[:count], do_tick, report) if self.pool is not None else []
+        walkers = self._spawn_walker_batch(blueprints, locations[len(reused):count], running, do_tick, report)
+        # 失败的行人在多采样的剩余位置上一次性重试
+        retry = locations[count:][:count - len(reused) - len(walkers)]
+        if retry:
+            report.retried = len(retry)
+            walkers += self._spawn_walker_batch(blueprints, retry, running, do_tick, report)
+        # 所有控制器一个批次
+        controller = self._world.get_blueprint_library().find('controller.ai.walker')
+        responses = self._client.apply_batch_sync(
+            [carla.command.SpawnActor(controller, carla.Transform(), walker['id']) for walker in walkers], do_tick)
+        report.batches += 1
+        orphans = []
+        for walker, response in zip(walkers, responses):
+            if response.error:
+                report.errors.append(response.error)
+                orphans.append(walker['id'])
+            else:
+                walker['con'] = response.actor_id
+        if orphans:
+            # 没有控制器的行人不会移动，直接销毁
+            self._client.apply_batch([carla.command.DestroyActor(actor_id) for actor_id in orphans])
+        walkers = reused + [walker for walker in walkers if 'con' in walker]
+        self.walkers.extend(walkers)
+        report.spawned = len(walkers)
+        report.elapsed = time.time() - start
+        return report
+
+    def start_walkers(self, period=None, budget=200):
+        """
+        Start the AI controllers towards random destinations of the sampled
+        pool, the destinations and speeds being sent with one batch each.
+        Call it after a tick following spawn_walkers.
+
+            :param period: (minimum, maximum) seconds before crowd.tick sends
+                           a walker to another destination, None to only
+                           re-target the walkers that arrive
+            :param budget: maximum walkers re-targeted per crowd.tick
+            :return: the traffic.crowd.WalkerCrowd, also kept in crowd
+        """
+        if not self.walkers:
+            return None
+        self._world.set_pedestrians_cross_factor(self.crossing)
+        self.crowd = WalkerCrowd(self._world, self.walkers, seed=self.random.getrandbits(32),
+                                 destinations=self.destinations or None, period=period, budget=budget)
+        self.crowd.start()
+        return self.crowd
+
+    def release(self, do_tick=False):
+        """
+        End an episode: park the vehicles and walkers in the pool, to be
+        reused by the next spawn calls, or destroy them without a pool. The
+        hero vehicle is always destroyed.
+
+            :return: number of actors parked or destroyed
+        """
+        import carla
+
+        if self.pool is None:
+            return self.destroy()
+        vehicles = [actor_id for actor_id in self.vehicles if actor_id != self.hero]
+        if self.hero is not None and self.hero in self.vehicles:
+            self._client.apply_batch([carla.command.DestroyActor(self.hero)])
+        parked = self.pool.park_vehicles(vehicles, do_tick) + self.pool.park_walkers(self.walkers, do_tick)
+        parked += len(self.vehicles) - len(vehicles)
+        self.vehicles, self.walkers, self.hero, self.crowd = [], [], None, None
+        # 下一回合重新预留生成点
+        self.grid = SpawnGrid()
+        self._occupied_existing = False
+        return parked
+
+    def destroy(self):
+        """
+        Stop the walkers and destroy every actor spawned by the population.
+        """
+        import carla
+
+        if self.walkers:
+            for controller in self._world.get_actors([walker['con'] for walker in self.walkers]):
+                controller.stop()
+        ids = list(self.vehicles)
+        for walker in self.walkers:
+            ids += [walker['con'], walker['id']]
+        self._client.apply_batch([carla.command.DestroyActor(actor_id) for actor_id in ids])
+        self.vehicles, self.walkers, self.hero, self.crowd = [], [], None, None
+        self.grid = SpawnGrid()
+        self._occupied_existing = False
+        return len(ids)
@@ -0,0 +1,397 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+"""
+Reproducible sampling of driving scenarios: spawn point, destination,
+route and traffic density.
+
+A RouteIndex is computed once per map from the route graph of the
+GlobalRoutePlanner: the spawn points, the road segment of each of them and
+the shortest route length between every pair of spawn points (one
+Dijkstra search per segment start). It is saved to a .npz file, so later
+runs do not need the server.
+
+A ScenarioSampler draws scenarios from the index with NumPy only, in
+blocks of block_size scenarios. Block b is drawn from its own generator
+seeded with (seed, b), so scenario i is the same whatever the number of
+scenarios asked for, the order of the calls or the number of processes:
+
+    index = RouteIndex.from_map(world.get_map())
+    index.save('Town10HD.npz')
+    sampler = ScenarioSampler(RouteIndex.load('Town10HD.npz'), seed=7, min_distance=100.0,
+                              vehicles=(20, 80))
+    scenarios = sampler.generate(100000, processes=4)
+    save_jobs('scenarios.jsonl', scenario_jobs(sampler, scenarios))
+
+The jobs have the format of benchmark.rollout and can be passed to a
+RolloutRunner (job['args'] holds the scenario). From PythonAPI/carla:
+
+    python -m traffic.scenarios --index Town10HD.npz -n 10000 --seed 7 -o scenarios.jsonl
+"""
+
+import argparse
+import heapq
+import json
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from benchmark.rollout import job_key
+
+SCENARIO_DTYPE = np.dtype([
+    ('index', np.int64),
+    ('spawn', np.int32),
+    ('destination', np.int32),
+    ('distance', np.float32),
+    ('vehicles', np.int32),
+    ('walkers', np.int32),
+    ('seed', np.uint32),
+])
+
+
+# ==============================================================================
+# -- RouteIndex ----------------------------------------------------------------
+# ==============================================================================
+
+def shortest_paths(indptr, indices, weights, source):
+    """
+    Dijkstra search on a graph in compressed sparse rows.
+
+        :return: (distance, previous node) arrays, inf and -1 for the
+                 nodes not reachable from source
+    """
+    count = len(indptr) - 1
+    distance = [float('inf')] * count
+    previous = [-1] * count
+    distance[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        current, node = heapq.heappop(heap)
+        if current > distance[node]:
+            continue
+        for edge in range(indptr[node], indptr[node + 1]):
+            target = indices[edge]
+            candidate = current + weights[edge]
+            if candidate < distance[target]:
+                distance[target] = candidate
+                previous[target] = node
+                heapq.heappush(heap, (candidate, target))
+    return np.array(distance), np.array(previous, dtype=np.int32)
+
+
+class RouteIndex(object):
+    """
+    Spawn points of a map and the route lengths between them.
+    """
+
+    _ARRAYS = ('spawn_points', 'spawn_edges', 'vertices', 'indptr', 'indices', 'weights', 'sources', 'previous',
+               'distance')
+
+    def __init__(self, spawn_points, spawn_edges, vertices, edges, town=''):
+        """
+        :param spawn_points: (N, 6) x, y, z, pitch, yaw, roll of the spawn points
+        :param spawn_edges: (N, 2) nodes (start, end) of the road segment of
+                            every spawn point, -1 if it has none
+        :param vertices: (V, 3) location of the nodes
+        :param edges: (E, 3) start node, end node and length of the segments
+        """
+        self.town = town
+        self.spawn_points = np.asarray(spawn_points, dtype=np.float64).reshape(-1, 6)
+        self.spawn_edges = np.asarray(spawn_edges, dtype=np.int32).reshape(-1, 2)
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        edges = np.asarray(edges, dtype=np.float64).reshape(-1, 3)
+        order = np.argsort(edges[:, 0], kind='stable')
+        starts = edges[order, 0].astype(np.int64)
+        self.indices = edges[order, 1].astype(np.int32)
+        self.weights = edges[order, 2]
+        self.indptr = np.searchsorted(starts, np.arange(len(self.vertices) + 1)).astype(np.int64)
+        self._build()
+
+    @classmethod
+    def from_map(cls, carla_map, sampling_resolution=2.0, planner=None):
+        """
+        Index the spawn points of a carla.Map on the graph of a
+        GlobalRoutePlanner (built if not given).
+        """
+        from agents.navigation.global_route_planner import GlobalRoutePlanner
+
+        if planner is None:
+            planner = GlobalRoutePlanner(carla_map, sampling_resolution)
+        graph = planner._graph
+        # 路段末端的节点 id 为负数，重新编号为 0 ... V - 1
+        nodes = sorted(graph.nodes())
+        position = dict((node, number) for number, node in enumerate(nodes))
+        vertices = [graph.nodes[node]['vertex'] for node in nodes]
+        # 边的长度是路点个数，换算成米
+        edges = [(position[start], position[end], data['length'] * planner._sampling_resolution)
+                 for start, end, data in graph.edges(data=True)]
+        spawn_points, spawn_edges = [], []
+        for transform in carla_map.get_spawn_points():
+            location, rotation = transform.location, transform.rotation
+            spawn_points.append((location.x, location.y, location.z, rotation.pitch, rotation.yaw, rotation.roll))
+            edge = planner._localize(location)
+            if edge is None or edge[0] not in position or edge[1] not in position:
+                spawn_edges.append((-1, -1))
+            else:
+                spawn_edges.append((position[edge[0]], position[edge[1]]))
+        return cls(spawn_points, spawn_edges, vertices, edges, carla_map.name.split('/')[-1])
+
+    def _build(self):
+        # 每个路段起点搜索一次，同一路段上的生成点共享结果
+        self.sources = np.unique(self.spawn_edges[self.spawn_edges[:, 0] >= 0, 0]).astype(np.int32)
+        indptr, indices, weights = self.indptr.tolist(), self.indices.tolist(), self.weights.tolist()
+        rows = [shortest_paths(indptr, indices, weights, source) for source in self.sources.tolist()]
+        count = len(self.spawn_edges)
+        self.previous = np.array([previous for _, previous in rows], dtype=np.int32).reshape(-1, len(self.vertices))
+        self.distance = np.full((count, count), np.inf, dtype=np.float32)
+        localized = np.flatnonzero(self.spawn_edges[:, 0] >= 0)
+        if len(localized):
+            lengths = self._edge_lengths(self.spawn_edges[localized])
+            rows_of = np.searchsorted(self.sources, self.spawn_edges[localized, 0])
+            to_start = np.array([distance for distance, _ in rows])[rows_of][:, self.spawn_edges[localized, 0]]
+            # 与 GlobalRoutePlanner 相同：到目标路段起点的路线加上目标路段本身
+            self.distance[np.ix_(localized, localized)] = to_start + lengths[np.newaxis, :]
+
+    def _edge_lengths(self, pairs):
+        lengths = np.zeros(len(pairs))
+        for position, (start, end) in enumerate(pairs.tolist()):
+            edges = range(self.indptr[start], self.indptr[start + 1])
+            lengths[position] = next((self.weights[edge] for edge in edges if self.indices[edge] == end), 0.0)
+        return lengths
+
+    def __len__(self):
+        return len(self.spawn_points)
+
+    def route(self, spawn, destination):
+        """
+        Nodes of the shortest route from a spawn point to another one.
+
+            :return: list of node ids, empty if there is no route
+        """
+        start, end = self.spawn_edges[spawn], self.spawn_edges[destination]
+        if start[0] < 0 or end[0] < 0 or not np.isfinite(self.distance[spawn, destination]):
+            return []
+        previous = self.previous[np.searchsorted(self.sources, start[0])]
+        nodes = [int(end[0])]
+        while nodes[-1] != start[0]:
+            nodes.append(int(previous[nodes[-1]]))
+        nodes.reverse()
+        return nodes + [int(end[1])]
+
+    def route_locations(self, spawn, destination):
+        """
+        :return: (nodes, 3) array with the locations of the route nodes
+        """
+        return self.vertices[self.route(spawn, destination)]
+
+    def transform(self, spawn):
+        import carla
+
+        x, y, z, pitch, yaw, roll = self.spawn_points[spawn].tolist()
+        return carla.Transform(carla.Location(x, y, z), carla.Rotation(pitch, yaw, roll))
+
+    def save(self, path):
+        arrays = dict((name, getattr(self, name)) for name in self._ARRAYS)
+        np.savez_compressed(path, town=np.array(self.town), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        index = cls.__new__(cls)
+        index.town = str(data['town'])
+        for name in cls._ARRAYS:
+            setattr(index, name, data[name])
+        return index
+
+
+# ==============================================================================
+# -- ScenarioSampler -----------------------------------------------------------
+# ==============================================================================
+
+def _sample_blocks(arguments):
+    sampler, blocks = arguments
+    return [sampler.sample_block(block) for block in blocks]
+
+
+class ScenarioSampler(object):
+    """
+    Draws scenarios from a RouteIndex, reproducibly by seed.
+    """
+
+    def __init__(self, index, seed=0, min_distance=50.0, max_distance=float('inf'), vehicles=(0, 50),
+                 walkers=(0, 0), block_size=4096):
+        """
+        :param min_distance: shortest route length in meters between the
+                             spawn point and the destination
+        :param vehicles: (minimum, maximum) number of other vehicles, capped
+                         at the number of spawn points left
+        :param walkers: (minimum, maximum) number of walkers
+        """
+        if vehicles[0] > vehicles[1] or walkers[0] > walkers[1]:
+            raise ValueError('invalid density ranges %s and %s' % (vehicles, walkers))
+        self.index = index
+        self.seed = seed
+        self.min_distance = min_distance
+        self.max_distance = max_distance
+        self.vehicles = (vehicles[0], min(vehicles[1], max(0, len(index) - 1)))
+        self.walkers = tuple(walkers)
+        self.block_size = block_size
+        # 每个生成点可选的目的地，按行压缩存储
+        distance = index.distance
+        valid = np.isfinite(distance) & (distance >= min_distance) & (distance <= max_distance)
+        np.fill_diagonal(valid, False)
+        self._counts = valid.sum(axis=1)
+        self._offsets = np.concatenate(([0], np.cumsum(self._counts)[:-1])).astype(np.int64)
+        self._targets = np.nonzero(valid)[1].astype(np.int32)
+        self._spawns = np.flatnonzero(self._counts).astype(np.int32)
+        if not len(self._spawns):
+            raise ValueError('no pair of spawn points is between %s and %s meters apart' % (
+                min_distance, max_distance))
+
+    def sample_block(self, block):
+        """
+        The scenarios block * block_size ... (block + 1) * block_size - 1.
+        """
+        rng = np.random.default_rng([self.seed, block])
+        size = self.block_size
+        spawn = self._spawns[rng.integers(len(self._spawns), size=size)]
+        pick = np.minimum((rng.random(size) * self._counts[spawn]).astype(np.int64), self._counts[spawn] - 1)
+        destination = self._targets[self._offsets[spawn] + pick]
+        scenarios = np.zeros(size, dtype=SCENARIO_DTYPE)
+        scenarios['index'] = np.arange(block * size, (block + 1) * size)
+        scenarios['spawn'] = spawn
+        scenarios['destination'] = destination
+        scenarios['distance'] = self.index.distance[spawn, destination]
+        scenarios['vehicles'] = rng.integers(self.vehicles[0], self.vehicles[1] + 1, size=size)
+        scenarios['walkers'] = rng.integers(self.walkers[0], self.walkers[1] + 1, size=size)
+        scenarios['seed'] = rng.integers(0, 2 ** 32, size=size, dtype=np.uint32)
+        return scenarios
+
+    def generate(self, count, start=0, processes=1):
+        """
+        The scenarios start ... start + count - 1.
+
+            :param processes: worker processes drawing the blocks
+            :return: structured array of SCENARIO_DTYPE
+        """
+        if count <= 0:
+            return np.zeros(0, dtype=SCENARIO_DTYPE)
+        blocks = list(range(start // self.block_size, (start + count - 1) // self.block_size + 1))
+        if processes > 1 and len(blocks) > 1:
+            chunks = [(self, blocks[offset::processes]) for offset in range(processes)]
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(_sample_blocks, chunks)
+            finally:
+                pool.close()
+                pool.join()
+            drawn = dict((block, scenarios) for chunk, result in zip(chunks, results)
+                         for block, scenarios in zip(chunk[1], result))
+            arrays = [drawn[block] for block in blocks]
+        else:
+            arrays = [self.sample_block(block) for block in blocks]
+        scenarios = np.concatenate(arrays)
+        first = start - blocks[0] * self.block_size
+        return scenarios[first:first + count]
+
+
+# ==============================================================================
+# -- Export --------------------------------------------------------------------
+# ==============================================================================
+
+def scenario_jobs(sampler, scenarios, name='route', routes=False):
+    """
+    Rollout jobs (see benchmark.rollout) of sampled scenarios. args holds
+    the scenario: indices and transforms of the spawn point and of the
+    destination in the order of map.get_spawn_points(), route length,
+    densities, the seed of the traffic and, with routes, the locations of
+    the route nodes.
+    """
+    index = sampler.index
+    label = '%s(town=%s,seed=%d)' % (name, index.town, sampler.seed)
+    jobs = []
+    for row in scenarios.tolist():
+        number, spawn, destination, distance, vehicles, walkers, seed = row
+        args = {
+            'town': index.town,
+            'spawn': spawn,
+            'destination': destination,
+            'spawn_transform': index.spawn_points[spawn].tolist(),
+            'destination_transform': index.spawn_points[destination].tolist(),
+            'distance': round(distance, 2),
+            'vehicles': vehicles,
+            'walkers': walkers,
+            'seed': seed,
+        }
+        if routes:
+            args['route'] = np.round(index.route_locations(spawn, destination), 2).tolist()
+        params = {'sample': number}
+        jobs.append({'key': job_key(label, None, params), 'scenario': name, 'blueprint': None,
+                     'args': args, 'params': params})
+    return jobs
+
+
+def save_jobs(path, jobs):
+    with open(path, 'w') as output:
+        for job in jobs:
+            output.write(json.dumps(job, sort_keys=True) + '\n')
+
+
+def load_jobs(path):
+    with open(path) as source:
+        return [json.loads(line) for line in source if line.strip()]
+
+
+def _parse_range(text):
+    values = [int(value) for value in text.split(':')]
+    return values[0], values[-1]
+
+
+def main():
+    argparser = argparse.ArgumentParser(description='Sample reproducible driving scenarios of a CARLA map')
+    argparser.add_argument('--index', metavar='FILE', required=True,
+                           help='route index (.npz), built from the server map if it does not exist')
+    argparser.add_argument('--host', metavar='H', default='127.0.0.1', help='IP of the host server (default: 127.0.0.1)')
+    argparser.add_argument('-p', '--port', metavar='P', default=2000, type=int, help='TCP port (default: 2000)')
+    argparser.add_argument('-n', '--number', metavar='N', default=1000, type=int, help='scenarios (default: 1000)')
+    argparser.add_argument('--start', metavar='I', default=0, type=int, help='first scenario (default: 0)')
+    argparser.add_argument('-s', '--seed', metavar='S', default=0, type=int, help='sampler seed (default: 0)')
+    argparser.add_argument('--min-distance', metavar='M', default=50.0, type=float,
+                           help='shortest route length in meters (default: 50)')
+    argparser.add_argument('--max-distance', metavar='M', default=float('inf'), type=float,
+                           help='longest route length in meters (default: no limit)')
+    argparser.add_argument('--vehicles', metavar='MIN:MAX', default='0:50', help='other vehicles (default: 0:50)')
+    argparser.add_argument('--walkers', metavar='MIN:MAX', default='0:0', help='walkers (default: 0:0)')
+    argparser.add_argument('--processes', metavar='N', default=1, type=int, help='worker processes (default: 1)')
+    argparser.add_argument('--routes', action='store_true', help='write the route node locations of every scenario')
+    argparser.add_argument('-o', '--output', metavar='FILE', default='scenarios.jsonl',
+                           help='jobs file (default: scenarios.jsonl)')
+    args = argparser.parse_args()
+
+    try:
+        index = RouteIndex.load(args.index)
+    except IOError:
+        import carla
+
+        client = carla.Client(args.host, args.port)
+        client.set_timeout(60.0)
+        index = RouteIndex.from_map(client.get_world().get_map())
+        index.save(args.index)
+    sampler = ScenarioSampler(index, args.seed, args.min_distance, args.max_distance,
+                              _parse_range(args.vehicles), _parse_range(args.walkers))
+    start = time.time()
+    scenarios = sampler.generate(args.number, args.start, args.processes)
+    elapsed = time.time() - start
+    save_jobs(args.output, scenario_jobs(sampler, scenarios, routes=args.routes))
+    print('%d scenarios of %s in %.3f seconds (%.0f per second) -> %s' % (
+        len(scenarios), index.town, elapsed, len(scenarios) / max(elapsed, 1e-9), args.output))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -22,15 +22,19 @@ except IndexError:
     pass
 
 import carla
-//从Carla库中导入VehicleLightState并将其重命名为vls，可能用于后续控制车辆灯光状态相关操作
+# 从Carla库中导入VehicleLightState并将其重命名为vls，可能用于后续控制车辆灯光状态相关操作
 from carla import VehicleLightState as vls
 
 import argparse
 import logging
-from numpy import random
+
+# 将PythonAPI/carla加入系统路径，以便导入traffic模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
+from traffic.population import TrafficPopulation
 
 def get_actor_blueprints(world, filter, generation):
-//从世界场景的蓝图库中筛选出符合给定过滤器条件的蓝图列表
+# 从世界场景的蓝图库中筛选出符合给定过滤器条件的蓝图列表
     bps = world.get_blueprint_library().filter(filter)
 
     if generation.lower() == "all":
@@ -38,14 +42,14 @@ def get_actor_blueprints(world, filter, generation):
 
     # If the filter returns only one bp, we assume that this one needed
     # and therefore, we ignore the generation
-// 如果过滤器返回的蓝图只有一个，那么就认为这就是需要的那个，此时忽略生成版本的限制
+# 如果过滤器返回的蓝图只有一个，那么就认为这就是需要的那个，此时忽略生成版本的限制
     if len(bps) == 1:
         return bps
-//将传入的生成版本字符串转换为整数类型，以便后续进行数值比较判断
+# 将传入的生成版本字符串转换为整数类型，以便后续进行数值比较判断
     try:
         int_generation = int(generation)
         # Check if generation is in available generations
-//检查转换后的生成版本数值是否在可用的版本列表中（这里限定为1、2、3）
+# 检查转换后的生成版本数值是否在可用的版本列表中（这里限定为1、2、3）
         if int_generation in [1, 2, 3]:
             bps = [x for x in bps if int(x.get_attribute('generation')) == int_generation]
             return bps
@@ -59,7 +63,7 @@ def get_actor_blueprints(world, filter, generation):
 def main():
     argparser = argparse.ArgumentParser(
         description=__doc__)
-//添加一个名为'--host'的命令行参数，用于指定主机服务器的IP地址，默认值为'127.0.0.1'
+# 添加一个名为'--host'的命令行参数，用于指定主机服务器的IP地址，默认值为'127.0.0.1'
     argparser.add_argument(
         '--host',
         metavar='H',
@@ -70,7 +74,7 @@ def main():
         metavar='P',
         default=2000,
         type=int,
-// 添加一个名为'-p'（短格式）或'--port'（长格式）的命令行参数，用于指定要监听的TCP端口号，默认值为2000，类型为整数
+# 添加一个名为'-p'（短格式）或'--port'（长格式）的命令行参数，用于指定要监听的TCP端口号，默认值为2000，类型为整数
         help='TCP port to listen to (default: 2000)')
     argparser.add_argument(
         '-n', '--number-of-vehicles',
@@ -78,7 +82,7 @@ def main():
         default=30,
         type=int,
         help='Number of vehicles (default: 30)')
-//添加一个名为'-w'（短格式）或'--number-of-walkers'（长格式）的命令行参数，用于指定要生成的行人数量，默认值为10，类型为整数
+# 添加一个名为'-w'（短格式）或'--number-of-walkers'（长格式）的命令行参数，用于指定要生成的行人数量，默认值为10，类型为整数
     argparser.add_argument(
         '-w', '--number-of-walkers',
         metavar='W',
@@ -89,7 +93,7 @@ def main():
         '--safe',
         action='store_true',
         help='Avoid spawning vehicles prone to accidents')
-// 添加一个名为'--seedw'的命令行参数，用于设置行人模块的种子，默认值为0，类型为整数
+# 添加一个名为'--seedw'的命令行参数，用于设置行人模块的种子，默认值为0，类型为整数
     argparser.add_argument(
         '--filterv',
         metavar='PATTERN',
@@ -145,7 +149,7 @@ def main():
         action='store_true',
         default=False,
         help='Set one of the vehicles as hero')
-//添加一个名为'--respawn'的命令行参数，当指定该参数时（action='store_true'），自动重新生成休眠的车辆（仅在大地图中有效），默认值为False
+# 添加一个名为'--respawn'的命令行参数，当指定该参数时（action='store_true'），自动重新生成休眠的车辆（仅在大地图中有效），默认值为False
     argparser.add_argument(
         '--respawn',
         action='store_true',
@@ -156,24 +160,26 @@ def main():
         action='store_true',
         default=False,
         help='Activate no rendering mode')
+    argparser.add_argument(
+        '--walker-retarget',
+        metavar='SECONDS',
+        default=0.0,
+        type=float,
+        help='Send every walker to a new destination after SECONDS on average (default: 0, only when they arrive)')
 
     args = argparser.parse_args()
 
     logging.basicConfig(format='%(levelname)s: %(message)s', level=logging.INFO)
-//用于存储生成的车辆的ID列表，初始化为空列表
-    vehicles_list = []
-// 用于存储生成的行人的相关信息（以字典形式，包含ID等）的列表，初始化为空列表
-    walkers_list = []
-//用于存储所有相关角色（车辆、行人等）的ID的列表，初始化为空列表
-    all_id = []
-// 创建一个Carla客户端对象，用于连接到Carla服务器，传入之前解析得到的主机IP地址和端口号参数
+# 生成的车辆和行人由population记录，退出时统一销毁
+    population = None
+# 创建一个Carla客户端对象，用于连接到Carla服务器，传入之前解析得到的主机IP地址和端口号参数
     client = carla.Client(args.host, args.port)
-//设置客户端的超时时间为10.0秒，即如果在10秒内没有收到服务器响应，则认为操作超时
+# 设置客户端的超时时间为10.0秒，即如果在10秒内没有收到服务器响应，则认为操作超时
     client = carla.Client(args.host, args.port)
     client.set_timeout(10.0)
     synchronous_master = False
-    random.seed(args.seed if args.seed is not None else int(time.time()))
-//通过客户端获取Carla世界场景对象，后续所有与世界场景相关的操作（如获取地图、获取角色等）都基于这个对象进行
+    seed = args.seed if args.seed is not None else int(time.time())
+# 通过客户端获取Carla世界场景对象，后续所有与世界场景相关的操作（如获取地图、获取角色等）都基于这个对象进行
     try:
         world = client.get_world()
 
@@ -189,9 +195,9 @@ def main():
 
         settings = world.get_settings()
         if not args.asynch:
-// 如果没有激活异步模式（即运行在同步模式下），则设置交通管理器为同步模式
+# 如果没有激活异步模式（即运行在同步模式下），则设置交通管理器为同步模式
             traffic_manager.set_synchronous_mode(True)
-//如果当前世界场景的设置中不是同步模式，则将同步主控制者标记为True，表示当前脚本将作为同步模式的控制者进行相关设置和操作，同时将世界场景的同步模式设置为True，并设置固定的时间步长为0.05秒（用于同步更新世界场景等操作）
+# 如果当前世界场景的设置中不是同步模式，则将同步主控制者标记为True，表示当前脚本将作为同步模式的控制者进行相关设置和操作，同时将世界场景的同步模式设置为True，并设置固定的时间步长为0.05秒（用于同步更新世界场景等操作）
             if not settings.synchronous_mode:
                 synchronous_master = True
                 settings.synchronous_mode = True
@@ -220,55 +226,29 @@ def main():
         blueprints = sorted(blueprints, key=lambda bp: bp.id)
 
         spawn_points = world.get_map().get_spawn_points()
-// 获取生成点的数量，用于后续判断要生成的角色数量是否超过了可用生成点数量等情况
+# 获取生成点的数量，用于后续判断要生成的角色数量是否超过了可用生成点数量等情况
         number_of_spawn_points = len(spawn_points)
 
-        if args.number_of_vehicles < number_of_spawn_points:
-            random.shuffle(spawn_points)
-        elif args.number_of_vehicles > number_of_spawn_points:
+        if args.number_of_vehicles > number_of_spawn_points:
             msg = 'requested %d vehicles, but could only find %d spawn points'
             logging.warning(msg, args.number_of_vehicles, number_of_spawn_points)
             args.number_of_vehicles = number_of_spawn_points
 
-        # @todo cannot import these directly.
-        SpawnActor = carla.command.SpawnActor
-        SetAutopilot = carla.command.SetAutopilot
-        FutureActor = carla.command.FutureActor
-
         # --------------
         # Spawn vehicles
         # --------------
-        batch = []
-        hero = args.hero
-        for n, transform in enumerate(spawn_points):
-            if n >= args.number_of_vehicles:
-                break
-            blueprint = random.choice(blueprints)
-            if blueprint.has_attribute('color'):
-                color = random.choice(blueprint.get_attribute('color').recommended_values)
-                blueprint.set_attribute('color', color)
-            if blueprint.has_attribute('driver_id'):
-                driver_id = random.choice(blueprint.get_attribute('driver_id').recommended_values)
-                blueprint.set_attribute('driver_id', driver_id)
-            if hero:
-                blueprint.set_attribute('role_name', 'hero')
-                hero = False
-            else:
-                blueprint.set_attribute('role_name', 'autopilot')
-
-            # spawn the cars and set their autopilot and light state all together
-            batch.append(SpawnActor(blueprint, transform)
-                .then(SetAutopilot(FutureActor, True, traffic_manager.get_port())))
-
-        for response in client.apply_batch_sync(batch, synchronous_master):
-            if response.error:
-                logging.error(response.error)
-            else:
-                vehicles_list.append(response.actor_id)
+        # the spawn points are reserved with the footprint of the vehicle so
+        # that no two vehicles overlap, the failures are retried in one batch
+        population = TrafficPopulation(client, world, traffic_manager, seed=seed)
+        report = population.spawn_vehicles(blueprints, args.number_of_vehicles, spawn_points,
+                                           hero=args.hero, do_tick=synchronous_master)
+        for error in report.errors:
+            logging.error(error)
+        print(report)
 
         # Set automatic vehicle lights update if specified
         if args.car_lights_on:
-            all_vehicle_actors = world.get_actors(vehicles_list)
+            all_vehicle_actors = world.get_actors(population.vehicles)
             for actor in all_vehicle_actors:
                 traffic_manager.update_vehicle_lights(actor, True)
 
@@ -280,63 +260,15 @@ def main():
         percentagePedestriansCrossing = 0.0     # how many pedestrians will walk through the road
         if args.seedw:
             world.set_pedestrians_seed(args.seedw)
-            random.seed(args.seedw)
-        # 1. take all the random locations to spawn
-        spawn_points = []
-        for i in range(args.number_of_walkers):
-            spawn_point = carla.Transform()
-            loc = world.get_random_location_from_navigation()
-            if (loc != None):
-                spawn_point.location = loc
-                spawn_points.append(spawn_point)
-        # 2. we spawn the walker object
-        batch = []
-        walker_speed = []
-        for spawn_point in spawn_points:
-            walker_bp = random.choice(blueprintsWalkers)
-            # set as not invincible
-            probability = random.randint(0,100 + 1);
-            if walker_bp.has_attribute('is_invincible'):
-                walker_bp.set_attribute('is_invincible', 'false')
-            if walker_bp.has_attribute('can_use_wheelchair') and probability < 11:
-                walker_bp.set_attribute('use_wheelchair', 'true')
-            # set the max speed
-            if walker_bp.has_attribute('speed'):
-                if (random.random() > percentagePedestriansRunning):
-                    # walking
-                    walker_speed.append(walker_bp.get_attribute('speed').recommended_values[1])
-                else:
-                    # running
-                    walker_speed.append(walker_bp.get_attribute('speed').recommended_values[2])
-            else:
-                print("Walker has no speed")
-                walker_speed.append(0.0)
-            batch.append(SpawnActor(walker_bp, spawn_point))
-        results = client.apply_batch_sync(batch, True)
-        walker_speed2 = []
-        for i in range(len(results)):
-            if results[i].error:
-                logging.error(results[i].error)
-            else:
-                walkers_list.append({"id": results[i].actor_id})
-                walker_speed2.append(walker_speed[i])
-        walker_speed = walker_speed2
-        # 3. we spawn the walker controller
-        batch = []
-        walker_controller_bp = world.get_blueprint_library().find('controller.ai.walker')
-        for i in range(len(walkers_list)):
-            batch.append(SpawnActor(walker_controller_bp, carla.Transform(), walkers_list[i]["id"]))
-        results = client.apply_batch_sync(batch, True)
-        for i in range(len(results)):
-            if results[i].error:
-                logging.error(results[i].error)
-            else:
-                walkers_list[i]["con"] = results[i].actor_id
-        # 4. we put together the walkers and controllers id to get the objects from their id
-        for i in range(len(walkers_list)):
-            all_id.append(walkers_list[i]["con"])
-            all_id.append(walkers_list[i]["id"])
-        all_actors = world.get_actors(all_id)
+            population.random.seed(args.seedw)
+        # spawn locations and destinations are drawn together from the
+        # navigation, then the walkers and their controllers are spawned
+        report = population.spawn_walkers(blueprintsWalkers, args.number_of_walkers,
+                                          running=percentagePedestriansRunning,
+                                          crossing=percentagePedestriansCrossing)
+        for error in report.errors:
+            logging.error(error)
+        print(report)
 
         # wait for a tick to ensure client receives the last transform of the walkers we have just created
         if args.asynch or not synchronous_master:
@@ -344,18 +276,14 @@ def main():
         else:
             world.tick()
 
-        # 5. initialize each controller and set target to walk to (list is [controler, actor, controller, actor ...])
-        # set how many pedestrians can cross the road
-        world.set_pedestrians_cross_factor(percentagePedestriansCrossing)
-        for i in range(0, len(all_id), 2):
-            # start walker
-            all_actors[i].start()
-            # set walk to random point
-            all_actors[i].go_to_location(world.get_random_location_from_navigation())
-            # max speed
-            all_actors[i].set_max_speed(float(walker_speed[int(i/2)]))
+        # start the controllers, targets and speeds are sent in one batch each
+        period = None
+        if args.walker_retarget > 0.0:
+            period = (0.5 * args.walker_retarget, 1.5 * args.walker_retarget)
+        population.start_walkers(period=period)
 
-        print('spawned %d vehicles and %d walkers, press Ctrl+C to exit.' % (len(vehicles_list), len(walkers_list)))
+        print('spawned %d vehicles and %d walkers, press Ctrl+C to exit.' % (
+            len(population.vehicles), len(population.walkers)))
 
         # Example of how to use Traffic Manager parameters
         traffic_manager.global_percentage_speed_difference(30.0)
@@ -363,8 +291,12 @@ def main():
         while True:
             if not args.asynch and synchronous_master:
                 world.tick()
+                snapshot = world.get_snapshot()
             else:
-                world.wait_for_tick()
+                snapshot = world.wait_for_tick()
+            # at most a bounded number of walkers get a new destination per tick
+            if population.crowd is not None:
+                population.crowd.tick(snapshot)
 
     finally:
 
@@ -375,15 +307,10 @@ def main():
             settings.fixed_delta_seconds = None
             world.apply_settings(settings)
 
-        print('\ndestroying %d vehicles' % len(vehicles_list))
-        client.apply_batch([carla.command.DestroyActor(x) for x in vehicles_list])
-
-        # stop walker controllers (list is [controller, actor, controller, actor ...])
-        for i in range(0, len(all_id), 2):
-            all_actors[i].stop()
-
-        print('\ndestroying %d walkers' % len(walkers_list))
-        client.apply_batch([carla.command.DestroyActor(x) for x in all_id])
+        if population is not None:
+            print('\ndestroying %d vehicles' % len(population.vehicles))
+            print('\ndestroying %d walkers' % len(population.walkers))
+            population.destroy()
 
         time.sleep(0.5)
 
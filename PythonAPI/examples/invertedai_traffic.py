@@ -11,6 +11,7 @@
 """
 
 import os
+import sys
 import time
 import carla
 import argparse
@@ -20,6 +21,13 @@ import random
 import invertedai as iai
 from invertedai.common import AgentProperties, AgentState, TrafficLightState
 
+# 将PythonAPI/carla加入系统路径，以便导入cosim模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
+from cosim.bridge import CoSimulationBridge
+from cosim.pipeline import PipelinedRunner
+from traffic.lights import TrafficLightMirror
+
 SpawnActor = carla.command.SpawnActor
 
 #---------
@@ -162,6 +170,10 @@ def argument_parser():
         '--iai-log',
         action="store_true",
         help=f"Export a log file for the InvertedAI cosimulation, which can be replayed afterwards")
+    argparser.add_argument(
+        '--no-pipeline',
+        action="store_true",
+        help=f"Wait for the IAI drive call before ticking instead of overlapping it with the tick of the previous step")
 
     args = argparser.parse_args()
 
@@ -215,11 +227,12 @@ def set_spectator(world, hero_v):
 # 初始化参与者
 #---------
 
-# 从CARLA参与者中初始化逆向代理
-def initialize_iai_agent(actor, agent_type):
+# 从CARLA参与者中初始化逆向代理，给定快照时从快照读取位姿和速度，不发起RPC调用
+def initialize_iai_agent(actor, agent_type, actor_snapshot=None):
 
-    transf = actor.get_transform()
-    vel = actor.get_velocity()
+    source = actor_snapshot if actor_snapshot is not None else actor
+    transf = source.get_transform()
+    vel = source.get_velocity()
     speed = math.sqrt(vel.x**2. + vel.y**2. +vel.z**2.)
 
     agent_state = AgentState.fromlist([
@@ -346,21 +359,16 @@ def transform_iai_to_carla(agent_state):
     return agent_transform
 
 # 更新由 IAI 驱动的 CARLA 代理的转换并推进世界
-def update_transforms(iai2carla,response):
+def update_transforms(bridge,iai2carla,response):
     """
     推进 carla 模拟一个时间步
-    假设 carla_actors 是由 IAI 控制的 carla 参与者列表
+    所有 IAI 代理的新位姿通过一次 apply_batch 下发
     """
-    for agent_id in iai2carla.keys():
-        agentdict = iai2carla[agent_id]
-        if agentdict["is_iai"]:            
-            agent = response.agent_states[agent_id]
-            agent_transform = transform_iai_to_carla(agent)
-            try:     
-                actor = agentdict["actor"]
-                actor.set_transform(agent_transform)
-            except:
-                pass
+    poses = {}
+    for agent_id, agentdict in iai2carla.items():
+        if agentdict["is_iai"]:
+            poses[agent_id] = transform_iai_to_carla(response.agent_states[agent_id])
+    bridge.apply_poses(poses)
 
 # 将现有的 IAI 代理分配给 CARLA 车辆蓝图，并将这些代理添加到 CARLA 模拟中
 def assign_carla_blueprints_to_iai_agents(world,vehicle_blueprints,agent_properties,agent_states,recurrent_states,is_iai,noniai_actors):
@@ -482,17 +490,18 @@ def get_traffic_light_state_from_carla(carla_tl_state):
         return TrafficLightState.Off
 
 # 根据 CARLA 交通灯分配 IAI 交通灯
-def assign_iai_traffic_lights_from_carla(world, iai_tl, carla2iai_tl):
-
-    traffic_lights = world.get_actors().filter('traffic.traffic_light*')
-    
-    carla_tl_dict = {}
-    for tl in traffic_lights:
-        carla_tl_dict[str(tl.id)]=tl.state
-
-    for carla_tl_id, carla_state in carla_tl_dict.items():
-        iai_tl_id_pair = carla2iai_tl[carla_tl_id]
-        for iai_tl_id in iai_tl_id_pair:
+# 状态从交通灯镜像（一个世界快照）读取；给出 light_ids 时只更新这些交通灯，例如 mirror.update 返回的变化的交通灯
+def assign_iai_traffic_lights_from_carla(world, iai_tl, carla2iai_tl, mirror=None, light_ids=None):
+
+    if mirror is None:
+        mirror = TrafficLightMirror(world)
+        mirror.update(world.get_snapshot())
+    if light_ids is None:
+        light_ids = mirror.ids
+
+    for carla_tl_id in light_ids:
+        carla_state = mirror.carla_state(carla_tl_id)
+        for iai_tl_id in carla2iai_tl[str(carla_tl_id)]:
             iai_tl[iai_tl_id] = get_traffic_light_state_from_carla(carla_state)
 
     return iai_tl
@@ -587,11 +596,19 @@ def main():
 
     # 将IAI代理映射到CARLA角色，并更新响应属性和状态。
     agent_properties, agent_states_new, recurrent_states_new, iai2carla = assign_carla_blueprints_to_iai_agents(world,vehicle_blueprints,agent_properties,response.agent_states,response.recurrent_states,is_iai,noniai_actors)
-    traffic_lights_states = assign_iai_traffic_lights_from_carla(world,response.traffic_lights_states, carla2iai_tl)
+    traffic_lights = TrafficLightMirror(world)
+    traffic_lights.update(world.get_snapshot())
+    traffic_lights_states = assign_iai_traffic_lights_from_carla(world,response.traffic_lights_states, carla2iai_tl, traffic_lights)
     response.agent_states = agent_states_new
     response.recurrent_states = recurrent_states_new
     response.traffic_lights_states = traffic_lights_states
 
+    # IAI代理的位姿通过桥接批量下发，其他参与者从世界快照读取
+    bridge = CoSimulationBridge(client, world, patterns=('vehicle.*',))
+    for agent_id, agentdict in iai2carla.items():
+        if agentdict["is_iai"]:
+            bridge.register_external(agent_id, agentdict["actor"])
+
     # 执行第一次CARLA模拟刻。
     world.tick()
 
@@ -605,59 +622,88 @@ def main():
         if args.hero:
             hero_v = vehicles[0]
 
-        for frame in range(args.sim_length * FPS):
-
-            response.traffic_lights_states = assign_iai_traffic_lights_from_carla(world, response.traffic_lights_states, carla2iai_tl)
-
-            # IAI更新步骤。
-            response = iai.large_drive(
+        # 最近一次的IAI响应与交通灯状态，只在drive中（工作线程）更新
+        latest = {"response": response, "traffic_lights_states": response.traffic_lights_states}
+        # CARLA交通灯对应的IAI状态，只在tick中（主线程）按变化更新
+        carla_traffic_lights_states = dict(response.traffic_lights_states)
+
+        # IAI更新步骤：合并上一次观测到的非IAI代理和新车辆，然后调用模型。
+        def drive(observation):
+            previous = latest["response"]
+            agent_states = list(previous.agent_states)
+            recurrent_states = list(previous.recurrent_states)
+            if observation is not None:
+                for agent_id, (state, properties) in observation["agents"].items():
+                    agent_states[agent_id] = state
+                    agent_properties[agent_id] = properties
+                for state, properties in observation["new_agents"]:
+                    agent_states.append( state )
+                    agent_properties.append( properties )
+                    recurrent_states.append( recurrent_states[-1] )   # temporal fix
+                latest["traffic_lights_states"] = observation["traffic_lights_states"]
+            result = iai.large_drive(
                 location = args.location,
-                agent_states = response.agent_states,
+                agent_states = agent_states,
                 agent_properties = agent_properties,
-                recurrent_states = response.recurrent_states,
-                traffic_lights_states = response.traffic_lights_states,
+                recurrent_states = recurrent_states,
+                traffic_lights_states = latest["traffic_lights_states"],
                 light_recurrent_states = None,
                 single_call_agent_limit = args.capacity,
                 async_api_calls = args.iai_async,
                 api_model_version = args.api_model,
                 random_seed = seed
             )
-
             if args.iai_log:
-                log_writer.drive(drive_response=response)
+                log_writer.drive(drive_response=result)
+            latest["response"] = result
+            return result
 
-            # 用IAI代理的新变换更新CARLA参与者
-            update_transforms(iai2carla,response)
+        # 用IAI代理的新变换更新CARLA参与者
+        def apply(result):
+            update_transforms(bridge,iai2carla,result)
 
-            # 执行CARLA模拟刻。
+        # 执行CARLA模拟刻，并从同一个世界快照中读取非IAI代理（例如行人）与新车辆。
+        def tick():
             world.tick()
+            added, _ = bridge.sync()
+            observation = {"agents": {}, "new_agents": []}
 
-            # 在IAI协同仿真中更新逆向控制的代理，例如行人。
-            for agent_id in iai2carla.keys():
+            noniai_ids = dict((agentdict["actor"].id, agent_id) for agent_id, agentdict in iai2carla.items() if not agentdict["is_iai"])
+            for actor_id, actor_snapshot in bridge.internal_states(noniai_ids):
+                agent_id = noniai_ids[actor_id]
                 agentdict = iai2carla[agent_id]
+                observation["agents"][agent_id] = initialize_iai_agent(agentdict["actor"], agentdict["type"], actor_snapshot)
 
-                if not agentdict["is_iai"]:
-                    actor = agentdict["actor"]
-                    state, properties = initialize_iai_agent(actor, agentdict["type"])
-                    response.agent_states[agent_id] = state
-                    agent_properties[agent_id] = properties
-
-            # 包括来自其他客户端的可能的新角色（车辆），例如使用`automatic_control.py`或`manual_control.py`。
-            actors_all = world.get_actors().filter('vehicle.*')
-            actsids = [act["actor"].id for act in iai2carla.values()]
-            for actor in actors_all:
+            # 包括来自其他客户端的可能的新角色（车辆），例如使用`automatic_control.py`或`manual_control.py`，通过快照对比发现。
+            actsids = set(act["actor"].id for act in iai2carla.values())
+            for actor in added:
                 if not (actor.id in actsids):
-                    state, properties = initialize_iai_agent(actor, "car")
-                    response.agent_states.append( state )
-                    agent_properties.append( properties )
-                    response.recurrent_states.append( response.recurrent_states[-1] )   # temporal fix
+                    state, properties = initialize_iai_agent(actor, "car", bridge.snapshot.find(actor.id))
+                    observation["new_agents"].append((state, properties))
                     iai2carla[len(iai2carla)] = {"actor":actor, "is_iai":False, "type":properties.agent_type}
 
-            # 如果存在主车辆，则更新观众视角。
+            changed = traffic_lights.update(bridge.snapshot)
+            assign_iai_traffic_lights_from_carla(world, carla_traffic_lights_states, carla2iai_tl, traffic_lights, changed)
+            observation["traffic_lights_states"] = dict(carla_traffic_lights_states)
+            return observation
+
+        # 如果存在主车辆，则更新观众视角。
+        def step_callback(step):
             if hero_v is not None:
                 set_spectator(world, hero_v)
 
-            
+        # 默认下一步的IAI请求与本次tick并行执行
+        runner = PipelinedRunner(drive, apply, tick, pipelined=not args.no_pipeline)
+        first_observation = {"agents": {}, "new_agents": [], "traffic_lights_states": response.traffic_lights_states}
+        try:
+            runner.run(args.sim_length * FPS, first_observation, step_callback)
+        finally:
+            times = runner.times
+            if len(times.step) > FPS:
+                summary = times.summary(warmup=FPS)
+                print("\n%s: %.1f FPS, IAI drive %.1f ms, tick %.1f ms, overlap %.0f%%" % (
+                    "Pipelined" if runner.pipelined else "Serial", summary["fps"], summary["drive_ms"],
+                    summary["tick_ms"], 100.0 * summary["overlap"]))
 
     finally:
 
@@ -23,6 +23,9 @@ try:
 except IndexError:
     pass
 
+# 将PythonAPI/carla加入系统路径，以便导入dataset模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 
 import argparse
@@ -78,8 +81,13 @@ def tutorial(args):
     vehicle = None
     camera = None
     lidar = None
+    writer = None
 
     try:
+        if args.dataset:
+            # 以异步分片的方式写入数据集，而不是每帧保存一个PNG文件
+            from dataset.writer import DatasetWriter
+            writer = DatasetWriter(args.dataset)
         if not os.path.isdir('_out'):
             os.mkdir('_out')
         #  搜索所需的蓝图
@@ -256,14 +264,22 @@ def tutorial(args):
                         v_coord[i]-args.dot_extent : v_coord[i]+args.dot_extent,
                         u_coord[i]-args.dot_extent : u_coord[i]+args.dot_extent] = color_map[i]
 
-            # 使用Pillow模块保存图像。
-            image = Image.fromarray(im_array)
-            image.save("_out/%08d.png" % image_data.frame)
+            if writer is not None:
+                # 编码与写盘在后台线程完成，不阻塞仿真循环。
+                writer.add(image_data.frame, 'projection', im_array, 'png', image_data.timestamp)
+                writer.add_point_cloud(lidar_data, 'lidar')
+            else:
+                # 使用Pillow模块保存图像。
+                image = Image.fromarray(im_array)
+                image.save("_out/%08d.png" % image_data.frame)
 
     finally:
         # 最后，退出时恢复原始设置。
         world.apply_settings(original_settings)
 
+        if writer is not None:
+            writer.close()
+
         # 销毁场景中的actor。
         if camera:
             camera.destroy()
@@ -274,7 +290,7 @@ def tutorial(args):
 
 
 def main():
-        """
+    """
     主函数，用于解析命令行参数并启动相关教程（tutorial）操作。
     它通过argparse模块来定义和解析一系列的命令行参数，然后调用tutorial函数执行具体任务，
     同时对可能出现的用户中断操作（通过键盘中断）进行了异常处理。
@@ -355,6 +371,12 @@ def main():
         default='100000',
         type=int,
         help='lidar points per second (default: 100000)')
+# 添加'--dataset'参数，指定后将图像和点云写入分片数据集目录，而不是逐帧保存PNG
+    argparser.add_argument(
+        '--dataset',
+        metavar='DIR',
+        default=None,
+        help='write frames into a sharded dataset in DIR instead of one PNG per frame')
 # 解析命令行参数，得到包含所有参数值的命名空间对象args
     args = argparser.parse_args()
 # 将分辨率参数（字符串形式如'WIDTHxHEIGHT'）拆分成宽度和高度两个整数，并分别赋值给args的width和height属性
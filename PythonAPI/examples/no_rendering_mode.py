@@ -46,12 +46,18 @@ try:
 except IndexError:
     pass
 
+# ==============================================================================
+# -- Add PythonAPI for release mode --------------------------------------------
+# ==============================================================================
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 # ==============================================================================
 # -- imports -------------------------------------------------------------------
 # ==============================================================================
 
 import carla
 from carla import TrafficLightState as tls
+from traffic.lights import TrafficLightMirror
 
 import argparse
 import logging
@@ -911,6 +917,7 @@ class World(object):
 
         self.traffic_light_surfaces = TrafficLightSurfaces()
         self.affected_traffic_light = None
+        self.traffic_lights = None
 
         # Map info
         self.map_image = None
@@ -985,6 +992,9 @@ class World(object):
         self.result_surface = pygame.Surface((self.surface_size, self.surface_size)).convert()
         self.result_surface.set_colorkey(COLOR_BLACK)
 
+        # States of all the traffic lights, read from one snapshot per tick
+        self.traffic_lights = TrafficLightMirror(self.world)
+
         # Start hero mode by default
         self.select_hero_actor()
         self.hero_actor.set_autopilot(False)
@@ -1026,6 +1036,7 @@ class World(object):
     def tick(self, clock):
         """Retrieves the actors for Hero and Map modes and updates de HUD based on that"""
         actors = self.world.get_actors()
+        self.traffic_lights.update(self.world.get_snapshot())
 
         # We store the transforms also so that we avoid having transforms of
         # previous tick and current tick when rendering them.
@@ -1045,7 +1056,7 @@ class World(object):
 
             affected_traffic_light_text = 'None'
             if self.affected_traffic_light is not None:
-                state = self.affected_traffic_light.state
+                state = self.traffic_lights.carla_state(self.affected_traffic_light.id)
                 if state == carla.TrafficLightState.Green:
                     affected_traffic_light_text = 'GREEN'
                 elif state == carla.TrafficLightState.Yellow:
@@ -1154,7 +1165,7 @@ class World(object):
                     srf = self.traffic_light_surfaces.surfaces['h']
                     surface.blit(srf, srf.get_rect(center=pos))
 
-            srf = self.traffic_light_surfaces.surfaces[tl.state]
+            srf = self.traffic_light_surfaces.surfaces[self.traffic_lights.carla_state(tl.id)]
             surface.blit(srf, srf.get_rect(center=pos))
 
     def _render_speed_limits(self, surface, list_sl, world_to_pixel, world_to_pixel_width):
@@ -27,7 +27,11 @@ try:
 except IndexError:
     pass
 
+# 将PythonAPI/carla加入系统路径，以便导入perception模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
+from perception.pointcloud import PointCloudPreprocessor, ground_height_limit
 # 获取名为'plasma'的颜色映射表中的颜色数组，用于后续根据强度值映射颜色
 VIRIDIS = np.array(cm.get_cmap('plasma').colors)
 # 在[0.0, 1.0]区间均匀生成与VIRIDIS颜色数组长度相同数量的数值，用于颜色映射的范围界定
@@ -60,7 +64,7 @@ LABEL_COLORS = np.array([
 ]) / 255.0 # normalize each channel [0-1] since is what Open3D uses
 
 
-def lidar_callback(point_cloud, point_list):
+def lidar_callback(point_cloud, point_list, preprocessor=None):
     """
     Prepares a point cloud with intensity
     colors ready to be consumed by Open3D
@@ -78,6 +82,9 @@ def lidar_callback(point_cloud, point_list):
     data = np.copy(np.frombuffer(point_cloud.raw_data, dtype=np.dtype('f4')))
     # 按照每4个元素一组进行重塑，因为每个点的数据可能包含坐标（3个值）和强度（1个值）等信息，共4个值一组
     data = np.reshape(data, (int(data.shape[0] / 4), 4))
+    # 在着色和渲染之前先做裁剪、去地面和体素降采样，减少后续处理的点数
+    if preprocessor is not None:
+        data = preprocessor(data)
 
     # 提取每个点的强度信息，存储在intensity数组中
     intensity = data[:, -1]
@@ -203,6 +210,10 @@ def main(arg):
 
         user_offset = carla.Location(arg.x, arg.y, arg.z)
         lidar_transform = carla.Transform(carla.Location(x=-0.5, z=1.8) + user_offset)
+        # 地面高度上限相对于传感器，默认由安装高度决定
+        max_ground_height = arg.max_ground_height
+        if max_ground_height is None:
+            max_ground_height = ground_height_limit(lidar_transform.location.z)
 
         lidar = world.spawn_actor(lidar_bp, lidar_transform, attach_to=vehicle)
 
@@ -210,7 +221,12 @@ def main(arg):
         if arg.semantic:
             lidar.listen(lambda data: semantic_lidar_callback(data, point_list))
         else:
-            lidar.listen(lambda data: lidar_callback(data, point_list))
+            preprocessor = None
+            if arg.voxel_size > 0.0 or arg.remove_ground:
+                preprocessor = PointCloudPreprocessor(
+                    voxel_size=arg.voxel_size, remove_ground=arg.remove_ground,
+                    max_ground_height=max_ground_height)
+            lidar.listen(lambda data: lidar_callback(data, point_list, preprocessor))
 
         vis = o3d.visualization.Visualizer()
         vis.create_window(
@@ -336,6 +352,21 @@ if __name__ == "__main__":
         default=0.0,
         type=float,
         help='offset in the sensor position in the Z-axis in meters (default: 0.0)')
+    argparser.add_argument(
+        '--voxel-size',
+        default=0.0,
+        type=float,
+        help='downsample the (non-semantic) lidar with a voxel grid of this size in meters (default: 0.0, disabled)')
+    argparser.add_argument(
+        '--remove-ground',
+        action='store_true',
+        help='remove the ground points of the (non-semantic) lidar')
+    argparser.add_argument(
+        '--max-ground-height',
+        default=None,
+        type=float,
+        help='highest ground height relative to the lidar in meters '
+             '(default: 0.5 minus the mounting height)')
     args = argparser.parse_args()
 
     try:
@@ -18,6 +18,9 @@ try:
 except IndexError:
     pass
 
+# 将PythonAPI/carla加入系统路径，以便导入其中的纯Python模块
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'carla'))
+
 import carla
 import time
 
@@ -13,6 +13,8 @@ import filecmp
 import shutil
 import os
 
+from determinism.snapshot import SnapshotRecorder, max_difference
+
 try:
     # python 3
     from queue import Queue as Queue
@@ -29,6 +31,9 @@ SpawnActor = carla.command.SpawnActor
 FutureActor = carla.command.FutureActor
 ApplyTargetVelocity = carla.command.ApplyTargetVelocity
 
+# 快照中每个actor的列顺序
+SNAPSHOT_FIELDS = ('velocity', 'location', 'angular_velocity')
+
 class Scenario(object):
     def __init__(self, client, world, save_snapshots_mode=False):
         self.world = world
@@ -38,19 +43,20 @@ class Scenario(object):
         self.active = False
         self.prefix = ""
         self.save_snapshots_mode = save_snapshots_mode
-        self.snapshots = []
+        self.snapshots = SnapshotRecorder(SNAPSHOT_FIELDS)
 
     def init_scene(self, prefix, settings = None, spectator_tr = None):
         self.prefix = prefix
         self.actor_list = []
         self.active = True
-        self.snapshots = []
+        self.snapshots = SnapshotRecorder(SNAPSHOT_FIELDS)
 
         self.reload_world(settings, spectator_tr)
 
         # Init timestamp
         snapshot = self.world.get_snapshot()
         self.init_timestamp = {'frame0' : snapshot.frame, 'time0' : snapshot.timestamp.elapsed_seconds}
+        self.snapshots.start(snapshot)
 
     def add_actor(self, actor, actor_name="Actor"):
         actor_idx = len(self.actor_list)
@@ -60,7 +66,7 @@ class Scenario(object):
         self.actor_list.append((name, actor))
 
         if self.save_snapshots_mode:
-            self.snapshots.append(np.empty((0,11), float))
+            self.snapshots.add(actor, name)
 
     def wait(self, frames=100):
         for _i in range(0, frames):
@@ -86,23 +92,11 @@ class Scenario(object):
         spectator = self.world.get_spectator()
         spectator.set_transform(spectator_tr)
 
-    def save_snapshot(self, actor):
-        snapshot = self.world.get_snapshot()
-
-        actor_snapshot = np.array([
-                float(snapshot.frame - self.init_timestamp['frame0']), \
-                snapshot.timestamp.elapsed_seconds - self.init_timestamp['time0'], \
-                actor.get_velocity().x, actor.get_velocity().y, actor.get_velocity().z, \
-                actor.get_location().x, actor.get_location().y, actor.get_location().z, \
-                actor.get_angular_velocity().x, actor.get_angular_velocity().y, actor.get_angular_velocity().z])
-        return actor_snapshot
-
     def save_snapshots(self):                      #函数用于保存snapshots（快照）
         if not self.save_snapshots_mode:           #检查快照是否为真
             return                                 #若不为真，则返回
 
-        for i in range (0, len(self.actor_list)):  #若为真，则i将进行从0到self.actor_list长度的遍历
-            self.snapshots[i] = np.vstack((self.snapshots[i], self.save_snapshot(self.actor_list[i][1])))    #每次循环执行该函数
+        self.snapshots.record(self.world.get_snapshot())    #一次读取所有actor的状态
 
     # 保存快照到磁盘的方法
     def save_snapshots_to_disk(self):
@@ -110,9 +104,12 @@ class Scenario(object):
         if not self.save_snapshots_mode:
             return
 
-        # 遍历所有actor，并保存每个actor的快照
-        for i, actor in enumerate(self.actor_list):
-            np.savetxt(self.get_filename(actor[0]), self.snapshots[i])
+        # 所有actor的快照保存在同一个文件中
+        self.snapshots.save(self.get_snapshots_filename(self.prefix))
+
+    # 获取快照文件名的方法
+    def get_snapshots_filename(self, prefix):
+        return prefix + "_snapshots.npz"
 
     # 获取带前缀的文件名的方法
     def get_filename_with_prefix(self, prefix, actor_id=None, frame=None):
@@ -129,6 +126,7 @@ class Scenario(object):
         original_settings = self.world.get_settings() # 获取原始设置
 
         self.init_scene(prefix, run_settings, spectator_tr)# 初始化场景
+        self.snapshots.reserve(tics) # 预分配快照数组
 
          # 运行仿真指定的帧数
         for _i in range(0, tics):
@@ -295,10 +293,7 @@ class CollisionScenarioTester():
         if check_ij:
             return True
 
-        data_i = np.loadtxt(file_i)
-        data_j = np.loadtxt(file_j)
-
-        max_error = np.amax(np.abs(data_i-data_j))
+        max_error = max_difference(SnapshotRecorder.load(file_i), SnapshotRecorder.load(file_j))
 
         return max_error < 0.2
 
@@ -309,14 +304,10 @@ class CollisionScenarioTester():
         for i in range(0, repetitions):
             mat_check[i][i] = 1
             for j in range(0, i):
-                sim_check = True
-                for actor in self.scene.actor_list:
-                    actor_id = actor[0]
-                    file_i = self.scene.get_filename_with_prefix(rep_prefixes[i], actor_id)
-                    file_j = self.scene.get_filename_with_prefix(rep_prefixes[j], actor_id)
-
-                    check_ij = self.compare_files(file_i, file_j)
-                    sim_check = sim_check and check_ij
+                file_i = self.scene.get_snapshots_filename(rep_prefixes[i])
+                file_j = self.scene.get_snapshots_filename(rep_prefixes[j])
+
+                sim_check = self.compare_files(file_i, file_j)
                 mat_check[i][j] = int(sim_check)
                 mat_check[j][i] = int(sim_check)
 
@@ -328,29 +319,14 @@ class CollisionScenarioTester():
         return determinism_set
 
     def save_simulations(self, rep_prefixes, prefix, max_idx, min_idx):
-        for actor in self.scene.actor_list:
-            actor_id = actor[0]
-            reference_id = "reference_" + actor_id
-            file_repetition = self.scene.get_filename_with_prefix(rep_prefixes[max_idx], actor_id)
-            file_reference  = self.scene.get_filename_with_prefix(prefix, reference_id)
-
-            shutil.copyfile(file_repetition, file_reference)
+        file_repetition = self.scene.get_snapshots_filename(rep_prefixes[max_idx])
+        file_reference  = self.scene.get_snapshots_filename(prefix + "_reference")
+        shutil.copyfile(file_repetition, file_reference)
 
         if min_idx != max_idx:
-            for actor in self.scene.actor_list:
-                actor_id = actor[0]
-                failed_id = "failed_" + actor_id
-                file_repetition = self.scene.get_filename_with_prefix(rep_prefixes[min_idx], actor_id)
-                file_failed     = self.scene.get_filename_with_prefix(prefix, failed_id)
-
-                shutil.copyfile(file_repetition, file_failed)
-
-        for r_prefix in rep_prefixes:
-            for actor in self.scene.actor_list:
-                actor_id = actor[0]
-                file_repetition = self.scene.get_filename_with_prefix(r_prefix, actor_id)
-
-                #os.remove(file_repetition)
+            file_repetition = self.scene.get_snapshots_filename(rep_prefixes[min_idx])
+            file_failed     = self.scene.get_snapshots_filename(prefix + "_failed")
+            shutil.copyfile(file_repetition, file_failed)
 
     def test_scenario(self, fps=20, fps_phys=100, repetitions=1, sim_tics=100):
         # Creating run features: prefix, settings and spectator options
@@ -21,3 +21,6 @@ except IndexError:
 #如果glob.glob没有找到任何匹配的文件路径，将抛出IndexError异常
     pass
     #如果发生IndexError异常，不执行任何操作
+
+# 将PythonAPI/carla加入系统路径，以便测试其中的纯Python模块
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'carla'))
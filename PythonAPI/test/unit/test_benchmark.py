@@ -0,0 +1,418 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import csv
+import json
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import unittest
+
+from benchmark import client_throughput, metrics, orchestrator, rollout, standin
+
+# 代替 performance_benchmark.py 的脚本，不需要服务器
+FAKE_WORKER = '''
+import argparse
+import json
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--host')
+parser.add_argument('--port')
+parser.add_argument('--tm_port')
+parser.add_argument('--file')
+parser.add_argument('--json')
+parser.add_argument('--list_scenarios')
+parser.add_argument('--scenarios')
+parser.add_argument('--towns', type=int, default=2)
+args = parser.parse_args()
+
+if args.list_scenarios:
+    scenarios = [{'id': i, 'town': 'Town%02d' % (i // 3 + 1), 'weather': 0, 'environment': 0, 'sensors': i % 3}
+                 for i in range(3 * args.towns)]
+    with open(args.list_scenarios, 'w') as fd:
+        json.dump(scenarios, fd)
+else:
+    with open(args.scenarios) as fd:
+        scenarios = json.load(fd)
+    records = []
+    for scenario in scenarios:
+        time.sleep(0.05)
+        records.append({'scenario': scenario['id'], 'town': scenario['town'], 'fps_mean': 20.0,
+                        'server': int(args.port), 'tm_port': int(args.tm_port)})
+    with open(args.json, 'w') as fd:
+        json.dump({'system': 'fake', 'records': records}, fd)
+'''
+
+
+class TestOrchestrator(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.worker = os.path.join(self.path, 'fake_worker.py')
+        with open(self.worker, 'w') as output:
+            output.write(FAKE_WORKER)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_shards_are_balanced_by_town(self):
+        scenarios = [{'id': i, 'town': 'Town%02d' % (i // 4)} for i in range(12)]
+        shards = orchestrator.shard_scenarios(scenarios, 3)
+        self.assertEqual([[s['id'] for s in shard] for shard in shards],
+                         [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11]])
+        # 城镇数少于服务器数时拆分同一城镇的场景
+        shards = orchestrator.shard_scenarios(scenarios[:4], 2)
+        self.assertEqual([len(shard) for shard in shards], [2, 2])
+        shards = orchestrator.shard_scenarios(scenarios, 5)
+        self.assertEqual(sorted(s['id'] for shard in shards for s in shard), list(range(12)))
+        self.assertLessEqual(max(len(shard) for shard in shards), 3)
+        with self.assertRaises(ValueError):
+            orchestrator.shard_scenarios(scenarios, 0)
+
+    def test_orchestrate_with_fake_worker(self):
+        pool = orchestrator.ServerPool(2, base_port=4000)
+        report = orchestrator.orchestrate(pool, self.worker, ['--towns', '3'], self.path)
+        self.assertEqual([record['scenario'] for record in report['records']], list(range(9)))
+        self.assertEqual(report['missing'], [])
+        self.assertEqual(report['failed_shards'], [])
+        self.assertEqual(report['system'], ['fake'])
+        for record in report['records']:
+            self.assertEqual(record['server'], record['port'])
+            self.assertEqual(record['tm_port'], pool.tm_ports[record['shard']])
+        self.assertEqual(set(record['port'] for record in report['records']), set([4000, 4003]))
+        json.dumps(report)
+
+
+class Data(object):
+    def __init__(self, frame, size):
+        self.frame = frame
+        self.raw_data = bytearray(size)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.frame = 10
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def tick(self):
+        self.frame += 1
+        return self.frame
+
+    def run_ticks(self, ticks=20):
+        timer = metrics.TickTimer(self.tick)
+        camera, lidar = metrics.SensorMeter(), metrics.SensorMeter()
+        for _ in range(ticks):
+            frame = timer()
+            camera(Data(frame, 1000))
+            if frame % 2 == 0:
+                lidar(Data(frame, 64))
+        # 计时窗口之外的帧不计入
+        lidar(Data(1, 64))
+        return timer, camera, lidar
+
+    def test_summarize(self):
+        timer, camera, lidar = self.run_ticks()
+        self.assertEqual(timer.frames, list(range(11, 31)))
+        result = metrics.summarize(timer, [camera, lidar], labels=['cam', 'lidar'])
+        self.assertEqual(result['sensor_metrics'][0]['label'], 'cam')
+        self.assertEqual(result['sensor_metrics'][0]['messages'], 20)
+        self.assertEqual(result['sensor_metrics'][1]['messages'], 10)
+        self.assertGreater(result['sensor_metrics'][0]['bytes_per_sec'], result['sensor_metrics'][1]['bytes_per_sec'])
+        self.assertGreaterEqual(result['sensor_metrics'][0]['latency_ms_p50'], 0.0)
+        self.assertLessEqual(result['tick_ms_p50'], result['tick_ms_p99'])
+        self.assertGreater(result['ticks_per_sec'], 0.0)
+        self.assertTrue(all(key in result for key in ('tick_ms_p50', 'tick_ms_p95', 'tick_ms_p99')))
+
+    def test_percentiles(self):
+        result = metrics.percentiles([0.001 * value for value in range(1, 101)], 'tick_ms', 1000.0)
+        self.assertAlmostEqual(result['tick_ms_p50'], 50.5)
+        self.assertAlmostEqual(result['tick_ms_p99'], 99.01)
+        self.assertAlmostEqual(result['tick_ms_max'], 100.0)
+        self.assertTrue(metrics.percentiles([], 'x')['x_p95'] != metrics.percentiles([], 'x')['x_p95'])
+
+    def test_process_meter(self):
+        try:
+            process = metrics.ProcessMeter()
+        except RuntimeError:
+            self.skipTest('psutil is not installed')
+        process.start()
+        self.run_ticks()
+        result = process.stop()
+        self.assertGreater(result['rss_mb'], 0.0)
+        self.assertGreaterEqual(result['cpu_percent'], 0.0)
+
+    def test_csv_and_baseline(self):
+        timer, camera, lidar = self.run_ticks()
+        record = {'town': 'Town01', 'sensors': 'cam ', 'weather': 'ClearNoon', 'n_vehicles': 1, 'n_walkers': 0,
+                  'fps_mean': 20.0}
+        record.update(metrics.summarize(timer, [camera, lidar]))
+        path = os.path.join(self.path, 'results.csv')
+        metrics.write_csv([record], path)
+        with open(path) as source:
+            rows = list(csv.DictReader(source))
+        self.assertEqual(len(rows), 1)
+        self.assertIn('sensor1_latency_ms_p95', rows[0])
+        self.assertNotIn('sensor_metrics', rows[0])
+        path = os.path.join(self.path, 'baseline.json')
+        metrics.write_json([record], path, 'system')
+        baseline = metrics.load_records(path)
+        self.assertEqual(metrics.compare([record], baseline), [])
+        slower = json.loads(json.dumps(record))
+        slower['fps_mean'] = 15.0
+        slower['sensor_metrics'][1]['latency_ms_p99'] = record['sensor_metrics'][1]['latency_ms_p99'] * 2 + 1.0
+        slower['tick_ms_mean'] = record['tick_ms_mean'] * 10
+        regressions = metrics.compare([slower], baseline, threshold=0.1)
+        self.assertEqual(sorted(r['metric'] for r in regressions), ['fps_mean', 'sensor1_latency_ms_p99'])
+        self.assertAlmostEqual([r for r in regressions if r['metric'] == 'fps_mean'][0]['change'], -0.25)
+        other = dict(slower, town='Town02')
+        self.assertEqual(metrics.compare([other], baseline), [])
+
+
+def make_token(stream, port, address='10.0.0.5'):
+    # 录制时服务器在另一台主机上
+    return struct.pack('<IHBB', stream, port, 1, 1) + socket.inet_aton(address) + bytes(12)
+
+
+class RPCClient(object):
+    """
+    Minimal msgpack-rpc client, as rpclib talks to the server.
+    """
+
+    def __init__(self, port):
+        import msgpack
+        self.msgpack = msgpack
+        self.socket = socket.create_connection(('127.0.0.1', port), timeout=5.0)
+        self.unpacker = msgpack.Unpacker(raw=False)
+        self.msgid = 0
+
+    def call(self, method, *params):
+        self.msgid += 1
+        self.socket.sendall(self.msgpack.packb([standin.REQUEST, self.msgid, method, list(params)], use_bin_type=True))
+        while True:
+            for reply in self.unpacker:
+                if reply[1] == self.msgid:
+                    return reply[2], reply[3]
+            self.unpacker.feed(self.socket.recv(1 << 16))
+
+    def close(self):
+        self.socket.close()
+
+
+def read_messages(port, stream, count):
+    connection = socket.create_connection(('127.0.0.1', port), timeout=5.0)
+    connection.sendall(standin.STREAM_ID.pack(stream))
+    messages = []
+    for _ in range(count):
+        size = standin.MESSAGE_SIZE.unpack(standin._read_exactly(connection, 4))[0]
+        messages.append(standin._read_exactly(connection, size))
+    connection.close()
+    return messages
+
+
+class TestStandIn(unittest.TestCase):
+    def setUp(self):
+        try:
+            import msgpack
+        except ImportError:
+            self.skipTest('msgpack is not installed')
+        self.path = tempfile.mkdtemp()
+        self.cassette = standin.Cassette()
+        self.cassette.add_response('get_episode_info', [], [7, make_token(1, 2001)])
+        self.cassette.add_response('get_sensor_token', [5], [make_token(5, 2001)])
+        self.cassette.add_response('get_actors_by_id', [[1]], ['one'])
+        self.cassette.add_response('get_actors_by_id', [[2]], ['two'])
+        self.cassette.add_response('get_actors_by_id', [[2]], ['two again'])
+        for index in range(3):
+            self.cassette.add_message(5, 0.0, b'message%d' % index)
+
+    def tearDown(self):
+        if hasattr(self, 'path'):
+            shutil.rmtree(self.path)
+
+    def test_replay(self):
+        path = os.path.join(self.path, 'session.cassette')
+        self.cassette.save(path)
+        cassette = standin.Cassette.load(path)
+        self.assertEqual(cassette.episode_streams, set([1]))
+        with standin.StandInServer(cassette) as server:
+            client = RPCClient(server.port)
+            self.assertEqual(client.call('get_actors_by_id', [1]), (None, ['one']))
+            self.assertEqual(client.call('get_actors_by_id', [2]), (None, ['two']))
+            self.assertEqual(client.call('get_actors_by_id', [2]), (None, ['two again']))
+            self.assertEqual(client.call('get_actors_by_id', [2]), (None, ['two']))
+            # 未录制的参数使用同一方法的任意响应
+            self.assertEqual(client.call('get_actors_by_id', [3]), (None, ['one']))
+            error, result = client.call('tick_cue')
+            self.assertIn('tick_cue', error)
+            self.assertIsNone(result)
+            error, result = client.call('get_sensor_token', 5)
+            self.assertEqual(standin.token_port(result[0]), server.stream_port)
+            self.assertEqual(standin.token_address(result[0]), '127.0.0.1')
+            self.assertEqual(standin.stream_id(result[0]), 5)
+            client.close()
+            messages = read_messages(server.stream_port, 5, 5)
+            self.assertEqual(messages, [b'message0', b'message1', b'message2', b'message0', b'message1'])
+            self.assertEqual(server.calls['get_actors_by_id'], 5)
+
+    def test_patch_tokens(self):
+        value = {'token': make_token(3, 2001), 'list': [make_token(4, 2002), b'short']}
+        patched = standin.patch_tokens(value, 3000, 'localhost')
+        self.assertEqual([standin.token_port(patched['token']), standin.token_address(patched['token'])],
+                         [3000, '127.0.0.1'])
+        self.assertEqual(standin.token_address(patched['list'][0]), '127.0.0.1')
+        self.assertEqual(patched['list'][1], b'short')
+        # 未指定的地址留空，由客户端使用 RPC 主机
+        token = standin.patch_tokens(make_token(3, 2001), 3000, '0.0.0.0')
+        self.assertIsNone(standin.token_address(token))
+        self.assertEqual(standin.stream_id(token), 3)
+        self.assertEqual(standin.token_address(make_token(3, 2001)), '10.0.0.5')
+
+    def test_recording_proxy(self):
+        cassette = standin.Cassette()
+        with standin.StandInServer(self.cassette) as server:
+            with standin.RecordingProxy(cassette, '127.0.0.1', server.port) as proxy:
+                client = RPCClient(proxy.port)
+                client.call('get_episode_info')
+                client.call('get_actors_by_id', [2])
+                _, result = client.call('get_sensor_token', 5)
+                self.assertEqual(standin.token_port(result[0]), proxy.stream_port)
+                self.assertEqual(standin.token_address(result[0]), '127.0.0.1')
+                client.close()
+                self.assertEqual(read_messages(proxy.stream_port, 5, 2), [b'message0', b'message1'])
+        self.assertEqual(sorted(cassette.rpc), ['get_actors_by_id', 'get_episode_info', 'get_sensor_token'])
+        self.assertEqual(cassette.response('get_actors_by_id', [[2]]), ['two'])
+        self.assertEqual(cassette.episode_streams, set([1]))
+        # 录制的是真实服务器返回的 token
+        self.assertEqual(standin.token_port(cassette.response('get_sensor_token', [5])[0]), server.stream_port)
+        self.assertEqual([payload for _, payload in cassette.messages(5)][:2], [b'message0', b'message1'])
+
+
+class TestClientThroughput(unittest.TestCase):
+    def test_measure(self):
+        calls = []
+        result = client_throughput.measure(lambda: calls.append(1) or 10, repetitions=3, duration=0.05, warmup=0.01)
+        self.assertGreater(result['ops_per_sec'], 0.0)
+        self.assertLessEqual(result['ops_per_sec_min'], result['ops_per_sec'])
+        self.assertLessEqual(result['ops_per_sec'], result['ops_per_sec_max'])
+        self.assertGreaterEqual(result['spread'], 0.0)
+
+    def test_compare_by_case(self):
+        baseline = [{'case': 'waypoint_next', 'ops_per_sec': 1000.0, 'ops_per_sec_min': 900.0}]
+        records = [{'case': 'waypoint_next', 'ops_per_sec': 800.0, 'ops_per_sec_min': 100.0}]
+        regressions = metrics.compare(records, baseline, 0.1, client_throughput.CASE_KEY)
+        self.assertEqual([r['metric'] for r in regressions], ['ops_per_sec'])
+        self.assertEqual(regressions[0]['scenario'], {'case': 'waypoint_next'})
+
+
+# 没有服务器监听的端口
+FAKE_DEAD_PORT = 1
+
+
+def fake_connect(host, port, timeout):
+    # 代替 carla.Client，world 就是端口号
+    return port
+
+
+def fake_setup(client):
+    return client
+
+
+def fake_job(world, job):
+    if world == FAKE_DEAD_PORT:
+        raise RuntimeError('time-out of 0.5 ms while waiting for the simulator')
+    if job['params']['x'] == 3.0:
+        raise ValueError('unstable')
+    return {'double': 2 * job['params']['x'], 'scenario_arg': job['args'].get('speed')}
+
+
+class Pool(object):
+    def __init__(self, ports):
+        self.host = 'localhost'
+        self.ports = ports
+
+    def restart(self, index):
+        return False
+
+
+class TestRollout(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.listeners = []
+
+    def tearDown(self):
+        for listener in self.listeners:
+            listener.close()
+        shutil.rmtree(self.path)
+
+    def listen(self):
+        listener = socket.socket()
+        listener.bind(('localhost', 0))
+        listener.listen(8)
+        self.listeners.append(listener)
+        return listener.getsockname()[1]
+
+    def test_jobs(self):
+        self.assertEqual(rollout.parameter_grid({'b': [1, 2], 'a': [3]}), [{'a': 3, 'b': 1}, {'a': 3, 'b': 2}])
+        self.assertEqual(rollout.parameter_grid({}), [{}])
+        jobs = rollout.make_jobs(['uturn', ('brake', {'speed': 80})], {'drag': [0.2, 0.3]}, ['vehicle.a', 'vehicle.b'])
+        self.assertEqual(len(jobs), 8)
+        self.assertEqual(len(set(job['key'] for job in jobs)), 8)
+        self.assertEqual(jobs[-1]['key'], 'brake(speed=80)|vehicle.b|drag=0.3')
+
+    def test_store_resumes(self):
+        path = os.path.join(self.path, 'results.jsonl')
+        store = rollout.ResultStore(path)
+        store.add({'key': 'a', 'scenario': 's', 'blueprint': None, 'params': {'x': 1}, 'metrics': {'m': 2},
+                   'error': None})
+        store.add({'key': 'b', 'scenario': 's', 'blueprint': None, 'params': {'x': 2}, 'metrics': {},
+                   'error': 'failed'})
+        with open(path, 'a') as output:
+            output.write('{"key": "c", "scen')
+        store = rollout.ResultStore(path)
+        self.assertEqual(store.completed(), set(['a']))
+        columns, rows = store.table()
+        self.assertEqual(columns[:3], ['key', 'scenario', 'blueprint'])
+        self.assertEqual(rows[0][columns.index('m')], 2)
+        self.assertEqual(rows[1][columns.index('error')], 'failed')
+        store.save_csv(os.path.join(self.path, 'results.csv'))
+        with open(os.path.join(self.path, 'results.csv')) as source:
+            self.assertEqual(len(list(csv.reader(source))), 3)
+
+    def test_runner(self):
+        jobs = rollout.make_jobs([('brake', {'speed': 80})], {'x': [1.0, 2.0, 3.0, 4.0, 5.0]})
+        store = rollout.ResultStore(os.path.join(self.path, 'results.jsonl'))
+        ports = [self.listen(), self.listen()]
+        runner = rollout.RolloutRunner(fake_job, Pool(ports), store, setup=fake_setup, timeout=0.5,
+                                       connector=fake_connect)
+        self.assertEqual(runner.run(jobs), 5)
+        self.assertEqual(len(store.completed()), 4)
+        columns, rows = store.table()
+        doubles = sorted(row[columns.index('double')] for row in rows if row[columns.index('double')] is not None)
+        self.assertEqual(doubles, [2.0, 4.0, 8.0, 10.0])
+        self.assertEqual(set(row[columns.index('scenario_arg')] for row in rows), set([80, None]))
+        # 再次运行只重跑失败的任务
+        self.assertEqual(runner.run(jobs), 1)
+        self.assertEqual(runner.run(jobs[:2]), 0)
+
+    def test_dead_server(self):
+        jobs = rollout.make_jobs(['uturn'], {'x': [1.0, 2.0, 4.0]})
+        store = rollout.ResultStore(os.path.join(self.path, 'results.jsonl'))
+        port = self.listen()
+        runner = rollout.RolloutRunner(fake_job, Pool([FAKE_DEAD_PORT, port]), store, setup=fake_setup,
+                                       timeout=0.5, connector=fake_connect)
+        self.assertEqual(runner.run(jobs), 3)
+        self.assertEqual(len(store.completed()), 3)
+        self.assertEqual(set(row['port'] for row in store.rows.values()), set([port]))
+        self.assertEqual(runner.dead, [FAKE_DEAD_PORT])
+        runner = rollout.RolloutRunner(fake_job, Pool([FAKE_DEAD_PORT]), rollout.ResultStore(
+            os.path.join(self.path, 'other.jsonl')), setup=fake_setup, timeout=0.5, connector=fake_connect)
+        with self.assertRaises(RuntimeError):
+            runner.run(jobs)
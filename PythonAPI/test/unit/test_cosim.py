@@ -0,0 +1,157 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import threading
+import unittest
+
+from cosim.bridge import ActorTracker, CoSimulationBridge
+from cosim.pipeline import PipelinedRunner, StandInModel, StepTimes
+
+
+class Actor(object):
+    def __init__(self, actor_id, type_id):
+        self.id = actor_id
+        self.type_id = type_id
+
+
+class ActorSnapshot(object):
+    def __init__(self, actor_id, frame):
+        self.id = actor_id
+        self.frame = frame
+
+
+class WorldSnapshot(object):
+    def __init__(self, frame, actors):
+        self.frame = frame
+        self.actors = dict((actor, ActorSnapshot(actor, frame)) for actor in actors)
+
+    def __iter__(self):
+        return iter(self.actors.values())
+
+    def find(self, actor_id):
+        return self.actors.get(actor_id)
+
+
+class World(object):
+    # 只实现 get_actors(ids) 和 get_snapshot，并记录 get_actors 的调用
+    def __init__(self, types):
+        self.types = types
+        self.frame = 0
+        self.alive = []
+        self.requests = []
+
+    def get_actors(self, actor_ids):
+        self.requests.append(list(actor_ids))
+        return [Actor(actor_id, self.types[actor_id]) for actor_id in actor_ids]
+
+    def get_snapshot(self):
+        self.frame += 1
+        return WorldSnapshot(self.frame, self.alive)
+
+
+class TestActorTracker(unittest.TestCase):
+    def test_snapshot_diffing(self):
+        world = World({1: 'spectator', 2: 'vehicle.audi.tt', 3: 'walker.pedestrian.0001', 4: 'vehicle.tesla.model3'})
+        tracker = ActorTracker(world, ('vehicle.*',))
+        added, removed = tracker.update(WorldSnapshot(1, [1, 2, 3]))
+        self.assertEqual([actor.id for actor in added], [2])
+        self.assertEqual(removed, [])
+        # 没有新参与者时不调用 get_actors
+        added, removed = tracker.update(WorldSnapshot(2, [1, 2, 3]))
+        self.assertEqual((added, removed), ([], []))
+        self.assertEqual(world.requests, [[1, 2, 3]])
+        added, removed = tracker.update(WorldSnapshot(3, [1, 3, 4]))
+        self.assertEqual([actor.id for actor in added], [4])
+        self.assertEqual(removed, [2])
+        self.assertEqual(world.requests[-1], [4])
+        self.assertEqual(sorted(tracker.actors), [4])
+
+
+class TestCoSimulationBridge(unittest.TestCase):
+    def test_sync_and_states(self):
+        world = World({1: 'vehicle.a', 2: 'vehicle.b', 3: 'walker.pedestrian.0001', 5: 'vehicle.c'})
+        bridge = CoSimulationBridge(None, world)
+        bridge.register_external('agent0', Actor(1, 'vehicle.a'))
+        with self.assertRaises(RuntimeError):
+            bridge.internal_states()
+        world.alive = [1, 2, 3]
+        added, removed = bridge.sync()
+        self.assertEqual(sorted(actor.id for actor in added), [2, 3])
+        self.assertEqual([actor_id for actor_id, _ in bridge.internal_states()], [2, 3])
+        self.assertEqual(bridge.internal_states([3])[0][1].frame, 1)
+        # 外部参与者被销毁后自动注销
+        world.alive = [2, 3, 5]
+        added, removed = bridge.sync()
+        self.assertEqual([actor.id for actor in added], [5])
+        self.assertEqual(removed, [1])
+        self.assertEqual(bridge.external, {})
+        self.assertFalse(bridge.is_external(1))
+        self.assertEqual(bridge.apply_poses({'agent0': None}), 0)
+
+
+class TestPipelinedRunner(unittest.TestCase):
+    def run_model(self, pipelined, steps=20):
+        model = StandInModel(agents=3)
+        observations, applied, calls = [], [], []
+        # 流水线模式下第 k + 1 次 drive 必须与第 k 次 tick 同时进行，
+        # 两边在屏障处相遇，串行执行时屏障超时
+        barrier = threading.Barrier(2, timeout=5.0)
+
+        def drive(observation):
+            calls.append('drive')
+            if pipelined and len(observations) > 0:
+                barrier.wait()
+            observations.append(observation)
+            return model(observation)
+
+        def apply(result):
+            calls.append('apply')
+            applied.append(result)
+
+        def tick():
+            calls.append('tick')
+            if pipelined and calls.count('tick') < steps:
+                barrier.wait()
+            # 代理 2 不由模型驱动，每次 tick 后观测到它停在原点
+            return {2: len(applied)}
+
+        runner = PipelinedRunner(drive, apply, tick, pipelined=pipelined)
+        times = runner.run(steps, {0: 1.0}, None)
+        return runner, times, observations, applied, calls
+
+    def test_serial(self):
+        runner, times, observations, applied, calls = self.run_model(False)
+        self.assertEqual(calls, ['drive', 'apply', 'tick'] * 20)
+        self.assertEqual(observations[0], {0: 1.0})
+        self.assertEqual(observations[1:], [{2: step} for step in range(1, 20)])
+        self.assertEqual(runner.observation, {2: 20})
+        self.assertAlmostEqual(applied[-1][0], 1.0 + 20 * 0.1)
+        self.assertEqual(times.summary()['overlap'], 0.0)
+
+    def test_pipelined_overlaps_model_and_tick(self):
+        runner, times, observations, applied, calls = self.run_model(True)
+        # 每个观测恰好交给模型一次，第二步还没有 tick 的观测，最后一次 tick 的观测留在 runner 中
+        self.assertEqual(observations[:2], [{0: 1.0}, None])
+        self.assertEqual(observations[2:], [{2: step} for step in range(1, 19)])
+        self.assertEqual(runner.observation, {2: 20})
+        self.assertEqual(len(applied), 20)
+        self.assertEqual(calls.count('drive'), 20)
+        self.assertAlmostEqual(applied[-1][0], 1.0 + 20 * 0.1)
+        self.assertEqual(len(times.step), 20)
+        with self.assertRaises(ValueError):
+            times.summary(warmup=20)
+
+    def test_summary(self):
+        times = StepTimes()
+        times.drive = [0.1] * 4
+        times.tick = [0.2] * 4
+        times.wait = [0.025] * 4
+        times.step = [0.25] * 4
+        summary = times.summary(warmup=1)
+        self.assertEqual(summary['steps'], 3)
+        self.assertAlmostEqual(summary['fps'], 4.0)
+        self.assertAlmostEqual(summary['overlap'], 0.75)
+        self.assertAlmostEqual(summary['tick_ms'], 200.0)
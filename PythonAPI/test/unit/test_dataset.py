@@ -0,0 +1,184 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from dataset.codecs import CODECS, decode, encode_png, decode_png
+from dataset.reader import DatasetReader
+from dataset.writer import DatasetWriter
+
+
+class FakeImage(object):
+    # 模拟carla.Image，只提供写入器需要的属性
+    def __init__(self, frame, array):
+        self.frame = frame
+        self.timestamp = frame * 0.05
+        self.height, self.width = array.shape[:2]
+        self.raw_data = array.tobytes()
+
+
+class TestCodecs(unittest.TestCase):
+    def test_png_round_trip(self):
+        for shape in [(7, 9), (7, 9, 3), (7, 9, 4)]:
+            array = np.random.randint(0, 255, shape, dtype=np.uint8)
+            self.assertTrue((decode_png(encode_png(array)) == array).all())
+
+    def test_png_rejects_float(self):
+        with self.assertRaises(ValueError):
+            encode_png(np.zeros((2, 2), dtype=np.float32))
+
+
+class TestDatasetWriter(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def read(self, entry):
+        # 通过索引中的偏移直接读取样本，不解析tar文件
+        with open(os.path.join(self.path, 'shard-%06d.tar' % entry['shard']), 'rb') as shard:
+            shard.seek(int(entry['offset']))
+            payload = shard.read(int(entry['length']))
+        shape = tuple(entry['shape'][:entry['ndim']])
+        return decode(payload, CODECS[entry['codec']], entry['dtype'].decode('ascii'), shape)
+
+    def test_round_trip(self):
+        images, clouds = {}, {}
+        with DatasetWriter(self.path, frames_per_shard=4, max_in_flight_bytes=4096, workers=2) as writer:
+            for frame in range(10):
+                images[frame] = np.random.randint(0, 255, (6, 8, 4), dtype=np.uint8)
+                clouds[frame] = np.random.rand(50, 4).astype(np.float32)
+                writer.add_image(FakeImage(frame, images[frame]), 'rgb')
+                writer.add(frame, 'lidar', clouds[frame], 'zlib')
+        with open(os.path.join(self.path, 'dataset.json')) as manifest:
+            manifest = json.load(manifest)
+        self.assertEqual(manifest['sensors'], ['rgb', 'lidar'])
+        self.assertEqual(len(manifest['shards']), 3)
+        index = np.load(os.path.join(self.path, 'index.npy'))
+        self.assertEqual(len(index), 20)
+        for entry in index:
+            sample = self.read(entry)
+            if entry['sensor'] == 0:
+                self.assertTrue((sample == images[entry['frame']][:, :, 2::-1]).all())
+            else:
+                self.assertTrue((sample == clouds[entry['frame']]).all())
+
+    def test_frames_stay_in_one_shard(self):
+        with DatasetWriter(self.path, frames_per_shard=1) as writer:
+            for frame in range(3):
+                for sensor in ['a', 'b', 'c']:
+                    writer.add(frame, sensor, np.arange(4), 'raw')
+        index = np.load(os.path.join(self.path, 'index.npy'))
+        self.assertEqual(list(index['shard']), [0, 0, 0, 1, 1, 1, 2, 2, 2])
+
+    def test_interleaved_frames(self):
+        # 两个传感器回调的帧交错到达
+        order = [('rgb', 0), ('lidar', 1), ('rgb', 1), ('lidar', 0), ('rgb', 2), ('lidar', 3),
+                 ('rgb', 3), ('lidar', 2), ('rgb', 4), ('lidar', 5), ('lidar', 4), ('rgb', 5)]
+        with DatasetWriter(self.path, frames_per_shard=2) as writer:
+            for sensor, frame in order:
+                writer.add(frame, sensor, np.full(4, frame))
+        index = np.load(os.path.join(self.path, 'index.npy'))
+        self.assertEqual(len(index), 12)
+        shards = {}
+        for entry in index:
+            shards.setdefault(int(entry['frame']), set()).add(int(entry['shard']))
+            self.assertTrue((self.read(entry) == entry['frame']).all())
+        self.assertEqual(shards, {0: {0}, 1: {0}, 2: {1}, 3: {1}, 4: {2}, 5: {2}})
+        for shard in range(3):
+            self.assertTrue(os.path.isfile(os.path.join(self.path, 'shard-%06d.idx.npy' % shard)))
+
+    def test_sensors_from_threads(self):
+        # 模拟多个传感器回调线程同时注册新的传感器
+        barrier = threading.Barrier(8)
+
+        def listen(writer, number):
+            barrier.wait()
+            writer.add(0, 'sensor%d' % number, np.full(4, number))
+
+        with DatasetWriter(self.path) as writer:
+            threads = [threading.Thread(target=listen, args=(writer, number)) for number in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(sorted(writer.sensors), ['sensor%d' % number for number in range(8)])
+        for entry in np.load(os.path.join(self.path, 'index.npy')):
+            number = int(writer.sensors[entry['sensor']][len('sensor'):])
+            self.assertTrue((self.read(entry) == number).all())
+
+    def test_closed_writer(self):
+        writer = DatasetWriter(self.path)
+        writer.close()
+        with self.assertRaises(RuntimeError):
+            writer.add(0, 'a', np.zeros(3))
+
+
+class TestDatasetReader(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.images = np.random.randint(0, 255, (12, 6, 8, 4), dtype=np.uint8)
+        self.clouds = [np.random.rand(10 + i, 4).astype(np.float32) for i in range(12)]
+        with DatasetWriter(self.path, frames_per_shard=5) as writer:
+            for frame in range(12):
+                writer.add_image(FakeImage(100 + frame, self.images[frame]), 'bgra', codec='raw')
+                writer.add(100 + frame, 'lidar', self.clouds[frame], 'zlib', timestamp=frame * 0.05)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_frames(self):
+        reader = DatasetReader(self.path)
+        self.assertEqual(len(reader), 12)
+        sample = reader[3]
+        self.assertEqual(sorted(sample.keys()), ['bgra', 'lidar'])
+        self.assertTrue((sample['bgra'] == self.images[3]).all())
+        self.assertTrue((sample['lidar'] == self.clouds[3]).all())
+        self.assertTrue((reader.get(107, 'lidar') == self.clouds[7]).all())
+        with self.assertRaises(KeyError):
+            reader.get(500, 'lidar')
+
+    def test_raw_samples_are_views(self):
+        reader = DatasetReader(self.path)
+        self.assertFalse(reader.get(101, 'bgra').flags.owndata)
+
+    def test_stack(self):
+        reader = DatasetReader(self.path)
+        stacked = reader.stack('bgra', frames=(100, 104))
+        self.assertFalse(stacked.flags.owndata)
+        self.assertTrue((stacked == self.images[0:5]).all())
+        # 跨越多个shard时退回拷贝
+        stacked = reader.stack('bgra')
+        self.assertTrue((stacked == self.images).all())
+
+    def test_select_time_range(self):
+        reader = DatasetReader(self.path, sensors=['lidar'])
+        entries = reader.select(time_range=(0.1, 0.2))
+        self.assertEqual(list(entries['frame']), [102, 103, 104])
+        arrays = [array for _, array in reader.iter_samples(entries)]
+        self.assertTrue((arrays[0] == self.clouds[2]).all())
+
+    def test_pickle(self):
+        reader = DatasetReader(self.path)
+        reader[0]
+        clone = pickle.loads(pickle.dumps(reader))
+        self.assertTrue((clone[1]['bgra'] == self.images[1]).all())
+
+    def test_unclosed_writer(self):
+        os.remove(os.path.join(self.path, 'index.npy'))
+        os.remove(os.path.join(self.path, 'dataset.json'))
+        reader = DatasetReader(self.path)
+        self.assertEqual(len(reader), 12)
+        self.assertEqual(reader.sensors, ['sensor_0', 'sensor_1'])
@@ -0,0 +1,343 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from determinism import checkpoint, compare, snapshot, telemetry
+
+
+class Vector(object):
+    def __init__(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+
+
+class Timestamp(object):
+    def __init__(self, elapsed_seconds):
+        self.elapsed_seconds = elapsed_seconds
+
+
+class Transform(object):
+    def __init__(self, location):
+        self.location = location
+
+
+class ActorSnapshot(object):
+    # 与 carla.ActorSnapshot 相同的接口，数值由 actor id 和帧号决定
+    def __init__(self, actor_id, frame):
+        self.id = actor_id
+        self.frame = frame
+
+    def get_transform(self):
+        return Transform(Vector(self.id, self.frame, 0.5))
+
+    def get_velocity(self):
+        return Vector(self.frame * 0.1, 0.0, -self.id)
+
+    def get_angular_velocity(self):
+        return Vector(0.0, self.id * 2.0, 0.0)
+
+
+class WorldSnapshot(object):
+    def __init__(self, frame, actors):
+        self.frame = frame
+        self.timestamp = Timestamp(frame * 0.05)
+        self.actors = dict((actor, ActorSnapshot(actor, frame)) for actor in actors)
+
+    def find(self, actor_id):
+        return self.actors.get(actor_id)
+
+    def get_actor_states(self, actor_ids):
+        # 按 WorldSnapshot.get_actor_states 的格式打包，旋转和加速度为 0
+        states = np.full((len(actor_ids), snapshot.STATE_WIDTH), np.nan)
+        for row, actor_id in zip(states, actor_ids):
+            actor = self.actors.get(actor_id)
+            if actor is not None:
+                location = actor.get_transform().location
+                velocity, angular = actor.get_velocity(), actor.get_angular_velocity()
+                row[:] = [location.x, location.y, location.z, 0.0, 0.0, 0.0,
+                          velocity.x, velocity.y, velocity.z, angular.x, angular.y, angular.z, 0.0, 0.0, 0.0]
+        return states.tobytes()
+
+
+class TestSnapshotRecorder(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def record(self, ticks, fields=snapshot.FIELDS):
+        recorder = snapshot.SnapshotRecorder(fields)
+        recorder.start(WorldSnapshot(100, [7, 9]))
+        recorder.add(7, 'ego')
+        recorder.add(9)
+        for frame in range(101, 101 + ticks):
+            # actor 9 在第 104 帧之后被销毁
+            recorder.record(WorldSnapshot(frame, [7, 9] if frame <= 104 else [7]))
+        return recorder
+
+    def test_table_layout(self):
+        recorder = self.record(40)
+        self.assertEqual(recorder.data.shape, (40, 2, 9))
+        self.assertEqual(recorder.columns[:3], ('x', 'y', 'z'))
+        table = recorder.table('ego')
+        self.assertEqual(table.shape, (40, 11))
+        np.testing.assert_allclose(table[0], [1, 0.05, 7, 101, 0.5, 10.1, 0, -7, 0, 14, 0])
+        self.assertTrue(np.isnan(recorder.table(9)[4:, 2:]).all())
+        self.assertFalse(np.isnan(recorder.table(9)[:4]).any())
+
+    def test_fields_order(self):
+        recorder = self.record(3, ('velocity', 'location'))
+        np.testing.assert_allclose(recorder.data[0, 0], [10.1, 0, -7, 7, 101, 0.5])
+        with self.assertRaises(ValueError):
+            snapshot.SnapshotRecorder(('location', 'speed'))
+        with self.assertRaises(KeyError):
+            recorder.table('missing')
+
+    def test_save_load_and_compare(self):
+        recorder = self.record(20)
+        path = os.path.join(self.path, 'run.npz')
+        recorder.save(path)
+        loaded = snapshot.SnapshotRecorder.load(path)
+        self.assertEqual(loaded.names, ['ego', '9'])
+        self.assertEqual(loaded.ids, [7, 9])
+        self.assertEqual(loaded.fields, snapshot.FIELDS)
+        np.testing.assert_array_equal(loaded.table('ego'), recorder.table('ego'))
+        self.assertEqual(snapshot.max_difference(recorder, loaded), 0.0)
+        loaded.data[3, 0, 1] += 0.5
+        self.assertAlmostEqual(snapshot.max_difference(recorder, loaded), 0.5)
+        self.assertEqual(snapshot.max_difference(recorder, self.record(21)), float('inf'))
+
+
+class TestCompare(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def write_run(self, repetition, offsets, text=False):
+        # 每帧一个文件，offsets[frame] 为该帧叠加的误差
+        paths = []
+        for frame, offset in enumerate(offsets):
+            points = np.arange(12, dtype=np.float32).reshape(3, 4) * (frame + 1) + offset
+            path = os.path.join(self.path, 'rep%d_%04d' % (repetition, frame))
+            if text:
+                path += '.out'
+                np.savetxt(path, points)
+            else:
+                path += '.npy'
+                np.save(path, points)
+            paths.append(path)
+        return paths
+
+    def test_file_stream(self):
+        clean = [0.0] * 6
+        runs = [
+            self.write_run(0, clean),
+            self.write_run(1, clean),
+            self.write_run(2, [0.0, 0.0, 0.001, 0.0, 0.0, 0.0]),
+            self.write_run(3, [0.0, 0.0, 0.0, 0.0, 0.5, 0.0]),
+            self.write_run(4, clean)]
+        result = compare.check_stream(compare.file_stream('0_LiDAR', runs), tolerance=0.01)
+        self.assertEqual(result.groups, [[0, 1, 4], [2], [3]])
+        self.assertEqual(result.divergence, 4)
+        self.assertFalse(result.deterministic)
+        self.assertEqual(result.matrix.sum(axis=1).tolist(), [4, 4, 4, 1, 4])
+        self.assertEqual(compare.determinism_set(result.matrix), [4, 1])
+
+    def test_text_frames_and_length(self):
+        runs = [self.write_run(0, [0.0] * 3, text=True), self.write_run(1, [0.0] * 3, text=True)]
+        self.assertTrue(compare.check_stream(compare.file_stream('radar', runs)).deterministic)
+        result = compare.check_stream(compare.file_stream('radar', [runs[0], runs[1][:2]]))
+        self.assertEqual(result.divergence, 2)
+
+    def test_snapshot_streams_in_pool(self):
+        paths = []
+        for repetition in range(3):
+            recorder = snapshot.SnapshotRecorder()
+            recorder.add(7, 'ego')
+            recorder.add(9, 'other')
+            for frame in range(1, 11):
+                world = WorldSnapshot(frame, [7, 9])
+                if repetition == 2 and frame >= 6:
+                    world.actors[9].frame += 1
+                recorder.record(world)
+            paths.append(os.path.join(self.path, 'run%d.npz' % repetition))
+            recorder.save(paths[-1])
+        results = compare.check_streams(compare.snapshot_streams(paths), processes=2)
+        self.assertEqual([result.name for result in results], ['ego', 'other'])
+        self.assertTrue(results[0].deterministic)
+        self.assertEqual(results[1].divergence, 5)
+        self.assertEqual(compare.determinism_set(compare.consistency_matrix(results, 3)), [2, 1])
+        # 没有传感器流时所有重复都一致
+        self.assertEqual(compare.determinism_set(compare.consistency_matrix([], 3)), [3])
+
+
+class Actor(object):
+    def __init__(self, actor_id, type_id):
+        self.id = actor_id
+        self.type_id = type_id
+        self.attributes = {'role_name': 'autopilot'}
+
+    def get_control(self):
+        return 'control %d' % self.id
+
+    def get_light_state(self):
+        return 'lights %d' % self.id
+
+
+class TrafficLight(Actor):
+    def __init__(self, actor_id, state):
+        super(TrafficLight, self).__init__(actor_id, 'traffic.traffic_light')
+        self.state = state
+        self.times = [10.0, 3.0, 2.0]
+        self.frozen = False
+        self.calls = []
+
+    def get_state(self):
+        return self.state
+
+    def set_state(self, state):
+        self.calls.append('state')
+        self.state = state
+
+    def get_green_time(self):
+        return self.times[0]
+
+    def set_green_time(self, value):
+        self.calls.append('green')
+        self.times[0] = value
+
+    def get_yellow_time(self):
+        return self.times[1]
+
+    def set_yellow_time(self, value):
+        self.times[1] = value
+
+    def get_red_time(self):
+        return self.times[2]
+
+    def set_red_time(self, value):
+        self.times[2] = value
+
+    def get_elapsed_time(self):
+        return 1.5
+
+    def is_frozen(self):
+        return self.frozen
+
+    def freeze(self, frozen):
+        self.frozen = frozen
+
+
+class World(object):
+    def __init__(self, actors):
+        self.actors = actors
+
+    def get_snapshot(self):
+        return WorldSnapshot(12, [actor.id for actor in self.actors])
+
+    def get_actors(self):
+        return self.actors
+
+
+class TestWorldCheckpoint(unittest.TestCase):
+    def test_capture(self):
+        light = TrafficLight(5, 'Red')
+        world = World([Actor(1, 'vehicle.audi.tt'), Actor(2, 'walker.pedestrian.0001'),
+                       Actor(3, 'controller.ai.walker'), Actor(4, 'sensor.camera.rgb'), light])
+        state = checkpoint.WorldCheckpoint.capture(world, autopilot=[1], traffic_manager_seed=7)
+        self.assertEqual(state.frame, 12)
+        self.assertEqual(sorted(state.actors), [1, 2, 3])
+        self.assertEqual(list(state.traffic_lights), [5])
+        vehicle = state.actors[1]
+        self.assertTrue(vehicle.is_vehicle and vehicle.autopilot)
+        self.assertEqual((vehicle.control, vehicle.light_state), ('control 1', 'lights 1'))
+        self.assertAlmostEqual(vehicle.velocity.x, 1.2)
+        walker = state.actors[2]
+        self.assertTrue(walker.is_walker and not walker.autopilot)
+        self.assertEqual((walker.control, walker.light_state), ('control 2', None))
+        self.assertEqual(state.actors[3].control, None)
+        self.assertEqual(state.traffic_manager_seed, 7)
+
+    def test_plan(self):
+        world = World([Actor(1, 'vehicle.audi.tt'), Actor(2, 'walker.pedestrian.0001'),
+                       Actor(3, 'controller.ai.walker')])
+        state = checkpoint.WorldCheckpoint.capture(world)
+        # 行人 2 和它的控制器 3 被销毁，生成了新的车辆 8
+        plan = state.plan([1, 8])
+        self.assertEqual((plan.update, plan.destroy, plan.respawn), ([1], [8], [2]))
+        # 重新生成后行人的 id 变为 9
+        state.respawned[2] = 9
+        plan = state.plan([1, 9, 3])
+        self.assertEqual((plan.update, plan.destroy, plan.respawn), ([1, 3, 2], [], []))
+        plan = state.plan([2])
+        self.assertEqual((plan.update, plan.destroy, plan.respawn), ([], [2], [1, 2]))
+
+    def test_traffic_light(self):
+        light = TrafficLight(5, 'Red')
+        state = checkpoint.TrafficLightState(light)
+        self.assertEqual(state.restore(light), 0)
+        light.state, light.times[0], light.frozen = 'Green', 20.0, True
+        self.assertEqual(state.restore(light), 3)
+        self.assertEqual((light.state, light.times, light.frozen), ('Red', [10.0, 3.0, 2.0], False))
+        self.assertEqual(state.elapsed, 1.5)
+
+
+class TestTelemetry(unittest.TestCase):
+    def braking(self, ticks=101, dt=0.05):
+        # 以 -8 m/s^2 从 20 m/s 沿 y 轴匀减速，之后静止
+        elapsed = np.arange(ticks) * dt
+        speeds = np.maximum(20.0 - 8.0 * elapsed, 0.0)
+        location = np.zeros((ticks, 3))
+        location[1:, 1] = np.cumsum((speeds[1:] + speeds[:-1]) / 2.0 * dt)
+        rotation = np.zeros((ticks, 3))
+        rotation[:, 1] = 90.0
+        velocity = np.zeros((ticks, 3))
+        velocity[:, 1] = speeds
+        acceleration = np.zeros((ticks, 3))
+        acceleration[:, 1] = np.where(speeds > 0.0, -8.0, 0.0)
+        return elapsed, location, rotation, velocity, acceleration
+
+    def test_split(self):
+        table = np.arange(24.0).reshape(2, 12)
+        location, rotation, velocity, acceleration = telemetry.split(table)
+        self.assertEqual(location.tolist(), [[0.0, 1.0, 2.0], [12.0, 13.0, 14.0]])
+        self.assertEqual(acceleration[0].tolist(), [9.0, 10.0, 11.0])
+
+    def test_stopping_and_speed(self):
+        elapsed, location, rotation, velocity, acceleration = self.braking()
+        self.assertAlmostEqual(telemetry.stopping_distance(location, velocity), 25.0, places=6)
+        self.assertTrue(np.isnan(telemetry.stopping_distance(location[:10], velocity[:10])))
+        # 倒过来就是加速过程
+        self.assertAlmostEqual(telemetry.time_to_speed(elapsed, velocity[::-1], 10.0), 3.75, places=6)
+        self.assertAlmostEqual(telemetry.time_to_speed(elapsed, velocity[::-1], 10.0, start=60), 0.75, places=6)
+        self.assertEqual(telemetry.time_to_speed(elapsed, velocity[::-1], 10.0, start=80), 0.0)
+        self.assertTrue(np.isnan(telemetry.time_to_speed(elapsed, velocity[::-1], 30.0)))
+        metrics = telemetry.summarize(elapsed, location, rotation, velocity, acceleration, end=51)
+        self.assertAlmostEqual(metrics['duration'], 2.5)
+        self.assertAlmostEqual(metrics['start_speed'], 72.0)
+        self.assertAlmostEqual(metrics['end_speed'], 0.0)
+        self.assertAlmostEqual(metrics['max_lateral_acceleration'], 0.0)
+        with self.assertRaises(ValueError):
+            telemetry.summarize(elapsed, location, rotation, velocity, acceleration, start=200)
+
+    def test_turning(self):
+        elapsed = np.arange(50) * 0.1
+        rotation = np.zeros((50, 3))
+        # 偏航角以 30 deg/s 增加，跨过 180 度的跳变
+        rotation[:, 1] = (170.0 + 30.0 * elapsed + 180.0) % 360.0 - 180.0
+        np.testing.assert_allclose(telemetry.yaw_rate(elapsed, rotation), 30.0)
+        rotation[:, 1] = 90.0
+        acceleration = np.zeros((50, 3))
+        acceleration[:, 0] = -3.0
+        np.testing.assert_allclose(telemetry.lateral_acceleration(rotation, acceleration), 3.0)
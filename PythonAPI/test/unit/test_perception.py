@@ -0,0 +1,169 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import unittest
+
+import numpy as np
+
+from perception import bev, labels, pointcloud
+
+
+class TestLabels(unittest.TestCase):
+    def setUp(self):
+        # 构造一个实例分割缓冲区：R为语义标签，G为实例号低字节，B为高字节
+        self.bgra = np.zeros((4, 5, 4), dtype=np.uint8)
+        self.bgra[..., 3] = 255
+        self.bgra[:2, :, 2] = 14
+        self.bgra[:2, :, 1] = 0x34
+        self.bgra[:2, :, 0] = 0x12
+        self.bgra[2:, 1:3, 2] = 12
+        self.bgra[2:, 1:3, 1] = 7
+
+    def test_colorize_matches_palette(self):
+        colored = labels.colorize(labels.semantic_tags(self.bgra))
+        self.assertEqual(colored.shape, (4, 5, 4))
+        self.assertEqual(tuple(colored[0, 0]), (142, 0, 0, 255))
+        self.assertEqual(tuple(colored[3, 0]), (0, 0, 0, 255))
+        # 超出调色板的标签与C++实现一样循环取色
+        wrapped = labels.colorize(np.array([len(labels.CITYSCAPES_PALETTE) + 1], dtype=np.uint8))
+        self.assertEqual(tuple(wrapped[0, :3]), (128, 64, 128))
+
+    def test_remap(self):
+        table = labels.remap_table({14: 1, 12: 2}, default=0)
+        remapped = labels.remap(labels.semantic_tags(self.bgra), table)
+        self.assertEqual(remapped[0, 0], 1)
+        self.assertEqual(remapped[2, 1], 2)
+        self.assertEqual(remapped[2, 0], 0)
+
+    def test_decode_instances(self):
+        tags, ids = labels.decode_instances(self.bgra)
+        self.assertEqual(tags[0, 0], 14)
+        self.assertEqual(ids[0, 0], 0x1234)
+        self.assertEqual(ids[2, 2], 7)
+
+    def test_instance_stats(self):
+        stats = labels.instance_stats(*labels.decode_instances(self.bgra), with_boxes=True)
+        by_id = {int(row['id']): row for row in stats}
+        self.assertEqual(int(by_id[0x1234]['pixels']), 10)
+        self.assertEqual(int(by_id[7]['tag']), 12)
+        self.assertEqual((by_id[7]['xmin'], by_id[7]['ymin'], by_id[7]['xmax'], by_id[7]['ymax']), (1, 2, 2, 3))
+
+    def test_class_counts(self):
+        counts = labels.class_counts(labels.semantic_tags(self.bgra))
+        self.assertEqual(counts[14], 10)
+        self.assertEqual(counts[12], 4)
+        self.assertEqual(counts[0], 6)
+
+    def test_colorize_points(self):
+        colors = labels.colorize_points(np.array([1, 14], dtype=np.uint32))
+        self.assertTrue(np.allclose(colors[1], np.array([0, 0, 142]) / 255.0))
+
+
+class TestPointCloud(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        ground = np.c_[rng.uniform(-20, 20, (2000, 2)), np.full(2000, -1.8), rng.rand(2000)]
+        boxes = np.c_[rng.uniform(-20, 20, (1000, 2)), rng.uniform(0.0, 2.0, 1000), rng.rand(1000)]
+        self.points = np.vstack([ground, boxes]).astype(np.float32)
+
+    def test_crop(self):
+        points = np.array([[1, 0, 0, 0], [10, 0, 0, 0], [0, 5, 0, 0], [-3, 0, 0, 0]], dtype=np.float32)
+        self.assertEqual(len(pointcloud.crop(points, min_range=2.0, max_range=8.0)), 2)
+        self.assertEqual(len(pointcloud.crop(points, horizontal_fov=(-45.0, 45.0))), 2)
+        # 跨越±180度的视场
+        self.assertEqual(len(pointcloud.crop(points, horizontal_fov=(170.0, -170.0))), 1)
+
+    def test_voxel_downsample(self):
+        points = np.array([[0.1, 0.1, 0.1, 1.0], [0.3, 0.3, 0.3, 3.0], [1.5, 0.0, 0.0, 5.0]], dtype=np.float32)
+        result = pointcloud.voxel_downsample(points, 1.0)
+        self.assertEqual(len(result), 2)
+        self.assertTrue(np.allclose(sorted(result[:, 3]), [2.0, 5.0]))
+        self.assertEqual(len(pointcloud.voxel_downsample(points, 1.0, mode='first')), 2)
+        # 负坐标必须落在不同的体素中
+        points[0, 0] = -0.1
+        self.assertEqual(len(pointcloud.voxel_downsample(points, 1.0)), 3)
+
+    def test_ground_segmentation(self):
+        mask = pointcloud.ground_mask_height_map(
+            self.points, cell_size=1.0, height_threshold=0.1, max_ground_height=-1.0)
+        self.assertTrue(mask[:2000].all())
+        self.assertFalse(mask[2000:].any())
+        # 下方没有点的车顶不是地面
+        roof = np.array([[30.2, 30.2, 0.2, 1.0], [30.4, 30.3, 0.25, 1.0]], dtype=np.float32)
+        mask = pointcloud.ground_mask_height_map(np.vstack([self.points, roof]))
+        self.assertTrue(mask[:2000].all())
+        self.assertFalse(mask[-2:].any())
+        self.assertTrue(pointcloud.ground_mask_height_map(roof, max_ground_height=None).all())
+        self.assertAlmostEqual(pointcloud.ground_height_limit(2.4), -1.9)
+        plane, mask = pointcloud.fit_ground_plane(self.points)
+        self.assertTrue(np.allclose(plane, [0.0, 0.0, 1.0, 1.8], atol=1e-3))
+        self.assertTrue(mask[:2000].all())
+        self.assertFalse(mask[2000:].any())
+
+    def test_deskew(self):
+        # 静止传感器不改变点云
+        self.assertTrue(np.allclose(pointcloud.deskew(self.points, 20.0, 0.0), self.points))
+        # 最后一束激光的点不受运动影响，半圈之前的点平移半个扫描周期
+        points = np.array([[10.0, 0.0, 0.0, 0.0], [-10.0, 1e-6, 0.0, 0.0]], dtype=np.float32)
+        result = pointcloud.deskew(points, 10.0, 0.0, velocity=(20.0, 0.0, 0.0))
+        self.assertTrue(np.allclose(result[0, :3], [10.0, 0.0, 0.0]))
+        self.assertTrue(np.allclose(result[1, :3], [-11.0, 0.0, 0.0], atol=1e-4))
+
+    def test_preprocessor(self):
+        preprocessor = pointcloud.PointCloudPreprocessor(max_range=15.0, voxel_size=1.0, remove_ground=True)
+        result = preprocessor(self.points)
+        self.assertGreater(preprocessor.reduction(), 3.0)
+        self.assertTrue((result[:, 2] > -1.5).all())
+
+
+class TestBirdEyeView(unittest.TestCase):
+    def setUp(self):
+        # 一条沿x轴的直路，宽8米，x=20处有一个人行横道
+        roads = [(x, 0.0, 0.0, 0.6, 4.0) for x in np.arange(-50.0, 51.0, 1.0)]
+        crosswalk = [(18.0, -4.0), (22.0, -4.0), (22.0, 4.0), (18.0, 4.0)]
+        self.raster = bev.MapRaster.from_samples(roads, [], [], [crosswalk], pixels_per_meter=4.0)
+        self.bev = bev.BirdEyeViewRasterizer(self.raster, size=(100, 100), pixels_per_meter=2.0,
+                                             ego_position=(0.5, 0.5))
+
+    def channel(self, tensor, name):
+        return tensor[self.bev.channels.index(name)]
+
+    def test_fill_boxes(self):
+        grid = np.zeros((20, 20), dtype=np.uint8)
+        bev.fill_boxes(grid, [(10.0, 10.0)], [(1.0, 0.0)], [(4.0, 2.0)])
+        self.assertEqual(int(grid.sum()), 32)
+        self.assertEqual(grid[10, 6:14].tolist(), [1] * 8)
+
+    def test_fill_polygon(self):
+        grid = np.zeros((10, 10), dtype=np.uint8)
+        bev.fill_polygon(grid, [(0.0, 0.0), (10.0, 0.0), (0.0, 10.0)])
+        self.assertEqual(int(grid.sum()), 45)
+
+    def test_static_layers(self):
+        tensor = self.bev.render((0.0, 0.0, 0.0, 2.0, 1.0))
+        road = self.channel(tensor, 'road')
+        # 车头朝上：道路沿列方向是一条竖直的带
+        self.assertTrue(road[:, 50].all())
+        self.assertFalse(road[50, :40].any())
+        crosswalk = self.channel(tensor, 'crosswalk')
+        rows = np.flatnonzero(crosswalk.any(axis=1))
+        self.assertEqual((rows.min(), rows.max()), (6, 13))
+        # 旋转90度后道路变为水平
+        road = self.channel(self.bev.render((0.0, 0.0, 90.0, 2.0, 1.0)), 'road')
+        self.assertTrue(road[50, :].all())
+
+    def test_actors(self):
+        vehicles = np.array([[10.0, 0.0, 0.0, 2.0, 1.0], [0.0, 10.0, 0.0, 2.0, 1.0]])
+        walkers = np.array([[-10.0, -10.0, 0.0, 0.3, 0.3]])
+        tensor = self.bev.render((0.0, 0.0, 0.0, 2.0, 1.0), vehicles, walkers)
+        vehicle = self.channel(tensor, 'vehicle')
+        self.assertEqual(vehicle[30, 50], 1)
+        self.assertEqual(vehicle[50, 70], 1)
+        self.assertEqual(self.channel(tensor, 'walker')[70, 30], 1)
+        self.assertEqual(self.channel(tensor, 'ego')[50, 50], 1)
+        # 朝向+y时，位于+y的车辆在正前方
+        tensor = self.bev.render((0.0, 0.0, 90.0, 2.0, 1.0), vehicles)
+        self.assertEqual(self.channel(tensor, 'vehicle')[30, 50], 1)
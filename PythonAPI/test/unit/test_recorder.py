@@ -0,0 +1,332 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from recorder import analysis, columnar, reader, replay_index
+
+
+def pack_string(text):
+    data = text.encode('utf-8')
+    return struct.pack('<H', len(data)) + data
+
+
+def packet(packet_type, payload):
+    return struct.pack('<BI', packet_type, len(payload)) + payload
+
+
+def write_recording(path, frames=10, truncate=False):
+    # 按 CarlaRecorder 的格式写一个小录制：两辆车沿x轴行驶，第5帧发生碰撞
+    data = struct.pack('<H', 1) + pack_string('CARLA_RECORDER') + struct.pack('<q', 0) + pack_string('Town01')
+    for frame in range(frames):
+        duration = 0.05 if frame < frames - 1 else -1.0
+        data += packet(reader.FRAME_START, struct.pack('<Qdd', frame + 1, duration, frame * 0.05))
+        if frame == 0:
+            events = struct.pack('<H', 2)
+            for actor_id in (1, 2):
+                events += struct.pack('<IB6fI', actor_id, 1, 0, 0, 0, 0, 0, 0, actor_id)
+                events += pack_string('vehicle.tesla.model3')
+                events += struct.pack('<H', 1) + struct.pack('<B', 1) + pack_string('role_name')
+                events += pack_string('hero' if actor_id == 1 else 'autopilot')
+            data += packet(reader.EVENT_ADD, events)
+        positions = struct.pack('<H', 2)
+        for actor_id in (1, 2):
+            positions += struct.pack('<I6f', actor_id, frame * actor_id, 0, 0, 0, 0, 90.0)
+        data += packet(reader.POSITION, positions)
+        if frame == 5:
+            data += packet(reader.COLLISION, struct.pack('<HIII??', 1, 0, 1, 2, True, False))
+        if frame == 8:
+            data += packet(reader.EVENT_DEL, struct.pack('<HI', 1, 2))
+        data += packet(reader.FRAME_END, b'')
+    if truncate:
+        data += struct.pack('<BI', reader.POSITION, 1000) + b'\0' * 10
+    with open(path, 'wb') as output:
+        output.write(data)
+
+
+def write_tracks(path, tracks, delta=0.05, types=None, collisions=None):
+    # tracks 为 (帧数, actor数, 3) 的位置数组，actor id 从 1 开始
+    frames, count = tracks.shape[:2]
+    types = types or [1] * count
+    collisions = collisions or {}
+    data = struct.pack('<H', 1) + pack_string('CARLA_RECORDER') + struct.pack('<q', 0) + pack_string('Town01')
+    for frame in range(frames):
+        duration = delta if frame < frames - 1 else -1.0
+        data += packet(reader.FRAME_START, struct.pack('<Qdd', frame + 1, duration, frame * delta))
+        if frame == 0:
+            events = struct.pack('<H', count)
+            for actor in range(count):
+                events += struct.pack('<IB6fI', actor + 1, types[actor], 0, 0, 0, 0, 0, 0, 0)
+                events += pack_string('actor.%d' % (actor + 1)) + struct.pack('<H', 0)
+            data += packet(reader.EVENT_ADD, events)
+        positions = np.zeros(count, dtype=reader.RECORD_DTYPES[reader.POSITION])
+        positions['id'] = np.arange(1, count + 1)
+        positions['location'] = tracks[frame]
+        data += packet(reader.POSITION, struct.pack('<H', count) + positions.tobytes())
+        if frame in collisions:
+            payload = struct.pack('<H', len(collisions[frame]))
+            for actor1, actor2, hero1, hero2 in collisions[frame]:
+                payload += struct.pack('<III??', 0, actor1, actor2, hero1, hero2)
+            data += packet(reader.COLLISION, payload)
+        data += packet(reader.FRAME_END, b'')
+    with open(path, 'wb') as output:
+        output.write(data)
+
+
+def reference_blocked(recording, min_time, min_distance):
+    # 逐条记录模拟 CarlaRecorderQuery::QueryBlocked
+    state, results = {}, []
+    for record in recording.positions():
+        actor, frame = int(record['id']), int(record['frame'])
+        anchor, duration, start = state.get(actor, (None, 0.0, 0.0))
+        location = record['location'].astype(np.float64)
+        if anchor is not None and np.linalg.norm(location - anchor) < min_distance:
+            if duration == 0.0:
+                start = recording.frames['elapsed'][frame]
+            state[actor] = (anchor, duration + recording.frames['duration'][frame], start)
+        else:
+            if duration >= min_time:
+                results.append((actor, start, duration))
+            state[actor] = (location, 0.0, 0.0)
+    results += [(actor, start, duration) for actor, (_, duration, start) in state.items() if duration >= min_time]
+    return sorted(results)
+
+
+class TestRecorderFile(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.file = os.path.join(self.path, 'test.rec')
+        write_recording(self.file)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_header_and_frames(self):
+        with reader.RecorderFile(self.file) as recording:
+            self.assertEqual(recording.map_name, 'Town01')
+            self.assertEqual(len(recording.frames), 10)
+            self.assertEqual(list(recording.frames['id'][:3]), [1, 2, 3])
+            self.assertAlmostEqual(recording.duration, 0.5)
+            self.assertEqual(recording.frame_at(0.26), 5)
+            self.assertFalse(recording.truncated)
+            self.assertEqual(recording.packet_counts()['Position'], 10)
+
+    def test_records(self):
+        with reader.RecorderFile(self.file) as recording:
+            positions = recording.positions()
+            self.assertEqual(len(positions), 20)
+            collisions = recording.collisions()
+            self.assertEqual(len(collisions), 1)
+            self.assertEqual((collisions['frame'][0], collisions['actor1'][0], collisions['actor2'][0]), (5, 1, 2))
+            self.assertTrue(collisions['hero1'][0])
+            # 帧范围与完整解码后按帧过滤的结果一致
+            for frames in [(0, 3), (4, 7), (5, 5), (8, 20), (6, 2), (-5, 0)]:
+                expected = positions[(positions['frame'] >= frames[0]) & (positions['frame'] <= frames[1])]
+                self.assertEqual(recording.records(reader.POSITION, frames).tobytes(), expected.tobytes())
+
+    def test_actors(self):
+        with reader.RecorderFile(self.file) as recording:
+            actors = recording.actors()
+        self.assertEqual(sorted(actors), [1, 2])
+        self.assertEqual(actors[1]['type'], 'vehicle')
+        self.assertEqual(actors[1]['type_id'], 'vehicle.tesla.model3')
+        self.assertEqual(actors[1]['attributes'], {'role_name': 'hero'})
+        self.assertEqual(actors[2]['attributes'], {'role_name': 'autopilot'})
+        self.assertEqual(actors[2]['destroyed'], 8)
+        self.assertIsNone(actors[1]['destroyed'])
+
+    def test_trajectory(self):
+        with reader.RecorderFile(self.file) as recording:
+            trajectory = recording.trajectory(2)
+        self.assertEqual(list(trajectory['frame']), list(range(10)))
+        self.assertTrue(np.allclose(trajectory['location'][:, 0], np.arange(10) * 2.0))
+        self.assertTrue(np.allclose(trajectory['elapsed'], np.arange(10) * 0.05))
+        self.assertTrue(np.allclose(trajectory['rotation'][:, 2], 90.0))
+
+    def test_truncated(self):
+        write_recording(self.file, truncate=True)
+        with reader.RecorderFile(self.file) as recording:
+            self.assertTrue(recording.truncated)
+            self.assertEqual(len(recording.positions()), 20)
+
+    def test_not_a_recording(self):
+        with open(self.file, 'wb') as output:
+            output.write(struct.pack('<H', 1) + pack_string('SOMETHING_ELSE') + b'\0' * 16)
+        with self.assertRaises(ValueError):
+            reader.RecorderFile(self.file)
+
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.file = os.path.join(self.path, 'test.rec')
+        write_recording(self.file)
+        self.output = os.path.join(self.path, 'tables')
+        columnar.export(self.file, self.output, frames_per_partition=4)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_partitions(self):
+        tables = columnar.RecordingTables(self.output)
+        self.assertEqual(tables.tables, sorted(columnar.TABLES))
+        partitions = tables.partitions('positions')
+        self.assertEqual([(part['first'], part['last'], part['rows']) for part in partitions],
+                         [(0, 3, 8), (4, 7, 8), (8, 9, 4)])
+        # 帧过滤下推到分区
+        self.assertEqual(len(tables.partitions('positions', frames=(5, 6))), 1)
+
+    def test_read_filters(self):
+        tables = columnar.RecordingTables(self.output)
+        positions = tables.read('positions', columns=['frame', 'x'], frames=(3, 6), actors=[2])
+        self.assertEqual(list(positions['frame']), [3, 4, 5, 6])
+        self.assertTrue(np.allclose(positions['x'], [6.0, 8.0, 10.0, 12.0]))
+        positions = tables.read('positions', time_range=(0.1, 0.2), actors=[1])
+        self.assertEqual(list(positions['frame']), [2, 3, 4])
+        collisions = tables.read('collisions', actors=[2])
+        self.assertEqual(list(collisions['frame']), [5])
+        self.assertEqual(len(tables.read('collisions', actors=[7])['frame']), 0)
+        with self.assertRaises(KeyError):
+            tables.read('positions', columns=['speed'])
+
+    def test_events(self):
+        events = columnar.RecordingTables(self.output).read('events')
+        self.assertEqual(list(events['event']), [columnar.EVENT_ADD, columnar.EVENT_ADD, columnar.EVENT_DEL])
+        self.assertEqual(list(events['role_name'][:2]), ['hero', 'autopilot'])
+        self.assertEqual((events['frame'][2], events['actor'][2]), (8, 2))
+
+    def test_read_many(self):
+        other = os.path.join(self.path, 'other')
+        columnar.export(self.file, other, tables=['positions'])
+        merged = columnar.read_many([self.output, other], 'positions', processes=1, actors=[1])
+        self.assertEqual(len(merged['frame']), 20)
+        self.assertEqual(list(np.bincount(merged['recording'])), [10, 10])
+
+
+class TestAnalysis(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.file = os.path.join(self.path, 'test.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_blocked(self):
+        # actor 1 匀速行驶，actor 2 在第 20 到 79 帧停住，actor 3 一直停着
+        tracks = np.zeros((100, 3, 3), dtype=np.float32)
+        tracks[:, 0, 0] = np.arange(100) * 150.0
+        tracks[:, 1, 0] = np.r_[np.arange(20) * 150.0, np.full(60, 3000.0), 3000.0 + np.arange(1, 21) * 150.0]
+        tracks[:, 2, 1] = 500.0
+        write_tracks(self.file, tracks)
+        with reader.RecorderFile(self.file) as recording:
+            blocked = analysis.blocked_actors(recording, min_time=2.0, min_distance=100.0)
+            report = analysis.format_blocked(recording, blocked)
+        self.assertEqual(list(blocked['actor']), [3, 2])
+        # 第 20 帧是停下的位置（锚点），之后的帧才计入静止时间
+        self.assertAlmostEqual(blocked['duration'][1], 59 * 0.05)
+        self.assertAlmostEqual(blocked['start'][1], 21 * 0.05)
+        self.assertEqual((blocked['first_frame'][1], blocked['last_frame'][1]), (21, 79))
+        self.assertIn('actor.2', report)
+
+    def test_blocked_matches_reference(self):
+        rng = np.random.RandomState(1)
+        steps = rng.normal(0.0, 30.0, (400, 12, 3)) * (rng.rand(400, 12, 1) < 0.3)
+        tracks = np.cumsum(steps, axis=0).astype(np.float32)
+        write_tracks(self.file, tracks)
+        with reader.RecorderFile(self.file) as recording:
+            blocked = analysis.blocked_actors(recording, min_time=0.5, min_distance=50.0)
+            expected = reference_blocked(recording, 0.5, 50.0)
+        result = sorted(zip(blocked['actor'].tolist(), blocked['start'].tolist(), blocked['duration'].tolist()))
+        self.assertGreater(len(expected), 10)
+        self.assertEqual([row[0] for row in result], [row[0] for row in expected])
+        self.assertTrue(np.allclose([row[1:] for row in result], [row[1:] for row in expected]))
+
+    def test_collisions(self):
+        tracks = np.zeros((10, 3, 3), dtype=np.float32)
+        collisions = {2: [(1, 2, True, False)], 3: [(1, 2, True, False)], 4: [(2, 3, False, False)],
+                      6: [(1, 2, True, False), (3, analysis.NO_ACTOR, False, False)]}
+        write_tracks(self.file, tracks, types=[1, 1, 2], collisions=collisions)
+        with reader.RecorderFile(self.file) as recording:
+            every = analysis.collisions(recording)
+            hero = analysis.collisions(recording, 'hv')
+            walker = analysis.collisions(recording, 'wo')
+            report = analysis.format_collisions(recording, every)
+            with self.assertRaises(ValueError):
+                analysis.collisions(recording, 'x')
+        # 连续帧中的同一碰撞只报告一次
+        self.assertEqual(list(every['frame']), [2, 4, 6, 6])
+        self.assertEqual(list(hero['frame']), [2, 6])
+        self.assertEqual((walker['type1'][0], walker['type2'][0]), ('w', 'o'))
+        self.assertIn('actor.3', report)
+
+
+class TestReplayIndex(unittest.TestCase):
+    def setUp(self):
+        # 每秒创建一个 actor，2.5 秒后销毁；actor 4 在第 35 帧挂到 actor 3 上
+        self.path = tempfile.mkdtemp()
+        self.file = os.path.join(self.path, 'test.rec')
+        data = struct.pack('<H', 1) + pack_string('CARLA_RECORDER') + struct.pack('<q', 0) + pack_string('Town01')
+        for frame in range(200):
+            data += packet(reader.FRAME_START, struct.pack('<Qdd', frame + 1, 0.1, frame * 0.1))
+            if frame % 10 == 0:
+                events = struct.pack('<HIB6fI', 1, frame // 10 + 1, 1, 0, 0, 0, 0, 0, 0, 0)
+                data += packet(reader.EVENT_ADD, events + pack_string('vehicle.a') + struct.pack('<H', 0))
+            if frame == 35:
+                data += packet(reader.EVENT_PARENT, struct.pack('<HII', 1, 4, 3))
+            if frame % 10 == 5 and frame >= 25:
+                data += packet(reader.EVENT_DEL, struct.pack('<HI', 1, (frame - 25) // 10 + 1))
+            data += packet(reader.POSITION, struct.pack('<H', 0))
+            data += packet(reader.FRAME_END, b'')
+        with open(self.file, 'wb') as output:
+            output.write(data)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def scan(self, recording, frame):
+        # 从头扫描得到第 frame 帧之前存活的 actor
+        alive = set()
+        for index, entry in enumerate(recording.packets):
+            if entry['frame'] >= frame:
+                break
+            if entry['type'] == reader.EVENT_ADD:
+                alive.update(event['id'] for event in recording.spawn_events((entry['frame'], entry['frame'])))
+            elif entry['type'] == reader.EVENT_DEL:
+                alive.difference_update(recording.packet_records(index)['id'].tolist())
+        return alive
+
+    def test_seek_matches_scan(self):
+        output = replay_index.build_index(self.file, interval=4.0)
+        self.assertEqual(output, self.file + '.index')
+        index = replay_index.ReplayIndex.load(output)
+        self.assertEqual(index.recording_size, os.path.getsize(self.file))
+        self.assertAlmostEqual(index.total_time, 19.9)
+        self.assertEqual(len(index.keyframes), 4)
+        with reader.RecorderFile(self.file) as recording:
+            offsets = dict((int(entry['offset']) - reader.PACKET_HEADER_SIZE, entry) for entry in recording.packets)
+            for time, expected in [(0.0, 0), (3.95, 39), (4.05, 40), (7.25, 72), (12.05, 120), (25.0, 199)]:
+                frame, keyframe, events = index.seek(time)
+                self.assertEqual(frame, expected)
+                self.assertEqual(offsets[int(index.frames['offset'][frame])]['type'], reader.FRAME_START)
+                alive = set(keyframe[2]['id'].tolist()) if keyframe is not None else set()
+                for event in events:
+                    entry = offsets[int(event['offset'])]
+                    self.assertLess(int(event['frame']), frame)
+                    position = int(np.flatnonzero(recording.packets['offset'] == entry['offset'])[0])
+                    if entry['type'] == reader.EVENT_ADD:
+                        alive.update(event['id'] for event in recording.spawn_events((entry['frame'], entry['frame'])))
+                    elif entry['type'] == reader.EVENT_DEL:
+                        alive.difference_update(recording.packet_records(position)['id'].tolist())
+                self.assertEqual(alive, self.scan(recording, frame))
+        # 第 40 帧的关键帧中 actor 4 挂在 actor 3 上
+        self.assertEqual(index.keyframes[0][0], 40)
+        self.assertEqual(index.keyframes[0][3].tolist(), [(4, 3)])
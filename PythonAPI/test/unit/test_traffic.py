@@ -0,0 +1,422 @@
+# Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma de
+# Barcelona (UAB).
+#
+# This work is licensed under the terms of the MIT license.
+# For a copy, see <https://opensource.org/licenses/MIT>.
+
+import math
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+from traffic.crowd import WalkerCrowd
+from traffic.lights import GREEN, MISSING, RED, YELLOW, TrafficLightMirror
+from traffic.pool import ActorPool, parking_offset
+from traffic.population import SpawnGrid, SpawnReport, TrafficPopulation
+from traffic.scenarios import RouteIndex, ScenarioSampler, load_jobs, save_jobs, scenario_jobs
+
+
+class Location(object):
+    def __init__(self, x, y, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class Rotation(object):
+    def __init__(self, yaw):
+        self.yaw = yaw
+
+
+class Transform(object):
+    def __init__(self, x, y, yaw=0.0):
+        self.location = Location(x, y)
+        self.rotation = Rotation(yaw)
+
+
+class Blueprint(object):
+    def __init__(self, blueprint_id):
+        self.id = blueprint_id
+
+
+class Pool(ActorPool):
+    # 只替换会发送命令的 activate_vehicles，记录位置并让指定的车辆失败
+    def __init__(self, vehicles, failing=()):
+        super(Pool, self).__init__(None, None)
+        self.vehicles = list(vehicles)
+        self.failing = failing
+        self.activated = []
+
+    def activate_vehicles(self, slots, autopilot=True, do_tick=False):
+        self.activated.extend(slots)
+        return ['failed' if actor_id in self.failing else None for actor_id, _ in slots]
+
+
+class World(object):
+    def __init__(self, locations):
+        self.locations = list(locations)
+        self.calls = 0
+
+    def get_random_location_from_navigation(self):
+        self.calls += 1
+        return self.locations.pop(0) if self.locations else None
+
+
+class Light(object):
+    def __init__(self, light_id, group):
+        self.id = light_id
+        self.group = group
+        self.group_calls = 0
+
+    def get_group_traffic_lights(self):
+        self.group_calls += 1
+        return self.group
+
+
+class LightSnapshot(object):
+    # 按 WorldSnapshot.get_traffic_light_data 的格式返回交通灯数据
+    def __init__(self, frame, lights):
+        self.frame = frame
+        self.lights = lights
+
+    def get_traffic_light_data(self, actor_ids):
+        states, frozen, times = b'', b'', b''
+        for actor_id in actor_ids:
+            state, elapsed, durations = self.lights.get(actor_id, (MISSING, float('nan'), (0.0, 0.0, 0.0)))
+            states += struct.pack('B', state)
+            frozen += struct.pack('B', 0)
+            times += struct.pack('4f', elapsed, *durations)
+        return states, frozen, times
+
+
+class Controller(object):
+    def __init__(self, actor_id):
+        self.id = actor_id
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+
+class Timestamp(object):
+    def __init__(self, elapsed_seconds):
+        self.elapsed_seconds = elapsed_seconds
+
+
+class ActorSnapshot(object):
+    def __init__(self, transform):
+        self.transform = transform
+
+    def get_transform(self):
+        return self.transform
+
+
+class WalkerSnapshot(object):
+    def __init__(self, elapsed, transforms):
+        self.timestamp = Timestamp(elapsed)
+        self.transforms = transforms
+
+    def find(self, actor_id):
+        transform = self.transforms.get(actor_id)
+        return ActorSnapshot(transform) if transform is not None else None
+
+
+class CrowdWorld(object):
+    # 记录批量调用，failing 中的行人设置失败
+    def __init__(self, failing=()):
+        self.controllers = {}
+        self.failing = set(failing)
+        self.targets = {}
+        self.speeds = {}
+        self.target_calls = 0
+
+    def get_actors(self, actor_ids):
+        return [self.controllers.setdefault(actor_id, Controller(actor_id)) for actor_id in actor_ids]
+
+    def get_snapshot(self):
+        return WalkerSnapshot(0.0, {})
+
+    def get_random_locations_from_navigation(self, count):
+        return [Location(100.0 * index, 0.0) for index in range(count)]
+
+    def set_walkers_targets(self, walker_ids, locations):
+        self.target_calls += 1
+        self.targets.update(zip(walker_ids, locations))
+        return [walker_id for walker_id in walker_ids if walker_id in self.failing]
+
+    def set_walkers_max_speeds(self, walker_ids, speeds):
+        self.speeds.update(zip(walker_ids, speeds))
+        return [walker_id for walker_id in walker_ids if walker_id in self.failing]
+
+
+class TestSpawnGrid(unittest.TestCase):
+    def test_oriented_footprints(self):
+        grid = SpawnGrid()
+        self.assertTrue(grid.reserve(0.0, 0.0, 0.0, 2.5, 1.0))
+        self.assertFalse(grid.reserve(0.0, 0.0, 90.0, 2.5, 1.0))
+        # 同一车道前后相隔一个车长不重叠，并排相隔一个车宽也不重叠
+        self.assertTrue(grid.is_free(5.1, 0.0, 0.0, 2.5, 1.0))
+        self.assertFalse(grid.is_free(4.9, 0.0, 0.0, 2.5, 1.0))
+        self.assertTrue(grid.is_free(0.0, 2.1, 0.0, 2.5, 1.0))
+        # 旋转后的车身伸到了第一辆车所在的位置
+        self.assertTrue(grid.is_free(0.0, 3.6, 0.0, 2.5, 1.0))
+        self.assertFalse(grid.is_free(0.0, 3.4, 90.0, 2.5, 1.0))
+        # 对角方向，外接圆相交但分离轴将两者分开
+        self.assertTrue(grid.is_free(4.0, 2.5, 0.0, 2.5, 1.0))
+        self.assertEqual(grid.count, 1)
+
+    def test_across_cells(self):
+        grid = SpawnGrid(cell_size=1.0)
+        grid.occupy(0.0, 0.0, 45.0, 10.0, 1.0)
+        offset = 8.0 / math.sqrt(2.0)
+        self.assertFalse(grid.is_free(offset, offset))
+        self.assertTrue(grid.is_free(offset, -offset))
+
+
+class TestTrafficPopulation(unittest.TestCase):
+    def test_reserve_slots(self):
+        population = TrafficPopulation(None, None, seed=0, margin=0.0, extents={'vehicle.bus': (6.0, 1.5)})
+        # 一条车道上每隔 6 米一个生成点，长车会挡住相邻的点
+        candidates = [Transform(6.0 * index, 0.0) for index in range(10)]
+        slots = population._reserve_slots(list(candidates), [Blueprint('vehicle.car')], 10)
+        self.assertEqual(len(slots), 10)
+        population = TrafficPopulation(None, None, seed=0, margin=0.0, extents={'vehicle.bus': (6.0, 1.5)})
+        remaining = list(candidates)
+        slots = population._reserve_slots(remaining, [Blueprint('vehicle.bus')], 10)
+        self.assertEqual(remaining, [])
+        self.assertLessEqual(len(slots), 5)
+        xs = sorted(transform.location.x for _, transform in slots)
+        self.assertTrue(all(b - a > 12.0 for a, b in zip(xs, xs[1:])))
+
+    def test_sample_navigation(self):
+        locations = [Location(0.0, 0.0), Location(0.2, 0.0), None, Location(3.0, 0.0), Location(6.0, 0.0)]
+        world = World(locations)
+        population = TrafficPopulation(None, world, seed=0)
+        sampled = population.sample_navigation(3)
+        self.assertEqual([location.x for location in sampled], [0.0, 3.0, 6.0])
+        self.assertEqual(world.calls, 5)
+        # 导航点用完时最多尝试 2 * count 次
+        self.assertEqual(population.sample_navigation(2), [])
+        self.assertEqual(world.calls, 9)
+
+    def test_report(self):
+        report = SpawnReport('vehicles', 4)
+        report.spawned = 3
+        report.elapsed = 0.5
+        self.assertEqual(report.success_rate, 0.75)
+        self.assertEqual(report.throughput, 6.0)
+        self.assertIn('3/4 vehicles spawned (75.0%, 0 reused)', str(report))
+        self.assertEqual(SpawnReport('walkers', 0).success_rate, 1.0)
+
+
+class TestActorPool(unittest.TestCase):
+    def test_take(self):
+        pool = ActorPool(None, None)
+        pool.vehicles = [(1, 'vehicle.a'), (2, 'vehicle.b'), (3, 'vehicle.a')]
+        pool.walkers = [{'id': 4, 'con': 5, 'speed': 1.0}]
+        self.assertEqual(len(pool), 4)
+        self.assertEqual(pool.take_vehicles(5, set(['vehicle.a'])), [(1, 'vehicle.a'), (3, 'vehicle.a')])
+        self.assertEqual(pool.take_vehicles(5), [(2, 'vehicle.b')])
+        self.assertEqual([walker['id'] for walker in pool.take_walkers(3)], [4])
+        self.assertEqual(len(pool), 0)
+
+    def test_parking_and_errors(self):
+        offsets = set(parking_offset(actor_id) for actor_id in range(1000))
+        self.assertEqual(len(offsets), 1000)
+        self.assertEqual(ActorPool._group_errors([None, None, 'a', None, None, 'b'], 3), [None, 'a', 'b'])
+        self.assertEqual(ActorPool._group_errors([], 0), [])
+
+    def test_population_reuses_parked_vehicles(self):
+        pool = Pool([(1, 'vehicle.bus'), (2, 'vehicle.bus'), (3, 'vehicle.car'), (4, 'vehicle.truck')], failing=(2,))
+        population = TrafficPopulation(None, None, seed=0, margin=0.0, extents={'vehicle.bus': (6.0, 1.5)},
+                                       pool=pool)
+        candidates = [Transform(6.0 * index, 0.0) for index in range(4)]
+        report = SpawnReport('vehicles', 4)
+        ids = population._reuse_vehicles([Blueprint('vehicle.bus'), Blueprint('vehicle.car')], 4, candidates,
+                                         False, report)
+        # 两辆公交车占满了所有生成点，小车放回 pool，激活失败的车辆不再使用
+        self.assertEqual(candidates, [])
+        self.assertEqual([actor_id for actor_id, _ in pool.activated], [1, 2])
+        self.assertEqual([transform.location.x for _, transform in pool.activated], [18.0, 0.0])
+        self.assertEqual(ids, [1])
+        self.assertEqual(report.errors, ['failed'])
+        self.assertEqual(pool.vehicles, [(4, 'vehicle.truck'), (3, 'vehicle.car')])
+        self.assertEqual((report.reused, report.batches), (1, 1))
+        candidates = [Transform(0.0, 20.0), Transform(0.0, 40.0)]
+        ids = population._reuse_vehicles([Blueprint('vehicle.car')], 4, candidates, False, report)
+        self.assertEqual(ids, [3])
+        self.assertEqual(len(candidates), 1)
+        self.assertEqual(pool.vehicles, [(4, 'vehicle.truck')])
+
+
+class TestTrafficLightMirror(unittest.TestCase):
+    def _mirror(self):
+        lights = [Light(3, []), Light(7, []), Light(12, [])]
+        lights[0].group = lights[1].group = [lights[0], lights[1]]
+        lights[2].group = [lights[2]]
+        return lights, TrafficLightMirror(None, lights)
+
+    def test_groups_read_once(self):
+        lights, mirror = self._mirror()
+        self.assertEqual(len(mirror), 3)
+        self.assertEqual([light.group_calls for light in lights], [1, 0, 1])
+        self.assertEqual(mirror.group(7).tolist(), [3, 7])
+        self.assertEqual(mirror.group(12).tolist(), [12])
+        # 未镜像的交通灯没有组
+        self.assertEqual(mirror.group(5).tolist(), [])
+        self.assertEqual(mirror.group(100).tolist(), [])
+        self.assertEqual(len(mirror.group_states(5)[1]), 0)
+        self.assertEqual(mirror.state(7), MISSING)
+        self.assertEqual(mirror.state(100), MISSING)
+
+    def test_changes_and_timing(self):
+        _, mirror = self._mirror()
+        calls = []
+        handle = mirror.on_change(lambda light_id, old, new: calls.append((light_id, old, new)))
+        durations = (10.0, 3.0, 5.0)
+        changed = mirror.update(LightSnapshot(1, {3: (GREEN, 4.0, durations), 7: (RED, 1.0, durations),
+                                                  12: (YELLOW, 0.5, durations)}))
+        self.assertEqual(changed.tolist(), [3, 7, 12])
+        self.assertEqual(mirror.states.dtype, np.uint8)
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(np.allclose(mirror.remaining(), [6.0, 4.0, 2.5]))
+        # 同一帧不再读取，只有变化的交通灯触发回调
+        self.assertEqual(len(mirror.update(LightSnapshot(1, {}))), 0)
+        del calls[:]
+        changed = mirror.update(LightSnapshot(2, {3: (YELLOW, 0.0, durations), 7: (RED, 1.1, durations),
+                                                  12: (YELLOW, 0.6, durations)}))
+        self.assertEqual(changed.tolist(), [3])
+        self.assertEqual(calls, [(3, GREEN, YELLOW)])
+        self.assertEqual(mirror.ids_in_state(YELLOW).tolist(), [3, 12])
+        ids, states = mirror.group_states(3)
+        self.assertEqual((ids.tolist(), states.tolist()), ([3, 7], [YELLOW, RED]))
+        mirror.remove_on_change(handle)
+        changed = mirror.update(LightSnapshot(3, {7: (RED, 1.2, durations), 12: (YELLOW, 0.7, durations)}))
+        self.assertEqual(changed.tolist(), [3])
+        self.assertEqual(mirror.state(3), MISSING)
+        self.assertTrue(np.isnan(mirror.remaining([3])[0]))
+        self.assertEqual(len(calls), 1)
+
+
+def ring_index():
+    # 六个节点的单向环，每段 10 米，另有一段不连通的路
+    vertices = [(10.0 * node, 0.0, 0.0) for node in range(8)]
+    edges = [(node, (node + 1) % 6, 10.0) for node in range(6)] + [(6, 7, 10.0)]
+    spawn_points = [(0.0, 0.0, 0.0, 0.0, 0.0, 0.0), (20.0, 0.0, 0.0, 0.0, 0.0, 0.0),
+                    (40.0, 0.0, 0.0, 0.0, 0.0, 0.0), (60.0, 0.0, 0.0, 0.0, 0.0, 0.0)]
+    return RouteIndex(spawn_points, [(0, 1), (2, 3), (4, 5), (6, 7)], vertices, edges, 'Ring')
+
+
+class TestScenarioSampler(unittest.TestCase):
+    def test_route_index(self):
+        index = ring_index()
+        self.assertEqual(index.distance[0, 1], 30.0)
+        self.assertEqual(index.distance[1, 0], 50.0)
+        self.assertTrue(np.isinf(index.distance[0, 3]))
+        self.assertEqual(index.route(0, 1), [0, 1, 2, 3])
+        self.assertEqual(index.route(2, 0), [4, 5, 0, 1])
+        self.assertEqual(index.route(0, 3), [])
+        self.assertEqual(index.route_locations(0, 1)[:, 0].tolist(), [0.0, 10.0, 20.0, 30.0])
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'ring.npz')
+            index.save(path)
+            loaded = RouteIndex.load(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(loaded.town, 'Ring')
+        self.assertTrue(np.array_equal(loaded.distance, index.distance))
+        self.assertEqual(loaded.route(2, 0), [4, 5, 0, 1])
+
+    def test_reproducible_blocks(self):
+        sampler = ScenarioSampler(ring_index(), seed=3, min_distance=35.0, vehicles=(0, 10), walkers=(5, 6),
+                                  block_size=64)
+        scenarios = sampler.generate(500)
+        self.assertEqual(scenarios['index'].tolist(), list(range(500)))
+        self.assertTrue(np.all(scenarios['distance'] >= 35.0))
+        self.assertTrue(np.all(np.isfinite(scenarios['distance'])))
+        self.assertFalse(np.any(scenarios['spawn'] == 3))
+        # 只有四个生成点，其它车辆最多三辆
+        self.assertTrue(np.all((scenarios['vehicles'] >= 0) & (scenarios['vehicles'] <= 3)))
+        self.assertTrue(np.all((scenarios['walkers'] >= 5) & (scenarios['walkers'] <= 6)))
+        self.assertTrue(np.array_equal(sampler.generate(100, start=130), scenarios[130:230]))
+        self.assertTrue(np.array_equal(sampler.generate(500, processes=2), scenarios))
+        other = ScenarioSampler(ring_index(), seed=4, min_distance=35.0, block_size=64).generate(500)
+        self.assertFalse(np.array_equal(other['seed'], scenarios['seed']))
+        with self.assertRaises(ValueError):
+            ScenarioSampler(ring_index(), min_distance=1000.0)
+
+    def test_jobs(self):
+        sampler = ScenarioSampler(ring_index(), seed=1, min_distance=35.0, block_size=16)
+        jobs = scenario_jobs(sampler, sampler.generate(20), routes=True)
+        self.assertEqual(len(set(job['key'] for job in jobs)), 20)
+        job = jobs[0]
+        self.assertEqual(job['scenario'], 'route')
+        self.assertEqual(job['params'], {'sample': 0})
+        self.assertEqual(job['args']['town'], 'Ring')
+        self.assertEqual(len(job['args']['route']), len(sampler.index.route(job['args']['spawn'],
+                                                                            job['args']['destination'])))
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'jobs.jsonl')
+            save_jobs(path, jobs)
+            self.assertEqual(load_jobs(path), jobs)
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestWalkerCrowd(unittest.TestCase):
+    def _crowd(self, count, failing=(), **kwargs):
+        world = CrowdWorld(failing)
+        walkers = [{'id': 10 + index, 'con': 1000 + index, 'speed': 1.5} for index in range(count)]
+        return world, WalkerCrowd(world, walkers, seed=0, pool_size=8, **kwargs)
+
+    def test_start_in_batches(self):
+        world, crowd = self._crowd(20, failing=(12,))
+        crowd.start()
+        self.assertEqual(len(world.controllers), 20)
+        self.assertTrue(all(controller.started for controller in world.controllers.values()))
+        self.assertEqual(len(crowd.destinations), 8)
+        self.assertEqual(world.target_calls, 1)
+        self.assertEqual(world.speeds[11], 1.5)
+        # 设置失败的行人之后不再更新
+        self.assertFalse(crowd.active[2])
+        self.assertEqual(int(crowd.active.sum()), 19)
+        self.assertEqual(crowd.set_max_speeds(2.0, [15, 11]), [])
+        self.assertEqual((world.speeds[15], world.speeds[10]), (2.0, 1.5))
+        with self.assertRaises(KeyError):
+            crowd.set_max_speeds(2.0, [99])
+
+    def test_bounded_retarget(self):
+        world, crowd = self._crowd(50, period=(10.0, 20.0), budget=8)
+        crowd.start(elapsed=0.0)
+        self.assertTrue(np.all((crowd.deadlines >= 10.0) & (crowd.deadlines <= 20.0)))
+        far = dict((10 + index, Transform(-500.0, -500.0)) for index in range(50))
+        self.assertEqual(len(crowd.tick(WalkerSnapshot(5.0, far))), 0)
+        # 每次最多 budget 个，最早到期的优先
+        earliest = np.argsort(crowd.deadlines, kind='stable')[:8]
+        retargeted = crowd.tick(WalkerSnapshot(30.0, far))
+        self.assertEqual(sorted(retargeted.tolist()), sorted(crowd.ids[earliest].tolist()))
+        self.assertTrue(np.all(crowd.deadlines[earliest] > 30.0))
+        self.assertEqual(int(np.sum(crowd.deadlines <= 30.0)), 42)
+        self.assertEqual(world.target_calls, 2)
+
+    def test_arrivals(self):
+        world, crowd = self._crowd(6, period=None, budget=3)
+        crowd.start(elapsed=0.0)
+        self.assertTrue(np.all(np.isinf(crowd.deadlines)))
+        target = crowd.targets[4]
+        transforms = dict((10 + index, Transform(-500.0, -500.0)) for index in range(6))
+        transforms[14] = Transform(target[0] + 1.0, target[1])
+        # 第一个窗口检查 10..12，第二个窗口才检查到 14
+        self.assertEqual(len(crowd.tick(WalkerSnapshot(1.0, transforms))), 0)
+        self.assertEqual(crowd.tick(WalkerSnapshot(2.0, transforms)).tolist(), [14])
+        self.assertEqual(crowd.retargeted, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
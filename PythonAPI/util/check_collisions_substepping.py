@@ -30,8 +30,13 @@ try:
 except IndexError:
     pass
 
+# 将PythonAPI/carla加入系统路径，以便导入determinism模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 
+from determinism.snapshot import SnapshotRecorder, max_difference
+
 
 class Scenario():
     def __init__(self, client, world, save_snapshots_mode=False):
@@ -42,19 +47,20 @@ class Scenario():
         self.active = False
         self.prefix = ""
         self.save_snapshots_mode = save_snapshots_mode
-        self.snapshots = []
+        self.snapshots = SnapshotRecorder()
 
     def init_scene(self, prefix, settings = None, spectator_tr = None):
         self.prefix = prefix
         self.actor_list = []
         self.active = True
-        self.snapshots = []
+        self.snapshots = SnapshotRecorder()
 
         self.reload_world(settings, spectator_tr)
 
         # Init timestamp
         world_snapshot = self.world.get_snapshot()
         self.init_timestamp = {'frame0' : world_snapshot.frame, 'time0' : world_snapshot.timestamp.elapsed_seconds}
+        self.snapshots.start(world_snapshot)
 
     def add_actor(self, actor, actor_name="Actor"):
         actor_idx = len(self.actor_list)
@@ -64,7 +70,7 @@ class Scenario():
         self.actor_list.append((name, actor))
 
         if self.save_snapshots_mode:
-            self.snapshots.append(np.empty((0,11), float))
+            self.snapshots.add(actor, name)
 
     def wait(self, frames=100):
         for _i in range(0, frames):
@@ -87,30 +93,20 @@ class Scenario():
         spectator = self.world.get_spectator()
         spectator.set_transform(spectator_tr)
 
-    def save_snapshot(self, actor):
-        snapshot = self.world.get_snapshot()
-
-        actor_snapshot = np.array([
-                float(snapshot.frame - self.init_timestamp['frame0']), \
-                snapshot.timestamp.elapsed_seconds - self.init_timestamp['time0'], \
-                actor.get_location().x, actor.get_location().y, actor.get_location().z, \
-                actor.get_velocity().x, actor.get_velocity().y, actor.get_velocity().z, \
-                actor.get_angular_velocity().x, actor.get_angular_velocity().y, actor.get_angular_velocity().z])
-        return actor_snapshot
-
     def save_snapshots(self):
         if not self.save_snapshots_mode:
             return
 
-        for i in range (0, len(self.actor_list)):
-            self.snapshots[i] = np.vstack((self.snapshots[i], self.save_snapshot(self.actor_list[i][1])))
+        self.snapshots.record(self.world.get_snapshot())
 
     def save_snapshots_to_disk(self):
         if not self.save_snapshots_mode:
             return
 
-        for i, actor in enumerate(self.actor_list):
-            np.savetxt(self.get_filename(actor[0]), self.snapshots[i])
+        self.snapshots.save(self.get_snapshots_filename(self.prefix))
+
+    def get_snapshots_filename(self, prefix):
+        return prefix + "_snapshots.npz"
 
     def get_filename_with_prefix(self, prefix, actor_id=None, frame=None):
         add_id = "" if actor_id is None else "_" + actor_id
@@ -124,6 +120,7 @@ class Scenario():
         original_settings = self.world.get_settings()
 
         self.init_scene(prefix, run_settings, spectator_tr)
+        self.snapshots.reserve(tics)
 
         t_start = time.perf_counter()
         for _i in range(0, tics):
@@ -321,15 +318,10 @@ class CollisionScenarioTester():
         self.output_path = output_path
 
     def compare_files(self, file_i, file_j):
-        check_ij = filecmp.cmp(file_i, file_j)
-
-        if check_ij:
+        if filecmp.cmp(file_i, file_j):
             return True
 
-        data_i = np.loadtxt(file_i)
-        data_j = np.loadtxt(file_j)
-
-        max_error = np.amax(np.abs(data_i-data_j))
+        max_error = max_difference(SnapshotRecorder.load(file_i), SnapshotRecorder.load(file_j))
 
         return max_error < 0.01
 
@@ -340,14 +332,10 @@ class CollisionScenarioTester():
         for i in range(0, repetitions):
             mat_check[i][i] = 1
             for j in range(0, i):
-                sim_check = True
-                for actor in self.scene.actor_list:
-                    actor_id = actor[0]
-                    file_i = self.scene.get_filename_with_prefix(rep_prefixes[i], actor_id)
-                    file_j = self.scene.get_filename_with_prefix(rep_prefixes[j], actor_id)
-
-                    check_ij = self.compare_files(file_i, file_j)
-                    sim_check = sim_check and check_ij
+                file_i = self.scene.get_snapshots_filename(rep_prefixes[i])
+                file_j = self.scene.get_snapshots_filename(rep_prefixes[j])
+
+                sim_check = self.compare_files(file_i, file_j)
                 mat_check[i][j] = int(sim_check)
                 mat_check[j][i] = int(sim_check)
 
@@ -368,29 +356,17 @@ class CollisionScenarioTester():
         return determinism_set
 
     def save_simulations(self, rep_prefixes, prefix, max_idx, min_idx):
-        for actor in self.scene.actor_list:
-            actor_id = actor[0]
-            reference_id = "reference_" + actor_id
-            file_repetition = self.scene.get_filename_with_prefix(rep_prefixes[max_idx], actor_id)
-            file_reference  = self.scene.get_filename_with_prefix(prefix, reference_id)
-
-            shutil.copyfile(file_repetition, file_reference)
+        file_repetition = self.scene.get_snapshots_filename(rep_prefixes[max_idx])
+        file_reference  = self.scene.get_snapshots_filename(prefix + "_reference")
+        shutil.copyfile(file_repetition, file_reference)
 
         if min_idx != max_idx:
-            for actor in self.scene.actor_list:
-                actor_id = actor[0]
-                failed_id = "failed_" + actor_id
-                file_repetition = self.scene.get_filename_with_prefix(rep_prefixes[min_idx], actor_id)
-                file_failed     = self.scene.get_filename_with_prefix(prefix, failed_id)
-
-                shutil.copyfile(file_repetition, file_failed)
+            file_repetition = self.scene.get_snapshots_filename(rep_prefixes[min_idx])
+            file_failed     = self.scene.get_snapshots_filename(prefix + "_failed")
+            shutil.copyfile(file_repetition, file_failed)
 
         for r_prefix in rep_prefixes:
-            for actor in self.scene.actor_list:
-                actor_id = actor[0]
-                file_repetition = self.scene.get_filename_with_prefix(r_prefix, actor_id)
-
-                os.remove(file_repetition)
+            os.remove(self.scene.get_snapshots_filename(r_prefix))
 
     def test_scenario(self, fps=20, fps_phys=100, repetitions = 1, sim_tics = 100):
         output_str = "Testing Determinism in %s for %3d render FPS and %3d physics FPS -> " % (self.scenario_name, fps, fps_phys)
@@ -17,7 +17,6 @@ import os
 import sys
 import argparse
 import time
-import filecmp
 import shutil
 from queue import Queue
 from queue import Empty
@@ -32,8 +31,14 @@ try:
 except IndexError:
     pass
 
+# 将PythonAPI/carla加入系统路径，以便导入determinism模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 
+from determinism.compare import check_streams, consistency_matrix, determinism_set, file_stream
+from determinism.snapshot import SnapshotRecorder
+
 
 class Scenario():
     def __init__(self, client, world, save_snapshots_mode=False):
@@ -44,7 +49,7 @@ class Scenario():
         self.active = False
         self.prefix = ""
         self.save_snapshots_mode = save_snapshots_mode
-        self.snapshots = []
+        self.snapshots = SnapshotRecorder()
         self.sensor_list = []
         self.sensor_queue = Queue()
 
@@ -52,7 +57,7 @@ class Scenario():
         self.prefix = prefix
         self.actor_list = []
         self.active = True
-        self.snapshots = []
+        self.snapshots = SnapshotRecorder()
         self.sensor_list = []
         self.sensor_queue = Queue()
 
@@ -61,6 +66,7 @@ class Scenario():
         # Init timestamp
         snapshot = self.world.get_snapshot()
         self.init_timestamp = {'frame0' : snapshot.frame, 'time0' : snapshot.timestamp.elapsed_seconds}
+        self.snapshots.start(snapshot)
 
     def add_actor(self, actor, actor_name="Actor"):
         actor_idx = len(self.actor_list)
@@ -70,7 +76,7 @@ class Scenario():
         self.actor_list.append((name, actor))
 
         if self.save_snapshots_mode:
-            self.snapshots.append(np.empty((0,11), float))
+            self.snapshots.add(actor, name)
 
     def wait(self, frames=100):
         for _i in range(0, frames):
@@ -99,43 +105,34 @@ class Scenario():
         spectator = self.world.get_spectator()
         spectator.set_transform(spectator_tr)
 
-    def save_snapshot(self, actor):
-        snapshot = self.world.get_snapshot()
-
-        actor_snapshot = np.array([
-                float(snapshot.frame - self.init_timestamp['frame0']), \
-                snapshot.timestamp.elapsed_seconds - self.init_timestamp['time0'], \
-                actor.get_location().x, actor.get_location().y, actor.get_location().z, \
-                actor.get_velocity().x, actor.get_velocity().y, actor.get_velocity().z, \
-                actor.get_angular_velocity().x, actor.get_angular_velocity().y, actor.get_angular_velocity().z])
-        return actor_snapshot
-
     def save_snapshots(self):
         if not self.save_snapshots_mode:
             return
 
-        for i in range (0, len(self.actor_list)):
-            self.snapshots[i] = np.vstack((self.snapshots[i], self.save_snapshot(self.actor_list[i][1])))
+        self.snapshots.record(self.world.get_snapshot())
 
     def save_snapshots_to_disk(self):
         if not self.save_snapshots_mode:
             return
 
-        for i, actor in enumerate(self.actor_list):
-            np.savetxt(self.get_filename(actor[0]), self.snapshots[i])
+        self.snapshots.save(self.get_snapshots_filename(self.prefix))
+
+    def get_snapshots_filename(self, prefix):
+        return prefix + "_snapshots.npz"
 
-    def get_filename_with_prefix(self, prefix, actor_id=None, frame=None):
+    def get_filename_with_prefix(self, prefix, actor_id=None, frame=None, extension=".out"):
         add_id = "" if actor_id is None else "_" + actor_id
         add_frame = "" if frame is None else ("_%04d") % frame
-        return prefix + add_id + add_frame + ".out"
+        return prefix + add_id + add_frame + extension
 
-    def get_filename(self, actor_id=None, frame=None):
-        return self.get_filename_with_prefix(self.prefix, actor_id, frame)
+    def get_filename(self, actor_id=None, frame=None, extension=".out"):
+        return self.get_filename_with_prefix(self.prefix, actor_id, frame, extension)
 
     def run_simulation(self, prefix, run_settings, spectator_tr, tics = 200):
         original_settings = self.world.get_settings()
 
         self.init_scene(prefix, run_settings, spectator_tr)
+        self.snapshots.reserve(tics)
 
         t_start = time.perf_counter()
         for _i in range(0, tics):
@@ -172,7 +169,7 @@ class Scenario():
         points = np.reshape(points, (int(points.shape[0] / 4), 4))
 
         frame = lidar_data.frame - self.init_timestamp['frame0']
-        np.savetxt(self.get_filename(name, frame), points)
+        np.save(self.get_filename(name, frame, ".npy"), points)
         self.sensor_queue.put((lidar_data.frame, name))
 
     def add_semlidar_snapshot(self, lidar_data, name="SemLiDAR"):
@@ -185,7 +182,7 @@ class Scenario():
         points = np.array([data['x'], data['y'], data['z'], data['CosAngle'], data['ObjTag']]).T
 
         frame = lidar_data.frame - self.init_timestamp['frame0']
-        np.savetxt(self.get_filename(name, frame), points)
+        np.save(self.get_filename(name, frame, ".npy"), points)
         self.sensor_queue.put((lidar_data.frame, name))
 
     def add_radar_snapshot(self, radar_data, name="Radar"):
@@ -196,7 +193,7 @@ class Scenario():
         points = np.reshape(points, (int(points.shape[0] / 4), 4))
 
         frame = radar_data.frame - self.init_timestamp['frame0']
-        np.savetxt(self.get_filename(name, frame), points)
+        np.save(self.get_filename(name, frame, ".npy"), points)
         self.sensor_queue.put((radar_data.frame, name))
 
     def sensor_syncronization(self):
@@ -346,54 +343,21 @@ class SensorScenarioTester():
         self.client = self.scene.client
         self.scenario_name = self.scene.__class__.__name__
         self.output_path = output_path
-
-    def compare_files(self, file_i, file_j):
-
-        # First, we check if the files are exactly equal,
-        # if they are the simulations are equivalent
-        check_ij = filecmp.cmp(file_i, file_j)
-        if check_ij:
-            return True
-
-        # If not, if we have different number of points
-        # the simulations are not equivalent
-        data_i = np.loadtxt(file_i)
-        data_j = np.loadtxt(file_j)
-        if data_i.shape != data_j.shape:
-            return False
-
-        # If they have the same number of points but there is
-        # a small diference, the simulations could be equivalent
-        # differing only in floaring-point arithmetic errors
-        max_error = np.amax(np.abs(data_i-data_j))
-
-        return max_error < 0.01
+        self.results = []
 
     def check_simulations(self, rep_prefixes, sim_tics):
-        repetitions = len(rep_prefixes)
-        mat_check = np.zeros((repetitions, repetitions), int)
-
-        for i in range(0, repetitions):
-            mat_check[i][i] = 1
-            for j in range(0, i):
-                sim_check = True
-                for f_idx in range(1, sim_tics):
-                    for sensor in self.scene.sensor_list:
-                        file_i = self.scene.get_filename_with_prefix(rep_prefixes[i], sensor[0], f_idx)
-                        file_j = self.scene.get_filename_with_prefix(rep_prefixes[j], sensor[0], f_idx)
-
-                        check_ij = self.compare_files(file_i, file_j)
-                        sim_check = sim_check and check_ij
-
-                mat_check[i][j] = int(sim_check)
-                mat_check[j][i] = int(sim_check)
-
-        determinism = np.sum(mat_check,axis=1)
+        # Every sensor frame is hashed once and only the repetitions with
+        # different hashes are compared with a tolerance of 0.01, which
+        # absorbs floating-point arithmetic differences
+        streams = []
+        for sensor in self.scene.sensor_list:
+            files = [[self.scene.get_filename_with_prefix(r_prefix, sensor[0], f_idx, ".npy")
+                      for f_idx in range(1, sim_tics)] for r_prefix in rep_prefixes]
+            streams.append(file_stream(sensor[0], files))
 
-        determinism_set = list(set(determinism))
-        determinism_set.sort(reverse=True)
+        self.results = check_streams(streams, tolerance=0.01)
 
-        return determinism_set
+        return determinism_set(consistency_matrix(self.results, len(rep_prefixes)))
 
     def test_scenario(self, repetitions = 1, sim_tics = 100):
         output_str = "Testing Determinism in %s -> " % (self.scenario_name)
@@ -419,6 +383,9 @@ class SensorScenarioTester():
 
         if determ_repet[0] != repetitions:
             print("Error!!! Scenario %s is not deterministic: %d / %d" % (self.scenario_name, determ_repet[0], repetitions))
+            for result in self.results:
+                if result.divergence is not None:
+                    print("  %s diverges at frame %d" % (result.name, result.divergence + 1))
 
         return output_str
 
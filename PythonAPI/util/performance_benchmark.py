@@ -32,6 +32,7 @@ from tr import tr
 import argparse
 import cpuinfo
 import glob
+import json
 import math
 import numpy as np
 import os
@@ -51,12 +52,18 @@ try:
 except IndexError:
     pass
 
+# 将PythonAPI/carla加入系统路径，以便导入benchmark模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
 import carla
 
+from benchmark import metrics
+
 # ======================================================================================================================
 # -- Global variables. So sorry... -------------------------------------------------------------------------------------
 # ======================================================================================================================
 sensors_callback = []
+sensors_meter = []
 
 def define_weather():
   list_weather = []
@@ -178,6 +185,23 @@ def define_maps(client):
       print("Warning!! The list of maps introduced is not valid. Using all available.")
 
   return maps
+
+def define_scenarios(maps):
+  """Scenario matrix, as indices into the lists of weather, environments and sensors."""
+  list_scenarios = []
+  for town in maps:
+    for i_weather, weather in enumerate(define_weather()):
+      for i_env, env in enumerate(define_environments()):
+        for i_sensors, sensors in enumerate(define_sensors()):
+          list_scenarios.append({
+            'id': len(list_scenarios),
+            'town': town,
+            'weather': i_weather,
+            'environment': i_env,
+            'sensors': i_sensors})
+
+  return list_scenarios
+
 class CallBack(object):
     def __init__(self):
         self._lock = threading.Lock()
@@ -195,6 +219,7 @@ class CallBack(object):
 
 def create_environment(world, sensors, n_vehicles, n_walkers, spawn_points, client, tick):
   global sensors_callback
+  global sensors_meter
   sensors_ret = []
   blueprint_library = world.get_blueprint_library()
 
@@ -239,11 +264,13 @@ def create_environment(world, sensors, n_vehicles, n_walkers, spawn_points, clie
     sensor_transform = carla.Transform(sensor_location, sensor_rotation)
     sensor = world.spawn_actor(bp, sensor_transform)
 
-    # add callbacks
+    # add callbacks, the meter records the frame, arrival time and size of each message
     sc = CallBack()
-    sensor.listen(sc)
+    meter = metrics.SensorMeter(sc)
+    sensor.listen(meter)
 
     sensors_callback.append(sc)
+    sensors_meter.append(meter)
     sensors_ret.append(sensor)
 
   vehicles_list = []
@@ -266,7 +293,7 @@ def create_environment(world, sensors, n_vehicles, n_walkers, spawn_points, clie
     if num >= n_vehicles:
       break
     blueprint.set_attribute('role_name', 'autopilot')
-    batch.append(SpawnActor(blueprint, transform).then(SetAutopilot(FutureActor, True)))
+    batch.append(SpawnActor(blueprint, transform).then(SetAutopilot(FutureActor, True, int(args.tm_port))))
 
   for response in client.apply_batch_sync(batch, False):
     if response.error:
@@ -372,13 +399,15 @@ def set_world_settings(world, args = None):
 
 def run_benchmark(world, sensors, n_vehicles, n_walkers, client, debug=False):
   global sensors_callback
+  global sensors_meter
 
   spawn_points = world.get_map().get_spawn_points()
   n = min(n_vehicles, len(spawn_points))
   list_fps = []
   sensor_list = None
 
-  tick = world.tick if args.sync else world.wait_for_tick
+  tick = metrics.TickTimer(world.tick if args.sync else world.wait_for_tick)
+  process = metrics.ProcessMeter()
   set_world_settings(world, args)
 
   vehicles_list, walkers_list, all_id, all_actors, sensors_ret = create_environment(world, sensors, n, n_walkers, spawn_points, client, tick)
@@ -390,9 +419,16 @@ def run_benchmark(world, sensors, n_vehicles, n_walkers, client, debug=False):
   for _i in range(0, 50):
     tick()
 
+  # only the measured ticks count for the latency and throughput metrics
+  tick.reset()
+  for meter in sensors_meter:
+    meter.reset()
+  process.start()
+
   ticks = 0
   while ticks < int(args.ticks):
     _ = tick()
+    process.sample()
     if debug:
       print("== Samples {} / {}".format(ticks + 1, args.ticks))
 
@@ -407,10 +443,14 @@ def run_benchmark(world, sensors, n_vehicles, n_walkers, client, debug=False):
 
     ticks += 1
 
+  labels = [sensor['label'] for sensor in sensors]
+  run_metrics = metrics.summarize(tick, sensors_meter, process, labels)
+
   for sensor in sensor_list:
     sensor.stop()
     sensor.destroy()
   sensors_callback.clear()
+  sensors_meter.clear()
 
   print('Destroying %d vehicles.\n' % len(vehicles_list))
   client.apply_batch([carla.command.DestroyActor(x) for x in vehicles_list])
@@ -424,7 +464,7 @@ def run_benchmark(world, sensors, n_vehicles, n_walkers, client, debug=False):
 
   set_world_settings(world)
 
-  return list_fps
+  return list_fps, run_metrics
 
 
 def compute_mean_std(list_values):
@@ -507,65 +547,102 @@ def show_benchmark_scenarios(maps):
 
 def main(args):
 
+  world = None
   try:
     client = carla.Client(args.host, int(args.port))
     client.set_timeout(150.0)
     pygame.init()
 
     records = {}
+    list_records = []
     maps = define_maps(client)
 
     if args.show_scenarios:
       show_benchmark_scenarios(maps)
       return
 
+    if args.list_scenarios is not None:
+      with open(args.list_scenarios, 'w') as fd:
+        json.dump(define_scenarios(maps), fd, indent=2)
+      return
+
+    if args.scenarios is not None:
+      # subset of the matrix assigned by benchmark/orchestrator.py
+      with open(args.scenarios) as fd:
+        list_scenarios = json.load(fd)
+    else:
+      list_scenarios = define_scenarios(maps)
+
     #maps = ["Town04_Opt"]
 
-    for town in maps:
-      world = client.load_world(town)
-      time.sleep(5)
-
-      # set to async mode
-      set_world_settings(world)
-
-      # spectator pointing to the sky to reduce rendering impact
-      spectator = world.get_spectator()
-      spectator.set_transform(carla.Transform(carla.Location(z=500), carla.Rotation(pitch=90)))
-
-      for weather in define_weather():
-        world.set_weather(weather["parameter"])
-        for env in define_environments():
-          for sensors in define_sensors():
-            list_fps = run_benchmark(world, sensors, env["vehicles"], env["walkers"], client)
-            mean, std = compute_mean_std(list_fps)
-            sensor_str = ""
-            for sensor in sensors:
-              sensor_str += (sensor['label'] + " ")
-
-            record = {
-              'town': town,
-              'sensors': sensor_str,
-              'weather': weather["name"],
-              'n_vehicles': env["vehicles"],
-              'n_walkers': env["walkers"],
-              'samples': args.ticks,
-              'fps_mean': mean,
-              'fps_std': std
-            }
-
-            env_str = str(env["vehicles"]) + str(env["walkers"])
-
-            if env_str not in records:
-              records[env_str] = []
-            records[env_str].append(record)
-            print(record)
+    list_weather = define_weather()
+    list_env = define_environments()
+    list_sensors = define_sensors()
+
+    town = None
+    for scenario in list_scenarios:
+      if scenario['town'] != town:
+        town = scenario['town']
+        world = client.load_world(town)
+        time.sleep(5)
+
+        # set to async mode
+        set_world_settings(world)
+
+        # spectator pointing to the sky to reduce rendering impact
+        spectator = world.get_spectator()
+        spectator.set_transform(carla.Transform(carla.Location(z=500), carla.Rotation(pitch=90)))
+
+      weather = list_weather[scenario['weather']]
+      env = list_env[scenario['environment']]
+      sensors = list_sensors[scenario['sensors']]
+      world.set_weather(weather["parameter"])
+
+      list_fps, run_metrics = run_benchmark(world, sensors, env["vehicles"], env["walkers"], client)
+      mean, std = compute_mean_std(list_fps)
+      sensor_str = ""
+      for sensor in sensors:
+        sensor_str += (sensor['label'] + " ")
+
+      record = {
+        'scenario': scenario.get('id'),
+        'town': town,
+        'sensors': sensor_str,
+        'weather': weather["name"],
+        'n_vehicles': env["vehicles"],
+        'n_walkers': env["walkers"],
+        'samples': args.ticks,
+        'fps_mean': mean,
+        'fps_std': std
+      }
+      record.update(run_metrics)
+
+      env_str = str(env["vehicles"]) + str(env["walkers"])
+
+      if env_str not in records:
+        records[env_str] = []
+      records[env_str].append(record)
+      list_records.append(record)
+      print({key: value for key, value in record.items() if key != 'sensor_metrics'})
 
     system_specs = get_system_specs()
     serialize_records(records, system_specs, args.file)
+    if args.json is not None:
+      metrics.write_json(list_records, args.json, system_specs)
+    if args.csv is not None:
+      metrics.write_csv(list_records, args.csv)
+    if args.baseline is not None:
+      regressions = metrics.compare(list_records, metrics.load_records(args.baseline), args.threshold)
+      for r in regressions:
+        print("Regression in {town} / {sensors}/ {weather} / {n_vehicles} vehicles / {n_walkers} walkers:".format(**r['scenario']),
+              "{} {:.3f} -> {:.3f} ({:+.1%})".format(r['metric'], r['baseline'], r['value'], r['change']))
+      if not regressions:
+        print("No regressions beyond {:.0%} of the baseline.".format(args.threshold))
     pygame.quit()
 
   except KeyboardInterrupt:
-      set_world_settings(world)
+      if world is not None:
+        set_world_settings(world)
       client.reload_world()
       print('\nCancelled by user. Bye!')
 
@@ -577,6 +654,11 @@ if __name__ == '__main__':
   parser.add_argument('--host', default='localhost', help='IP of the host server (default: localhost)')
   parser.add_argument('--port', default='2000', help='TCP port to listen to (default: 2000)')
   parser.add_argument('--file', type=str, help='Write results into a txt file', default="benchmark.md")
+  parser.add_argument('--json', type=str, default=None, help='Also write the results into a JSON file')
+  parser.add_argument('--csv', type=str, default=None, help='Also write the results into a CSV file, one row per scenario')
+  parser.add_argument('--baseline', type=str, default=None, help='JSON results of a previous run to compare with')
+  parser.add_argument('--threshold', type=float, default=0.1, help='Relative change flagged as a regression (default: 0.1)')
+  parser.add_argument('--tm_port', default=8000, help='Port of the traffic manager (default: 8000)')
   parser.add_argument('--tm', action='store_true', help='Switch to traffic manager benchmark')
   parser.add_argument('--ticks', default=100, help='Number of ticks for each scenario (default: 100)')
   parser.add_argument('--sync', default=True, action='store_true', help='Synchronous mode execution (default)')
@@ -588,6 +670,8 @@ if __name__ == '__main__':
   parser.add_argument('--sensors', nargs="+", default=None, help='List of sensors to benchmark, by default all defined ones')
   parser.add_argument('--maps', nargs="+", default=None, help='List of maps to benchmark, by default all defined ones')
   parser.add_argument('--weather', nargs="+", default=None, help='List of weather types to benchmark, by default all defined ones')
+  parser.add_argument('--list_scenarios', type=str, default=None, help='Write the scenario matrix into a JSON file and return')
+  parser.add_argument('--scenarios', type=str, default=None, help='Run only the scenarios of a JSON file written by --list_scenarios')
 
   args = parser.parse_args()
 
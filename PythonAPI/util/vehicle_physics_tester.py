@@ -13,6 +13,9 @@ Uses:
         python vehicle_physics_tester.py --filter vehicle_id --basics
     High-speed (100km/h) turn sceneario:
         python vehicle_physics_tester.py --filter vehicle_id --turn
+    Parameter sweep on 4 servers, resumed from sweep.jsonl if interrupted:
+        python vehicle_physics_tester.py --servers 4 --carla ~/carla/CarlaUE4.sh \
+            --sweep tire_friction=2.0,3.5 --sweep drag=0.2,0.3 --output sweep.jsonl
 """
 
 import glob
@@ -32,6 +35,15 @@ except IndexError:
 
 import carla
 
+# 将PythonAPI/carla加入系统路径，以便导入benchmark模块
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + '/carla')
+
+from benchmark.orchestrator import ServerPool
+from determinism import telemetry
+from determinism.snapshot import SnapshotRecorder
+from determinism.telemetry import TELEMETRY_FIELDS
+from benchmark.rollout import ResultStore, RolloutRunner, make_jobs
+
 class VehicleControlStop:
     def __init__(self, x_min = -100000, x_max = +100000, y_min = -100000, y_max = +100000,
             yaw_min = -500, yaw_max = +500, speed_min = -1, speed_max = +100000):
@@ -48,24 +60,26 @@ class VehicleControlStop:
     def stop_control(self, vehicle):
 
         loc = vehicle.get_location()
-        if loc.x > self.x_max :
+        rot = vehicle.get_transform().rotation
+        return self.stop_values(loc.x, loc.y, rot.yaw, norm(vehicle.get_velocity()))
+
+    def stop_values(self, x, y, yaw, speed):
+
+        if x > self.x_max :
             return True
-        if loc.x < self.x_min:
+        if x < self.x_min:
             return True
 
-        if loc.y > self.y_max :
+        if y > self.y_max :
             return True
-        if loc.y < self.y_min:
+        if y < self.y_min:
             return True
 
-        rot = vehicle.get_transform().rotation
-
-        if rot.yaw > self.yaw_max :
+        if yaw > self.yaw_max :
             return True
-        if rot.yaw < self.yaw_min:
+        if yaw < self.yaw_min:
             return True
 
-        speed = norm(vehicle.get_velocity())
         if speed > self.speed_max :
             return True
         if speed < self.speed_min:
@@ -165,48 +179,78 @@ class TelemetryPoint:
         return TelemetryPoint(t, l, r, v)
 
 class TelemetryData:
-    def __init__(self, curr_time, vehicle):
-        self.list_of_telemetries = []
-        location = vehicle.get_location()
-        rotation = vehicle.get_transform().rotation
-        velocity = vehicle.get_velocity()
-        self.list_of_telemetries.append(TelemetryPoint(curr_time, location, rotation, velocity))
+    """Per-tick telemetry of a vehicle in preallocated NumPy columns,
+    with marks at the start of every control phase"""
+    def __init__(self, world, vehicle, ticks=0):
+        self.recorder = SnapshotRecorder(TELEMETRY_FIELDS, capacity=ticks + 1)
+        self.recorder.add(vehicle)
+        self.marks = []
+        snapshot = world.get_snapshot()
+        self.recorder.start(snapshot)
+        self.record(snapshot)
+        self.add_telemetry()
 
     def __str__(self):
         ret_str = ""
-        for idx, val in enumerate(self.list_of_telemetries):
-            ret_str += "%d: %s\n" % (idx, str(val))
+        for idx in range(self.number_of_telemetries()):
+            ret_str += "%d: %s\n" % (idx, str(self.get_telemetry(idx)))
 
         return ret_str
 
-    def add_telemetry(self, curr_time, vehicle):
-        location = vehicle.get_location()
-        rotation = vehicle.get_transform().rotation
-        velocity = vehicle.get_velocity()
-        self.list_of_telemetries.append(TelemetryPoint(curr_time, location, rotation, velocity))
+    def record(self, snapshot):
+        self.recorder.record(snapshot)
+
+    def add_telemetry(self):
+        """Mark the last recorded tick"""
+        self.marks.append(self.recorder.count - 1)
+
+    def columns(self):
+        """elapsed, location, rotation, velocity and acceleration arrays"""
+        return [self.recorder.elapsed] + telemetry.split(self.recorder.data[:, 0])
+
+    def last(self):
+        """x, y, yaw and speed of the last recorded tick"""
+        row = self.recorder.data[self.recorder.count - 1, 0]
+        return row[0], row[1], row[4], float(np.sqrt(np.dot(row[6:9], row[6:9])))
 
     def number_of_telemetries(self):
-        return len(self.list_of_telemetries)
+        return len(self.marks)
 
     def get_telemetry(self, index):
         if index >= self.number_of_telemetries():
             return TelemetryPoint()
 
-        return self.list_of_telemetries[index]
+        tick = self.marks[index]
+        row = self.recorder.data[tick, 0]
+        return TelemetryPoint(float(self.recorder.elapsed[tick]), carla.Location(*row[0:3]),
+                              carla.Rotation(*row[3:6]), carla.Vector3D(*row[6:9]))
 
     def get_telemetry_delta(self, index):
         if index >= (self.number_of_telemetries()-1):
             return TelemetryPoint()
 
-        return self.list_of_telemetries[index+1] - self.list_of_telemetries[index]
+        return self.get_telemetry(index+1) - self.get_telemetry(index)
 
     def get_scalar_delta(self, index):
         if index >= (self.number_of_telemetries()-1):
             return TelemetryPoint()
 
-        delta = self.list_of_telemetries[index+1] - self.list_of_telemetries[index]
+        first, second = self.marks[index], self.marks[index+1]
+        data = self.recorder.data[:, 0]
+        location = data[second, 0:3] - data[first, 0:3]
+        velocity = data[second, 6:9] - data[first, 6:9]
+        return (float(self.recorder.elapsed[second] - self.recorder.elapsed[first]),
+                float(np.sqrt(np.dot(location, location))), float(np.sqrt(np.dot(velocity, velocity))))
 
-        return delta.time, norm(delta.location), norm(delta.velocity)
+    def metrics(self, index, end_index=None):
+        """Vectorized metrics between the marks index and end_index (default: the end)"""
+        end = self.marks[end_index] + 1 if end_index is not None else None
+        return telemetry.summarize(*self.columns(), start=self.marks[index], end=end)
+
+
+def tick(world, data):
+    world.tick()
+    data.record(world.get_snapshot())
 
 
 def run_scenario(world, bp_veh, init_loc, init_speed = 0.0, init_frames=10,
@@ -216,39 +260,42 @@ def run_scenario(world, bp_veh, init_loc, init_speed = 0.0, init_frames=10,
     veh_transf = init_loc
 
     vehicle = world.spawn_actor(bp_veh, veh_transf)
+    if apply_phys_control:
+        vehicle.apply_physics_control(change_physics_control(vehicle, **apply_phys_control))
     wait(world, 10)
 
-    data = TelemetryData(world.get_snapshot().elapsed_seconds, vehicle)
+    data = TelemetryData(world, vehicle, ticks=init_frames + 1 + sum(control[0] for control in controls))
 
     # Initialization at init_speed
     vehicle.enable_constant_velocity(carla.Vector3D(init_speed, 0, 0))
-    wait(world, init_frames)
+    for _i in range(0, init_frames):
+        tick(world, data)
     vehicle.disable_constant_velocity()
-    wait(world, 1)
+    tick(world, data)
 
     for i_control in controls:
         control_frames = i_control[0]
         control = i_control[1]
         stopper = i_control[2]
 
-        data.add_telemetry(world.get_snapshot().elapsed_seconds, vehicle)
+        data.add_telemetry()
 
         # Apply control
         vehicle.apply_control(control)
         for _i in range(0, control_frames):
-            world.tick()
-            check = stopper.stop_control(vehicle)
+            tick(world, data)
+            check = stopper.stop_values(*data.last())
             if check:
                 break
 
-    data.add_telemetry(world.get_snapshot().elapsed_seconds, vehicle)
+    data.add_telemetry()
 
     wait(world, 10)
     vehicle.destroy()
 
     return data
 
-def brake_scenario(world, bp_veh, speed):
+def brake_scenario(world, bp_veh, speed, physics=None):
 
     spectator_transform = carla.Transform(carla.Location(20, -190, 10), carla.Rotation(yaw=67, pitch=-13))
     try:
@@ -262,13 +309,17 @@ def brake_scenario(world, bp_veh, speed):
     controls = [
         (1000, carla.VehicleControl(brake=1.0), VehicleControlStop(speed_min=0.1))]
     
-    data = run_scenario(world, bp_veh, init_loc, init_speed=speed/3.6, controls=controls)
+    data = run_scenario(world, bp_veh, init_loc, init_speed=speed/3.6, controls=controls,
+                        apply_phys_control=physics)
 
     delta = data.get_scalar_delta(1)
     end_vel = 3.6*norm(data.get_telemetry(2).velocity)
     print("  %.0f -> 0 km/h: (%.1f s, %.1f m)" % (speed, delta[0], delta[1]), end="")
+    _, location, _, velocity, _ = data.columns()
+    return {'time': delta[0], 'distance': delta[1], 'end_speed': end_vel,
+            'stopping_distance': telemetry.stopping_distance(location, velocity, start=data.marks[1])}
 
-def accel_scenario(world, bp_veh, max_vel):
+def accel_scenario(world, bp_veh, max_vel, physics=None):
 
     spectator_transform = carla.Transform(carla.Location(20, -190, 10), carla.Rotation(yaw=67, pitch=-13))
     try:
@@ -282,13 +333,16 @@ def accel_scenario(world, bp_veh, max_vel):
     controls = [
         (1000, carla.VehicleControl(throttle=1.0), VehicleControlStop(speed_max=max_vel/3.6))]
 
-    data = run_scenario(world, bp_veh, init_loc=init_loc, controls=controls)
+    data = run_scenario(world, bp_veh, init_loc=init_loc, controls=controls, apply_phys_control=physics)
 
     delta = data.get_scalar_delta(1)
     end_vel = 3.6*norm(data.get_telemetry(2).velocity)
     print("  0 -> %.0f km/h: (%.1f s, %.1f m)" % (max_vel, delta[0], delta[1]), end="")
+    elapsed, _, _, velocity, _ = data.columns()
+    return {'time': delta[0], 'distance': delta[1], 'end_speed': end_vel,
+            'time_to_speed': telemetry.time_to_speed(elapsed, velocity, max_vel/3.6, start=data.marks[1])}
 
-def uturn_scenario(world, bp_veh):
+def uturn_scenario(world, bp_veh, physics=None):
 
     spectator_transform = carla.Transform(carla.Location(30, -180, 20), carla.Rotation(yaw=-140, pitch=-36))
     try:
@@ -304,10 +358,13 @@ def uturn_scenario(world, bp_veh):
         (100, carla.VehicleControl(throttle=0.4), VehicleControlStop(x_min =10))
         ]
 
-    data = run_scenario(world, bp_veh, init_loc=init_pos, controls=controls)
+    data = run_scenario(world, bp_veh, init_loc=init_pos, controls=controls, apply_phys_control=physics)
     end_vel = 3.6*norm(data.get_telemetry(3).velocity)
+    metrics = data.metrics(1)
+    return {'time': metrics['duration'], 'end_speed': end_vel,
+            'max_lateral_acceleration': metrics['max_lateral_acceleration'], 'max_yaw_rate': metrics['max_yaw_rate']}
 
-def highspeed_turn_scenario(world, bp_veh, steer):
+def highspeed_turn_scenario(world, bp_veh, steer, physics=None):
     spectator_transform = carla.Transform(carla.Location(70, -200, 15), carla.Rotation(yaw=0, pitch=-12))
 
     try:
@@ -323,9 +380,65 @@ def highspeed_turn_scenario(world, bp_veh, steer):
         (200, carla.VehicleControl(throttle=1.0, steer = steer), VehicleControlStop(yaw_max=45, speed_min=3)),
         (200, carla.VehicleControl(brake=1), VehicleControlStop())]
 
-    data = run_scenario(world, bp_veh, init_loc=init_pos, init_speed=init_speed, init_frames = init_frames, controls=controls)
+    data = run_scenario(world, bp_veh, init_loc=init_pos, init_speed=init_speed, init_frames = init_frames, controls=controls,
+                        apply_phys_control=physics)
 
     time.sleep(1)
+    turn = data.metrics(2, 3)
+    return {'turn_speed': turn['end_speed'], 'turn_yaw': data.get_telemetry(3).rotation.yaw,
+            'end_speed': 3.6*norm(data.get_telemetry(4).velocity),
+            'max_lateral_acceleration': turn['max_lateral_acceleration'], 'max_yaw_rate': turn['max_yaw_rate']}
+
+# 并行扫描使用的场景：名称 -> 函数，以及 --all 时的参数
+SCENARIOS = {
+    'accel': accel_scenario,
+    'brake': brake_scenario,
+    'uturn': uturn_scenario,
+    'turn': highspeed_turn_scenario,
+}
+SCENARIO_ARGS = [('accel', {'max_vel': 50}), ('accel', {'max_vel': 100}), ('brake', {'speed': 80}),
+                 ('brake', {'speed': 100}), ('uturn', {}), ('turn', {'steer': 0.2})]
+
+def setup_world(client):
+    """Synchronous Town05 world of a sweep worker"""
+    if client.get_world().get_map().name.split('/')[-1] != "Town05":
+        client.load_world("Town05", False)
+    world = client.get_world()
+    settings = world.get_settings()
+    settings.fixed_delta_seconds = 0.05
+    settings.synchronous_mode = True
+    world.apply_settings(settings)
+    return world
+
+def run_job(world, job):
+    """Run one scenario of a sweep, with the physics parameters of the job"""
+    bp_veh = world.get_blueprint_library().find(job['blueprint'])
+    return SCENARIOS[job['scenario']](world, bp_veh, physics=job['params'], **job['args'])
+
+def parse_sweep(values):
+    """['tire_friction=2.0,3.5', 'wheel_sweep=true,false'] -> dict name -> list of values"""
+    parameters = {}
+    for value in values:
+        name, _, options = value.partition('=')
+        parameters[name] = [option == 'true' if option in ('true', 'false') else float(option)
+                            for option in options.split(',')]
+    return parameters
+
+def sweep(arg):
+    """Run the selected scenarios x sweep parameters on several servers"""
+    names = [name for name in ('accel', 'brake', 'uturn', 'turn') if arg.all or getattr(arg, name)]
+    store = ResultStore(arg.output)
+    with ServerPool(arg.servers, arg.carla, arg.host, arg.port) as pool:
+        client = carla.Client(arg.host, arg.port)
+        client.set_timeout(30.0)
+        blueprints = [bp.id for bp in client.get_world().get_blueprint_library().filter(arg.filter)]
+        jobs = make_jobs([scenario for scenario in SCENARIO_ARGS if scenario[0] in names],
+                         parse_sweep(arg.sweep), blueprints)
+        print("%d jobs, %d already done" % (len(jobs), len(store.completed() & set(job['key'] for job in jobs))))
+        runner = RolloutRunner(run_job, pool, store, setup=setup_world)
+        runner.run(jobs, progress=lambda row: print("%s %s" % (row['key'], row['error'] or row['metrics'])))
+    if arg.csv:
+        store.save_csv(arg.csv)
 
 def main(arg):
     """Main function of the script"""
@@ -451,11 +564,42 @@ if __name__ == "__main__":
         action='store_true',
         help='Show default physics control of cars')
 
+    argparser.add_argument(
+        '--servers',
+        metavar='N',
+        default=0,
+        type=int,
+        help='Run the scenarios in parallel on N servers on ports --port, --port + 3...')
+    argparser.add_argument(
+        '--carla',
+        metavar='PATH',
+        default=None,
+        help='Server binary launched for --servers (default: servers already running)')
+    argparser.add_argument(
+        '--sweep',
+        metavar='NAME=V1,V2',
+        action='append',
+        default=[],
+        help='Physics parameter of change_physics_control and its values, repeatable')
+    argparser.add_argument(
+        '--output',
+        metavar='FILE',
+        default='vehicle_physics.jsonl',
+        help='Results of --servers, completed jobs are skipped when run again')
+    argparser.add_argument(
+        '--csv',
+        metavar='FILE',
+        default=None,
+        help='Write the results of --servers as a table')
+
     args = argparser.parse_args()
     if args.accel or args.brake or args.uturn or args.turn:
         args.all = False
 
     try:
-        main(args)
+        if args.servers > 0:
+            sweep(args)
+        else:
+            main(args)
     except KeyboardInterrupt:
         print(' - Exited by user.')
@@ -8,6 +8,7 @@
 #include "CarlaRecorder.h"
 #include "Carla/Game/CarlaEpisode.h"
 
+#include <algorithm>
 #include <ctime>
 #include <sstream>
 
@@ -132,6 +133,12 @@ std::string CarlaReplayer::ReplayFile(std::string Filename, double TimeStart, do
   // from start
   Rewind();
 
+  // use the sidecar index if there is one for this recording
+  if (Index.Load(Filename2))
+  {
+    Info << "Using replay index " << CarlaReplayerIndex::GetIndexFilename(Filename2) << std::endl;
+  }
+
   // check to load map if different
   if (Episode->GetMapName() != RecInfo.Mapfile)
   {
@@ -156,7 +163,7 @@ std::string CarlaReplayer::ReplayFile(std::string Filename, double TimeStart, do
   }
 
   // get Total time of recorder
-  TotalTime = GetTotalTime();
+  TotalTime = Index.IsValid() ? Index.GetTotalTime() : GetTotalTime();
   Info << "Total time recorded: " << TotalTime << std::endl;
 
   // set time to start replayer
@@ -190,7 +197,8 @@ std::string CarlaReplayer::ReplayFile(std::string Filename, double TimeStart, do
   if (!Autoplay.Enabled)
   {
     Helper.RemoveStaticProps();
-    // process all events until the time
+    // jump close to the time if possible, and process all events until the time
+    SeekWithIndex(TimeStart);
     ProcessToTime(TimeStart, true);
     // mark as enabled
     Enabled = true;
@@ -224,9 +232,10 @@ void CarlaReplayer::CheckPlayAfterMapLoaded(void)
 
   // from start
   Rewind();
+  Index.Load(Autoplay.Filename);
 
   // get Total time of recorder
-  TotalTime = GetTotalTime();
+  TotalTime = Index.IsValid() ? Index.GetTotalTime() : GetTotalTime();
 
   // set time to start replayer
   double TimeStart = Autoplay.TimeStart;
@@ -253,13 +262,97 @@ void CarlaReplayer::CheckPlayAfterMapLoaded(void)
 
   Helper.RemoveStaticProps();
 
-  // process all events until the time
+  // jump close to the time if possible, and process all events until the time
+  SeekWithIndex(TimeStart);
   ProcessToTime(TimeStart, true);
 
   // mark as enabled
   Enabled = true;
 }
 
+bool CarlaReplayer::SeekWithIndex(double Time)
+{
+  if (!Index.IsValid())
+  {
+    return false;
+  }
+
+  uint32_t TargetFrame = Index.FindFrame(Time);
+  if (TargetFrame == 0)
+  {
+    return false;
+  }
+
+  const auto &Events = Index.GetEvents();
+  size_t FirstEvent = 0;
+
+  // create the actors alive at the keyframe, reading each EventAdd packet once
+  const CarlaReplayerIndexKeyframe *Keyframe = Index.FindKeyframe(TargetFrame);
+  if (Keyframe != nullptr)
+  {
+    std::unordered_set<uint32_t> Alive;
+    std::vector<uint64_t> Packets;
+    for (const auto &Actor : Keyframe->Actors)
+    {
+      Alive.insert(Actor.DatabaseId);
+      Packets.push_back(Actor.Offset);
+    }
+    std::sort(Packets.begin(), Packets.end());
+    Packets.erase(std::unique(Packets.begin(), Packets.end()), Packets.end());
+
+    for (uint64_t Offset : Packets)
+    {
+      File.clear();
+      File.seekg(Offset, std::ios::beg);
+      if (ReadHeader() && Header.Id == static_cast<char>(CarlaRecorderPacketId::EventAdd))
+      {
+        ProcessEventsAdd(&Alive);
+      }
+    }
+
+    for (const auto &Parent : Keyframe->Parents)
+    {
+      Helper.ProcessReplayerEventParent(MappedId[Parent.DatabaseId], MappedId[Parent.DatabaseIdParent]);
+    }
+
+    FirstEvent = Keyframe->FirstEvent;
+  }
+
+  // process only the event packets between the keyframe and the target frame
+  for (size_t i = FirstEvent; i < Events.size() && Events[i].Frame < TargetFrame; ++i)
+  {
+    File.clear();
+    File.seekg(Events[i].Offset, std::ios::beg);
+    if (!ReadHeader())
+    {
+      break;
+    }
+
+    switch (Header.Id)
+    {
+      case static_cast<char>(CarlaRecorderPacketId::EventAdd):
+        ProcessEventsAdd();
+        break;
+
+      case static_cast<char>(CarlaRecorderPacketId::EventDel):
+        ProcessEventsDel();
+        break;
+
+      case static_cast<char>(CarlaRecorderPacketId::EventParent):
+        ProcessEventsParent();
+        break;
+
+      default:
+        break;
+    }
+  }
+
+  // continue from the start of the target frame
+  File.clear();
+  File.seekg(Index.GetFrames()[TargetFrame].Offset, std::ios::beg);
+  return true;
+}
+
 void CarlaReplayer::ProcessToTime(double Time, bool IsFirstTime)
 {
   double Per = 0.0f;
@@ -443,7 +536,7 @@ void CarlaReplayer::ProcessVisualTime(void)
   Episode->SetVisualGameTime(VisualTime.Time);
 }
 
-void CarlaReplayer::ProcessEventsAdd(void)
+void CarlaReplayer::ProcessEventsAdd(const std::unordered_set<uint32_t> *Filter)
 {
   uint16_t i, Total;
   CarlaRecorderEventAdd EventAdd;
@@ -454,6 +547,12 @@ void CarlaReplayer::ProcessEventsAdd(void)
   {
     EventAdd.Read(File);
 
+    // only the actors of the filter (when seeking with a keyframe)
+    if (Filter != nullptr && Filter->count(EventAdd.DatabaseId) == 0)
+    {
+      continue;
+    }
+
     // auto Result = CallbackEventAdd(
     auto Result = Helper.ProcessReplayerEventAdd(
         EventAdd.Location,
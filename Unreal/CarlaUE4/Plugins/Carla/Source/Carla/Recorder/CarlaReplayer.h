@@ -9,6 +9,7 @@
 #include <fstream>
 #include <sstream>
 #include <unordered_map>
+#include <unordered_set>
 
 #include <functional>
 #include "CarlaRecorderInfo.h"
@@ -21,6 +22,7 @@
 #include "CarlaRecorderState.h"
 #include "CarlaRecorderHelpers.h"
 #include "CarlaReplayerHelper.h"
+#include "CarlaReplayerIndex.h"
 
 class UCarlaEpisode;
 
@@ -127,6 +129,7 @@ private:
   bool IgnoreHero { false };
   bool IgnoreSpectator { true };
   std::unordered_map<uint32_t, bool> IsHeroMap;
+  CarlaReplayerIndex Index;
 
   //实用工具函数
   bool ReadHeader();
@@ -140,9 +143,13 @@ private:
   //处理数据包
   void ProcessToTime(double Time, bool IsFirstTime = false);
 
+  // jump to the frame of the time with the sidecar index, returns false if
+  // there is no index and the recording has to be scanned from the start
+  bool SeekWithIndex(double Time);
+
   void ProcessVisualTime(void);
 
-  void ProcessEventsAdd(void);
+  void ProcessEventsAdd(const std::unordered_set<uint32_t> *Filter = nullptr);
   void ProcessEventsDel(void);
   void ProcessEventsParent(void);
 
@@ -0,0 +1,98 @@
+// Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma
+// de Barcelona (UAB).
+//
+// This work is licensed under the terms of the MIT license.
+// For a copy, see <https://opensource.org/licenses/MIT>.
+
+#include "Carla.h"
+#include "CarlaReplayerIndex.h"
+#include "CarlaRecorderHelpers.h"
+
+#include <algorithm>
+#include <fstream>
+
+bool CarlaReplayerIndex::Load(const std::string &RecordingFilename)
+{
+  Clear();
+
+  std::ifstream Recording(RecordingFilename, std::ios::binary | std::ios::ate);
+  std::ifstream File(GetIndexFilename(RecordingFilename), std::ios::binary);
+  if (!Recording.is_open() || !File.is_open())
+  {
+    return false;
+  }
+
+  uint16_t FileVersion;
+  FString Magic;
+  uint64_t RecordingSize;
+  ReadValue<uint16_t>(File, FileVersion);
+  ReadFString(File, Magic);
+  ReadValue<uint64_t>(File, RecordingSize);
+  if (!File || FileVersion != Version || Magic != TEXT("CARLA_REPLAY_INDEX"))
+  {
+    UE_LOG(LogCarla, Warning, TEXT("Ignoring replay index with unknown format"));
+    return false;
+  }
+  // the recording has changed since the index was built
+  if (RecordingSize != static_cast<uint64_t>(Recording.tellg()))
+  {
+    UE_LOG(LogCarla, Warning, TEXT("Ignoring replay index that does not match the recording"));
+    return false;
+  }
+
+  ReadValue<double>(File, TotalTime);
+  ReadStdVector<CarlaReplayerIndexFrame>(File, Frames);
+  ReadStdVector<CarlaReplayerIndexEvent>(File, Events);
+
+  uint32_t Total;
+  ReadValue<uint32_t>(File, Total);
+  Keyframes.resize(Total);
+  for (auto &Keyframe : Keyframes)
+  {
+    ReadValue<uint32_t>(File, Keyframe.Frame);
+    ReadValue<uint32_t>(File, Keyframe.FirstEvent);
+    ReadStdVector<CarlaReplayerIndexActor>(File, Keyframe.Actors);
+    ReadStdVector<CarlaReplayerIndexParent>(File, Keyframe.Parents);
+  }
+
+  if (!File || Frames.empty())
+  {
+    UE_LOG(LogCarla, Warning, TEXT("Ignoring truncated replay index"));
+    Clear();
+    return false;
+  }
+
+  Valid = true;
+  return true;
+}
+
+void CarlaReplayerIndex::Clear(void)
+{
+  Valid = false;
+  TotalTime = 0.0;
+  Frames.clear();
+  Events.clear();
+  Keyframes.clear();
+}
+
+uint32_t CarlaReplayerIndex::FindFrame(double Time) const
+{
+  auto It = std::upper_bound(Frames.begin(), Frames.end(), Time,
+      [](double Value, const CarlaReplayerIndexFrame &Frame) { return Value < Frame.Elapsed; });
+  if (It == Frames.begin())
+  {
+    return 0;
+  }
+  return static_cast<uint32_t>(std::distance(Frames.begin(), It) - 1);
+}
+
+const CarlaReplayerIndexKeyframe *CarlaReplayerIndex::FindKeyframe(uint32_t Frame) const
+{
+  auto It = std::upper_bound(Keyframes.begin(), Keyframes.end(), Frame,
+      [](uint32_t Value, const CarlaReplayerIndexKeyframe &Keyframe) { return Value < Keyframe.Frame; });
+  if (It == Keyframes.begin())
+  {
+    return nullptr;
+  }
+  return &(*(It - 1));
+}
@@ -0,0 +1,104 @@
+// Copyright (c) 2026 Computer Vision Center (CVC) at the Universitat Autonoma
+// de Barcelona (UAB).
+//
+// This work is licensed under the terms of the MIT license.
+// For a copy, see <https://opensource.org/licenses/MIT>.
+
+#pragma once
+
+#include <cstdint>
+#include <string>
+#include <vector>
+
+// Sidecar index of a recording ("<recording>.index"), built offline by
+// PythonAPI/carla/recorder/replay_index.py. It lets the replayer jump to any
+// frame without scanning the whole file: the byte offset of every frame, the
+// offset of every event packet, and periodic keyframes with the actors alive
+// at that frame (and the EventAdd packet that created each of them).
+
+#pragma pack(push, 1)
+struct CarlaReplayerIndexFrame
+{
+  double Elapsed;
+  uint64_t Offset;
+};
+
+struct CarlaReplayerIndexEvent
+{
+  uint32_t Frame;
+  uint64_t Offset;
+};
+
+struct CarlaReplayerIndexActor
+{
+  uint32_t DatabaseId;
+  uint64_t Offset;
+};
+
+struct CarlaReplayerIndexParent
+{
+  uint32_t DatabaseId;
+  uint32_t DatabaseIdParent;
+};
+#pragma pack(pop)
+
+struct CarlaReplayerIndexKeyframe
+{
+  uint32_t Frame;
+  // first event packet at or after Frame
+  uint32_t FirstEvent;
+  std::vector<CarlaReplayerIndexActor> Actors;
+  std::vector<CarlaReplayerIndexParent> Parents;
+};
+
+class CarlaReplayerIndex
+{
+public:
+
+  static const uint16_t Version = 1;
+
+  // try to load the sidecar of the recording, the index is discarded if it
+  // does not match the size of the recording
+  bool Load(const std::string &RecordingFilename);
+
+  void Clear(void);
+
+  bool IsValid(void) const
+  {
+    return Valid;
+  }
+
+  double GetTotalTime(void) const
+  {
+    return TotalTime;
+  }
+
+  // last frame starting at or before the time
+  uint32_t FindFrame(double Time) const;
+
+  // last keyframe at or before the frame, nullptr if there is none
+  const CarlaReplayerIndexKeyframe *FindKeyframe(uint32_t Frame) const;
+
+  const std::vector<CarlaReplayerIndexFrame> &GetFrames(void) const
+  {
+    return Frames;
+  }
+
+  const std::vector<CarlaReplayerIndexEvent> &GetEvents(void) const
+  {
+    return Events;
+  }
+
+  static std::string GetIndexFilename(const std::string &RecordingFilename)
+  {
+    return RecordingFilename + ".index";
+  }
+
+private:
+
+  bool Valid { false };
+  double TotalTime { 0.0 };
+  std::vector<CarlaReplayerIndexFrame> Frames;
+  std::vector<CarlaReplayerIndexEvent> Events;
+  std::vector<CarlaReplayerIndexKeyframe> Keyframes;
+};